@@ -0,0 +1,34 @@
+"""
+Bump cache versions as loans, repayments and investments change
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from loans.models import LoanApplication
+from repayments.models import Investment, Repayment
+from users.models import StudentUser
+from .versioned import invalidate, invalidate_loans, loan_scope, student_scope
+
+
+@receiver(post_save, sender=LoanApplication)
+@receiver(post_delete, sender=LoanApplication)
+def invalidate_loan(sender, instance, **kwargs):
+    invalidate(loan_scope(instance.pk), student_scope(instance.student_id))
+
+
+@receiver(post_save, sender=Repayment)
+@receiver(post_delete, sender=Repayment)
+@receiver(post_save, sender=Investment)
+@receiver(post_delete, sender=Investment)
+def invalidate_loan_of(sender, instance, **kwargs):
+    invalidate_loans([instance.loan_id])
+
+
+@receiver(post_save, sender=StudentUser)
+@receiver(post_delete, sender=StudentUser)
+def invalidate_student(sender, instance, created=False, signal=None, **kwargs):
+    # A new row may reuse the id of a deleted one (or of another database
+    # sharing the L2 cache); profile edits do not feed any cached summary
+    if created or signal is post_delete:
+        invalidate(student_scope(instance.pk))
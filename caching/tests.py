@@ -0,0 +1,125 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from loan_app.computed import as_of
+from loans.models import LoanApplication
+from loans.transitions import transition_loans
+from repayments.models import Investment, Repayment
+from users.models import StudentUser, FinancierUser
+from users.services import repayment_summary_data
+from .versioned import L1_ALIAS, L2_ALIAS, cache_stats, get_versions, loan_scope, reset_stats, student_scope
+
+
+class VersionedCacheTests(TestCase):
+    """Summary endpoints are served from cache until a write bumps their versions"""
+
+    def setUp(self):
+        caches[L1_ALIAS].clear()
+        caches[L2_ALIAS].clear()
+        reset_stats()
+        self.student = self.create_user('STU001')
+        self.other = self.create_user('STU002')
+        self.loan = LoanApplication.objects.create(
+            student=self.student, amount=Decimal('10000'), reason='Tuition', status='Approved',
+            repayment_due_date=timezone.now().date() + timedelta(days=30),
+        )
+        self.client.force_login(self.student)
+
+    def create_user(self, student_id):
+        return StudentUser.objects.create_user(
+            email=f'{student_id.lower()}@example.com', password='testpass123', first_name='Test',
+            last_name=student_id, student_id=student_id, university='Test University', gpa=Decimal('5.00'),
+        )
+
+    def summary(self, name='users:repayment_summary_api'):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(reverse(name)).json()['data']
+        return data, len(queries)
+
+    def test_repeat_reads_skip_the_database(self):
+        data, cold = self.summary()
+        self.assertEqual(data['total_paid'], 0.0)
+        again, warm = self.summary()
+        self.assertEqual(again, data)
+        self.assertLess(warm, cold)
+        self.assertEqual(cache_stats()['repayment_summary'], {'misses': 1, 'l1_hits': 1})
+
+        # Another process (empty L1) is served from the shared L2
+        caches[L1_ALIAS].clear()
+        self.summary()
+        self.assertEqual(cache_stats()['repayment_summary']['l2_hits'], 1)
+
+    def test_repayment_invalidates_student_and_loan(self):
+        self.summary()
+        self.assertEqual(self.summary('repayments:summary_api')[0]['repayment_progress'], 0.0)
+        status = self.client.get(reverse('users:loan_status_api', args=[self.loan.pk])).json()['data']
+
+        Repayment.objects.create(loan=self.loan, amount_paid=Decimal('2500'), status='Paid')
+
+        self.assertEqual(self.summary()[0]['total_paid'], 2500.0)
+        self.assertGreater(self.summary('repayments:summary_api')[0]['repayment_progress'], 0.0)
+        fresh = self.client.get(reverse('users:loan_status_api', args=[self.loan.pk])).json()['data']
+        self.assertEqual(fresh['total_amount_due'], status['total_amount_due'])
+        self.assertEqual(cache_stats()['loan_status']['misses'], 2)
+
+    def test_bulk_transition_invalidates(self):
+        pending = LoanApplication.objects.create(
+            student=self.other, amount=Decimal('5000'), reason='Books',
+            repayment_due_date=timezone.now().date() + timedelta(days=30),
+        )
+        self.client.force_login(self.other)
+        self.assertFalse(self.summary()[0]['has_active_loan'])
+
+        transition_loans([pending.pk], 'Approved', notify=False)
+        self.assertEqual(self.summary()[0]['loan_id'], pending.pk)
+
+    def test_investment_bumps_loan_version(self):
+        before = get_versions([loan_scope(self.loan.pk), student_scope(self.student.pk)])
+        financier = FinancierUser.objects.create(user=self.other, financier_id='F001')
+        Investment.objects.create(financier=financier, loan=self.loan, investment_amount=Decimal('5000'))
+        after = get_versions([loan_scope(self.loan.pk), student_scope(self.student.pk)])
+        self.assertNotEqual(before[loan_scope(self.loan.pk)], after[loan_scope(self.loan.pk)])
+        self.assertNotEqual(before[student_scope(self.student.pk)], after[student_scope(self.student.pk)])
+
+    def test_commit_bumps_again(self):
+        # Entries cached from pre-commit data while the write was in flight are retired on commit
+        with self.captureOnCommitCallbacks() as callbacks:
+            Repayment.objects.create(loan=self.loan, amount_paid=Decimal('100'), status='Paid')
+        self.summary()
+        for callback in callbacks:
+            callback()
+        self.summary()
+        self.assertEqual(cache_stats()['repayment_summary']['misses'], 2)
+
+    def test_loan_status_is_per_student(self):
+        url = reverse('users:loan_status_api', args=[self.loan.pk])
+        self.assertTrue(self.client.get(url).json()['success'])
+        self.client.force_login(self.other)
+        self.assertFalse(self.client.get(url).json()['success'])
+
+    def test_no_shared_backend_disables_caching(self):
+        shared = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        with override_settings(CACHES={'default': settings.CACHES['default'], 'shared': shared}):
+            first, cold = self.summary()
+            Repayment.objects.create(loan=self.loan, amount_paid=Decimal('100'), status='Paid')
+            second, warm = self.summary()
+        self.assertEqual(second['total_paid'], 100.0)
+        self.assertEqual(warm, cold)
+        self.assertEqual(cache_stats()['repayment_summary'], {'misses': 2})
+
+    def test_key_follows_as_of_date(self):
+        today = timezone.localdate()
+        with as_of(today):
+            repayment_summary_data(self.student)
+            repayment_summary_data(self.student)
+        with as_of(today + timedelta(days=1)):
+            repayment_summary_data(self.student)
+        self.assertEqual(cache_stats()['repayment_summary'], {'misses': 2, 'l1_hits': 1})
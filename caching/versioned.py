@@ -0,0 +1,168 @@
+"""
+Versioned two-tier cache for per-student read endpoints
+
+Cached values live in a per-process L1 (the 'default' local-memory cache)
+in front of a shared L2 (the 'shared' cache: file-based by default, Redis
+in production). A value's key embeds the current version of every scope
+it was computed from (student:<id>, loan:<id>). Writes never look for
+entries to delete: signal handlers give the touched scopes a new version,
+readers stop asking for the old keys and those expire on their own.
+
+Versions are always read from L2, so every process sees a bump at once
+and an L1 entry can never be served after its data changed. A scope
+without a stored version (new or evicted) starts from the clock, never
+from a number an old entry may still be stored under.
+
+That guarantee only holds if every process that writes (the web service,
+the webhook and outbox workers, the cron jobs) shares the L2: a bump made
+in a process with its own L2 never reaches the readers. The file-based
+default is therefore limited to development on a single host. When the L2
+is a DummyCache (the production default until a shared backend is
+configured) cached() calls straight through and nothing is cached.
+"""
+
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.db import transaction
+
+from loan_app.computed import as_of_date
+
+L1_ALIAS = 'default'
+L2_ALIAS = 'shared'
+
+_MISSING = object()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def student_scope(student_id):
+    return f'student:{student_id}'
+
+
+def loan_scope(loan_id):
+    return f'loan:{loan_id}'
+
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def get_versions(scopes):
+    """Current version of each scope, keyed by scope (one L2 round trip when all exist)"""
+    shared = caches[L2_ALIAS]
+    keys = {scope: _version_key(scope) for scope in scopes}
+    found = shared.get_many(keys.values())
+    versions = {}
+    for scope, key in keys.items():
+        if key not in found:
+            # add() so concurrent first readers settle on one version
+            shared.add(key, time.time_ns(), timeout=None)
+            found[key] = shared.get(key)
+        versions[scope] = found[key]
+    return versions
+
+
+def _bump(scopes):
+    version = time.time_ns()
+    caches[L2_ALIAS].set_many({_version_key(scope): version for scope in scopes}, timeout=None)
+
+
+def invalidate(*scopes):
+    """
+    Give each scope a new version, now and again when the transaction commits
+
+    The second bump retires entries that concurrent readers cached from the
+    pre-commit data while the write was in flight. Outside a transaction
+    both happen immediately.
+    """
+    scopes = set(scopes)
+    if not scopes:
+        return
+    _bump(scopes)
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def invalidate_loans(loan_ids):
+    """Invalidate loans and their students after writes that bypass save() (one query)"""
+    from loans.models import LoanApplication
+
+    loan_ids = set(loan_ids)
+    if not loan_ids:
+        return
+    student_ids = (
+        LoanApplication.objects.filter(pk__in=loan_ids)
+        .values_list('student_id', flat=True).distinct()
+    )
+    invalidate(*map(loan_scope, loan_ids), *map(student_scope, student_ids))
+
+
+def _count(name, outcome):
+    with _stats_lock:
+        _stats.setdefault(name, Counter())[outcome] += 1
+
+
+def cache_stats():
+    """Hit/miss counters of this process: {name: {'l1_hits', 'l2_hits', 'misses'}}"""
+    with _stats_lock:
+        return {name: dict(counts) for name, counts in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def caching_enabled():
+    """False when no shared L2 is configured (versions could not be shared)"""
+    return not isinstance(caches[L2_ALIAS], DummyCache)
+
+
+def cached(name, scopes):
+    """
+    Cache a function's result under the versions of the scopes it reads
+
+    Args:
+        name: Key prefix and stats name
+        scopes: Callable taking the function's arguments and returning the
+            scopes its result depends on. The key is built from these
+            alone, so they must also identify the result (include the
+            student the data belongs to).
+
+    The key also carries the as-of date the values are computed for
+    (as_of_date()), as summaries count days to due dates. Exceptions are not cached.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not caching_enabled():
+                _count(name, 'misses')
+                return func(*args, **kwargs)
+            versions = get_versions(scopes(*args, **kwargs))
+            key = ':'.join([
+                name, as_of_date().isoformat(),
+                *(f'{scope}@{version}' for scope, version in sorted(versions.items())),
+            ])
+            local, shared = caches[L1_ALIAS], caches[L2_ALIAS]
+
+            value = local.get(key, _MISSING)
+            if value is not _MISSING:
+                _count(name, 'l1_hits')
+                return value
+            value = shared.get(key, _MISSING)
+            if value is not _MISSING:
+                _count(name, 'l2_hits')
+                local.set(key, value)
+                return value
+
+            _count(name, 'misses')
+            value = func(*args, **kwargs)
+            shared.set(key, value)
+            local.set(key, value)
+            return value
+        return wrapper
+    return decorator
@@ -0,0 +1,36 @@
+"""
+Django template backend that adds render time to the request's metrics
+
+Only the top-level render() of a template obtained through the backend
+(render(), TemplateResponse, render_to_string) is timed; includes and
+extends render inside it and are not counted twice.
+"""
+
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+from .metrics import record_template
+
+
+class Template(django_backend.Template):
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record_template(time.perf_counter() - started)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -0,0 +1,206 @@
+"""
+Per-request query, template and wall-time metrics
+
+RequestMetricsMiddleware opens a RequestMetrics for every request and
+keeps it in a context variable. Every database connection carries
+record_query() as an execute wrapper, which adds each query's count and
+duration to the current request (context variables follow the request
+into sync_to_async threads, so async views are covered too); outside a
+request the wrapper only forwards the call. The template backend in
+diagnostics.backends adds render time the same way.
+
+Finished requests are appended to a bounded in-process ring buffer read
+by the staff diagnostics page. Each worker keeps its own buffer, so the
+page shows the requests served by the worker that answers it.
+"""
+
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Counters for one request"""
+
+    __slots__ = ('started', 'queries', 'db_time', 'template_time', 'total_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.total_time = None
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+        return self
+
+
+def start_request():
+    """Begin collecting for the current context; returns (metrics, token)"""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def metered_stream(content, metrics):
+    """Iterate a streaming body with metrics current while each chunk is produced"""
+    iterator = iter(content)
+    while True:
+        token = _current.set(metrics)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _current.reset(token)
+        yield chunk
+
+
+async def ametered_stream(content, metrics):
+    """Async counterpart of metered_stream()"""
+    iterator = aiter(content)
+    while True:
+        token = _current.set(metrics)
+        try:
+            chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            _current.reset(token)
+        yield chunk
+
+
+def current_metrics():
+    """The RequestMetrics being collected, or None outside a request"""
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper adding each query to the current request"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def record_template(elapsed):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.template_time += elapsed
+
+
+def install_query_recorder(connection, **kwargs):
+    """Attach record_query to a connection (connection_created receiver)"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_on_open_connections():
+    # Connections opened before the app registry was ready never sent connection_created
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection)
+
+
+class RequestLog:
+    """Thread-safe ring buffer of finished requests"""
+
+    def __init__(self, size):
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def append(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self):
+        """Oldest first"""
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+request_log = RequestLog(getattr(settings, 'REQUEST_METRICS_BUFFER_SIZE', 500))
+
+
+def log_request(request, response, metrics):
+    """Append a finished request to request_log and return its entry"""
+    match = getattr(request, 'resolver_match', None)
+    entry = {
+        'at': timezone.now(),
+        'view': match.view_name if match else None,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'queries': metrics.queries,
+        'db_ms': metrics.db_time * 1000,
+        'template_ms': metrics.template_time * 1000,
+        'total_ms': metrics.total_time * 1000,
+    }
+    budget = query_budgets().get(entry['view'])
+    entry['budget'] = budget
+    entry['over_budget'] = budget is not None and metrics.queries > budget
+    request_log.append(entry)
+    return entry
+
+
+def query_budgets():
+    """settings.QUERY_BUDGETS: maximum queries per URL name"""
+    return getattr(settings, 'QUERY_BUDGETS', {})
+
+
+def server_timing(metrics):
+    """Server-Timing header value for a finished request"""
+    return (
+        f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries", '
+        f'tpl;dur={metrics.template_time * 1000:.1f};desc="Templates", '
+        f'total;dur={metrics.total_time * 1000:.1f};desc="Total"'
+    )
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(entries):
+    """Per-view aggregates of request_log entries, most total time first"""
+    by_view = {}
+    for entry in entries:
+        by_view.setdefault(entry['view'] or '(unresolved)', []).append(entry)
+    rows = []
+    for view, group in by_view.items():
+        totals = sorted(entry['total_ms'] for entry in group)
+        queries = [entry['queries'] for entry in group]
+        rows.append({
+            'view': view,
+            'requests': len(group),
+            'avg_queries': sum(queries) / len(group),
+            'max_queries': max(queries),
+            'budget': group[-1]['budget'],
+            'over_budget': sum(1 for entry in group if entry['over_budget']),
+            'avg_db_ms': sum(entry['db_ms'] for entry in group) / len(group),
+            'avg_template_ms': sum(entry['template_ms'] for entry in group) / len(group),
+            'p50_ms': _percentile(totals, 0.5),
+            'p95_ms': _percentile(totals, 0.95),
+            'sum_ms': sum(totals),
+        })
+    rows.sort(key=lambda row: row['sum_ms'], reverse=True)
+    return rows
@@ -0,0 +1,62 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .metrics import (
+    ametered_stream, end_request, install_on_open_connections, log_request, metered_stream, server_timing,
+    start_request,
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, DB time, template time and wall time per request
+
+    Place it first in MIDDLEWARE so the wall time covers the other
+    middleware. The figures are sent in a Server-Timing header and logged
+    to the ring buffer shown at diagnostics:requests.
+
+    Streaming responses (the CSV/JSONL exports) run their queries while
+    the body is consumed, so the body is metered too and the request is
+    logged when the stream closes. Their Server-Timing header goes out
+    with the first byte and covers only the work done before it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        install_on_open_connections()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        metrics.finish()
+        response.headers['Server-Timing'] = server_timing(metrics)
+        if not response.streaming:
+            log_request(request, response, metrics)
+            return response
+
+        if response.is_async:
+            response.streaming_content = ametered_stream(response.streaming_content, metrics)
+        else:
+            response.streaming_content = metered_stream(response.streaming_content, metrics)
+        response._resource_closers.append(lambda: log_request(request, response, metrics.finish()))
+        return response
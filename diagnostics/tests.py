@@ -0,0 +1,183 @@
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from loan_app.testing import QueryBudgetMixin
+from loans.models import LoanApplication
+from repayments.models import Investment, Repayment, Withdrawal
+from users.models import FinancierUser, StudentUser
+from .metrics import RequestLog, request_log, summarize
+
+
+def create_user(student_id, **extra):
+    return StudentUser.objects.create_user(
+        email=f'{student_id.lower()}@example.com', password='testpass123', first_name='Test',
+        last_name=student_id, student_id=student_id, university='Test University', gpa=Decimal('5.00'), **extra,
+    )
+
+
+class PortalDataMixin:
+    """Several loans, repayments, investments and withdrawals so per-row queries show up"""
+
+    ROWS = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        cls.staff = create_user('STAFF01', is_staff=True)
+        cls.student = create_user('STU001')
+        financier_user = create_user('FIN001', user_type='financier')
+        cls.financier = FinancierUser.objects.create(user=financier_user, financier_id='F001')
+        cls.loans = []
+        for i in range(cls.ROWS):
+            loan = LoanApplication.objects.create(
+                student=cls.student if i == 0 else create_user(f'STU1{i:02}'), amount=1000 + i,
+                reason='Tuition', status='Approved',
+                repayment_due_date=today - timedelta(days=3) if i % 2 else today + timedelta(days=30),
+            )
+            cls.loans.append(loan)
+            Investment.objects.create(financier=cls.financier, loan=loan, investment_amount=Decimal('500'))
+            Withdrawal.objects.create(
+                financier=cls.financier, amount=Decimal('10.00'), withdrawal_method='UPI', upi_id='fin@upi',
+            )
+        # The student's repayments on their own loan (a student has one active loan)
+        cls.repayments = [
+            Repayment.objects.create(loan=cls.loans[0], amount_paid=Decimal('100.00'), status='Paid')
+            for _ in range(cls.ROWS)
+        ]
+
+
+class QueryBudgetTests(QueryBudgetMixin, PortalDataMixin, TestCase):
+    """Pages stay within their declared query budgets (settings.QUERY_BUDGETS)"""
+
+    def test_student_pages(self):
+        self.client.force_login(self.student)
+        self.assertWithinQueryBudget('users:dashboard')
+        self.assertWithinQueryBudget('users:profile')
+        self.assertWithinQueryBudget('users:loan_history')
+        self.assertWithinQueryBudget('users:repayment_history')
+        self.assertWithinQueryBudget('loans:list')
+        self.assertWithinQueryBudget('loans:detail', args=[self.loans[0].pk])
+        self.assertWithinQueryBudget('repayments:list')
+        self.assertWithinQueryBudget('repayments:detail', args=[self.repayments[0].pk])
+        self.assertWithinQueryBudget('users:repayment_summary_api')
+        self.assertWithinQueryBudget('users:loan_status_api', args=[self.loans[0].pk])
+
+    def test_financier_pages(self):
+        self.client.force_login(self.financier.user)
+        self.assertWithinQueryBudget('users:dashboard')
+        self.assertWithinQueryBudget('repayments:withdrawal_list')
+
+    def test_staff_pages(self):
+        self.client.force_login(self.staff)
+        self.assertWithinQueryBudget('loans:admin_management')
+        self.assertWithinQueryBudget('loans:statistics')
+        self.assertWithinQueryBudget('repayments:admin_withdrawal_management')
+        self.assertWithinQueryBudget('repayments:statistics')
+        for export in ('loans:admin_export', 'repayments:admin_export', 'repayments:withdrawal_export',
+                       'repayments:investment_export'):
+            response = self.assertWithinQueryBudget(export)
+            self.assertEqual(len(response.streamed_content.decode().strip().splitlines()), self.ROWS + 1)
+
+    def test_budget_catches_per_row_queries(self):
+        self.client.force_login(self.student)
+        with self.settings(QUERY_BUDGETS={'users:profile': 1}):
+            with self.assertRaisesMessage(AssertionError, 'users:profile ran'):
+                self.assertWithinQueryBudget('users:profile')
+
+    def test_undeclared_budget_fails(self):
+        with self.settings(QUERY_BUDGETS={}):
+            with self.assertRaisesMessage(AssertionError, 'No query budget declared for users:login'):
+                self.assertWithinQueryBudget('users:login')
+
+
+class RequestMetricsTests(PortalDataMixin, TestCase):
+    """The middleware reports per-request figures in Server-Timing and the request log"""
+
+    def setUp(self):
+        request_log.clear()
+
+    def test_server_timing_header(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('users:profile'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+;desc="Templates", total;dur=[\d.]+')
+
+        entry = request_log.entries()[-1]
+        self.assertEqual(entry['view'], 'users:profile')
+        self.assertEqual(entry['status'], 200)
+        self.assertIn(f'desc="{entry["queries"]} queries"', timing)
+        self.assertGreater(entry['queries'], 0)
+        self.assertGreater(entry['template_ms'], 0)
+        self.assertGreaterEqual(entry['total_ms'], entry['db_ms'])
+
+    def test_queries_outside_requests_are_not_counted(self):
+        LoanApplication.objects.count()
+        self.assertEqual(request_log.entries(), [])
+
+    def test_async_view_queries_are_counted(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('repayments:payment_success'), {'order_id': 'missing'})
+        entry = request_log.entries()[-1]
+        self.assertEqual(entry['view'], 'repayments:payment_success')
+        self.assertIn('Server-Timing', response)
+        # The session and user lookups run in sync_to_async threads
+        self.assertGreater(entry['queries'], 0)
+
+    def test_streaming_exports_are_logged_when_the_stream_closes(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('loans:admin_export'))
+        self.assertIn('Server-Timing', response)
+        self.assertEqual(request_log.entries(), [])
+
+        lines = b''.join(response.streaming_content).decode().strip().splitlines()
+        self.assertEqual(len(lines), self.ROWS + 1)
+        entry = request_log.entries()[-1]
+        self.assertEqual(entry['view'], 'loans:admin_export')
+        # The export query runs while the body is consumed, after the header went out
+        before_body = int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+        self.assertEqual(entry['queries'], before_body + 1)
+
+    async def test_async_streaming_exports_are_metered(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse('loans:admin_export'))
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(body.decode().strip().splitlines()), self.ROWS + 1)
+        entry = request_log.entries()[-1]
+        self.assertEqual(entry['view'], 'loans:admin_export')
+        self.assertEqual(entry['queries'], 3)
+
+    def test_over_budget_requests_are_flagged(self):
+        self.client.force_login(self.student)
+        with self.settings(QUERY_BUDGETS={'users:profile': 1}):
+            self.client.get(reverse('users:profile'))
+            self.client.get(reverse('users:repayment_summary_api'))
+        profile, summary = request_log.entries()
+        self.assertTrue(profile['over_budget'])
+        self.assertFalse(summary['over_budget'])
+
+        rows = {row['view']: row for row in summarize(request_log.entries())}
+        self.assertEqual(rows['users:profile']['over_budget'], 1)
+        self.assertEqual(rows['users:profile']['requests'], 1)
+
+    def test_ring_buffer_is_bounded(self):
+        log = RequestLog(3)
+        for i in range(5):
+            log.append(i)
+        self.assertEqual(log.entries(), [2, 3, 4])
+
+    def test_diagnostics_page_is_staff_only(self):
+        url = reverse('diagnostics:requests')
+        self.client.force_login(self.student)
+        self.client.get(reverse('users:profile'))
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'users:profile')
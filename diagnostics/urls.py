@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'diagnostics'
+
+urlpatterns = [
+    path('requests/', views.request_metrics, name='requests'),
+]
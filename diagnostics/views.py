@@ -0,0 +1,19 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import render
+
+from .metrics import query_budgets, request_log, summarize
+
+RECENT_REQUESTS = 50
+
+
+@staff_member_required
+def request_metrics(request):
+    """Per-view query and latency figures from this worker's request log"""
+    entries = request_log.entries()
+    context = {
+        'views': summarize(entries),
+        'recent': entries[::-1][:RECENT_REQUESTS],
+        'logged': len(entries),
+        'budgets': sorted(query_budgets().items()),
+    }
+    return render(request, 'diagnostics/requests.html', context)
@@ -0,0 +1,26 @@
+"""
+Versioned REST API routes, mounted at api/<version>/
+"""
+
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from loans.api_views import LoanViewSet
+from repayments.api_views import InvestmentViewSet, RepaymentViewSet, WithdrawalViewSet
+from users.api_views import UserViewSet
+
+router = DefaultRouter()
+router.register('loans', LoanViewSet, basename='loan')
+router.register('repayments', RepaymentViewSet, basename='repayment')
+router.register('withdrawals', WithdrawalViewSet, basename='withdrawal')
+router.register('investments', InvestmentViewSet, basename='investment')
+router.register('users', UserViewSet, basename='user')
+
+app_name = 'api'
+
+urlpatterns = [
+    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('', include(router.urls)),
+]
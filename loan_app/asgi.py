@@ -13,4 +13,27 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'loan_app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Importable once get_asgi_application() has loaded the app registry
+from repayments.async_gateway import aclose_transports, serving_loop_started  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """
+    Django plus the lifespan protocol, which Django does not handle
+
+    Startup marks the server's event loop as the one the async payment
+    gateway may keep sessions open on; shutdown closes them.
+    """
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            serving_loop_started()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await aclose_transports()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
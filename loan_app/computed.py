@@ -0,0 +1,123 @@
+"""
+Memoized model properties and a per-request "as of" date
+
+Financial properties such as LoanApplication.total_amount_due are read
+many times per render (views, templates, other properties). computed()
+turns a method into a read-only property whose value is kept on the
+instance together with the inputs it was derived from. The inputs are
+checked on each access, so assigning a new amount or status (or
+refresh_from_db()) recomputes on the next read without any explicit
+invalidation.
+
+Date-dependent properties read as_of_date(). AsOfDateMiddleware captures
+the date once at the start of a request, so every figure on a page is
+computed for the same day even if the render crosses midnight, and
+timezone.now() is not called once per property.
+
+Memoized values live on the instance, so SingleObjectOnceMixin makes a
+detail view's permission check, get() and get_context_data() share one
+loaded object instead of fetching (and recomputing) it three times.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils import timezone
+
+_as_of = ContextVar('as_of_date', default=None)
+
+
+def as_of_date():
+    """The current request's date, or today's date outside a request"""
+    return _as_of.get() or timezone.now().date()
+
+
+@contextmanager
+def as_of(date=None):
+    """Pin as_of_date() to date (default: today) for the duration of the block"""
+    token = _as_of.set(date or timezone.now().date())
+    try:
+        yield
+    finally:
+        _as_of.reset(token)
+
+
+class AsOfDateMiddleware:
+    """Capture one as-of date per request (sync and async, so async views stay async)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with as_of():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with as_of():
+            return await self.get_response(request)
+
+
+class SingleObjectOnceMixin:
+    """SingleObjectMixin views: load the default object once per request"""
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if '_object' not in self.__dict__:
+            self._object = super().get_object()
+        return self._object
+
+
+class ComputedProperty:
+    """Read-only property memoized per instance until its inputs change"""
+
+    # Switched off by benchmark_computed_properties to time the plain computation
+    enabled = True
+
+    def __init__(self, func, inputs):
+        self.func = func
+        self.inputs = inputs
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        if not ComputedProperty.enabled:
+            return self.func(instance)
+        key = self.inputs(instance)
+        try:
+            memo = instance.__dict__['_computed']
+        except KeyError:
+            memo = instance.__dict__['_computed'] = {}
+        cached = memo.get(self.name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        value = self.func(instance)
+        memo[self.name] = (key, value)
+        return value
+
+
+def computed(inputs):
+    """
+    Decorator for memoized properties
+
+    Args:
+        inputs: Callable returning a tuple of everything the property is
+            derived from (field values, as_of_date() for date-dependent
+            ones); the cached value is reused while it compares equal
+    """
+    def decorator(func):
+        return ComputedProperty(func, inputs)
+    return decorator
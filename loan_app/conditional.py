@@ -0,0 +1,96 @@
+"""
+Conditional GET (ETag / Last-Modified) for detail pages and polled JSON endpoints
+
+A view supplies a validator read with one small indexed query: the row's
+updated_at plus whatever else the response shows that can change without
+it (for loans, the repayment ledger and the count and latest update of
+the loan's repayments). While the client's If-None-Match or
+If-Modified-Since still matches, a 304 is returned before the object is
+loaded, the template rendered or the JSON serialized; otherwise the view
+runs as usual and the response carries ETag and Last-Modified.
+
+The ETag also covers the viewer, as pages embed the user's navigation
+bar. Responses are marked private, no-cache so browsers keep them but
+always revalidate, and requests with pending flash messages are always
+rendered so the messages are shown.
+
+Validators return None when the object does not exist or is not visible
+to the user; the view then responds (404/403) as it always has.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+CONDITIONAL_METHODS = ('GET', 'HEAD')
+
+
+def validator(request, last_modified, *parts):
+    """(etag, last_modified) for a response built from parts as seen by request.user"""
+    digest = hashlib.sha1(repr((request.user.pk, last_modified, parts)).encode()).hexdigest()
+    return quote_etag(digest), last_modified
+
+
+def not_modified(request, etag, last_modified):
+    """A 304 response when the client's copy is current, else None"""
+    if request.method not in CONDITIONAL_METHODS or len(get_messages(request)):
+        return None
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified.timestamp() if last_modified else None,
+    )
+
+
+def add_validator_headers(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _respond(request, current, render):
+    if current is None:
+        return render()
+    response = not_modified(request, *current)
+    if response is None:
+        response = render()
+    return add_validator_headers(response, *current)
+
+
+def conditional(validator_func):
+    """
+    Function view decorator
+
+    validator_func(request, *args, **kwargs) returns validator(...) for
+    the object the view shows, or None to let the view respond normally.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            current = None
+            if request.method in CONDITIONAL_METHODS:
+                current = validator_func(request, *args, **kwargs)
+            return _respond(request, current, lambda: view(request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+class ConditionalGetMixin:
+    """
+    Class-based view mixin; place it after LoginRequiredMixin and before
+    UserPassesTestMixin so a 304 skips the permission check's object load
+    (the validator query is scoped to what the user may see)
+    """
+
+    def get_validator(self):
+        raise NotImplementedError('ConditionalGetMixin requires get_validator()')
+
+    def dispatch(self, request, *args, **kwargs):
+        current = None
+        if request.method in CONDITIONAL_METHODS and request.user.is_authenticated:
+            current = self.get_validator()
+        return _respond(request, current, lambda: super(ConditionalGetMixin, self).dispatch(request, *args, **kwargs))
@@ -0,0 +1,255 @@
+"""
+Keyset (cursor) pagination for list and history views
+
+OFFSET pagination makes the database walk and discard every row before
+the requested page, and Django's Paginator adds a COUNT(*) on top of it.
+KeysetPaginator filters on the ordering key of the last row seen instead,
+e.g. (created_at, id) or (payment_date, id), so every page is a bounded
+index range scan however deep it is. Cursors are opaque URL-safe tokens;
+totals are optional and approximate on PostgreSQL.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+    pass
+
+
+def approximate_count(queryset):
+    """
+    Row count estimate for a queryset
+
+    PostgreSQL answers from the planner's row estimate (no table scan);
+    other databases fall back to an exact COUNT(*).
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows']), True
+    return queryset.count(), False
+
+
+class KeysetPage:
+    """A single page of results plus the cursors needed to move around"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous,
+                 next_cursor=None, previous_cursor=None, total=None,
+                 total_is_approximate=False, query_params=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.total = total
+        self.total_is_approximate = total_is_approximate
+        self.query_params = query_params or {}
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __repr__(self):
+        return f"<KeysetPage ({len(self)} objects)>"
+
+    # Method names mirror django.core.paginator.Page so templates keep working
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    def _url(self, cursor=None):
+        params = dict(self.query_params)
+        if cursor:
+            params[self.paginator.cursor_param] = cursor
+        query = urlencode(params, doseq=True)
+        return f"?{query}" if query else "?"
+
+    @property
+    def first_url(self):
+        return self._url()
+
+    @property
+    def next_url(self):
+        return self._url(self.next_cursor) if self.has_next_page else None
+
+    @property
+    def previous_url(self):
+        return self._url(self.previous_cursor) if self.has_previous_page else None
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by a unique ordering key
+
+    Args:
+        queryset: QuerySet to paginate
+        ordering: Ordering fields, all in the same direction, ending with a
+            unique field, e.g. ('-created_at', '-id')
+        per_page: Rows per page
+        with_total: Also compute a (possibly approximate) total row count
+        cursor_param: Query string parameter that carries the cursor
+    """
+
+    def __init__(self, queryset, ordering, per_page=20, with_total=False, cursor_param='cursor'):
+        directions = {field.startswith('-') for field in ordering}
+        if len(directions) != 1:
+            raise ValueError("Keyset ordering fields must all sort in the same direction")
+
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.descending = directions.pop()
+        self.fields = tuple(field.lstrip('-') for field in ordering)
+        self.per_page = per_page
+        self.with_total = with_total
+        self.cursor_param = cursor_param
+
+    # Cursor encoding
+
+    @staticmethod
+    def _serialize(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    def encode_cursor(self, obj, direction):
+        values = [self._serialize(getattr(obj, field)) for field in self.fields]
+        payload = json.dumps([direction, values], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def _to_python(self, field_name, value):
+        try:
+            field = self.queryset.model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            # Annotation (e.g. search_rank); JSON already round-trips it
+            return value
+        return field.to_python(value)
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if direction not in ('next', 'prev') or len(values) != len(self.fields):
+                raise ValueError
+            values = [self._to_python(field, value) for field, value in zip(self.fields, values)]
+        except (ValueError, TypeError, ValidationError, json.JSONDecodeError):
+            raise InvalidCursor(f"Invalid pagination cursor: {token!r}")
+        return direction, values
+
+    # Query building
+
+    def _seek(self, values, forward):
+        """Q object selecting rows strictly after (or before) the given key"""
+        # Moving forward through a descending ordering means smaller keys
+        lookup = 'lt' if forward == self.descending else 'gt'
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            clause = Q(**{f'{field}__{lookup}': values[i]})
+            for prev_field, prev_value in zip(self.fields[:i], values[:i]):
+                clause &= Q(**{prev_field: prev_value})
+            condition |= clause
+        # Redundant bound on the leading column keeps the OR sargable, so the
+        # database seeks into the (field, id) index instead of scanning it
+        return Q(**{f'{self.fields[0]}__{lookup}e': values[0]}) & condition
+
+    @staticmethod
+    def _reverse(ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+    def get_page(self, cursor=None, query_params=None):
+        """Return the page identified by cursor (first page when cursor is empty or invalid)"""
+        direction, values = None, None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                direction, values = None, None
+
+        limit = self.per_page + 1
+        if direction == 'prev':
+            rows = list(
+                self.queryset.filter(self._seek(values, forward=False))
+                .order_by(*self._reverse(self.ordering))[:limit]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.queryset
+            if direction == 'next':
+                queryset = queryset.filter(self._seek(values, forward=True))
+            rows = list(queryset.order_by(*self.ordering)[:limit])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = direction == 'next'
+
+        total, approximate = None, False
+        if self.with_total:
+            total, approximate = approximate_count(self.queryset)
+
+        return KeysetPage(
+            rows,
+            self,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if rows and has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], 'prev') if rows and has_previous else None,
+            total=total,
+            total_is_approximate=approximate,
+            query_params=query_params,
+        )
+
+
+def keyset_paginate(request, queryset, ordering, per_page=20, with_total=False, cursor_param='cursor'):
+    """Paginate queryset using the cursor in request.GET, keeping the other query parameters"""
+    paginator = KeysetPaginator(
+        queryset, ordering, per_page=per_page, with_total=with_total, cursor_param=cursor_param
+    )
+    query_params = {
+        key: request.GET.getlist(key)
+        for key in request.GET
+        if key not in (cursor_param, 'page')
+    }
+    return paginator.get_page(request.GET.get(cursor_param), query_params=query_params)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin that swaps OFFSET pagination for keyset pagination
+
+    Views set `keyset_ordering` (and optionally `paginate_by` and
+    `keyset_with_total`) or override get_keyset_ordering(); the page is
+    exposed as `page_obj` as usual.
+    """
+    keyset_ordering = ('-created_at', '-id')
+    keyset_with_total = False
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        page = keyset_paginate(
+            self.request, queryset, self.get_keyset_ordering(),
+            per_page=page_size, with_total=self.keyset_with_total,
+        )
+        return page.paginator, page, page.object_list, page.has_other_pages()
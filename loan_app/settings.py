@@ -13,7 +13,8 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
-from decouple import config
+import tempfile
+from decouple import config, Csv
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -53,9 +54,15 @@ INSTALLED_APPS = [
     'users',
     'loans',
     'repayments',
+    'search',
+    'portfolio',
+    'outbox',
+    'caching',
+    'diagnostics',
 ]
 
 MIDDLEWARE = [
+    'diagnostics.middleware.RequestMetricsMiddleware',  # First, so wall time covers all middleware
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # For static files in production
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -65,13 +72,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'loan_app.computed.AsOfDateMiddleware',  # One "today" per request for loan figures
 ]
 
 ROOT_URLCONF = 'loan_app.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'diagnostics.backends.DjangoTemplates',  # Django templates, render time recorded per request
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -123,6 +131,34 @@ else:
     }
 
 
+# Caches: a per-process L1 in front of a shared L2 (see caching/versioned.py).
+# Every process that writes loans or repayments (web, webhook worker, cron
+# jobs) must reach the same L2, or their cache invalidations are lost. The
+# file-based default only holds for development on one host; in production
+# set SHARED_CACHE_BACKEND to django.core.cache.backends.redis.RedisCache
+# (LOCATION redis://...). Without it the L2 is a DummyCache, which turns the
+# summary cache off rather than serving summaries other services made stale.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'loan-portal-l1',
+        'TIMEOUT': config('L1_CACHE_TIMEOUT', default=60, cast=int),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'shared': {
+        'BACKEND': config(
+            'SHARED_CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache' if DEBUG
+            else 'django.core.cache.backends.dummy.DummyCache',
+        ),
+        'LOCATION': config('SHARED_CACHE_LOCATION', default=os.path.join(tempfile.gettempdir(), 'loan_app_cache')),
+        'TIMEOUT': config('SHARED_CACHE_TIMEOUT', default=300, cast=int),
+        'KEY_PREFIX': 'loan_app',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -188,8 +224,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10,
+    'DEFAULT_PAGINATION_CLASS': 'loan_app.api.CursorPagination',
+    'PAGE_SIZE': 20,
+    'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.URLPathVersioning',
+    'ALLOWED_VERSIONS': ('v1',),
+    'DEFAULT_VERSION': 'v1',
 }
 
 # JWT Settings
@@ -246,6 +285,9 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 # Razorpay Configuration
 RAZORPAY_KEY_ID = config('RAZORPAY_KEY_ID', default='rzp_test_your_key_id_here')
 RAZORPAY_KEY_SECRET = config('RAZORPAY_KEY_SECRET', default='your_razorpay_secret_here')
+RAZORPAY_BASE_URL = config('RAZORPAY_BASE_URL', default='https://api.razorpay.com/v1')
+# Signs server-to-server webhooks (set in the Razorpay dashboard, separate from the API secret)
+RAZORPAY_WEBHOOK_SECRET = config('RAZORPAY_WEBHOOK_SECRET', default='')
 
 # PayU Configuration
 PAYU_MERCHANT_KEY = config('PAYU_MERCHANT_KEY', default='your_payu_merchant_key')
@@ -260,6 +302,23 @@ PAYMENT_SUCCESS_URL = '/repayments/payment/success/'
 PAYMENT_FAILURE_URL = '/repayments/payment/failure/'
 PAYMENT_CALLBACK_URL = '/repayments/payment/callback/'
 
+# Gateway HTTP client: timeouts (seconds), retries for idempotent calls, pooled connections per host
+PAYMENT_GATEWAY_CONNECT_TIMEOUT = config('PAYMENT_GATEWAY_CONNECT_TIMEOUT', default=3.05, cast=float)
+PAYMENT_GATEWAY_READ_TIMEOUT = config('PAYMENT_GATEWAY_READ_TIMEOUT', default=10, cast=float)
+PAYMENT_GATEWAY_MAX_RETRIES = config('PAYMENT_GATEWAY_MAX_RETRIES', default=2, cast=int)
+PAYMENT_GATEWAY_BACKOFF = config('PAYMENT_GATEWAY_BACKOFF', default=0.25, cast=float)
+PAYMENT_GATEWAY_POOL_SIZE = config('PAYMENT_GATEWAY_POOL_SIZE', default=10, cast=int)
+PAYMENT_GATEWAY_ASYNC_MAX_CONNECTIONS = config('PAYMENT_GATEWAY_ASYNC_MAX_CONNECTIONS', default=200, cast=int)
+
+# Gateways tried (after the one the user picked) when creating orders, and circuit breaker thresholds
+PAYMENT_GATEWAY_FAILOVER = config('PAYMENT_GATEWAY_FAILOVER', default='razorpay,payu,paytm', cast=Csv())
+PAYMENT_GATEWAY_BREAKER_WINDOW = 60         # seconds of call history
+PAYMENT_GATEWAY_BREAKER_MIN_CALLS = 10
+PAYMENT_GATEWAY_BREAKER_FAILURE_RATE = 0.5
+PAYMENT_GATEWAY_BREAKER_SLOW_CALL = 3.0     # seconds
+PAYMENT_GATEWAY_BREAKER_SLOW_RATE = 0.5
+PAYMENT_GATEWAY_BREAKER_OPEN_FOR = 30       # seconds before half-open probing
+
 # Email Settings
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@studentloanportal.com')
 BASE_URL = config('BASE_URL', default='http://localhost:8000')
@@ -274,4 +333,34 @@ if not DEBUG:
     X_FRAME_OPTIONS = 'DENY'
     SECURE_HSTS_SECONDS = 31536000
     SECURE_HSTS_INCLUDE_SUBDOMAINS = True
-    SECURE_HSTS_PRELOAD = True
\ No newline at end of file
+    SECURE_HSTS_PRELOAD = True
+
+# Request diagnostics (diagnostics app): finished requests kept per worker
+# for the staff page, and the most queries each URL name may run.
+# QueryBudgetMixin (loan_app/testing.py) fails tests over budget; live
+# requests over budget are flagged on the diagnostics page.
+REQUEST_METRICS_BUFFER_SIZE = config('REQUEST_METRICS_BUFFER_SIZE', default=500, cast=int)
+QUERY_BUDGETS = {
+    # Student and financier pages (session and user lookups included)
+    'users:dashboard': 8,
+    'users:profile': 8,
+    'users:loan_history': 4,
+    'users:repayment_history': 4,
+    'users:repayment_summary_api': 5,
+    'users:loan_status_api': 4,
+    'loans:list': 4,
+    'loans:detail': 7,
+    'repayments:list': 7,
+    'repayments:detail': 7,
+    'repayments:withdrawal_list': 4,
+    # Staff pages
+    'loans:admin_management': 7,
+    'loans:statistics': 5,
+    'repayments:admin_withdrawal_management': 6,
+    'repayments:statistics': 4,
+    # Streamed exports (counted until the stream closes)
+    'loans:admin_export': 3,
+    'repayments:admin_export': 3,
+    'repayments:withdrawal_export': 3,
+    'repayments:investment_export': 3,
+}
@@ -0,0 +1,92 @@
+"""
+Shared test helpers for the Student Loan Portal
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+class QueryPlanAssertionsMixin:
+    """
+    TestCase mixin asserting that hot queries are served by an index
+
+    EXPLAIN output is captured for the query and checked for full table
+    scans: `SCAN <table>` on SQLite, `Seq Scan on <table>` on PostgreSQL.
+    On PostgreSQL sequential scans are disabled for the duration of the
+    EXPLAIN so the planner's choice on tiny test tables reflects whether
+    a usable index exists at all, not its cost estimate.
+    """
+
+    def explain(self, queryset):
+        """Return the EXPLAIN output for a queryset as text"""
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            try:
+                return queryset.explain()
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = on')
+        return queryset.explain()
+
+    def full_scans(self, plan):
+        """Tables read with a full scan according to the plan"""
+        if connection.vendor == 'postgresql':
+            return re.findall(r'Seq Scan on (\w+)', plan)
+        # SQLite: "SCAN <table>" (optionally "USING INDEX" for an ordered full pass)
+        return re.findall(r'\bSCAN (\w+)', plan)
+
+    def assertIndexedQuery(self, queryset, index_name=None):
+        """Fail when the query plan scans a whole table (or misses index_name)"""
+        plan = self.explain(queryset)
+        scans = self.full_scans(plan)
+        self.assertFalse(
+            scans,
+            f"Query regressed to a full scan of {', '.join(scans)}:\n{queryset.query}\n\n{plan}"
+        )
+        if index_name:
+            self.assertIn(index_name, plan, f"Expected {index_name} in query plan:\n{plan}")
+        return plan
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin enforcing the per-URL-name query budgets in settings.QUERY_BUDGETS
+
+    The budget is a fixed ceiling, so a test that requests the page with
+    several rows per relation fails as soon as a per-row (N+1) query
+    creeps back in. The same budgets are flagged on the diagnostics page
+    for live traffic.
+    """
+
+    def query_budget(self, url_name):
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        self.assertIn(url_name, budgets, f"No query budget declared for {url_name} in settings.QUERY_BUDGETS")
+        return budgets[url_name]
+
+    def assertWithinQueryBudget(self, url_name, args=None, kwargs=None, method='get', data=None, status=200):
+        """
+        Request url_name with self.client and fail when it runs more queries than its budget
+
+        Streaming bodies are consumed inside the count and kept as
+        response.streamed_content.
+        """
+        budget = self.query_budget(url_name)
+        url = reverse(url_name, args=args, kwargs=kwargs)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data)
+            if response.streaming:
+                # Streamed exports query while the body is consumed
+                response.streamed_content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response.resolver_match.view_name, url_name)
+        self.assertLessEqual(
+            len(queries), budget,
+            f"{url_name} ran {len(queries)} queries (budget {budget}):\n"
+            + '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+        return response
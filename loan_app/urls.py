@@ -15,7 +15,7 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
@@ -27,6 +27,10 @@ urlpatterns = [
     path('', include('users.urls')),
     path('loans/', include('loans.urls')),
     path('repayments/', include('repayments.urls')),
+    path('diagnostics/', include('diagnostics.urls')),
+    
+    # Versioned REST API
+    re_path(r'^api/(?P<version>v1)/', include('loan_app.api_urls')),
     
     # API URLs
     path('api/', include('users.api_urls')),
@@ -1,12 +1,28 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from django.utils import timezone
-from .models import LoanApplication
+from django.http import HttpResponse
+from search.admin import RankedSearchAdminMixin
+from .engine import PortfolioSchedule, write_schedule_csv
+from .models import LoanApplication, RepaymentSchedule
+from .overdue import mark_overdue
+from .transitions import transition_loans
+
+
+class RepaymentScheduleInline(admin.TabularInline):
+    """Read-only installment schedule shown on the loan page"""
+    model = RepaymentSchedule
+    fields = ['number', 'due_date', 'amount_due', 'amount_paid', 'settled']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(LoanApplication)
-class LoanApplicationAdmin(admin.ModelAdmin):
+class LoanApplicationAdmin(RankedSearchAdminMixin, admin.ModelAdmin):
     """Admin configuration for LoanApplication model"""
     
     list_display = [
@@ -25,7 +41,8 @@ class LoanApplicationAdmin(admin.ModelAdmin):
     
     readonly_fields = [
         'created_at', 'updated_at', 'is_overdue', 'total_amount_due', 
-        'days_until_due'
+        'days_until_due', 'total_paid', 'outstanding_balance',
+        'last_payment_date', 'paid_installments'
     ]
     
     fieldsets = (
@@ -35,6 +52,10 @@ class LoanApplicationAdmin(admin.ModelAdmin):
         ('Repayment Details', {
             'fields': ('repayment_due_date', 'interest_rate', 'admin_notes')
         }),
+        ('Repayment Ledger', {
+            'fields': ('total_paid', 'outstanding_balance', 'last_payment_date', 'paid_installments'),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -45,7 +66,9 @@ class LoanApplicationAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['approve_loans', 'reject_loans', 'mark_overdue']
+    actions = ['approve_loans', 'reject_loans', 'mark_overdue', 'export_schedule']
+    
+    inlines = [RepaymentScheduleInline]
     
     ordering = ['-created_at']
     
@@ -65,7 +88,7 @@ class LoanApplicationAdmin(admin.ModelAdmin):
     
     def is_overdue_display(self, obj):
         """Display overdue status with color coding"""
-        if obj.is_overdue:
+        if obj.overdue:
             return format_html(
                 '<span style="color: red; font-weight: bold;">OVERDUE</span>'
             )
@@ -75,44 +98,35 @@ class LoanApplicationAdmin(admin.ModelAdmin):
             )
         return "N/A"
     is_overdue_display.short_description = 'Overdue Status'
+    is_overdue_display.admin_order_field = 'overdue'
     
     def total_amount_due(self, obj):
         """Display total amount due"""
-        return f"₹{obj.total_amount_due}"
+        return f"₹{obj.amount_due}"
     total_amount_due.short_description = 'Total Amount Due'
+    total_amount_due.admin_order_field = 'amount_due'
     
     def approve_loans(self, request, queryset):
         """Action to approve selected loans"""
-        updated = queryset.filter(status='Pending').update(
-            status='Approved',
-            admin_notes=f"Approved by admin on {timezone.now().strftime('%Y-%m-%d %H:%M')}"
-        )
+        result = transition_loans(queryset.filter(status='Pending').values_list('pk', flat=True), 'Approved')
         self.message_user(
             request, 
-            f"Successfully approved {updated} loan application(s)."
+            f"Successfully approved {len(result['updated'])} loan application(s)."
         )
     approve_loans.short_description = "Approve selected loans"
     
     def reject_loans(self, request, queryset):
         """Action to reject selected loans"""
-        updated = queryset.filter(status='Pending').update(
-            status='Rejected',
-            admin_notes=f"Rejected by admin on {timezone.now().strftime('%Y-%m-%d %H:%M')}"
-        )
+        result = transition_loans(queryset.filter(status='Pending').values_list('pk', flat=True), 'Rejected')
         self.message_user(
             request, 
-            f"Successfully rejected {updated} loan application(s)."
+            f"Successfully rejected {len(result['updated'])} loan application(s)."
         )
     reject_loans.short_description = "Reject selected loans"
     
     def mark_overdue(self, request, queryset):
         """Action to mark loans as overdue"""
-        overdue_count = 0
-        for loan in queryset.filter(status='Approved'):
-            if loan.is_overdue:
-                loan.admin_notes = f"{loan.admin_notes or ''}\nMarked as overdue on {timezone.now().strftime('%Y-%m-%d %H:%M')}"
-                loan.save()
-                overdue_count += 1
+        overdue_count = mark_overdue(queryset.overdue().values_list('pk', flat=True), note=True)
         
         self.message_user(
             request, 
@@ -120,6 +134,15 @@ class LoanApplicationAdmin(admin.ModelAdmin):
         )
     mark_overdue.short_description = "Mark selected loans as overdue"
     
+    def export_schedule(self, request, queryset):
+        """Action to download interest, dues and balances of the selected loans as CSV"""
+        schedule = PortfolioSchedule.from_queryset(queryset)
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="loan_schedule.csv"'
+        write_schedule_csv(schedule, response)
+        return response
+    export_schedule.short_description = "Export amortization schedule (CSV)"
+    
     def get_queryset(self, request):
-        """Custom queryset with related student data"""
-        return super().get_queryset(request).select_related('student')
+        """Custom queryset with related student data and SQL financial annotations"""
+        return super().get_queryset(request).select_related('student').with_financials()
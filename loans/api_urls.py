@@ -7,4 +7,5 @@ urlpatterns = [
     # Loan management API endpoints
     path('approve/<int:loan_id>/', views.approve_loan, name='approve_api'),
     path('reject/<int:loan_id>/', views.reject_loan, name='reject_api'),
+    path('bulk-transition/', views.bulk_transition_loans, name='bulk_transition_api'),
 ]
@@ -0,0 +1,86 @@
+"""
+REST API viewsets for loan applications (api/v1/loans/)
+
+Students see and apply for their own loans; staff see every loan and
+approve or reject pending ones. Joins, annotations and prefetches are
+added per action and only for the fields a request asks for.
+"""
+
+from django.db.models import Prefetch
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from loan_app.api import SparseFieldsetsViewMixin
+from .models import LoanApplication, RepaymentSchedule
+from .serializers import FINANCIAL_FIELDS, LoanDetailSerializer, LoanSerializer
+from .transitions import transition_loans
+
+
+class LoanViewSet(SparseFieldsetsViewMixin, mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    list:     GET  loans/                 (?status=, ?fields=, ?cursor=, ?page_size=)
+    retrieve: GET  loans/{id}/            (with the installment schedule)
+    create:   POST loans/                 (apply; validated like the web form)
+    approve:  POST loans/{id}/approve/    (staff)
+    reject:   POST loans/{id}/reject/     (staff)
+    """
+    serializer_class = LoanSerializer
+    cursor_ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = LoanApplication.objects.all()
+        if not user.is_staff:
+            queryset = queryset.filter(student=user)
+        if self.action == 'list' and self.request.query_params.get('status'):
+            queryset = queryset.filter(status=self.request.query_params['status'])
+
+        if self.action in ('approve', 'reject'):
+            return queryset
+        if self.wants(*FINANCIAL_FIELDS):
+            queryset = queryset.with_financials()
+        if self.wants('student_email'):
+            queryset = queryset.select_related('student')
+        if self.action == 'retrieve' and self.wants('installments'):
+            queryset = queryset.prefetch_related(
+                Prefetch('installments', queryset=RepaymentSchedule.objects.order_by('number'))
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        return LoanDetailSerializer if self.action == 'retrieve' else LoanSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        loan = serializer.save(student=request.user)
+        return Response(self._fresh(loan.pk), status=status.HTTP_201_CREATED)
+
+    def _fresh(self, pk):
+        """Serialized loan re-read with its annotations"""
+        loan = (
+            LoanApplication.objects.with_financials().select_related('student')
+            .prefetch_related(Prefetch('installments', queryset=RepaymentSchedule.objects.order_by('number')))
+            .get(pk=pk)
+        )
+        return LoanDetailSerializer(loan, context=self.get_serializer_context()).data
+
+    def _decide(self, decision):
+        loan = self.get_object()
+        result = transition_loans([loan.pk], decision)
+        if not result['updated']:
+            return Response(
+                {'detail': f'Loan #{loan.pk} is {loan.status}; only pending loans can be decided.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(self._fresh(loan.pk))
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
+    def approve(self, request, pk=None, version=None):
+        return self._decide('Approved')
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
+    def reject(self, request, pk=None, version=None):
+        return self._decide('Rejected')
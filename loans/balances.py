@@ -0,0 +1,116 @@
+"""
+Repayment ledger maintenance for loan applications
+
+Every LoanApplication carries a denormalized copy of its paid repayments
+(total_paid, outstanding_balance, last_payment_date, paid_installments).
+Repayment.save() and Repayment.delete() keep a single loan current; the
+helpers here rebuild many loans at once after writes that bypass save(),
+such as queryset.update() admin actions or raw SQL, and retire the cached
+summaries of every loan whose ledger changed.
+"""
+
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Sum, Count, Max
+
+from caching.versioned import invalidate_loans
+from .engine import PortfolioSchedule, paise_to_rupees
+from .models import LoanApplication
+from .schedules import allocate_payments_for
+from repayments.models import Repayment
+
+
+def paid_totals(loan_ids):
+    """Return paid repayment totals keyed by loan id for the given loans"""
+    rows = (
+        Repayment.objects.filter(loan_id__in=loan_ids, status='Paid')
+        .values('loan_id')
+        .annotate(total=Sum('amount_paid'), count=Count('id'), last=Max('payment_date'))
+        .order_by()
+    )
+    return {row['loan_id']: row for row in rows}
+
+
+def apply_totals(loan, totals, total_due=None):
+    """
+    Set ledger fields on a loan instance; return the names of fields that changed
+
+    total_due defaults to loan.total_amount_due; batch callers pass the
+    figure the portfolio engine computed for the whole batch.
+    """
+    totals = totals or {}
+    values = {
+        'total_paid': totals.get('total') or Decimal('0.00'),
+        'paid_installments': totals.get('count') or 0,
+        'last_payment_date': totals.get('last'),
+    }
+    if total_due is None:
+        total_due = loan.total_amount_due
+    values['outstanding_balance'] = total_due - values['total_paid']
+
+    changed = []
+    for field, value in values.items():
+        if getattr(loan, field) != value:
+            setattr(loan, field, value)
+            changed.append(field)
+    return changed
+
+
+def rebuild_balances(queryset=None, batch_size=1000, commit=True):
+    """
+    Recompute the repayment ledger for every loan in queryset
+
+    Loans are processed in primary key order, one batch at a time: a single
+    grouped query fetches the paid totals for the batch, the portfolio
+    engine computes every loan's total due at once and drifted rows are
+    written back with one bulk_update. Their installments are re-allocated
+    in the same transaction, as Repayment.save() would have done.
+
+    Args:
+        queryset: LoanApplication queryset to rebuild (defaults to all loans)
+        batch_size: Number of loans loaded per batch
+        commit: Write corrected balances when True, only report drift when False
+
+    Returns:
+        dict: Number of loans checked and a list of (loan_id, changed_fields) for drifted loans
+    """
+    if queryset is None:
+        queryset = LoanApplication.objects.all()
+
+    queryset = queryset.only(
+        'id', 'amount', 'status', 'created_at', 'repayment_due_date',
+        *LoanApplication.BALANCE_FIELDS
+    ).order_by('pk')
+
+    checked = 0
+    drifted = []
+    last_pk = 0
+
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        checked += len(batch)
+
+        totals = paid_totals([loan.pk for loan in batch])
+        schedule = PortfolioSchedule.from_loans(batch)
+        changed_loans = []
+        for loan, total_due in zip(batch, schedule.total_due):
+            changed = apply_totals(loan, totals.get(loan.pk), paise_to_rupees(total_due))
+            if changed:
+                drifted.append((loan.pk, changed))
+                changed_loans.append(loan)
+
+        if commit and changed_loans:
+            with transaction.atomic():
+                LoanApplication.objects.bulk_update(changed_loans, LoanApplication.BALANCE_FIELDS)
+                allocate_payments_for(loan.pk for loan in changed_loans)
+                invalidate_loans(loan.pk for loan in changed_loans)
+
+    return {'checked': checked, 'drifted': drifted}
+
+
+def rebuild_balances_for(loan_ids):
+    """Rebuild the ledger for specific loans, e.g. after a queryset.update()"""
+    return rebuild_balances(LoanApplication.objects.filter(pk__in=set(loan_ids)))
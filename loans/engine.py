@@ -0,0 +1,194 @@
+"""
+Vectorized amortization engine for whole-portfolio loan math
+
+The LoanApplication properties (repayment_months, total_interest,
+total_amount_due, monthly_payment, days_overdue, days_until_due) work one
+instance at a time in Decimal. Reports, exports and batch jobs that need
+them for thousands of loans load the portfolio into NumPy columns instead
+and compute every loan at once.
+
+All money is exact integer paise (int64): principal and interest are
+whole paise by construction, and the monthly installment is the total
+due divided by the term, rounded half up to the paisa. Use
+paise_to_rupees() to turn a value back into the Decimal the properties
+return.
+"""
+
+import csv
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+from loan_app.computed import as_of_date
+from .models import MONTHLY_INTEREST_RATE
+
+PAISE_PER_RUPEE = 100
+
+# Interest rate as an exact fraction of RATE_SCALE (0.10 -> 1000 / 10000)
+RATE_SCALE = 10000
+RATE_UNITS = int(MONTHLY_INTEREST_RATE * RATE_SCALE)
+
+# days_until_due for loans where the property returns None
+NOT_DUE = -1
+
+LOAD_FIELDS = ('id', 'amount', 'status', 'created_at', 'repayment_due_date', 'total_paid')
+
+EXPORT_COLUMNS = (
+    'id', 'principal', 'term_months', 'interest', 'total_due', 'installment',
+    'paid', 'outstanding', 'overdue_days', 'days_until_due',
+)
+
+
+def paise_to_rupees(paise):
+    """Integer paise (NumPy or Python int) as a 2-place Decimal"""
+    return Decimal(int(paise)) / PAISE_PER_RUPEE
+
+
+def rupees_to_paise(amount):
+    """Decimal/int rupees as integer paise, rounded half up"""
+    return int((Decimal(amount) * PAISE_PER_RUPEE).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def _date_parts(dates):
+    """Absolute month number (months since 1970-01) and day of month"""
+    months = dates.astype('datetime64[M]')
+    days = (dates - months.astype('datetime64[D]')).astype(np.int64) + 1
+    return months.astype(np.int64), days
+
+
+def _div_round_half_up(numerator, denominator):
+    """Elementwise round(numerator / denominator) for non-negative int arrays"""
+    safe = np.where(denominator == 0, 1, denominator)
+    return np.where(denominator == 0, 0, (2 * numerator + safe) // (2 * safe))
+
+
+class PortfolioSchedule:
+    """
+    Amortization figures for many loans, one array element per loan
+
+    Attributes (int64 arrays aligned with `ids`):
+        principal       loan amount in paise
+        term_months     repayment_months
+        interest        total_interest in paise
+        total_due       total_amount_due in paise
+        installment     monthly_payment in paise (rounded half up)
+        overdue_days    days_overdue
+        days_until_due  days_until_due, NOT_DUE where the property is None
+        paid            ledger total_paid in paise
+        outstanding     total_due - paid in paise
+    """
+
+    def __init__(self, ids, amounts, approved, start_dates, due_dates, paid=None, as_of=None):
+        """
+        Args:
+            ids: Loan ids
+            amounts: Loan amounts in whole rupees
+            approved: Booleans, True where status == 'Approved'
+            start_dates: Dates the loans were created
+            due_dates: Repayment due dates (None where unset)
+            paid: Amounts paid to date in paise (defaults to zero)
+            as_of: Date overdue state is evaluated against (defaults to today)
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.as_of = as_of or as_of_date()
+
+        amounts = np.asarray(amounts, dtype=np.int64)
+        approved = np.asarray(approved, dtype=bool)
+        start = np.asarray(start_dates, dtype='datetime64[D]')
+        due = np.array(due_dates, dtype='datetime64[D]')
+        today = np.datetime64(self.as_of, 'D')
+
+        has_due = ~np.isnat(due)
+        active = approved & has_due
+        # NaT never compares or subtracts sensibly; park missing due dates on the start date
+        due = np.where(has_due, due, start)
+
+        start_month, start_day = _date_parts(start)
+        due_month, due_day = _date_parts(due)
+        raw_months = due_month - start_month + (due_day > start_day)
+        self.term_months = np.where(has_due, np.maximum(1, raw_months), 0)
+
+        self.principal = amounts * PAISE_PER_RUPEE
+        interest_units = self.principal * RATE_UNITS * self.term_months
+        self.interest = np.where(active, _div_round_half_up(interest_units, RATE_SCALE), 0)
+        self.total_due = self.principal + self.interest
+        self.installment = _div_round_half_up(self.total_due, self.term_months)
+
+        days_past_due = (today - due).astype(np.int64)
+        self.overdue_days = np.where(active, np.maximum(0, days_past_due), 0)
+        self.days_until_due = np.where(active, np.maximum(0, -days_past_due), NOT_DUE)
+
+        self.paid = (
+            np.zeros(len(self.ids), dtype=np.int64) if paid is None
+            else np.asarray(paid, dtype=np.int64)
+        )
+        self.outstanding = self.total_due - self.paid
+
+    @classmethod
+    def from_loans(cls, loans, as_of=None):
+        """Build from LoanApplication instances (e.g. a batch already in memory)"""
+        loans = list(loans)
+        return cls(
+            ids=[loan.pk for loan in loans],
+            amounts=[loan.amount for loan in loans],
+            approved=[loan.status == 'Approved' for loan in loans],
+            start_dates=[loan.created_at.date() if loan.created_at else as_of_date() for loan in loans],
+            due_dates=[loan.repayment_due_date for loan in loans],
+            paid=[rupees_to_paise(loan.total_paid) for loan in loans],
+            as_of=as_of,
+        )
+
+    @classmethod
+    def from_queryset(cls, queryset, as_of=None):
+        """Load the columns the engine needs straight from the database (no model instances)"""
+        rows = list(queryset.order_by('pk').values_list(*LOAD_FIELDS))
+        if not rows:
+            return cls([], [], [], [], [], [], as_of=as_of)
+        ids, amounts, statuses, created, due_dates, paid = zip(*rows)
+        return cls(
+            ids=ids,
+            amounts=amounts,
+            approved=[status == 'Approved' for status in statuses],
+            start_dates=[value.date() for value in created],
+            due_dates=due_dates,
+            paid=[rupees_to_paise(value) for value in paid],
+            as_of=as_of,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def totals(self):
+        """Portfolio-wide sums in rupees"""
+        return {
+            'loans': len(self),
+            'principal': paise_to_rupees(self.principal.sum()),
+            'interest': paise_to_rupees(self.interest.sum()),
+            'total_due': paise_to_rupees(self.total_due.sum()),
+            'paid': paise_to_rupees(self.paid.sum()),
+            'outstanding': paise_to_rupees(self.outstanding.sum()),
+            'overdue_loans': int(np.count_nonzero(self.overdue_days)),
+        }
+
+    def rows(self):
+        """Per-loan figures as dicts of Python values (rupee amounts as Decimal)"""
+        for i in range(len(self)):
+            yield {
+                'id': int(self.ids[i]),
+                'principal': paise_to_rupees(self.principal[i]),
+                'term_months': int(self.term_months[i]),
+                'interest': paise_to_rupees(self.interest[i]),
+                'total_due': paise_to_rupees(self.total_due[i]),
+                'installment': paise_to_rupees(self.installment[i]),
+                'paid': paise_to_rupees(self.paid[i]),
+                'outstanding': paise_to_rupees(self.outstanding[i]),
+                'overdue_days': int(self.overdue_days[i]),
+                'days_until_due': None if self.days_until_due[i] == NOT_DUE else int(self.days_until_due[i]),
+            }
+
+
+def write_schedule_csv(schedule, stream):
+    """Write one CSV row of amortization figures per loan"""
+    writer = csv.DictWriter(stream, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    writer.writerows(schedule.rows())
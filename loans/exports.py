@@ -0,0 +1,34 @@
+"""
+Loan export definition: columns and the filtered, annotated queryset
+
+Financial columns come from LoanApplication.objects.with_financials(), so
+the export reads them straight from the database.
+"""
+
+from .filters import filter_loans
+from .models import LoanApplication
+
+LOAN_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('student_email', 'student__email'),
+    ('student_first_name', 'student__first_name'),
+    ('student_last_name', 'student__last_name'),
+    ('student_id', 'student__student_id'),
+    ('amount', 'amount'),
+    ('status', 'status'),
+    ('created_at', 'created_at'),
+    ('repayment_due_date', 'repayment_due_date'),
+    ('term_months', 'term_months'),
+    ('interest_due', 'interest_due'),
+    ('amount_due', 'amount_due'),
+    ('paid_to_date', 'paid_to_date'),
+    ('balance_due', 'balance_due'),
+    ('overdue', 'overdue'),
+    ('overdue_days', 'overdue_days'),
+    ('days_to_due', 'days_to_due'),
+]
+
+
+def loan_export(search='', status=''):
+    """(queryset, ordering) for a loan export with the admin management filters"""
+    return filter_loans(LoanApplication.objects.with_financials(), search, status)
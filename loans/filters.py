@@ -0,0 +1,26 @@
+"""
+Filters shared by the admin loan management page and the loan exports
+"""
+
+from search.services import ranked_search, SEARCH_ORDERING
+
+# Newest applications first, keyset-friendly
+LOAN_ORDERING = ('-created_at', '-id')
+
+
+def filter_loans(queryset, search='', status=''):
+    """
+    Apply the admin management search and status filters
+
+    Returns:
+        (queryset, ordering): search results are ordered by rank
+    """
+    ordering = LOAN_ORDERING
+    if search:
+        queryset = ranked_search(queryset, search)
+        ordering = SEARCH_ORDERING
+    
+    if status:
+        queryset = queryset.filter(status=status)
+    
+    return queryset, ordering
@@ -0,0 +1,66 @@
+import operator
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from loan_app.computed import ComputedProperty, as_of
+from loans.models import LoanApplication
+
+# Property reads of one loan on a detail page: the view, the template and monthly_payment
+DETAIL_READS = [
+    'total_amount_due', 'total_amount_due', 'total_amount_due', 'repayment_progress', 'monthly_payment',
+    'total_interest', 'repayment_months', 'is_overdue', 'days_until_due', 'total_amount_due',
+]
+
+# Property reads of one loan in a dashboard or admin list row
+LIST_READS = ['total_amount_due', 'repayment_progress', 'is_overdue', 'days_until_due']
+
+
+class Command(BaseCommand):
+    help = 'Time memoized financial properties against recomputing them on every read'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loans', type=int, default=2000, help='Number of in-memory loans')
+        parser.add_argument('--rounds', type=int, default=5, help='Timed rounds (best is reported)')
+
+    def handle(self, *args, **options):
+        start = datetime(2025, 1, 10, tzinfo=dt_timezone.utc)
+        loans = [
+            LoanApplication(
+                pk=i, amount=1000 + i, status='Approved', created_at=start, interest_rate=Decimal('12.00'),
+                repayment_due_date=start.date() + timedelta(days=30 + i % 700), total_paid=Decimal('250.00'),
+            )
+            for i in range(options['loans'])
+        ]
+        for label, reads in (('loan detail page', DETAIL_READS), ('loan list row', LIST_READS)):
+            readers = [operator.attrgetter(name) for name in reads]
+            # Before: every read recomputes and looks up today's date
+            ComputedProperty.enabled = False
+            try:
+                plain = self.time(options['rounds'], loans, readers)
+            finally:
+                ComputedProperty.enabled = True
+            # After: inside a request the date is captured once and values are memoized
+            with as_of():
+                memoized = self.time(options['rounds'], loans, readers)
+            self.stdout.write(
+                f'{label:<18} {len(loans):,} x {len(reads)} reads: '
+                f'recomputed {plain * 1000:8.2f} ms, memoized {memoized * 1000:8.2f} ms '
+                f'({plain / memoized:.1f}x)'
+            )
+
+    def time(self, rounds, loans, readers):
+        best = None
+        for _ in range(rounds):
+            # Every round starts from freshly loaded instances
+            for loan in loans:
+                loan.__dict__.pop('_computed', None)
+            started = time.perf_counter()
+            for loan in loans:
+                for read in readers:
+                    read(loan)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
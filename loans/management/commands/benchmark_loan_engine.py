@@ -0,0 +1,68 @@
+import time
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from loans.engine import PortfolioSchedule, paise_to_rupees
+from loans.models import LoanApplication
+
+
+class Command(BaseCommand):
+    help = 'Time the portfolio engine on a synthetic portfolio and cross-check it against the model properties'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1_000_000, help='Number of synthetic loans')
+        parser.add_argument('--check', type=int, default=10_000,
+                            help='Number of loans cross-checked against the scalar properties')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        size = options['size']
+        rng = np.random.default_rng(options['seed'])
+        as_of = date(2026, 1, 15)
+
+        epoch = np.datetime64('2023-01-01')
+        start = epoch + rng.integers(0, 3 * 365, size).astype('timedelta64[D]')
+        due = start + rng.integers(1, 3 * 365, size).astype('timedelta64[D]')
+        due[rng.random(size) < 0.05] = np.datetime64('NaT')
+        amounts = rng.integers(500, 100_001, size)
+        approved = rng.random(size) < 0.7
+        ids = np.arange(1, size + 1)
+
+        started = time.perf_counter()
+        schedule = PortfolioSchedule(ids, amounts, approved, start, due, as_of=as_of)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Computed {size:,} loans in {elapsed * 1000:.1f} ms')
+
+        mismatches = 0
+        for i in rng.choice(size, min(options['check'], size), replace=False):
+            due_date = None if np.isnat(due[i]) else due[i].item()
+            loan = LoanApplication(
+                amount=int(amounts[i]),
+                status='Approved' if approved[i] else 'Pending',
+                repayment_due_date=due_date,
+                created_at=datetime.combine(start[i].item(), datetime.min.time(), dt_timezone.utc),
+            )
+            expected = (
+                loan.repayment_months,
+                loan.total_interest,
+                loan.total_amount_due,
+                loan.monthly_payment.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+                max(0, (as_of - due_date).days) if approved[i] and due_date else 0,
+            )
+            actual = (
+                int(schedule.term_months[i]),
+                paise_to_rupees(schedule.interest[i]),
+                paise_to_rupees(schedule.total_due[i]),
+                paise_to_rupees(schedule.installment[i]),
+                int(schedule.overdue_days[i]),
+            )
+            if expected != actual:
+                mismatches += 1
+                self.stderr.write(f'Loan {i}: properties {expected} != engine {actual}')
+
+        if mismatches:
+            raise CommandError(f'{mismatches} loan(s) disagree with the scalar properties')
+        self.stdout.write(self.style.SUCCESS(f'Cross-checked {min(options["check"], size):,} loans against the properties'))
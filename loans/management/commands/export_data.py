@@ -0,0 +1,61 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loan_app.exports import CHUNK_SIZE, EXPORT_FORMATS, write_export
+from loans.exports import LOAN_EXPORT_COLUMNS, loan_export
+from repayments.exports import (
+    INVESTMENT_EXPORT_COLUMNS, REPAYMENT_EXPORT_COLUMNS, WITHDRAWAL_EXPORT_COLUMNS,
+    investment_export, repayment_export, withdrawal_export,
+)
+
+
+class Command(BaseCommand):
+    help = 'Stream loans, repayments, withdrawals or investments to CSV/JSONL with the admin page filters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=['loans', 'repayments', 'withdrawals', 'investments'])
+        parser.add_argument('--format', dest='fmt', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', default='-', help='File to write (default: stdout)')
+        parser.add_argument('--search', default='', help='Ranked search query (not for investments)')
+        parser.add_argument('--status', default='', help='Only rows with this status')
+        parser.add_argument('--method', default='',
+                            help='Payment, withdrawal or investment method filter')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        dataset, search, status, method = (
+            options['dataset'], options['search'], options['status'], options['method']
+        )
+        if dataset == 'loans':
+            if method:
+                raise CommandError('--method does not apply to loans')
+            queryset, ordering = loan_export(search, status)
+            columns = LOAN_EXPORT_COLUMNS
+        elif dataset == 'repayments':
+            queryset, ordering = repayment_export(search, status, method)
+            columns = REPAYMENT_EXPORT_COLUMNS
+        elif dataset == 'withdrawals':
+            queryset, ordering = withdrawal_export(search, status, method)
+            columns = WITHDRAWAL_EXPORT_COLUMNS
+        else:
+            if search:
+                raise CommandError('--search does not apply to investments')
+            queryset, ordering = investment_export(status, method)
+            columns = INVESTMENT_EXPORT_COLUMNS
+
+        started = time.monotonic()
+        if options['output'] == '-':
+            write_export(sys.stdout.buffer, queryset, columns, options['fmt'], ordering, options['chunk_size'])
+            sys.stdout.buffer.flush()
+            return
+
+        with open(options['output'], 'wb') as stream:
+            written = write_export(stream, queryset, columns, options['fmt'], ordering, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {dataset} to {options['output']} ({written / 1e6:.1f} MB in {time.monotonic() - started:.2f}s)"
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from loans.engine import PortfolioSchedule, write_schedule_csv
+from loans.models import LoanApplication
+
+
+class Command(BaseCommand):
+    help = 'Summarize (and optionally export) interest, dues and balances for the loan portfolio'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', choices=[choice for choice, _ in LoanApplication.STATUS_CHOICES],
+                            help='Limit to loans with this status')
+        parser.add_argument('--csv', dest='csv_path',
+                            help='Also export the per-loan schedule to this CSV file')
+
+    def handle(self, *args, **options):
+        queryset = LoanApplication.objects.all()
+        if options['status']:
+            queryset = queryset.filter(status=options['status'])
+
+        schedule = PortfolioSchedule.from_queryset(queryset)
+        for name, value in schedule.totals().items():
+            self.stdout.write(f'{name}: {value}')
+
+        if options['csv_path']:
+            with open(options['csv_path'], 'w', newline='') as stream:
+                write_schedule_csv(schedule, stream)
+            self.stdout.write(self.style.SUCCESS(f'Exported {len(schedule)} loans to {options["csv_path"]}'))
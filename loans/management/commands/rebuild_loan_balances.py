@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from loans.balances import rebuild_balances
+from loans.models import LoanApplication
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (or verify) the denormalized repayment balances stored on loan applications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only report loans whose stored balance has drifted; do not write')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loan', type=int, action='append', dest='loan_ids',
+                            help='Limit to the given loan id (can be repeated)')
+
+    def handle(self, *args, **options):
+        queryset = LoanApplication.objects.all()
+        if options['loan_ids']:
+            queryset = queryset.filter(pk__in=options['loan_ids'])
+
+        result = rebuild_balances(
+            queryset,
+            batch_size=options['batch_size'],
+            commit=not options['verify'],
+        )
+
+        for loan_id, fields in result['drifted']:
+            self.stdout.write(f"Loan #{loan_id}: {', '.join(fields)}")
+
+        drift_count = len(result['drifted'])
+        if options['verify']:
+            if drift_count:
+                raise CommandError(
+                    f'{drift_count} of {result["checked"]} loan balance(s) have drifted'
+                )
+            self.stdout.write(
+                self.style.SUCCESS(f'All {result["checked"]} loan balances are consistent')
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Checked {result["checked"]} loans, corrected {drift_count} balance(s)'
+                )
+            )
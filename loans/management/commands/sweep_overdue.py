@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loans.overdue import CHUNK_SIZE, REMIND_EVERY, overdue_candidates, sweep_overdue
+
+
+class Command(BaseCommand):
+    help = 'Flag overdue loans and queue reminder emails in chunks (safe to re-run after an interruption)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many loans would be flagged; do not write or queue')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Loans loaded, flagged and reminded per chunk')
+        parser.add_argument('--remind-every', type=int, default=REMIND_EVERY.days,
+                            help='Days before an already flagged loan is reminded again')
+        parser.add_argument('--no-email', action='store_false', dest='notify',
+                            help='Flag loans without queueing reminder emails')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        remind_every = timedelta(days=options['remind_every'])
+
+        if options['verbosity'] >= 1:
+            pending = overdue_candidates(remind_every=remind_every).count()
+            self.stdout.write(f'{pending} overdue loan(s) due a reminder')
+
+        def progress(stats):
+            if options['verbosity'] >= 1:
+                self.stdout.write(
+                    f"  chunk {stats['chunks']}: {stats['loans']} loans, "
+                    f"{stats['marked']} flagged, {stats['queued']} queued "
+                    f"({self._rate(stats):.0f} loans/s)"
+                )
+
+        try:
+            stats = sweep_overdue(
+                chunk_size=options['chunk_size'],
+                remind_every=remind_every,
+                notify=options['notify'],
+                dry_run=options['dry_run'],
+                on_chunk=progress,
+            )
+        except Exception as e:
+            raise CommandError(f'Overdue sweep interrupted: {e}. Re-run to resume.') from e
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Dry run: {stats['loans']} loan(s) would be flagged in {stats['chunks']} chunk(s)"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Flagged {stats['marked']} loan(s), queued {stats['queued']} reminder(s) "
+                f"in {stats['elapsed']:.2f}s ({self._rate(stats):.0f} loans/s)"
+            ))
+
+    @staticmethod
+    def _rate(stats):
+        return stats['loans'] / stats['elapsed'] if stats['elapsed'] else 0.0
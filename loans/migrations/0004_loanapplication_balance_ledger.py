@@ -0,0 +1,75 @@
+# Generated by Django 5.0.6 on 2026-10-17 00:57
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum, Count, Max
+
+
+def populate_balances(apps, schema_editor):
+    """Seed the ledger fields from existing paid repayments"""
+    LoanApplication = apps.get_model('loans', 'LoanApplication')
+    Repayment = apps.get_model('repayments', 'Repayment')
+
+    totals = {
+        row['loan_id']: row
+        for row in Repayment.objects.filter(status='Paid').values('loan_id').annotate(
+            total=Sum('amount_paid'), count=Count('id'), last=Max('payment_date')
+        ).order_by()
+    }
+
+    loans = []
+    for loan in LoanApplication.objects.all().iterator():
+        row = totals.get(loan.pk, {})
+        loan.total_paid = row.get('total') or Decimal('0.00')
+        loan.paid_installments = row.get('count') or 0
+        loan.last_payment_date = row.get('last')
+
+        # Same 10%/month simple interest rule as LoanApplication.total_amount_due
+        total_due = Decimal(loan.amount)
+        if loan.status == 'Approved' and loan.repayment_due_date:
+            start = loan.created_at.date()
+            end = loan.repayment_due_date
+            months = (end.year - start.year) * 12 + (end.month - start.month)
+            if end.day > start.day:
+                months += 1
+            total_due += Decimal(loan.amount) * Decimal('0.10') * Decimal(max(1, months))
+        loan.outstanding_balance = total_due - loan.total_paid
+        loans.append(loan)
+
+    LoanApplication.objects.bulk_update(
+        loans,
+        ['total_paid', 'outstanding_balance', 'last_payment_date', 'paid_installments'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0003_alter_loanapplication_amount_and_more'),
+        ('repayments', '0003_investment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanapplication',
+            name='last_payment_date',
+            field=models.DateTimeField(blank=True, help_text='Date of the most recent paid repayment', null=True),
+        ),
+        migrations.AddField(
+            model_name='loanapplication',
+            name='outstanding_balance',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Total amount due minus total paid', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='loanapplication',
+            name='paid_installments',
+            field=models.PositiveIntegerField(default=0, help_text='Number of paid repayments'),
+        ),
+        migrations.AddField(
+            model_name='loanapplication',
+            name='total_paid',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Sum of all paid repayments', max_digits=12),
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
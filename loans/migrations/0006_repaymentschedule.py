@@ -0,0 +1,54 @@
+# Generated by Django 5.0.6 on 2026-10-17 01:13
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def generate_existing_schedules(apps, schema_editor):
+    """Build installment schedules for loans approved before schedules existed"""
+    from loans.schedules import generate_schedules
+
+    LoanApplication = apps.get_model('loans', 'LoanApplication')
+    approved = LoanApplication.objects.filter(status='Approved').order_by('pk')
+    batch = []
+    for loan in approved.iterator(chunk_size=1000):
+        batch.append(loan)
+        if len(batch) == 1000:
+            generate_schedules(batch, apps=apps)
+            batch = []
+    generate_schedules(batch, apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepaymentSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(help_text='Installment number, starting at 1')),
+                ('due_date', models.DateField()),
+                ('amount_due', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('settled', models.BooleanField(default=False, help_text='Fully covered by paid repayments')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installments', to='loans.loanapplication')),
+            ],
+            options={
+                'verbose_name': 'Repayment Schedule Installment',
+                'verbose_name_plural': 'Repayment Schedule',
+                'ordering': ['loan', 'number'],
+                'indexes': [models.Index(condition=models.Q(('settled', False)), fields=['due_date', 'loan'], name='installment_open_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='repaymentschedule',
+            constraint=models.UniqueConstraint(fields=('loan', 'number'), name='installment_loan_number_uniq'),
+        ),
+        migrations.RunPython(generate_existing_schedules, migrations.RunPython.noop),
+    ]
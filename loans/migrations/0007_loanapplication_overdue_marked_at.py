@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0006_repaymentschedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanapplication',
+            name='overdue_marked_at',
+            field=models.DateTimeField(blank=True, help_text='When the loan was last flagged overdue and the student reminded', null=True),
+        ),
+    ]
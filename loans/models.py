@@ -1,9 +1,166 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Sum, Count, Max, Q, F, Case, When, Value, OuterRef, Subquery, ExpressionWrapper, Func
+from django.db.models.functions import Coalesce, Greatest, ExtractYear, ExtractMonth, ExtractDay, TruncMonth
+from django.db.models.lookups import GreaterThan
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 
+from loan_app.computed import as_of_date, computed
+
+
+MONTHLY_INTEREST_RATE = Decimal('0.10')
+
+MONEY_FIELD = models.DecimalField(max_digits=14, decimal_places=2)
+
+
+class DaysBetween(Func):
+    """Whole days from the first date expression to the second (end - start)"""
+    arity = 2
+    output_field = models.IntegerField()
+    
+    def _compile_args(self, compiler):
+        start_sql, start_params = compiler.compile(self.source_expressions[0])
+        end_sql, end_params = compiler.compile(self.source_expressions[1])
+        return start_sql, start_params, end_sql, end_params
+    
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: date - date yields an integer number of days
+        start_sql, start_params, end_sql, end_params = self._compile_args(compiler)
+        return f"({end_sql} - {start_sql})", (*end_params, *start_params)
+    
+    def as_sqlite(self, compiler, connection, **extra_context):
+        start_sql, start_params, end_sql, end_params = self._compile_args(compiler)
+        return (
+            f"CAST(julianday({end_sql}) - julianday({start_sql}) AS INTEGER)",
+            (*end_params, *start_params),
+        )
+    
+    def as_mysql(self, compiler, connection, **extra_context):
+        start_sql, start_params, end_sql, end_params = self._compile_args(compiler)
+        return f"DATEDIFF({end_sql}, {start_sql})", (*end_params, *start_params)
+
+
+class LoanApplicationQuerySet(models.QuerySet):
+    """QuerySet with database-side equivalents of the LoanApplication financial properties"""
+    
+    def with_financials(self, as_of=None):
+        """
+        Annotate the financial properties as SQL expressions
+        
+        Annotations (mirroring the Python properties of the same meaning):
+            term_months   -> repayment_months
+            interest_due  -> total_interest
+            amount_due    -> total_amount_due
+            paid_to_date  -> sum of paid repayments (subquery)
+            balance_due   -> amount_due - paid_to_date
+            overdue       -> is_overdue
+            overdue_days  -> days_overdue
+            days_to_due   -> days_until_due (0 once past due)
+        
+        Args:
+            as_of: Date to evaluate overdue state against (defaults to today)
+        """
+        today = Value(as_of or as_of_date(), output_field=models.DateField())
+        Repayment = self.model._meta.get_field('repayments').related_model
+        
+        raw_months = (
+            (ExtractYear('repayment_due_date') - ExtractYear('created_at')) * 12
+            + ExtractMonth('repayment_due_date') - ExtractMonth('created_at')
+            + Case(
+                When(GreaterThan(ExtractDay('repayment_due_date'), ExtractDay('created_at')), then=Value(1)),
+                default=Value(0),
+            )
+        )
+        active = Q(status='Approved', repayment_due_date__isnull=False)
+        past_due = Q(status='Approved', repayment_due_date__lt=today)
+        
+        paid_subquery = Subquery(
+            Repayment.objects.filter(loan=OuterRef('pk'), status='Paid')
+            .order_by()
+            .values('loan')
+            .annotate(total=Sum('amount_paid'))
+            .values('total'),
+            output_field=MONEY_FIELD,
+        )
+        
+        return self.annotate(
+            term_months=Case(
+                When(repayment_due_date__isnull=True, then=Value(0)),
+                default=Greatest(Value(1), raw_months),
+                output_field=models.IntegerField(),
+            ),
+        ).annotate(
+            interest_due=Case(
+                When(active, then=ExpressionWrapper(
+                    F('amount') * Value(MONTHLY_INTEREST_RATE) * F('term_months'),
+                    output_field=MONEY_FIELD,
+                )),
+                default=Value(Decimal('0.00')),
+                output_field=MONEY_FIELD,
+            ),
+            paid_to_date=Coalesce(paid_subquery, Value(Decimal('0.00')), output_field=MONEY_FIELD),
+            overdue=Case(
+                When(past_due, then=Value(True)),
+                default=Value(False),
+                output_field=models.BooleanField(),
+            ),
+            overdue_days=Case(
+                When(past_due, then=DaysBetween('repayment_due_date', today)),
+                default=Value(0),
+                output_field=models.IntegerField(),
+            ),
+            days_to_due=Case(
+                When(Q(active) & ~past_due, then=DaysBetween(today, 'repayment_due_date')),
+                When(active, then=Value(0)),
+                default=None,
+                output_field=models.IntegerField(),
+            ),
+        ).annotate(
+            amount_due=ExpressionWrapper(F('amount') + F('interest_due'), output_field=MONEY_FIELD),
+        ).annotate(
+            balance_due=ExpressionWrapper(F('amount_due') - F('paid_to_date'), output_field=MONEY_FIELD),
+        )
+    
+    def overdue(self, as_of=None):
+        """Approved loans whose due date has passed (index-friendly range filter)"""
+        return self.filter(status='Approved', repayment_due_date__lt=as_of or as_of_date())
+    
+    def version(self, pk):
+        """
+        (last_modified, version) of one loan for conditional GET, or None when not in the queryset
+        
+        The version moves with the loan row, its repayment ledger (rebuilt
+        by bulk writes that leave updated_at alone) and the number and
+        latest update of its repayments.
+        """
+        row = (
+            self.filter(pk=pk).order_by()
+            .annotate(repayment_count=Count('repayments'), repayments_updated_at=Max('repayments__updated_at'))
+            .values_list('updated_at', 'total_paid', 'paid_installments', 'repayment_count', 'repayments_updated_at')
+            .first()
+        )
+        if row is None:
+            return None
+        return max(filter(None, (row[0], row[4]))), row
+    
+    def summary(self, as_of=None):
+        """Status counts and amount totals for the queryset in a single aggregate query"""
+        today = as_of or as_of_date()
+        totals = self.aggregate(
+            total_loans=Count('id'),
+            pending_loans=Count('id', filter=Q(status='Pending')),
+            approved_loans=Count('id', filter=Q(status='Approved')),
+            rejected_loans=Count('id', filter=Q(status='Rejected')),
+            overdue_loans=Count('id', filter=Q(status='Approved', repayment_due_date__lt=today)),
+            total_amount_approved=Sum('amount', filter=Q(status='Approved')),
+            total_amount_pending=Sum('amount', filter=Q(status='Pending')),
+        )
+        totals['total_amount_approved'] = totals['total_amount_approved'] or 0
+        totals['total_amount_pending'] = totals['total_amount_pending'] or 0
+        return totals
+
 
 class LoanApplication(models.Model):
     """Model for student loan applications"""
@@ -50,10 +207,74 @@ class LoanApplication(models.Model):
         help_text="Monthly simple interest rate (%) (used for display; calculation fixed at 10%)"
     )
     
+    # Repayment ledger (denormalized from paid repayments, kept in sync by Repayment.save/delete)
+    total_paid = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text="Sum of all paid repayments"
+    )
+    outstanding_balance = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text="Total amount due minus total paid"
+    )
+    last_payment_date = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="Date of the most recent paid repayment"
+    )
+    paid_installments = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of paid repayments"
+    )
+    
+    # Set by the overdue sweep (and the admin action) when the loan is flagged overdue
+    overdue_marked_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When the loan was last flagged overdue and the student reminded"
+    )
+    
+    BALANCE_FIELDS = ['total_paid', 'outstanding_balance', 'last_payment_date', 'paid_installments']
+    
+    objects = LoanApplicationQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Loan Application'
         verbose_name_plural = 'Loan Applications'
+        indexes = [
+            # Borrower dashboards: a student's loans by status
+            models.Index(fields=['student', 'status'], name='loan_student_status_idx'),
+            # Overdue sweeps and reminders: status = X AND due date range
+            models.Index(fields=['status', 'repayment_due_date'], name='loan_status_due_idx'),
+            # Keyset pagination on (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='loan_created_id_idx'),
+        ]
+    
+    # Fields the installment schedule is generated from
+    SCHEDULE_FIELDS = ['status', 'amount', 'repayment_due_date']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Schedule-relevant values as last persisted (None until saved/loaded)
+        self._schedule_state = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._schedule_state = instance._get_schedule_state()
+        return instance
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._schedule_state = self._get_schedule_state()
+    
+    def _get_schedule_state(self):
+        # Read from __dict__ so deferred fields are not fetched one by one
+        return tuple(self.__dict__.get(field) for field in self.SCHEDULE_FIELDS)
     
     def __str__(self):
         return f"Loan #{self.id} - {self.student.get_full_name()} - {self.amount} INR"
@@ -68,32 +289,87 @@ class LoanApplication(models.Model):
         if self.status == 'Approved' and not self.repayment_due_date:
             self.repayment_due_date = timezone.now().date() + timedelta(days=365)
         
-        super().save(*args, **kwargs)
+        # Keep outstanding balance in step with status/due date changes
+        self.outstanding_balance = self.total_amount_due - self.total_paid
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._sync_schedule()
+    
+    def _sync_schedule(self):
+        """(Re)generate the installment schedule when the loan's terms change"""
+        old_state = self._schedule_state
+        new_state = self._get_schedule_state()
+        self._schedule_state = new_state
+        if old_state == new_state:
+            return
+        
+        from .schedules import generate_schedules
+        if self.status == 'Approved':
+            generate_schedules([self])
+        elif old_state is not None:
+            self.installments.all().delete()
+    
+    def refresh_balance(self):
+        """Recompute the repayment ledger from paid repayments and persist it.
+        
+        The loan row is locked for the duration so concurrent repayment
+        writes against the same loan are applied one after another.
+        """
+        with transaction.atomic():
+            type(self).objects.select_for_update().filter(pk=self.pk).values_list('pk').first()
+            totals = self.repayments.filter(status='Paid').aggregate(
+                total=Sum('amount_paid'),
+                count=Count('id'),
+                last=Max('payment_date'),
+            )
+            self.total_paid = totals['total'] or Decimal('0.00')
+            self.paid_installments = totals['count']
+            self.last_payment_date = totals['last']
+            self.save(update_fields=self.BALANCE_FIELDS)
+            
+            from .schedules import allocate_payments
+            allocate_payments(self)
+    
+    # Inputs of the memoized financial properties below (date-only
+    # properties read as_of_date() directly; memoizing them costs more
+    # than it saves)
+    def _terms(self):
+        # Until saved the loan starts today
+        return (self.amount, self.status, self.repayment_due_date, self.created_at or as_of_date())
+    
+    @computed(lambda loan: (*loan._terms(), loan.total_paid))
+    def repayment_progress(self):
+        """Percentage of the total amount due that has been paid"""
+        total_due = self.total_amount_due
+        if total_due > 0:
+            return (self.total_paid / total_due) * 100
+        return 0
     
     @property
     def is_overdue(self):
         """Check if loan is overdue"""
         if self.status == 'Approved' and self.repayment_due_date:
-            return timezone.now().date() > self.repayment_due_date
+            return as_of_date() > self.repayment_due_date
         return False
     
-    @property
+    @computed(_terms)
     def total_amount_due(self):
         """Calculate total amount due using 10% per month simple interest."""
         if self.status == 'Approved' and self.repayment_due_date:
             months = self.repayment_months
-            monthly_rate = Decimal('0.10')
+            monthly_rate = MONTHLY_INTEREST_RATE
             principal = Decimal(self.amount)
             interest = principal * monthly_rate * Decimal(months)
             return principal + interest
         return Decimal(self.amount)
 
-    @property
+    @computed(_terms)
     def total_interest(self):
         """Interest portion only for the full term at 10% per month simple interest."""
         if self.status == 'Approved' and self.repayment_due_date:
             months = self.repayment_months
-            monthly_rate = Decimal('0.10')
+            monthly_rate = MONTHLY_INTEREST_RATE
             principal = Decimal(self.amount)
             return principal * monthly_rate * Decimal(months)
         return Decimal('0.00')
@@ -102,7 +378,7 @@ class LoanApplication(models.Model):
     def days_until_due(self):
         """Calculate days until repayment is due"""
         if self.status == 'Approved' and self.repayment_due_date:
-            days = (self.repayment_due_date - timezone.now().date()).days
+            days = (self.repayment_due_date - as_of_date()).days
             return max(0, days)
         return None
 
@@ -110,23 +386,23 @@ class LoanApplication(models.Model):
     def days_overdue(self):
         """Number of days past the due date (0 if not overdue)."""
         if self.status == 'Approved' and self.repayment_due_date:
-            days = (timezone.now().date() - self.repayment_due_date).days
+            days = (as_of_date() - self.repayment_due_date).days
             return max(0, days)
         return 0
 
-    @property
+    @computed(_terms)
     def repayment_months(self):
         """Number of months between loan start and due date (minimum 1, partial months count as full)."""
         if not self.repayment_due_date:
             return 0
-        start = (self.created_at or timezone.now()).date()
+        start = self.created_at.date() if self.created_at else as_of_date()
         end = self.repayment_due_date
         months = (end.year - start.year) * 12 + (end.month - start.month)
         if end.day > start.day:
             months += 1
         return max(1, months)
 
-    @property
+    @computed(_terms)
     def monthly_payment(self):
         """Equal monthly payment based on simple interest total divided by months."""
         months = self.repayment_months
@@ -134,3 +410,83 @@ class LoanApplication(models.Model):
             return Decimal('0.00')
         total = self.total_amount_due
         return total / Decimal(months)
+
+
+class RepaymentScheduleQuerySet(models.QuerySet):
+    """Installment queries served by the open-installment due date index"""
+    
+    def open(self):
+        """Installments not yet fully paid"""
+        return self.filter(settled=False)
+    
+    def due_between(self, start, end):
+        """Open installments falling due in [start, end]"""
+        return self.open().filter(due_date__range=(start, end))
+    
+    def overdue(self, as_of=None):
+        """Open installments whose due date has passed"""
+        return self.open().filter(due_date__lt=as_of or as_of_date())
+    
+    def forecast(self, start, end):
+        """Expected collections per month for open installments due in [start, end]"""
+        return (
+            self.due_between(start, end)
+            .annotate(month=TruncMonth('due_date'))
+            .values('month')
+            .annotate(
+                installments=Count('id'),
+                expected=Sum(F('amount_due') - F('amount_paid'), output_field=MONEY_FIELD),
+            )
+            .order_by('month')
+        )
+
+
+class RepaymentSchedule(models.Model):
+    """
+    One installment of an approved loan's repayment plan
+    
+    Generated in bulk when a loan is approved (see loans.schedules); paid
+    repayments are allocated to installments oldest first whenever the
+    loan's repayment ledger is refreshed.
+    """
+    
+    loan = models.ForeignKey(
+        LoanApplication,
+        on_delete=models.CASCADE,
+        related_name='installments'
+    )
+    number = models.PositiveIntegerField(help_text="Installment number, starting at 1")
+    due_date = models.DateField()
+    amount_due = models.DecimalField(max_digits=12, decimal_places=2)
+    amount_paid = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    settled = models.BooleanField(default=False, help_text="Fully covered by paid repayments")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = RepaymentScheduleQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['loan', 'number']
+        verbose_name = 'Repayment Schedule Installment'
+        verbose_name_plural = 'Repayment Schedule'
+        constraints = [
+            models.UniqueConstraint(fields=['loan', 'number'], name='installment_loan_number_uniq'),
+        ]
+        indexes = [
+            # Reminders, overdue checks and forecasts: open installments by due date
+            models.Index(
+                fields=['due_date', 'loan'],
+                name='installment_open_due_idx',
+                condition=Q(settled=False),
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Loan #{self.loan_id} installment {self.number} due {self.due_date}"
+    
+    @property
+    def amount_remaining(self):
+        return self.amount_due - self.amount_paid
+    
+    @property
+    def days_until_due(self):
+        return (self.due_date - as_of_date()).days
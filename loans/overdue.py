@@ -0,0 +1,123 @@
+"""
+Overdue sweep: flag past-due loans and remind their students in bulk
+
+sweep_overdue() walks the approved loans whose repayment due date has
+passed (LoanApplication.objects.overdue(), served by loan_status_due_idx)
+in keyset-ordered chunks of (repayment_due_date, id), so memory stays flat
+and every chunk is an index seek rather than a deeper OFFSET. Each chunk
+is flagged with one UPDATE and its reminder emails are queued in the
+outbox with one INSERT, in the same transaction.
+
+A loan is picked up again only once its last flag is older than
+`remind_every`, which is also what makes the sweep resumable: chunks
+committed before an interruption are skipped on the next run.
+"""
+
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce, Concat
+from django.utils import timezone
+
+from loan_app.pagination import KeysetPaginator
+from outbox.delivery import queue_emails
+from .models import LoanApplication
+
+# Loans loaded, flagged and reminded per chunk
+CHUNK_SIZE = 500
+
+# How long a flagged loan is left alone before it is reminded again
+REMIND_EVERY = timedelta(days=7)
+
+SWEEP_ORDERING = ('repayment_due_date', 'id')
+
+
+def overdue_candidates(now=None, remind_every=REMIND_EVERY):
+    """Overdue loans with a balance left that have not been flagged within remind_every"""
+    now = now or timezone.now()
+    return (
+        LoanApplication.objects.overdue(now.date())
+        .filter(outstanding_balance__gt=0)
+        .filter(Q(overdue_marked_at__isnull=True) | Q(overdue_marked_at__lt=now - remind_every))
+    )
+
+
+def mark_overdue(loan_ids, now=None, note=False):
+    """
+    Flag loans as overdue with a single UPDATE
+
+    Args:
+        loan_ids: Ids of the loans to flag
+        now: Timestamp to record (defaults to now)
+        note: Also append a "Marked as overdue" line to admin_notes
+
+    Returns:
+        Number of loans updated
+    """
+    now = now or timezone.now()
+    values = {'overdue_marked_at': now, 'updated_at': now}
+    if note:
+        values['admin_notes'] = Concat(
+            Coalesce('admin_notes', Value('')),
+            Value(f"\nMarked as overdue on {now.strftime('%Y-%m-%d %H:%M')}"),
+        )
+    return LoanApplication.objects.filter(pk__in=list(loan_ids)).update(**values)
+
+
+def sweep_overdue(chunk_size=CHUNK_SIZE, remind_every=REMIND_EVERY, notify=True,
+                  dry_run=False, now=None, on_chunk=None):
+    """
+    Flag every overdue loan due a reminder and queue an email to its student
+
+    Each chunk is flagged and its emails queued inside one transaction, so
+    an interrupted run never leaves a loan flagged without a reminder.
+
+    Args:
+        chunk_size: Loans per SELECT/UPDATE and per email batch
+        remind_every: Minimum gap between two reminders for the same loan
+        notify: Queue the reminder emails
+        dry_run: Only count what would be flagged; write and queue nothing
+        now: Sweep timestamp (defaults to now)
+        on_chunk: Called with the running stats dict after every chunk
+
+    Returns:
+        dict with 'loans' (overdue loans found), 'marked', 'queued',
+        'chunks' and 'elapsed' (seconds)
+    """
+    now = now or timezone.now()
+    paginator = KeysetPaginator(
+        overdue_candidates(now, remind_every).select_related('student'),
+        SWEEP_ORDERING,
+        per_page=chunk_size,
+    )
+    stats = {'loans': 0, 'marked': 0, 'queued': 0, 'chunks': 0, 'elapsed': 0.0}
+    started = time.monotonic()
+
+    cursor = None
+    while True:
+        page = paginator.get_page(cursor)
+        loans = page.object_list
+        if not loans:
+            break
+
+        stats['loans'] += len(loans)
+        if not dry_run:
+            with transaction.atomic():
+                stats['marked'] += mark_overdue([loan.pk for loan in loans], now=now)
+                if notify:
+                    from repayments.notifications import build_overdue_message
+                    queued = queue_emails([build_overdue_message(loan) for loan in loans])
+                    stats['queued'] += len(queued)
+
+        stats['chunks'] += 1
+        stats['elapsed'] = time.monotonic() - started
+        if on_chunk:
+            on_chunk(stats)
+        if not page.has_next():
+            break
+        cursor = page.next_cursor
+
+    stats['elapsed'] = time.monotonic() - started
+    return stats
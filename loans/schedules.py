@@ -0,0 +1,126 @@
+"""
+Installment schedules for approved loans
+
+A loan's total amount due is split into repayment_months installments:
+installment n falls due n months after the loan was created (clamped to
+the end of shorter months) and the last one on repayment_due_date. Every
+installment but the last is the engine's rounded monthly payment; the
+last absorbs the rounding so the schedule adds up to the total exactly.
+
+Paid repayments are allocated oldest installment first from the loan's
+ledger total, so allocation stays correct however payments arrive
+(partial, early, out of order, refunded).
+"""
+
+import calendar
+from datetime import date
+from decimal import Decimal
+from itertools import groupby
+from operator import attrgetter
+
+from django.apps import apps as django_apps
+from django.db import transaction
+
+from .engine import PortfolioSchedule, paise_to_rupees
+
+
+def add_months(start, months):
+    """Same day of month `months` later, clamped to the month's last day"""
+    month_index = start.month - 1 + months
+    year = start.year + month_index // 12
+    month = month_index % 12 + 1
+    return date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def build_installments(start, due_date, term_months, total_due_paise, installment_paise):
+    """(number, due_date, amount_due) for each installment of one loan"""
+    installments = []
+    for number in range(1, term_months + 1):
+        if number == term_months:
+            when = due_date
+            amount = total_due_paise - installment_paise * (term_months - 1)
+        else:
+            when = add_months(start, number)
+            amount = installment_paise
+        installments.append((number, when, paise_to_rupees(amount)))
+    return installments
+
+
+def allocate(installments, total_paid):
+    """
+    Spread total_paid over installments in order; return those that changed
+
+    Installments must be sorted by number.
+    """
+    remaining = total_paid
+    changed = []
+    for installment in installments:
+        paid = min(installment.amount_due, max(remaining, Decimal('0.00')))
+        remaining -= paid
+        settled = paid >= installment.amount_due
+        if installment.amount_paid != paid or installment.settled != settled:
+            installment.amount_paid = paid
+            installment.settled = settled
+            changed.append(installment)
+    return changed
+
+
+def allocate_payments(loan):
+    """Re-allocate a loan's paid total against its installments"""
+    RepaymentSchedule = loan.installments.model
+    changed = allocate(list(loan.installments.order_by('number')), loan.total_paid)
+    if changed:
+        RepaymentSchedule.objects.bulk_update(changed, ['amount_paid', 'settled'])
+
+
+def allocate_payments_for(loan_ids, batch_size=1000):
+    """Re-allocate the paid totals of many loans, one batch of loans per query pair"""
+    LoanApplication = django_apps.get_model('loans', 'LoanApplication')
+    RepaymentSchedule = django_apps.get_model('loans', 'RepaymentSchedule')
+    loan_ids = sorted(set(loan_ids))
+    for start in range(0, len(loan_ids), batch_size):
+        chunk = loan_ids[start:start + batch_size]
+        totals = dict(LoanApplication.objects.filter(pk__in=chunk).values_list('pk', 'total_paid'))
+        installments = RepaymentSchedule.objects.filter(loan_id__in=chunk).order_by('loan_id', 'number')
+        changed = []
+        for loan_id, rows in groupby(installments, key=attrgetter('loan_id')):
+            changed.extend(allocate(list(rows), totals[loan_id]))
+        if changed:
+            RepaymentSchedule.objects.bulk_update(changed, ['amount_paid', 'settled'], batch_size=batch_size)
+
+
+def generate_schedules(loans, apps=django_apps):
+    """
+    Replace the installment schedules of approved loans in bulk
+
+    Args:
+        loans: LoanApplication instances (approved, with a due date)
+        apps: App registry; migrations pass their historical registry
+
+    Returns:
+        Number of installments created
+    """
+    RepaymentSchedule = apps.get_model('loans', 'RepaymentSchedule')
+    loans = [loan for loan in loans if loan.status == 'Approved' and loan.repayment_due_date]
+    if not loans:
+        return 0
+
+    schedule = PortfolioSchedule.from_loans(loans)
+    installments = []
+    for i, loan in enumerate(loans):
+        rows = []
+        for number, due_date, amount_due in build_installments(
+            start=loan.created_at.date(),
+            due_date=loan.repayment_due_date,
+            term_months=int(schedule.term_months[i]),
+            total_due_paise=int(schedule.total_due[i]),
+            installment_paise=int(schedule.installment[i]),
+        ):
+            rows.append(RepaymentSchedule(loan_id=loan.pk, number=number, due_date=due_date, amount_due=amount_due))
+        allocate(rows, loan.total_paid)
+        installments.extend(rows)
+
+    with transaction.atomic():
+        RepaymentSchedule.objects.filter(loan_id__in=[loan.pk for loan in loans]).delete()
+        RepaymentSchedule.objects.bulk_create(installments, batch_size=1000)
+    return len(installments)
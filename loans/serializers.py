@@ -0,0 +1,80 @@
+"""
+REST API serializers for loan applications
+
+The financial fields are read from the annotations added by
+LoanApplication.objects.with_financials(). They are not computed from the
+model properties, so listing a page of loans costs one query. The
+viewset only adds the annotations when one of them is requested.
+"""
+
+from rest_framework import serializers
+
+from loan_app.api import FormValidationMixin, SparseFieldsetsMixin
+from .forms import LoanApplicationForm
+from .models import LoanApplication, RepaymentSchedule
+
+# Serializer fields backed by with_financials() annotations
+FINANCIAL_FIELDS = (
+    'term_months', 'interest_due', 'amount_due', 'paid_to_date', 'balance_due',
+    'overdue', 'overdue_days', 'days_to_due',
+)
+
+
+class InstallmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RepaymentSchedule
+        fields = ['number', 'due_date', 'amount_due', 'amount_paid', 'settled']
+
+
+class LoanSerializer(SparseFieldsetsMixin, FormValidationMixin, serializers.ModelSerializer):
+    """Loan application with its annotated financial figures; creates go through LoanApplicationForm"""
+    form_class = LoanApplicationForm
+
+    student_email = serializers.EmailField(source='student.email', read_only=True)
+    university = serializers.CharField(write_only=True)
+
+    term_months = serializers.IntegerField(read_only=True)
+    interest_due = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    amount_due = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    paid_to_date = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    balance_due = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    overdue = serializers.BooleanField(read_only=True)
+    overdue_days = serializers.IntegerField(read_only=True)
+    days_to_due = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = LoanApplication
+        fields = [
+            'id', 'student', 'student_email', 'university', 'amount', 'reason', 'status', 'admin_notes',
+            'repayment_due_date', 'interest_rate', 'created_at', 'updated_at',
+            'paid_installments', 'last_payment_date', *FINANCIAL_FIELDS,
+        ]
+        read_only_fields = [
+            'student', 'status', 'admin_notes', 'interest_rate', 'created_at', 'updated_at',
+            'paid_installments', 'last_payment_date',
+        ]
+
+    def get_form_kwargs(self):
+        return {'user': self.context['request'].user}
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        # Kept on the student's profile, as apply_loan does
+        attrs['university'] = self.form.cleaned_data['university']
+        return attrs
+
+    def create(self, validated_data):
+        university = validated_data.pop('university')
+        student = validated_data['student']
+        if student.university != university:
+            student.university = university
+            student.save(update_fields=['university'])
+        return super().create(validated_data)
+
+
+class LoanDetailSerializer(LoanSerializer):
+    """A single loan with its installment schedule (prefetched)"""
+    installments = InstallmentSerializer(many=True, read_only=True)
+
+    class Meta(LoanSerializer.Meta):
+        fields = LoanSerializer.Meta.fields + ['installments']
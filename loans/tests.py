@@ -1,3 +1,814 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal, ROUND_HALF_UP
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from loan_app.computed import as_of
+from loan_app.pagination import KeysetPaginator
+from loan_app.testing import QueryPlanAssertionsMixin
+from outbox.models import OutboxMessage
+from repayments.models import Repayment
+from users.models import StudentUser
+from .forms import TOP_INDIAN_UNIVERSITIES
+from .balances import rebuild_balances_for
+from .engine import PortfolioSchedule, paise_to_rupees
+from .models import LoanApplication, RepaymentSchedule
+from .overdue import mark_overdue, overdue_candidates
+from .schedules import add_months
+from .transitions import transition_loans
+from .views import admin_loan_detail_validator
+
+
+class LoanQueryPlanTests(QueryPlanAssertionsMixin, TestCase):
+    """Hot LoanApplication queries must stay on an index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = StudentUser.objects.create_user(
+            email='student@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='Student',
+            student_id='STU001',
+            university='Test University',
+            gpa=Decimal('5.00'),
+        )
+        today = timezone.now().date()
+        for i in range(20):
+            LoanApplication.objects.create(
+                student=cls.student,
+                amount=1000 + i,
+                reason='Tuition',
+                status=['Pending', 'Approved', 'Rejected'][i % 3],
+                repayment_due_date=today + timedelta(days=i - 10),
+            )
+
+    def test_student_loans_by_status(self):
+        self.assertIndexedQuery(
+            LoanApplication.objects.filter(student=self.student, status='Approved'),
+            'loan_student_status_idx',
+        )
+
+    def test_overdue_loans(self):
+        self.assertIndexedQuery(LoanApplication.objects.overdue(), 'loan_status_due_idx')
+
+    def test_keyset_page(self):
+        first = LoanApplication.objects.order_by('-created_at', '-id')[5]
+        paginator = KeysetPaginator(LoanApplication.objects.all(), ('-created_at', '-id'), per_page=5)
+        queryset = LoanApplication.objects.filter(
+            paginator._seek([first.created_at, first.id], forward=True)
+        ).order_by('-created_at', '-id')[:6]
+        self.assertIndexedQuery(queryset, 'loan_created_id_idx')
+
+
+class PortfolioEngineTests(TestCase):
+    """The vectorized engine must agree with the scalar LoanApplication properties"""
+
+    AS_OF = date(2025, 3, 15)
+
+    def make_loan(self, amount, status, start, due):
+        return LoanApplication(
+            amount=amount,
+            status=status,
+            created_at=datetime.combine(start, datetime.min.time(), dt_timezone.utc),
+            repayment_due_date=due,
+        )
+
+    def test_matches_properties(self):
+        loans = [
+            # Month-end starts, same-day and next-day due dates, leap years
+            self.make_loan(1000, 'Approved', date(2025, 1, 31), date(2025, 2, 28)),
+            self.make_loan(1000, 'Approved', date(2025, 1, 15), date(2025, 1, 15)),
+            self.make_loan(2500, 'Approved', date(2024, 2, 29), date(2025, 3, 1)),
+            self.make_loan(777, 'Approved', date(2024, 12, 10), date(2025, 3, 16)),
+            self.make_loan(1001, 'Approved', date(2023, 5, 20), date(2025, 3, 14)),
+            # Pending/rejected loans accrue no interest; no due date means no term
+            self.make_loan(5000, 'Pending', date(2025, 1, 1), date(2025, 7, 1)),
+            self.make_loan(5000, 'Rejected', date(2025, 1, 1), None),
+            self.make_loan(5000, 'Approved', date(2025, 1, 1), None),
+        ]
+        for i, loan in enumerate(loans, start=1):
+            loan.pk = i
+        schedule = PortfolioSchedule.from_loans(loans, as_of=self.AS_OF)
+
+        for i, loan in enumerate(loans):
+            with self.subTest(loan=i):
+                self.assertEqual(schedule.term_months[i], loan.repayment_months)
+                self.assertEqual(paise_to_rupees(schedule.interest[i]), loan.total_interest)
+                self.assertEqual(paise_to_rupees(schedule.total_due[i]), loan.total_amount_due)
+                self.assertEqual(
+                    paise_to_rupees(schedule.installment[i]),
+                    loan.monthly_payment.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+                )
+                active = loan.status == 'Approved' and loan.repayment_due_date
+                days = (self.AS_OF - loan.repayment_due_date).days if active else 0
+                self.assertEqual(schedule.overdue_days[i], max(0, days))
+
+        self.assertEqual(schedule.totals()['overdue_loans'], 4)
+
+    def test_from_queryset_reads_ledger(self):
+        student = StudentUser.objects.create_user(
+            email='student@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='Student',
+            student_id='STU001',
+            university='Test University',
+            gpa=Decimal('5.00'),
+        )
+        loan = LoanApplication.objects.create(
+            student=student,
+            amount=1000,
+            reason='Tuition',
+            status='Approved',
+            repayment_due_date=timezone.now().date() + timedelta(days=60),
+        )
+        loan.repayments.create(amount_paid=Decimal('250.50'), status='Paid')
+        loan.refresh_from_db()
+
+        row = next(PortfolioSchedule.from_queryset(LoanApplication.objects.all()).rows())
+        self.assertEqual(row['total_due'], loan.total_amount_due)
+        self.assertEqual(row['paid'], Decimal('250.50'))
+        self.assertEqual(row['outstanding'], loan.outstanding_balance)
+
+
+class RepaymentScheduleTests(QueryPlanAssertionsMixin, TestCase):
+    """Installments are generated on approval and absorb repayments oldest first"""
+
+    def setUp(self):
+        self.student = StudentUser.objects.create_user(
+            email='student@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='Student',
+            student_id='STU001',
+            university='Test University',
+            gpa=Decimal('5.00'),
+        )
+        self.admin = StudentUser.objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+            first_name='Admin',
+            last_name='User',
+            student_id='ADM001',
+            university='N/A',
+            gpa=Decimal('0.00'),
+        )
+
+    def create_loan(self, status='Pending', months=3):
+        return LoanApplication.objects.create(
+            student=self.student,
+            amount=1000,
+            reason='Tuition',
+            status=status,
+            repayment_due_date=add_months(timezone.now().date(), months),
+        )
+
+    def installments(self, loan):
+        return list(loan.installments.order_by('number'))
+
+    def test_add_months_clamps_to_month_end(self):
+        self.assertEqual(add_months(date(2025, 1, 31), 1), date(2025, 2, 28))
+        self.assertEqual(add_months(date(2024, 1, 31), 1), date(2024, 2, 29))
+        self.assertEqual(add_months(date(2024, 11, 30), 3), date(2025, 2, 28))
+
+    def test_generated_on_approval(self):
+        loan = self.create_loan()
+        self.assertEqual(loan.installments.count(), 0)
+
+        loan.status = 'Approved'
+        loan.save()
+        installments = self.installments(loan)
+        self.assertEqual(len(installments), loan.repayment_months)
+        self.assertEqual(sum(i.amount_due for i in installments), loan.total_amount_due)
+        self.assertEqual(installments[-1].due_date, loan.repayment_due_date)
+        self.assertEqual(
+            [i.due_date for i in installments],
+            sorted(i.due_date for i in installments),
+        )
+
+        loan.status = 'Rejected'
+        loan.save()
+        self.assertEqual(loan.installments.count(), 0)
+
+    def test_approval_paths(self):
+        view_loan = self.create_loan()
+        action_loan = self.create_loan()
+        self.client.force_login(self.admin)
+
+        self.client.post(reverse('loans:approve_api', args=[view_loan.pk]))
+        self.client.post(
+            reverse('admin:loans_loanapplication_changelist'),
+            {'action': 'approve_loans', '_selected_action': [action_loan.pk]},
+        )
+        for loan in (view_loan, action_loan):
+            loan.refresh_from_db()
+            self.assertEqual(loan.status, 'Approved')
+            self.assertEqual(sum(i.amount_due for i in self.installments(loan)), loan.total_amount_due)
+            self.assertEqual(loan.outstanding_balance, loan.total_amount_due)
+
+    def test_repayments_are_allocated(self):
+        loan = self.create_loan(status='Approved')
+        first, second, third = self.installments(loan)
+
+        loan.repayments.create(amount_paid=first.amount_due + Decimal('10.00'), status='Paid')
+        first, second, third = self.installments(loan)
+        self.assertTrue(first.settled)
+        self.assertEqual(second.amount_paid, Decimal('10.00'))
+        self.assertFalse(second.settled)
+
+        today = timezone.now().date()
+        open_installments = RepaymentSchedule.objects.due_between(today, third.due_date)
+        self.assertEqual([i.number for i in open_installments.order_by('number')], [2, 3])
+        forecast = list(RepaymentSchedule.objects.forecast(today, third.due_date))
+        self.assertEqual(
+            sum(row['expected'] for row in forecast),
+            loan.total_amount_due - loan.repayments.get().amount_paid,
+        )
+        self.assertFalse(RepaymentSchedule.objects.overdue().exists())
+
+        # Refunds move the allocation back
+        loan.repayments.get().delete()
+        self.assertFalse(any(i.settled for i in self.installments(loan)))
+
+    def test_admin_mark_as_paid_settles_installments(self):
+        loan = self.create_loan(status='Approved')
+        first = self.installments(loan)[0]
+        repayment = loan.repayments.create(amount_paid=first.amount_due, status='Paid')
+        # Back to Pending behind save()'s back, as a gateway callback would leave it
+        Repayment.objects.filter(pk=repayment.pk).update(status='Pending')
+        rebuild_balances_for([loan.pk])
+        self.assertFalse(any(i.settled for i in self.installments(loan)))
+
+        self.client.force_login(self.admin)
+        self.client.post(
+            reverse('admin:repayments_repayment_changelist'),
+            {'action': 'mark_as_paid', '_selected_action': [repayment.pk]},
+        )
+        first, second, third = self.installments(loan)
+        self.assertTrue(first.settled)
+        self.assertEqual(first.amount_paid, first.amount_due)
+        self.assertFalse(second.settled)
+
+    def test_due_soon_uses_index(self):
+        self.create_loan(status='Approved')
+        today = timezone.now().date()
+        self.assertIndexedQuery(
+            RepaymentSchedule.objects.due_between(today, today + timedelta(days=7)),
+            'installment_open_due_idx',
+        )
+
+
+class BulkTransitionTests(TestCase):
+    """Bulk approval must leave loans exactly as LoanApplication.save() would"""
+
+    def setUp(self):
+        self.student = StudentUser.objects.create_user(
+            email='student@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='Student',
+            student_id='STU001',
+            university='Test University',
+            gpa=Decimal('5.00'),
+        )
+        self.loans = [
+            LoanApplication.objects.create(
+                student=self.student,
+                amount=1000 + i,
+                reason='Tuition',
+                repayment_due_date=timezone.now().date() + timedelta(days=90),
+            )
+            for i in range(6)
+        ]
+
+    def test_transition_matches_save(self):
+        ids = [loan.pk for loan in self.loans]
+        result = transition_loans(ids[:4] + [999999], 'Approved', batch_size=3)
+
+        self.assertEqual(result['updated'], ids[:4])
+        self.assertEqual(result['skipped'], [999999])
+        for loan in LoanApplication.objects.filter(pk__in=ids[:4]):
+            self.assertEqual(loan.status, 'Approved')
+            self.assertTrue(loan.admin_notes.startswith('Approved by admin'))
+            self.assertEqual(loan.outstanding_balance, loan.total_amount_due)
+            self.assertEqual(sum(i.amount_due for i in loan.installments.all()), loan.total_amount_due)
+        # Every approved student's email was queued with the decision
+        self.assertEqual(OutboxMessage.objects.filter(subject__startswith='Loan Application Approved').count(), 4)
+
+        # Already decided loans are skipped
+        result = transition_loans(ids, 'Rejected', notify=False)
+        self.assertEqual(result['updated'], ids[4:])
+
+    def test_bulk_endpoint(self):
+        admin = StudentUser.objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+            first_name='Admin',
+            last_name='User',
+            student_id='ADM001',
+            university='N/A',
+            gpa=Decimal('0.00'),
+        )
+        self.client.force_login(admin)
+        url = reverse('loans_api:bulk_transition_api')
+
+        response = self.client.post(
+            url, {'loan_ids': [self.loans[0].pk], 'status': 'Rejected'}, content_type='application/json'
+        )
+        self.assertEqual(response.json()['updated'], [self.loans[0].pk])
+        self.assertEqual(LoanApplication.objects.get(pk=self.loans[0].pk).status, 'Rejected')
+
+        response = self.client.post(url, {'loan_ids': [self.loans[1].pk], 'status': 'Closed'})
+        self.assertEqual(response.status_code, 400)
+
+
+class OverdueSweepTests(QueryPlanAssertionsMixin, TestCase):
+    """The overdue sweep flags and reminds each overdue loan once per remind interval"""
+
+    def setUp(self):
+        self.student = StudentUser.objects.create_user(
+            email='student@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='Student',
+            student_id='STU001',
+            university='Test University',
+            gpa=Decimal('5.00'),
+        )
+        today = timezone.now().date()
+        self.overdue = [
+            LoanApplication.objects.create(
+                student=self.student,
+                amount=1000 + i,
+                reason='Tuition',
+                status='Approved',
+                repayment_due_date=today - timedelta(days=10 + i),
+            )
+            for i in range(5)
+        ]
+        self.current = LoanApplication.objects.create(
+            student=self.student,
+            amount=2000,
+            reason='Books',
+            status='Approved',
+            repayment_due_date=today + timedelta(days=30),
+        )
+
+    def sweep(self, *args):
+        out = StringIO()
+        call_command('sweep_overdue', '--chunk-size=2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_candidates_use_due_date_index(self):
+        self.assertIndexedQuery(overdue_candidates(), 'loan_status_due_idx')
+
+    def test_dry_run_writes_nothing(self):
+        output = self.sweep('--dry-run')
+        self.assertIn('5 loan(s) would be flagged in 3 chunk(s)', output)
+        self.assertFalse(LoanApplication.objects.filter(overdue_marked_at__isnull=False).exists())
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_sweep_flags_and_emails_in_chunks(self):
+        output = self.sweep()
+        self.assertIn('Flagged 5 loan(s), queued 5 reminder(s)', output)
+        queued = list(OutboxMessage.objects.order_by('id').values_list('subject', flat=True))
+        self.assertEqual(len(queued), 5)
+        self.assertEqual(queued[0], f'Payment Overdue - Loan #{self.overdue[-1].pk}')
+        flagged = set(
+            LoanApplication.objects.filter(overdue_marked_at__isnull=False).values_list('pk', flat=True)
+        )
+        self.assertEqual(flagged, {loan.pk for loan in self.overdue})
+
+        # A second run inside the remind interval has nothing left to do
+        self.assertIn('Flagged 0 loan(s)', self.sweep())
+        self.assertEqual(OutboxMessage.objects.count(), 5)
+
+    def test_resumes_after_interrupted_run(self):
+        mark_overdue([loan.pk for loan in self.overdue[:3]])
+        self.sweep()
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list('subject', flat=True)),
+            sorted(f'Payment Overdue - Loan #{loan.pk}' for loan in self.overdue[3:]),
+        )
+
+    def test_admin_action_marks_in_bulk(self):
+        count = mark_overdue(
+            LoanApplication.objects.overdue().values_list('pk', flat=True), note=True
+        )
+        self.assertEqual(count, 5)
+        loan = LoanApplication.objects.get(pk=self.overdue[0].pk)
+        self.assertIn('Marked as overdue on', loan.admin_notes)
+        self.assertIsNotNone(loan.overdue_marked_at)
+
+
+class LoanExportTests(TestCase):
+    """Loan exports stream annotated rows with the admin management filters"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = StudentUser.objects.create_user(
+            email='student@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='Student',
+            student_id='STU001',
+            university='Test University',
+            gpa=Decimal('5.00'),
+        )
+        cls.loans = [
+            LoanApplication.objects.create(
+                student=cls.student,
+                amount=1000 * (i + 1),
+                reason='Tuition',
+                status=status,
+                repayment_due_date=timezone.now().date() + timedelta(days=30 * (i + 1)),
+            )
+            for i, status in enumerate(['Approved', 'Approved', 'Pending'])
+        ]
+        cls.admin = StudentUser.objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+            first_name='Admin',
+            last_name='User',
+            student_id='ADM001',
+            university='N/A',
+            gpa=Decimal('0.00'),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_csv_export_matches_model_properties(self):
+        response = self.client.get(reverse('loans:admin_export'), {'status': 'Approved'})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([int(row['id']) for row in rows], [loan.pk for loan in reversed(self.loans[:2])])
+        for row in rows:
+            loan = LoanApplication.objects.get(pk=row['id'])
+            self.assertEqual(Decimal(row['amount_due']), loan.total_amount_due)
+            self.assertEqual(Decimal(row['interest_due']), loan.total_interest)
+            self.assertEqual(int(row['term_months']), loan.repayment_months)
+            self.assertEqual(row['student_email'], 'student@example.com')
+
+    def test_header_is_sent_before_the_query(self):
+        response = self.client.get(reverse('loans:admin_export'))
+        content = iter(response.streaming_content)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(next(content).startswith(b'id,student_email,'))
+        with self.assertNumQueries(1):
+            self.assertEqual(len(b''.join(content).splitlines()), 3)
+
+    def test_jsonl_export(self):
+        response = self.client.get(reverse('loans:admin_export'), {'format': 'jsonl', 'status': 'Pending'})
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line)['id'] for line in lines], [self.loans[2].pk])
+
+    def test_unsupported_format_and_non_staff(self):
+        self.assertEqual(self.client.get(reverse('loans:admin_export'), {'format': 'xml'}).status_code, 400)
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(reverse('loans:admin_export')).status_code, 302)
+
+    async def test_asgi_export_streams_asynchronously(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse('loans:admin_export'))
+
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.splitlines()), 4)
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'loans.jsonl')
+            call_command('export_data', 'loans', format='jsonl', output=path, chunk_size=2, stdout=StringIO())
+            with open(path) as stream:
+                rows = [json.loads(line) for line in stream]
+
+        self.assertEqual([row['id'] for row in rows], [loan.pk for loan in reversed(self.loans)])
+        self.assertEqual(Decimal(rows[0]['balance_due']), Decimal('3000.00'))
+
+
+class LoanApiTests(TestCase):
+    """api/v1/loans/: scoped, annotated, cursor-paginated and constant in queries"""
+
+    def setUp(self):
+        self.student = StudentUser.objects.create_user(
+            email='student@example.com', password='testpass123', first_name='Test', last_name='Student',
+            student_id='STU001', university='Test University', gpa=Decimal('5.00'),
+        )
+        self.other = StudentUser.objects.create_user(
+            email='other@example.com', password='testpass123', first_name='Other', last_name='Student',
+            student_id='STU002', university='Test University', gpa=Decimal('5.00'),
+        )
+        self.staff = StudentUser.objects.create_superuser(
+            email='admin@example.com', password='testpass123', first_name='Admin', last_name='User',
+            student_id='ADM001', university='N/A', gpa=Decimal('0.00'),
+        )
+        due = timezone.now().date() + timedelta(days=90)
+        self.loans = [
+            LoanApplication.objects.create(
+                student=self.student, amount=1000 * (i + 1), reason='Tuition', status='Approved',
+                repayment_due_date=due,
+            )
+            for i in range(3)
+        ]
+        self.pending = LoanApplication.objects.create(
+            student=self.other, amount=2000, reason='Books', status='Pending', repayment_due_date=due,
+        )
+        self.client = APIClient()
+
+    def test_list_is_scoped_and_annotated(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.get('/api/v1/loans/')
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([row['id'] for row in results], [loan.pk for loan in reversed(self.loans)])
+        loan = self.loans[-1]
+        self.assertEqual(Decimal(results[0]['amount_due']), loan.total_amount_due)
+        self.assertEqual(Decimal(results[0]['balance_due']), loan.total_amount_due)
+        self.assertEqual(results[0]['term_months'], loan.repayment_months)
+        self.assertEqual(results[0]['days_to_due'], loan.days_until_due)
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        self.client.force_authenticate(self.staff)
+        with self.assertNumQueries(1):
+            self.client.get('/api/v1/loans/')
+        for _ in range(5):
+            LoanApplication.objects.create(
+                student=self.other, amount=500, reason='More', status='Pending',
+                repayment_due_date=timezone.now().date() + timedelta(days=30),
+            )
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/loans/')
+        self.assertEqual(len(response.json()['results']), 9)
+
+    def test_retrieve_prefetches_installments(self):
+        self.client.force_authenticate(self.student)
+        loan = self.loans[0]
+        # Loan with annotations and student, then installments
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/v1/loans/{loan.pk}/')
+        self.assertEqual(len(response.json()['installments']), loan.installments.count())
+
+        self.assertEqual(self.client.get(f'/api/v1/loans/{self.pending.pk}/').status_code, 404)
+
+    def test_sparse_fieldsets(self):
+        self.client.force_authenticate(self.student)
+        # No financial fields requested: no annotations, no join
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/loans/?fields=status,amount')
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'status', 'amount'})
+        self.assertNotIn('repayments_repayment', queries[0]['sql'])
+        self.assertNotIn('users_studentuser', queries[0]['sql'].split('WHERE')[0])
+
+        self.assertEqual(self.client.get('/api/v1/loans/?fields=nope').status_code, 400)
+
+    def test_cursor_pagination(self):
+        self.client.force_authenticate(self.student)
+        first = self.client.get('/api/v1/loans/?page_size=2').json()
+        second = self.client.get(first['next']).json()
+
+        self.assertEqual(len(first['results']), 2)
+        self.assertEqual([row['id'] for row in second['results']], [self.loans[0].pk])
+        self.assertIsNone(second['next'])
+        self.assertNotIn('count', first)
+
+    def test_create_validates_like_the_form(self):
+        applicant = StudentUser.objects.create_user(
+            email='applicant@example.com', password='testpass123', first_name='New', last_name='Applicant',
+            student_id='STU003', university='Test University', gpa=Decimal('8.00'),
+        )
+        self.client.force_authenticate(self.other)
+        response = self.client.post('/api/v1/loans/', {'amount': 5000}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(applicant)
+        payload = {
+            'amount': 100, 'reason': 'Laptop', 'university': TOP_INDIAN_UNIVERSITIES[0],
+            'repayment_due_date': (timezone.now().date() + timedelta(days=60)).isoformat(),
+        }
+        response = self.client.post('/api/v1/loans/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('amount', response.json())
+
+        payload['amount'] = 5000
+        response = self.client.post('/api/v1/loans/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.json())
+        # Auto-approved like a web application, with its schedule in the response
+        self.assertEqual(response.json()['status'], 'Approved')
+        self.assertEqual(response.json()['student'], applicant.pk)
+        self.assertTrue(response.json()['installments'])
+        applicant.refresh_from_db()
+        self.assertEqual(applicant.university, TOP_INDIAN_UNIVERSITIES[0])
+
+    def test_staff_decisions(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.post(f'/api/v1/loans/{self.loans[0].pk}/approve/').status_code, 403)
+
+        self.client.force_authenticate(self.staff)
+        response = self.client.post(f'/api/v1/loans/{self.pending.pk}/approve/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'Approved')
+        self.assertTrue(response.json()['installments'])
+
+        response = self.client.post(f'/api/v1/loans/{self.pending.pk}/reject/')
+        self.assertEqual(response.status_code, 409)
+
+
+class ConditionalGetTests(TestCase):
+    """Loan detail and loan status answer 304 from one query while the loan is unchanged"""
+
+    def setUp(self):
+        self.student = StudentUser.objects.create_user(
+            email='student@example.com', password='testpass123', first_name='Test', last_name='Student',
+            student_id='STU001', university='Test University', gpa=Decimal('5.00'),
+        )
+        self.other = StudentUser.objects.create_user(
+            email='other@example.com', password='testpass123', first_name='Other', last_name='Student',
+            student_id='STU002', university='Test University', gpa=Decimal('5.00'),
+        )
+        self.loan = LoanApplication.objects.create(
+            student=self.student, amount=5000, reason='Tuition', status='Approved',
+            repayment_due_date=timezone.now().date() + timedelta(days=90),
+        )
+        self.client.force_login(self.student)
+
+    def revalidate(self, url, response):
+        with CaptureQueriesContext(connection) as queries:
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        return again, queries
+
+    def test_detail_page_not_modified(self):
+        url = reverse('loans:detail', args=[self.loan.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        again, queries = self.revalidate(url, response)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+        self.assertEqual(again['ETag'], response['ETag'])
+        self.assertFalse(again.templates)
+        # Session and user lookups plus the one validator query
+        self.assertEqual(len(queries), 3)
+
+        # A new repayment changes the validator even though the loan row is untouched
+        from repayments.models import Repayment
+        Repayment.objects.create(loan=self.loan, amount_paid=Decimal('100.00'), status='Pending')
+        self.assertEqual(self.revalidate(url, response)[0].status_code, 200)
+
+    def test_other_students_never_get_not_modified(self):
+        url = reverse('loans:detail', args=[self.loan.pk])
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
+    def test_loan_status_not_modified(self):
+        url = reverse('users:loan_status_api', args=[self.loan.pk])
+        response = self.client.get(url)
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(self.revalidate(url, response)[0].status_code, 304)
+
+        self.loan.reason = 'Tuition and books'
+        self.loan.save()
+        self.assertEqual(self.revalidate(url, response)[0].status_code, 200)
+
+
+class AdminLoanManagementTests(TestCase):
+    """Admin loan table: cached rows and one lazily filled detail modal"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.staff = StudentUser.objects.create_superuser(
+            email='admin@example.com', password='testpass123', first_name='Admin', last_name='User',
+            student_id='ADM001', university='N/A', gpa=Decimal('0.00'),
+        )
+        self.student = StudentUser.objects.create_user(
+            email='student@example.com', password='testpass123', first_name='Test', last_name='Student',
+            student_id='STU001', university='Test University', gpa=Decimal('5.00'),
+        )
+        due = timezone.now().date() + timedelta(days=30)
+        self.loans = [
+            LoanApplication.objects.create(
+                student=self.student, amount=1000 + i, reason='Tuition', status='Pending', repayment_due_date=due,
+            )
+            for i in range(3)
+        ]
+        self.client.force_login(self.staff)
+
+    def test_page_has_one_shared_modal(self):
+        response = self.client.get(reverse('loans:admin_management'))
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertEqual(content.count('class="modal fade"'), 1)
+        self.assertNotIn('student@example.com', content)
+        for loan in self.loans:
+            self.assertIn(reverse('loans:admin_loan_detail', args=[loan.pk]), content)
+
+    def test_rows_follow_the_loan_and_student(self):
+        url = reverse('loans:admin_management')
+        self.client.get(url)
+
+        loan = self.loans[0]
+        loan.status = 'Approved'
+        loan.save()
+        self.student.university = 'Other University'
+        self.student.save()
+
+        content = self.client.get(url).content.decode()
+        self.assertEqual(content.count('<span class="badge bg-success">Approved</span>'), 1)
+        self.assertEqual(content.count('Other University'), len(self.loans))
+
+    def test_detail_fragment(self):
+        url = reverse('loans:admin_loan_detail', args=[self.loans[0].pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'loans/admin_loan_detail.html')
+        self.assertContains(response, 'student@example.com')
+        self.assertNotContains(response, '<html')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+
+    def test_date_comes_from_as_of_date(self):
+        request = RequestFactory().get('/')
+        request.user = self.staff
+        today = timezone.localdate()
+        with as_of(today):
+            current = admin_loan_detail_validator(request, self.loans[0].pk)
+        with as_of(today + timedelta(days=1)):
+            tomorrow = admin_loan_detail_validator(request, self.loans[0].pk)
+        self.assertNotEqual(current[0], tomorrow[0])
+        self.assertEqual(self.client.get(reverse('loans:admin_management')).context['today'], today)
+
+class ComputedPropertyTests(TestCase):
+    """Financial properties are memoized per instance and follow changes to their inputs"""
+
+    def setUp(self):
+        self.loan = LoanApplication(
+            amount=1000, status='Approved', created_at=datetime(2025, 1, 10, tzinfo=dt_timezone.utc),
+            repayment_due_date=date(2025, 4, 10),
+        )
+
+    def test_value_is_reused_until_an_input_changes(self):
+        total = self.loan.total_amount_due
+        self.assertIs(self.loan.total_amount_due, total)
+        self.assertEqual(total, Decimal('1300.00'))
+
+        self.loan.amount = 2000
+        self.assertEqual(self.loan.total_amount_due, Decimal('2600.00'))
+        self.loan.repayment_due_date = date(2025, 2, 10)
+        self.assertEqual(self.loan.repayment_months, 1)
+        self.assertEqual(self.loan.monthly_payment, Decimal('2200.00'))
+        self.loan.status = 'Pending'
+        self.assertEqual(self.loan.total_amount_due, Decimal('2000'))
+        self.assertEqual(self.loan.total_interest, Decimal('0.00'))
+
+    def test_progress_follows_payments(self):
+        self.assertEqual(self.loan.repayment_progress, 0)
+        self.loan.total_paid = Decimal('650.00')
+        self.assertEqual(self.loan.repayment_progress, Decimal('50'))
+
+    def test_as_of_date_is_pinned(self):
+        with as_of(date(2025, 4, 1)):
+            self.assertFalse(self.loan.is_overdue)
+            self.assertEqual(self.loan.days_until_due, 9)
+        with as_of(date(2025, 4, 15)):
+            self.assertTrue(self.loan.is_overdue)
+            self.assertEqual(self.loan.days_overdue, 5)
+
+    def test_detail_view_loads_the_loan_once(self):
+        student = StudentUser.objects.create_user(
+            email='student@example.com', password='testpass123', first_name='Test', last_name='Student',
+            student_id='STU001', university='Test University', gpa=Decimal('5.00'),
+        )
+        loan = LoanApplication.objects.create(
+            student=student, amount=1000, reason='Tuition', status='Approved',
+            repayment_due_date=timezone.now().date() + timedelta(days=60),
+        )
+        self.client.force_login(student)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('loans:detail', args=[loan.pk])).status_code, 200)
+        loan_reads = [q for q in queries if q['sql'].startswith('SELECT "loans_loanapplication"."id"')]
+        self.assertEqual(len(loan_reads), 1)
@@ -0,0 +1,103 @@
+"""
+Batch approval and rejection of loan applications
+
+transition_loans() moves thousands of pending loans to Approved or
+Rejected in one transaction while keeping everything LoanApplication.save()
+maintains: a repayment due date for approved loans, the admin note, the
+outstanding balance, the installment schedule, the portfolio statistics
+and the cached summaries. Loans are changed in memory and written with
+bulk_update in chunks; the notification emails for the whole batch are
+queued in the outbox in the same transaction.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from caching.versioned import invalidate, loan_scope, student_scope
+from portfolio.stats import apply_deltas, collect_deltas, tracker_for_model
+from .engine import PortfolioSchedule, paise_to_rupees
+from .models import LoanApplication
+from .schedules import generate_schedules
+
+DECISIONS = ('Approved', 'Rejected')
+
+# Rows loaded and written per statement
+BATCH_SIZE = 500
+
+# Largest batch a single request may submit
+MAX_LOANS = 10000
+
+UPDATE_FIELDS = ['status', 'admin_notes', 'repayment_due_date', 'outstanding_balance', 'updated_at']
+
+
+def transition_loans(loan_ids, status, batch_size=BATCH_SIZE, notify=True):
+    """
+    Approve or reject pending loan applications in bulk
+
+    Args:
+        loan_ids: Ids of the loans to decide
+        status: 'Approved' or 'Rejected'
+        batch_size: Rows per SELECT/UPDATE statement
+        notify: Queue decision emails to the students
+
+    Returns:
+        dict with 'updated' (ids moved to status) and 'skipped' (ids that
+        were not pending or do not exist)
+    """
+    if status not in DECISIONS:
+        raise ValueError(f"Unsupported loan status transition: {status!r}")
+    loan_ids = sorted(set(int(loan_id) for loan_id in loan_ids))
+    if len(loan_ids) > MAX_LOANS:
+        raise ValueError(f"At most {MAX_LOANS} loans can be processed at once")
+
+    now = timezone.now()
+    note = f"{status} by admin on {now.strftime('%Y-%m-%d %H:%M')}"
+    default_due_date = now.date() + timedelta(days=365)
+    tracker = tracker_for_model(LoanApplication)
+
+    updated = []
+    with transaction.atomic():
+        for start in range(0, len(loan_ids), batch_size):
+            chunk = loan_ids[start:start + batch_size]
+            loans = list(
+                LoanApplication.objects.select_for_update()
+                .filter(pk__in=chunk, status='Pending')
+                .order_by('pk')
+            )
+            if not loans:
+                continue
+
+            changes = []
+            for loan in loans:
+                before = tracker.current(loan)
+                loan.status = status
+                loan.admin_notes = note
+                loan.updated_at = now
+                if status == 'Approved' and not loan.repayment_due_date:
+                    loan.repayment_due_date = default_due_date
+                changes.append((before, tracker.current(loan)))
+
+            # Same derived balance LoanApplication.save() would store
+            schedule = PortfolioSchedule.from_loans(loans)
+            for loan, total_due in zip(loans, schedule.total_due):
+                loan.outstanding_balance = paise_to_rupees(total_due) - loan.total_paid
+                loan._schedule_state = loan._get_schedule_state()
+
+            LoanApplication.objects.bulk_update(loans, UPDATE_FIELDS)
+            apply_deltas(collect_deltas(tracker, changes))
+            invalidate(*(scope for loan in loans for scope in (loan_scope(loan.pk), student_scope(loan.student_id))))
+            if status == 'Approved':
+                generate_schedules(loans)
+            updated.extend(loan.pk for loan in loans)
+
+        if notify and updated:
+            from repayments.notifications import send_loan_decision_notifications
+            send_loan_decision_notifications(updated)
+
+    updated_ids = set(updated)
+    return {
+        'updated': updated,
+        'skipped': [loan_id for loan_id in loan_ids if loan_id not in updated_ids],
+    }
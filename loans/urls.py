@@ -12,6 +12,8 @@ urlpatterns = [
     
     # Admin management URLs
     path('admin/', views.admin_loan_management, name='admin_management'),
+    path('admin/export/', views.export_loans, name='admin_export'),
+    path('admin/detail/<int:loan_id>/', views.admin_loan_detail, name='admin_loan_detail'),
     path('statistics/', views.loan_statistics, name='statistics'),
     
     # API endpoints for loan management
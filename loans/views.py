@@ -1,3 +1,5 @@
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
@@ -8,13 +10,20 @@ from django.urls import reverse_lazy
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
-from django.db.models import Q, Sum
-from django.core.paginator import Paginator
 
+from .exports import LOAN_EXPORT_COLUMNS, loan_export
+from .filters import filter_loans
 from .forms import LoanApplicationForm, LoanApplicationUpdateForm
 from .models import LoanApplication
+from .transitions import transition_loans, DECISIONS
 from users.models import StudentUser
 from repayments.models import Repayment
+from loan_app.computed import SingleObjectOnceMixin, as_of_date
+from loan_app.conditional import ConditionalGetMixin, conditional, validator
+from loan_app.exports import EXPORT_FORMATS, export_response
+from loan_app.pagination import KeysetPaginationMixin, keyset_paginate
+from search.services import ranked_search, SEARCH_ORDERING
+from portfolio.stats import PortfolioSnapshot
 
 
 class LoanApplicationCreateView(LoginRequiredMixin, CreateView):
@@ -66,12 +75,21 @@ class LoanApplicationCreateView(LoginRequiredMixin, CreateView):
         return response
 
 
-class LoanApplicationDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
+class LoanApplicationDetailView(LoginRequiredMixin, ConditionalGetMixin, UserPassesTestMixin, SingleObjectOnceMixin,
+                                DetailView):
     """View for displaying loan application details"""
     model = LoanApplication
     template_name = 'loans/detail.html'
     context_object_name = 'loan'
     
+    def get_validator(self):
+        """Loan row, ledger and repayments version (None if the user may not view the loan)"""
+        loans = LoanApplication.objects.all()
+        if not self.request.user.is_staff:
+            loans = loans.filter(student=self.request.user)
+        version = loans.version(self.kwargs['pk'])
+        return version and validator(self.request, *version)
+    
     def test_func(self):
         """Check if user can view this loan"""
         loan = self.get_object()
@@ -85,67 +103,54 @@ class LoanApplicationDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailV
         # Get repayments for this loan
         context['repayments'] = loan.repayments.all().order_by('-payment_date')
         
-        # Calculate repayment statistics
-        total_paid = context['repayments'].filter(status='Paid').aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
-        
-        context['total_paid'] = total_paid
-        context['remaining_amount'] = loan.total_amount_due - total_paid
-        context['repayment_progress'] = (total_paid / loan.total_amount_due) * 100 if loan.total_amount_due > 0 else 0
+        # Repayment statistics come from the loan's stored ledger
+        context['total_paid'] = loan.total_paid
+        context['remaining_amount'] = loan.outstanding_balance
+        context['repayment_progress'] = loan.repayment_progress
         
         return context
 
 
-class LoanApplicationListView(LoginRequiredMixin, ListView):
+class LoanApplicationListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """View for listing loan applications"""
     model = LoanApplication
     template_name = 'loans/list.html'
     context_object_name = 'loans'
     paginate_by = 10
+    keyset_ordering = ('-created_at', '-id')
     
     def get_queryset(self):
-        """Filter loans based on user role"""
+        """Filter loans based on user role, search and status"""
         if self.request.user.is_staff:
             # Admin sees all loans
-            return LoanApplication.objects.all().select_related('student').order_by('-created_at')
+            queryset = LoanApplication.objects.all().select_related('student')
         else:
             # Students see only their own loans
-            return LoanApplication.objects.filter(
-                student=self.request.user
-            ).order_by('-created_at')
-    
-    def get_context_data(self, **kwargs):
-        """Add search and filter context"""
-        context = super().get_context_data(**kwargs)
+            queryset = LoanApplication.objects.filter(student=self.request.user)
         
-        # Search functionality
         search_query = self.request.GET.get('search', '')
         status_filter = self.request.GET.get('status', '')
         
-        queryset = self.get_queryset()
-        
         if search_query:
-            queryset = queryset.filter(
-                Q(student__first_name__icontains=search_query) |
-                Q(student__last_name__icontains=search_query) |
-                Q(student__student_id__icontains=search_query) |
-                Q(reason__icontains=search_query)
-            )
+            queryset = ranked_search(queryset, search_query)
         
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        # Pagination
-        paginator = Paginator(queryset, self.paginate_by)
-        page_number = self.request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
-        
-        context['page_obj'] = page_obj
-        context['search_query'] = search_query
-        context['status_filter'] = status_filter
+        return queryset
+    
+    def get_keyset_ordering(self):
+        """Best matches first while searching"""
+        if self.request.GET.get('search', ''):
+            return SEARCH_ORDERING
+        return self.keyset_ordering
+    
+    def get_context_data(self, **kwargs):
+        """Add search and filter context"""
+        context = super().get_context_data(**kwargs)
+        context['search_query'] = self.request.GET.get('search', '')
+        context['status_filter'] = self.request.GET.get('status', '')
         context['status_choices'] = LoanApplication.STATUS_CHOICES
-        
         return context
 
 
@@ -202,42 +207,28 @@ def apply_loan(request):
 @staff_member_required
 def admin_loan_management(request):
     """Admin view for managing loan applications"""
-    loans = LoanApplication.objects.all().select_related('student').order_by('-created_at')
+    loans = LoanApplication.objects.with_financials().select_related('student')
     
-    # Statistics
-    total_loans = loans.count()
-    pending_loans = loans.filter(status='Pending').count()
-    approved_loans = loans.filter(status='Approved').count()
-    rejected_loans = loans.filter(status='Rejected').count()
-    overdue_loans = sum(1 for loan in loans.filter(status='Approved') if loan.is_overdue)
+    # Statistics from the incrementally maintained snapshot
+    stats = PortfolioSnapshot().loan_summary()
+    stats['overdue_loans'] = LoanApplication.objects.overdue().count()
     
     # Search and filtering
     search_query = request.GET.get('search', '')
     status_filter = request.GET.get('status', '')
+    loans, ordering = filter_loans(loans, search_query, status_filter)
     
-    if search_query:
-        loans = loans.filter(
-            Q(student__first_name__icontains=search_query) |
-            Q(student__last_name__icontains=search_query) |
-            Q(student__student_id__icontains=search_query) |
-            Q(reason__icontains=search_query)
-        )
-    
-    if status_filter:
-        loans = loans.filter(status=status_filter)
-    
-    # Pagination
-    paginator = Paginator(loans, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on (created_at, id), or on search rank while searching
+    page_obj = keyset_paginate(request, loans, ordering, per_page=20, with_total=True)
     
     context = {
         'loans': page_obj,
-        'total_loans': total_loans,
-        'pending_loans': pending_loans,
-        'approved_loans': approved_loans,
-        'rejected_loans': rejected_loans,
-        'overdue_loans': overdue_loans,
+        'today': as_of_date(),
+        'total_loans': stats['total_loans'],
+        'pending_loans': stats['pending_loans'],
+        'approved_loans': stats['approved_loans'],
+        'rejected_loans': stats['rejected_loans'],
+        'overdue_loans': stats['overdue_loans'],
         'search_query': search_query,
         'status_filter': status_filter,
         'status_choices': LoanApplication.STATUS_CHOICES,
@@ -246,6 +237,33 @@ def admin_loan_management(request):
     return render(request, 'loans/admin_management.html', context)
 
 
+def admin_loan_detail_validator(request, loan_id):
+    version = LoanApplication.objects.version(loan_id)
+    # Days until due move with the date
+    return version and validator(request, *version, as_of_date())
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+@conditional(admin_loan_detail_validator)
+def admin_loan_detail(request, loan_id):
+    """Detail modal content for one loan, fetched when the admin opens it"""
+    loan = get_object_or_404(LoanApplication.objects.with_financials().select_related('student'), id=loan_id)
+    return render(request, 'loans/admin_loan_detail.html', {'loan': loan})
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def export_loans(request):
+    """Stream the loans matching the admin management filters as CSV or JSONL (?format=jsonl)"""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'success': False, 'error': f'Unsupported format: {fmt}'}, status=400)
+    
+    loans, ordering = loan_export(request.GET.get('search', ''), request.GET.get('status', ''))
+    return export_response(request, loans, LOAN_EXPORT_COLUMNS, 'loans', fmt, ordering)
+
+
 @staff_member_required
 @require_http_methods(["POST"])
 def approve_loan(request, loan_id):
@@ -288,6 +306,42 @@ def reject_loan(request, loan_id):
         })
 
 
+@staff_member_required
+@require_http_methods(["POST"])
+def bulk_transition_loans(request):
+    """API endpoint to approve or reject many pending loans at once
+    
+    Accepts JSON ({"loan_ids": [...], "status": "Approved"}) or form data
+    with repeated loan_ids.
+    """
+    try:
+        if request.content_type == 'application/json':
+            payload = json.loads(request.body or b'{}')
+            loan_ids = payload.get('loan_ids') or []
+            status = payload.get('status', '')
+        else:
+            loan_ids = request.POST.getlist('loan_ids')
+            status = request.POST.get('status', '')
+        
+        if status not in DECISIONS:
+            return JsonResponse({
+                'success': False,
+                'error': f"status must be one of: {', '.join(DECISIONS)}"
+            }, status=400)
+        if not isinstance(loan_ids, list) or not loan_ids:
+            return JsonResponse({'success': False, 'error': 'loan_ids is required'}, status=400)
+        
+        result = transition_loans(loan_ids, status)
+        return JsonResponse({
+            'success': True,
+            'message': f"{len(result['updated'])} loan(s) {status.lower()}",
+            'updated': result['updated'],
+            'skipped': result['skipped'],
+        })
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
 @login_required
 def loan_statistics(request):
     """View for displaying loan statistics"""
@@ -295,53 +349,18 @@ def loan_statistics(request):
     
     if user.is_staff:
         # Admin sees all statistics
-        total_loans = LoanApplication.objects.count()
-        pending_loans = LoanApplication.objects.filter(status='Pending').count()
-        approved_loans = LoanApplication.objects.filter(status='Approved').count()
-        rejected_loans = LoanApplication.objects.filter(status='Rejected').count()
-        overdue_loans = sum(
-            1 for loan in LoanApplication.objects.filter(status='Approved') 
-            if loan.is_overdue
-        )
-        
-        # Total amount statistics
-        total_amount_approved = LoanApplication.objects.filter(
-            status='Approved'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        total_amount_pending = LoanApplication.objects.filter(
-            status='Pending'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
+        snapshot = PortfolioSnapshot()
+        loans = LoanApplication.objects.all()
     else:
         # Students see their own statistics
-        user_loans = LoanApplication.objects.filter(student=user)
-        total_loans = user_loans.count()
-        pending_loans = user_loans.filter(status='Pending').count()
-        approved_loans = user_loans.filter(status='Approved').count()
-        rejected_loans = user_loans.filter(status='Rejected').count()
-        overdue_loans = sum(
-            1 for loan in user_loans.filter(status='Approved') 
-            if loan.is_overdue
-        )
-        
-        # Total amount statistics
-        total_amount_approved = user_loans.filter(
-            status='Approved'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        total_amount_pending = user_loans.filter(
-            status='Pending'
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        snapshot = PortfolioSnapshot(user)
+        loans = LoanApplication.objects.filter(student=user)
     
+    # Counts and amount totals come from the snapshot; overdue depends on
+    # today's date so it is an indexed count
     context = {
-        'total_loans': total_loans,
-        'pending_loans': pending_loans,
-        'approved_loans': approved_loans,
-        'rejected_loans': rejected_loans,
-        'overdue_loans': overdue_loans,
-        'total_amount_approved': total_amount_approved,
-        'total_amount_pending': total_amount_pending,
+        **snapshot.loan_summary(),
+        'overdue_loans': loans.overdue().count(),
         'user': user,
     }
     
@@ -0,0 +1,27 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import OutboxMessage
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    """Admin interface for queued, sent and failed emails"""
+    
+    list_display = ['subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject']
+    readonly_fields = ['created_at', 'sent_at', 'attempts', 'last_error']
+    ordering = ['-created_at']
+    actions = ['retry_now']
+    
+    def recipients(self, obj):
+        return ', '.join(obj.to)
+    recipients.short_description = 'To'
+    
+    def retry_now(self, request, queryset):
+        """Action to put failed or waiting messages back at the front of the queue"""
+        updated = queryset.exclude(status='Sent').update(
+            status='Pending', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"Queued {updated} message(s) for immediate delivery.")
+    retry_now.short_description = "Retry selected messages now"
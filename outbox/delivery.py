@@ -0,0 +1,157 @@
+"""
+Queueing and delivery of outbox emails
+
+queue_email()/queue_emails() store already rendered messages as
+OutboxMessage rows in the caller's transaction. deliver_batch() is the
+worker side: it claims due rows with SELECT ... FOR UPDATE SKIP LOCKED
+(so several workers never pick the same message), sends them over the
+connection it is given, and records the outcome. Failed messages are
+retried with exponential backoff until MAX_ATTEMPTS, then left as Failed
+for an admin to inspect or retry.
+"""
+
+from datetime import timedelta
+
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+# Messages claimed and sent per transaction
+BATCH_SIZE = 100
+
+# Delivery attempts before a message is given up on
+MAX_ATTEMPTS = 8
+
+# First retry delay, doubled on every further failure up to RETRY_MAX
+RETRY_BASE = timedelta(minutes=1)
+RETRY_MAX = timedelta(hours=6)
+
+UPDATE_FIELDS = ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+
+
+def _to_row(message):
+    html_body = next(
+        (content for content, mimetype in getattr(message, 'alternatives', []) if mimetype == 'text/html'),
+        '',
+    )
+    return OutboxMessage(
+        subject=message.subject,
+        body=message.body,
+        html_body=html_body,
+        from_email=message.from_email,
+        to=list(message.to),
+    )
+
+
+def queue_emails(messages):
+    """Store EmailMessage/EmailMultiAlternatives instances for delivery; returns the rows"""
+    rows = [_to_row(message) for message in messages]
+    # Savepoint: callers swallow notification errors, which must not break their transaction
+    with transaction.atomic():
+        return OutboxMessage.objects.bulk_create(rows)
+
+
+def queue_email(message):
+    """Store a single message for delivery"""
+    return queue_emails([message])[0]
+
+
+def to_email(row):
+    """Rebuild the EmailMultiAlternatives for an outbox row"""
+    message = EmailMultiAlternatives(
+        subject=row.subject,
+        body=row.body,
+        from_email=row.from_email,
+        to=row.to,
+    )
+    if row.html_body:
+        message.attach_alternative(row.html_body, "text/html")
+    return message
+
+
+def retry_delay(attempts):
+    """Backoff after the given number of failed attempts"""
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+def claim_batch(batch_size=BATCH_SIZE, now=None):
+    """
+    Lock and return up to batch_size due messages, oldest first
+
+    Must run inside a transaction; rows locked by another worker are
+    skipped rather than waited on.
+    """
+    now = now or timezone.now()
+    return list(
+        OutboxMessage.objects.select_for_update(skip_locked=True)
+        .filter(status='Pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id')[:batch_size]
+    )
+
+
+def _record_failure(row, error, now):
+    row.last_error = f"{type(error).__name__}: {error}"
+    if row.attempts >= MAX_ATTEMPTS:
+        row.status = 'Failed'
+    else:
+        row.next_attempt_at = now + retry_delay(row.attempts)
+
+
+def deliver_batch(connection, batch_size=BATCH_SIZE, now=None):
+    """
+    Claim one batch of due messages and send it over connection
+
+    The connection is opened if needed and left open for the next batch;
+    it is closed after any failure so the next batch reconnects. Rows
+    stay locked until their outcome is saved, so a worker that dies
+    mid-batch leaves them Pending for the next one.
+
+    Returns:
+        dict with 'claimed', 'sent', 'retried' and 'failed' counts
+    """
+    now = now or timezone.now()
+    stats = {'claimed': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+
+    with transaction.atomic():
+        rows = claim_batch(batch_size, now)
+        if not rows:
+            return stats
+        stats['claimed'] = len(rows)
+
+        try:
+            connection.open()
+            connection_error = None
+        except Exception as e:
+            connection_error = e
+
+        for row in rows:
+            row.attempts += 1
+            if connection_error is not None:
+                _record_failure(row, connection_error, now)
+                continue
+            try:
+                connection.send_messages([to_email(row)])
+            except Exception as e:
+                _record_failure(row, e, now)
+            else:
+                row.status = 'Sent'
+                row.sent_at = now
+                row.last_error = ''
+
+        OutboxMessage.objects.bulk_update(rows, UPDATE_FIELDS)
+
+    for row in rows:
+        if row.status == 'Sent':
+            stats['sent'] += 1
+        elif row.status == 'Failed':
+            stats['failed'] += 1
+        else:
+            stats['retried'] += 1
+    if stats['sent'] < stats['claimed']:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return stats
@@ -0,0 +1,45 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from outbox.delivery import BATCH_SIZE, deliver_batch
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbox emails over one long-lived mail connection, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Messages claimed and sent per transaction')
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Seconds to wait when no message is due')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no message is due instead of polling')
+
+    def handle(self, *args, **options):
+        totals = {'claimed': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+        connection = get_connection()
+        try:
+            while True:
+                stats = deliver_batch(connection, batch_size=options['batch_size'])
+                for key, value in stats.items():
+                    totals[key] += value
+
+                if stats['claimed'] and options['verbosity'] >= 2:
+                    self.stdout.write(
+                        f"Sent {stats['sent']}, retrying {stats['retried']}, failed {stats['failed']}"
+                    )
+                if stats['claimed'] < options['batch_size']:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Delivered {totals['sent']} message(s); {totals['retried']} scheduled for retry, "
+            f"{totals['failed']} failed permanently"
+        ))
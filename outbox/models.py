@@ -0,0 +1,48 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxMessage(models.Model):
+    """
+    An email waiting to be delivered by the deliver_outbox worker
+
+    Notifications are rendered and stored here in the same transaction
+    as the event that triggers them (a repayment, a withdrawal, a loan
+    decision), so requests never wait on SMTP and a rolled back event
+    never sends mail. The worker claims due rows, sends them and either
+    marks them Sent or schedules a retry (see outbox.delivery).
+    """
+
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Sent', 'Sent'),
+        ('Failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, help_text="Optional text/html alternative")
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list, help_text="Recipient addresses")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text="Not sent before this time")
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Outbox Message'
+        verbose_name_plural = 'Outbox Messages'
+        indexes = [
+            # Worker claim query: pending rows that are due, oldest first
+            models.Index(
+                fields=['next_attempt_at', 'id'],
+                name='outbox_due_idx',
+                condition=models.Q(status='Pending'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
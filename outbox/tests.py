@@ -0,0 +1,91 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from loan_app.testing import QueryPlanAssertionsMixin
+from .delivery import MAX_ATTEMPTS, RETRY_BASE, deliver_batch, queue_email, retry_delay
+from .models import OutboxMessage
+
+
+class BouncingBackend(EmailBackend):
+    """locmem backend that refuses mail for bounce@ addresses, like a rejecting SMTP server"""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any(address.startswith('bounce@') for address in message.to):
+                raise ConnectionError('recipient refused')
+        return super().send_messages(messages)
+
+
+def make_message(to='student@example.com', subject='Payment Confirmed'):
+    message = EmailMultiAlternatives(
+        subject=subject, body='Thank you', from_email='noreply@example.com', to=[to]
+    )
+    message.attach_alternative('<p>Thank you</p>', 'text/html')
+    return message
+
+
+class OutboxDeliveryTests(QueryPlanAssertionsMixin, TestCase):
+    """Queued emails are sent by the worker, not the request, and retried on failure"""
+
+    def test_queued_with_the_transaction(self):
+        try:
+            with transaction.atomic():
+                queue_email(make_message())
+                raise RuntimeError('event rolled back')
+        except RuntimeError:
+            pass
+        self.assertFalse(OutboxMessage.objects.exists())
+
+        queue_email(make_message())
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_worker_delivers_pending_messages(self):
+        for i in range(3):
+            queue_email(make_message(subject=f'Message {i}'))
+
+        out = StringIO()
+        call_command('deliver_outbox', '--once', '--batch-size=2', stdout=out)
+
+        self.assertIn('Delivered 3 message(s)', out.getvalue())
+        self.assertEqual([message.subject for message in mail.outbox], ['Message 0', 'Message 1', 'Message 2'])
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertFalse(OutboxMessage.objects.exclude(status='Sent').exists())
+
+    def test_failures_back_off_then_give_up(self):
+        row = queue_email(make_message(to='bounce@example.com'))
+        queue_email(make_message())
+        connection = BouncingBackend()
+
+        now = timezone.now()
+        stats = deliver_batch(connection, now=now)
+        self.assertEqual(stats, {'claimed': 2, 'sent': 1, 'retried': 1, 'failed': 0})
+        row.refresh_from_db()
+        self.assertEqual(row.status, 'Pending')
+        self.assertEqual(row.next_attempt_at, now + RETRY_BASE)
+        self.assertIn('recipient refused', row.last_error)
+
+        # Not due again until the backoff has passed
+        self.assertEqual(deliver_batch(connection, now=now)['claimed'], 0)
+
+        for attempt in range(2, MAX_ATTEMPTS + 1):
+            now += retry_delay(attempt - 1)
+            deliver_batch(connection, now=now)
+        row.refresh_from_db()
+        self.assertEqual(row.status, 'Failed')
+        self.assertEqual(row.attempts, MAX_ATTEMPTS)
+        self.assertEqual(retry_delay(20), timedelta(hours=6))
+
+    def test_claim_uses_due_index(self):
+        queryset = (
+            OutboxMessage.objects.filter(status='Pending', next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at', 'id')[:100]
+        )
+        self.assertIndexedQuery(queryset, 'outbox_due_idx')
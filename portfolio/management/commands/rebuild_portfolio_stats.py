@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute (or verify) the incrementally maintained portfolio statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only report buckets that have drifted; do not write')
+
+    def handle(self, *args, **options):
+        result = rebuild_stats(commit=not options['verify'])
+
+        for (scope, dimension, key), have, want in result['drifted']:
+            self.stdout.write(
+                f"{scope} {dimension}={key}: stored {have[0]} / {have[1]}, expected {want[0]} / {want[1]}"
+            )
+
+        drift_count = len(result['drifted'])
+        if options['verify']:
+            if drift_count:
+                raise CommandError(
+                    f'{drift_count} of {result["checked"]} statistics bucket(s) have drifted'
+                )
+            self.stdout.write(
+                self.style.SUCCESS(f'All {result["checked"]} statistics buckets are consistent')
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Checked {result["checked"]} buckets, corrected {drift_count}'
+                )
+            )
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-17 01:09
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(help_text="'global' or 'user:<id>'", max_length=32)),
+                ('dimension', models.CharField(choices=[('loan_status', 'Loans by status'), ('repayment_status', 'Repayments by status'), ('repayment_method', 'Repayments by payment method'), ('withdrawal_status', 'Withdrawals by status')], max_length=30)),
+                ('key', models.CharField(max_length=50)),
+                ('count', models.BigIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Portfolio Statistic',
+                'verbose_name_plural': 'Portfolio Statistics',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='portfoliostats',
+            constraint=models.UniqueConstraint(fields=('scope', 'dimension', 'key'), name='portfolio_stats_bucket_uniq'),
+        ),
+    ]
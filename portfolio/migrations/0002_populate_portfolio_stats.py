@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def populate_stats(apps, schema_editor):
+    from portfolio.stats import rebuild_stats
+    rebuild_stats(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0001_initial'),
+        ('loans', '0005_hot_path_indexes'),
+        ('repayments', '0004_hot_path_indexes'),
+        ('users', '0003_studentuser_user_type_financieruser'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
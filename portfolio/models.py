@@ -0,0 +1,39 @@
+from decimal import Decimal
+from django.db import models
+
+
+class PortfolioStats(models.Model):
+    """
+    Running count and amount total for one statistics bucket
+
+    A bucket is a (scope, dimension, key) triple, e.g. ('global',
+    'loan_status', 'Approved') or ('user:42', 'repayment_method', 'UPI').
+    Rows are adjusted incrementally whenever a loan, repayment or
+    withdrawal is created, changes bucket or is deleted (see
+    portfolio.stats), so the statistics pages read a handful of rows
+    instead of aggregating whole tables.
+    """
+
+    DIMENSION_CHOICES = [
+        ('loan_status', 'Loans by status'),
+        ('repayment_status', 'Repayments by status'),
+        ('repayment_method', 'Repayments by payment method'),
+        ('withdrawal_status', 'Withdrawals by status'),
+    ]
+
+    scope = models.CharField(max_length=32, help_text="'global' or 'user:<id>'")
+    dimension = models.CharField(max_length=30, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=50)
+    count = models.BigIntegerField(default=0)
+    amount = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Portfolio Statistic'
+        verbose_name_plural = 'Portfolio Statistics'
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'dimension', 'key'], name='portfolio_stats_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.dimension}={self.key}: {self.count} / {self.amount}"
@@ -0,0 +1,60 @@
+"""
+Turn loan, repayment and withdrawal writes into PortfolioStats deltas
+"""
+
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from loans.models import LoanApplication
+from repayments.models import Repayment, Withdrawal
+from users.models import StudentUser
+from .models import PortfolioStats
+from .stats import tracker_for_model, record_change, user_scope
+
+TRACKED_MODELS = (LoanApplication, Repayment, Withdrawal)
+
+
+def _skip(tracker, raw, update_fields):
+    # Fixture loads are reconciled by rebuild_stats(); saves limited to
+    # untracked fields (e.g. the loan balance ledger) cannot move a row
+    return raw or (update_fields is not None and not tracker.trigger_fields & set(update_fields))
+
+
+def remember_stored_values(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Status transitions need the values the row had before this save"""
+    tracker = tracker_for_model(sender)
+    if _skip(tracker, raw, update_fields) or instance.pk is None:
+        return
+    instance._portfolio_stats_old = tracker.stored(
+        sender._base_manager.using(kwargs.get('using')).filter(pk=instance.pk)
+    ).get(instance.pk)
+
+
+def count_saved_object(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    tracker = tracker_for_model(sender)
+    old = instance.__dict__.pop('_portfolio_stats_old', None)
+    if _skip(tracker, raw, update_fields):
+        return
+    record_change(tracker, None if created else old, tracker.current(instance))
+
+
+def remember_deleted_values(sender, instance, **kwargs):
+    instance._portfolio_stats_old = tracker_for_model(sender).current(instance)
+
+
+def uncount_deleted_object(sender, instance, **kwargs):
+    old = instance.__dict__.pop('_portfolio_stats_old', None)
+    if old is not None:
+        record_change(tracker_for_model(sender), old, None)
+
+
+for model in TRACKED_MODELS:
+    pre_save.connect(remember_stored_values, sender=model)
+    post_save.connect(count_saved_object, sender=model)
+    pre_delete.connect(remember_deleted_values, sender=model)
+    post_delete.connect(uncount_deleted_object, sender=model)
+
+
+@receiver(post_delete, sender=StudentUser)
+def drop_user_stats(sender, instance, **kwargs):
+    PortfolioStats.objects.filter(scope=user_scope(instance.pk)).delete()
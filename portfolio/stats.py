@@ -0,0 +1,301 @@
+"""
+Incrementally maintained portfolio statistics
+
+Each StatsTracker maps one model onto PortfolioStats buckets: every row
+counts once (and adds its amount) in each of its dimensions, both
+globally and for the user who owns it. Signals (portfolio.signals) turn
+saves and deletes into +1/-1 deltas against the affected buckets;
+update_tracked() does the same for queryset.update() bulk transitions.
+rebuild_stats() recomputes every bucket from the source tables for
+periodic reconciliation (rebuild_portfolio_stats management command).
+
+Overdue counts depend on today's date rather than on writes, so they are
+not kept here; LoanApplication.objects.overdue() serves them from the
+(status, repayment_due_date) index.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+GLOBAL_SCOPE = 'global'
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+class StatsTracker:
+    """Base class: which buckets a model's rows count towards"""
+    model = None
+    # Lookup path from the model to the owning user's id
+    owner = None
+    amount_field = None
+    # dimension -> field holding the bucket key
+    dimensions = {}
+
+    def get_model(self, apps=django_apps):
+        return apps.get_model(self.model)
+
+    @property
+    def fields(self):
+        return tuple(self.dimensions.values()) + (self.amount_field,)
+
+    @property
+    def trigger_fields(self):
+        """Saves limited to other fields (update_fields) cannot change any bucket"""
+        owner_field = self.owner.split('__')[0]
+        names = set(self.fields) | {owner_field}
+        return names | {name[:-3] for name in names if name.endswith('_id')} | {f'{owner_field}_id'}
+
+    def current(self, obj):
+        """Tracked values of an in-memory instance"""
+        values = {field: getattr(obj, field) for field in self.fields}
+        owner = obj
+        for part in self.owner.split('__'):
+            owner = getattr(owner, part)
+        values['owner'] = owner
+        return values
+
+    def stored(self, queryset):
+        """Tracked values of rows as stored in the database, keyed by primary key"""
+        return {
+            row.pop('pk'): row
+            for row in queryset.values('pk', *self.fields, owner=F(self.owner))
+        }
+
+    def contributions(self, values):
+        """(bucket, amount) pairs a row with these values counts towards"""
+        amount = Decimal(values[self.amount_field] or 0)
+        scopes = (GLOBAL_SCOPE, user_scope(values['owner']))
+        for dimension, field in self.dimensions.items():
+            for scope in scopes:
+                yield (scope, dimension, values[field]), amount
+
+
+class LoanStatsTracker(StatsTracker):
+    model = 'loans.LoanApplication'
+    owner = 'student_id'
+    amount_field = 'amount'
+    dimensions = {'loan_status': 'status'}
+
+
+class RepaymentStatsTracker(StatsTracker):
+    model = 'repayments.Repayment'
+    owner = 'loan__student_id'
+    amount_field = 'amount_paid'
+    dimensions = {'repayment_status': 'status', 'repayment_method': 'payment_method'}
+
+
+class WithdrawalStatsTracker(StatsTracker):
+    model = 'repayments.Withdrawal'
+    owner = 'financier__user_id'
+    amount_field = 'amount'
+    dimensions = {'withdrawal_status': 'status'}
+
+
+TRACKERS = (LoanStatsTracker(), RepaymentStatsTracker(), WithdrawalStatsTracker())
+
+
+def tracker_for_model(model):
+    label = model._meta.label
+    for tracker in TRACKERS:
+        if tracker.model == label:
+            return tracker
+    return None
+
+
+# Incremental maintenance
+
+def collect_deltas(tracker, changes, deltas=None):
+    """
+    Accumulate bucket deltas for (old_values, new_values) pairs
+
+    None on either side means the row did not exist (creation) or no
+    longer exists (deletion). Unchanged rows cancel out.
+    """
+    deltas = deltas if deltas is not None else defaultdict(lambda: [0, Decimal('0.00')])
+    for old, new in changes:
+        if old == new:
+            continue
+        for values, sign in ((old, -1), (new, 1)):
+            if values is None:
+                continue
+            for bucket, amount in tracker.contributions(values):
+                deltas[bucket][0] += sign
+                deltas[bucket][1] += sign * amount
+    return deltas
+
+
+def apply_deltas(deltas, apps=django_apps):
+    """Add the accumulated deltas to their PortfolioStats rows"""
+    PortfolioStats = apps.get_model('portfolio', 'PortfolioStats')
+    with transaction.atomic():
+        for (scope, dimension, key), (count, amount) in deltas.items():
+            if not count and not amount:
+                continue
+            bucket = PortfolioStats.objects.filter(scope=scope, dimension=dimension, key=key)
+            changes = {'count': F('count') + count, 'amount': F('amount') + amount}
+            if not bucket.update(**changes):
+                PortfolioStats.objects.get_or_create(scope=scope, dimension=dimension, key=key)
+                bucket.update(**changes)
+
+
+def record_change(tracker, old, new):
+    apply_deltas(collect_deltas(tracker, [(old, new)]))
+
+
+def update_tracked(queryset, **values):
+    """
+    queryset.update() that keeps PortfolioStats in step
+
+    Admin bulk actions move many rows between statuses at once and bypass
+    save() signals; this reads the affected rows' tracked values under a
+    row lock, performs the update and applies the resulting deltas.
+    """
+    tracker = tracker_for_model(queryset.model)
+    # update() skips auto_now; conditional GET validators rely on updated_at
+    if 'updated_at' not in values and any(f.name == 'updated_at' for f in queryset.model._meta.concrete_fields):
+        values['updated_at'] = timezone.now()
+    with transaction.atomic():
+        stored = tracker.stored(queryset.select_for_update(of=('self',)))
+        updated = queryset.model._base_manager.filter(pk__in=list(stored)).update(**values)
+        changes = [
+            (old, {**old, **{field: value for field, value in values.items() if field in old}})
+            for old in stored.values()
+        ]
+        apply_deltas(collect_deltas(tracker, changes))
+    return updated
+
+
+# Reconciliation
+
+def expected_buckets(apps=django_apps):
+    """Every bucket's (count, amount) recomputed from the source tables"""
+    buckets = defaultdict(lambda: [0, Decimal('0.00')])
+    for tracker in TRACKERS:
+        model = tracker.get_model(apps)
+        for dimension, field in tracker.dimensions.items():
+            rows = (
+                model._base_manager.values(owner=F(tracker.owner), key=F(field))
+                .annotate(count=Count('pk'), amount=Sum(tracker.amount_field))
+                .order_by()
+            )
+            for row in rows:
+                amount = Decimal(row['amount'] or 0)
+                for scope in (GLOBAL_SCOPE, user_scope(row['owner'])):
+                    buckets[(scope, dimension, row['key'])][0] += row['count']
+                    buckets[(scope, dimension, row['key'])][1] += amount
+    return buckets
+
+
+def rebuild_stats(commit=True, apps=django_apps):
+    """
+    Recompute all statistics buckets and report (or fix) drift
+
+    Args:
+        commit: Write corrected buckets when True, only report when False
+        apps: App registry; migrations pass their historical registry
+
+    Returns:
+        dict with 'checked' (number of buckets compared) and 'drifted'
+        (list of (bucket, stored, expected) tuples)
+    """
+    PortfolioStats = apps.get_model('portfolio', 'PortfolioStats')
+    with transaction.atomic():
+        expected = expected_buckets(apps)
+        stored = {
+            (row.scope, row.dimension, row.key): row
+            for row in PortfolioStats.objects.select_for_update()
+        }
+
+        drifted = []
+        for bucket in set(expected) | set(stored):
+            want = tuple(expected.get(bucket, (0, Decimal('0.00'))))
+            row = stored.get(bucket)
+            have = (row.count, row.amount) if row else (0, Decimal('0.00'))
+            if have != want:
+                drifted.append((bucket, have, want))
+
+        if commit:
+            for (scope, dimension, key), have, (count, amount) in drifted:
+                if count or amount:
+                    PortfolioStats.objects.update_or_create(
+                        scope=scope, dimension=dimension, key=key,
+                        defaults={'count': count, 'amount': amount},
+                    )
+                else:
+                    PortfolioStats.objects.filter(scope=scope, dimension=dimension, key=key).delete()
+
+    drifted.sort(key=lambda item: item[0])
+    return {'checked': len(set(expected) | set(stored)), 'drifted': drifted}
+
+
+# Reading
+
+class PortfolioSnapshot:
+    """Statistics for the whole portfolio or one user, read in a single query"""
+
+    def __init__(self, user=None):
+        from .models import PortfolioStats
+
+        scope = GLOBAL_SCOPE if user is None else user_scope(user.pk)
+        self.buckets = defaultdict(dict)
+        rows = PortfolioStats.objects.filter(scope=scope).values_list('dimension', 'key', 'count', 'amount')
+        for dimension, key, count, amount in rows:
+            self.buckets[dimension][key] = (count, amount)
+
+    def count(self, dimension, key=None):
+        if key is not None:
+            return self.buckets[dimension].get(key, (0, 0))[0]
+        return sum(count for count, _ in self.buckets[dimension].values())
+
+    def amount(self, dimension, key=None):
+        if key is not None:
+            return self.buckets[dimension].get(key, (0, Decimal('0.00')))[1]
+        return sum((amount for _, amount in self.buckets[dimension].values()), Decimal('0.00'))
+
+    def breakdown(self, dimension):
+        """Non-empty buckets of a dimension, largest count first"""
+        return sorted(
+            (
+                {'key': key, 'count': count, 'total_amount': amount}
+                for key, (count, amount) in self.buckets[dimension].items()
+                if count
+            ),
+            key=lambda item: -item['count'],
+        )
+
+    def loan_summary(self):
+        """Same keys as LoanApplicationQuerySet.summary(), minus overdue_loans"""
+        return {
+            'total_loans': self.count('loan_status'),
+            'pending_loans': self.count('loan_status', 'Pending'),
+            'approved_loans': self.count('loan_status', 'Approved'),
+            'rejected_loans': self.count('loan_status', 'Rejected'),
+            'total_amount_approved': self.amount('loan_status', 'Approved'),
+            'total_amount_pending': self.amount('loan_status', 'Pending'),
+        }
+
+    def repayment_summary(self):
+        return {
+            'total_repayments': self.count('repayment_status'),
+            'paid_repayments': self.count('repayment_status', 'Paid'),
+            'pending_repayments': self.count('repayment_status', 'Pending'),
+            'failed_repayments': self.count('repayment_status', 'Failed'),
+            'total_amount_paid': self.amount('repayment_status', 'Paid'),
+        }
+
+    def withdrawal_summary(self):
+        return {
+            'total_withdrawals': self.count('withdrawal_status'),
+            'pending_withdrawals': self.count('withdrawal_status', 'Pending'),
+            'processing_withdrawals': self.count('withdrawal_status', 'Processing'),
+            'completed_withdrawals': self.count('withdrawal_status', 'Completed'),
+            'failed_withdrawals': self.count('withdrawal_status', 'Failed'),
+            'total_amount_requested': self.amount('withdrawal_status'),
+        }
@@ -0,0 +1,138 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from loans.models import LoanApplication
+from repayments.models import Repayment, Withdrawal
+from users.models import StudentUser, FinancierUser
+from .models import PortfolioStats
+from .stats import PortfolioSnapshot, rebuild_stats, update_tracked
+
+
+class PortfolioStatsTests(TestCase):
+    """Incremental statistics must always match a full recomputation"""
+
+    def setUp(self):
+        self.student = self.create_user('STU001')
+        self.other = self.create_user('STU002')
+
+    def create_user(self, student_id, **extra):
+        return StudentUser.objects.create_user(
+            email=f'{student_id.lower()}@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name=student_id,
+            student_id=student_id,
+            university='Test University',
+            gpa=Decimal('5.00'),
+            **extra,
+        )
+
+    def create_loan(self, student, amount=1000, status='Pending'):
+        return LoanApplication.objects.create(
+            student=student,
+            amount=amount,
+            reason='Tuition',
+            status=status,
+            repayment_due_date=timezone.now().date() + timedelta(days=30),
+        )
+
+    def assertConsistent(self):
+        self.assertEqual(rebuild_stats(commit=False)['drifted'], [])
+
+    def test_loan_lifecycle(self):
+        loan = self.create_loan(self.student, 2000)
+        self.create_loan(self.other, 3000, status='Approved')
+
+        snapshot = PortfolioSnapshot()
+        self.assertEqual(snapshot.count('loan_status'), 2)
+        self.assertEqual(snapshot.amount('loan_status', 'Pending'), Decimal('2000'))
+        self.assertEqual(PortfolioSnapshot(self.student).count('loan_status', 'Pending'), 1)
+
+        loan.status = 'Approved'
+        loan.save()
+        summary = PortfolioSnapshot().loan_summary()
+        self.assertEqual(summary['approved_loans'], 2)
+        self.assertEqual(summary['pending_loans'], 0)
+        self.assertEqual(summary['total_amount_approved'], Decimal('5000'))
+        self.assertConsistent()
+
+        loan.delete()
+        self.assertEqual(PortfolioSnapshot().count('loan_status'), 1)
+        self.assertEqual(PortfolioSnapshot(self.student).count('loan_status'), 0)
+        self.assertConsistent()
+
+    def test_repayment_transitions(self):
+        loan = self.create_loan(self.student, status='Approved')
+        repayment = Repayment.objects.create(
+            loan=loan, amount_paid=Decimal('150.00'), status='Processing', payment_method='UPI'
+        )
+        repayment.status = 'Paid'
+        repayment.payment_method = 'Cash'
+        repayment.save()
+        # Ledger refreshes save the loan with update_fields; nothing to count
+        loan.refresh_balance()
+
+        summary = PortfolioSnapshot(self.student).repayment_summary()
+        self.assertEqual(summary['paid_repayments'], 1)
+        self.assertEqual(summary['total_amount_paid'], Decimal('150.00'))
+        self.assertEqual(
+            PortfolioSnapshot().breakdown('repayment_method'),
+            [{'key': 'Cash', 'count': 1, 'total_amount': Decimal('150.00')}],
+        )
+        self.assertConsistent()
+
+        # Deleting the student cascades through loans and repayments
+        self.student.delete()
+        self.assertEqual(PortfolioSnapshot().count('repayment_status'), 0)
+        self.assertFalse(PortfolioStats.objects.filter(scope=f'user:{self.student.pk}').exists())
+        self.assertConsistent()
+
+    def test_bulk_transitions_and_rebuild(self):
+        financier_user = self.create_user('FIN001', user_type='financier')
+        financier = FinancierUser.objects.create(user=financier_user, financier_id='F001')
+        for _ in range(3):
+            Withdrawal.objects.create(
+                financier=financier, amount=Decimal('250.00'), withdrawal_method='UPI', upi_id='fin@upi'
+            )
+
+        updated = update_tracked(Withdrawal.objects.filter(status='Pending'), status='Processing')
+        self.assertEqual(updated, 3)
+        summary = PortfolioSnapshot(financier_user).withdrawal_summary()
+        self.assertEqual(summary['processing_withdrawals'], 3)
+        self.assertEqual(summary['total_amount_requested'], Decimal('750.00'))
+        self.assertConsistent()
+
+        # Writes that bypass the hooks are repaired by a rebuild
+        Withdrawal.objects.update(status='Completed')
+        self.assertEqual(len(rebuild_stats(commit=False)['drifted']), 4)
+        rebuild_stats()
+        self.assertEqual(PortfolioSnapshot().count('withdrawal_status', 'Completed'), 3)
+        self.assertConsistent()
+
+    def test_admin_action_keeps_stats(self):
+        admin = StudentUser.objects.create_superuser(
+            email='admin@example.com', password='testpass123', first_name='Admin',
+            last_name='User', student_id='ADM001', university='N/A', gpa=Decimal('0.00'),
+        )
+        loan = self.create_loan(self.student)
+        self.client.force_login(admin)
+        self.client.post(
+            reverse('admin:loans_loanapplication_changelist'),
+            {'action': 'approve_loans', '_selected_action': [loan.pk]},
+        )
+
+        self.assertEqual(PortfolioSnapshot().count('loan_status', 'Approved'), 1)
+        self.assertConsistent()
+
+    def test_statistics_pages_read_the_snapshot(self):
+        self.create_loan(self.student)
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('loans:statistics'))
+        self.assertEqual(response.context['pending_loans'], 1)
+        self.assertEqual(response.context['overdue_loans'], 0)
+        response = self.client.get(reverse('repayments:statistics'))
+        self.assertEqual(response.context['total_repayments'], 0)
@@ -1,11 +1,24 @@
+import io
+import tempfile
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse
+from django.shortcuts import redirect, render
+from django.utils import timezone
 from django.utils.html import format_html
-from django.urls import reverse
-from .models import Repayment, Withdrawal
+from django.urls import path, reverse
+from search.admin import RankedSearchAdminMixin
+from .forms import SettlementUploadForm, StatementImportForm
+from .imports import StatementFileError, import_statement, statement_format
+from .models import GatewayEvent, Repayment, Withdrawal
+from .settlements import SettlementFileError, reconcile_settlements
+from loans.balances import rebuild_balances_for
+from portfolio.stats import update_tracked
 
 
 @admin.register(Repayment)
-class RepaymentAdmin(admin.ModelAdmin):
+class RepaymentAdmin(RankedSearchAdminMixin, admin.ModelAdmin):
     """Admin configuration for Repayment model"""
     
     list_display = [
@@ -24,7 +37,7 @@ class RepaymentAdmin(admin.ModelAdmin):
     
     readonly_fields = [
         'created_at', 'updated_at', 'is_successful', 'formatted_amount',
-        'payment_date_formatted'
+        'payment_date_formatted', 'reconciled_at'
     ]
     
     fieldsets = (
@@ -43,7 +56,7 @@ class RepaymentAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Processing', {
-            'fields': ('processed_by', 'processed_at'),
+            'fields': ('processed_by', 'processed_at', 'reconciled_at'),
             'classes': ('collapse',)
         }),
         ('Timestamps', {
@@ -92,7 +105,11 @@ class RepaymentAdmin(admin.ModelAdmin):
     
     def mark_as_paid(self, request, queryset):
         """Action to mark selected repayments as paid"""
-        updated = queryset.filter(status='Pending').update(status='Paid')
+        pending = queryset.filter(status='Pending')
+        loan_ids = list(pending.values_list('loan_id', flat=True).distinct())
+        updated = update_tracked(pending, status='Paid')
+        # update() bypasses Repayment.save(), so rebuild the affected loan balances
+        rebuild_balances_for(loan_ids)
         self.message_user(
             request, 
             f"Successfully marked {updated} repayment(s) as paid."
@@ -101,20 +118,112 @@ class RepaymentAdmin(admin.ModelAdmin):
     
     def mark_as_failed(self, request, queryset):
         """Action to mark selected repayments as failed"""
-        updated = queryset.filter(status='Pending').update(status='Failed')
+        updated = update_tracked(queryset.filter(status='Pending'), status='Failed')
         self.message_user(
             request, 
             f"Successfully marked {updated} repayment(s) as failed."
         )
     mark_as_failed.short_description = "Mark selected repayments as failed"
     
+    def get_urls(self):
+        urls = [
+            path(
+                'reconcile-settlements/',
+                self.admin_site.admin_view(self.reconcile_settlements_view),
+                name='repayments_repayment_reconcile_settlements',
+            ),
+            path(
+                'import-statement/',
+                self.admin_site.admin_view(self.import_statement_view),
+                name='repayments_repayment_import_statement',
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def reconcile_settlements_view(self, request):
+        """Upload a settlement CSV; responds with the reconciliation report as a CSV download"""
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        form = SettlementUploadForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['settlement_file']
+            # Large uploads are spooled to disk by Django; both files are read and written as streams
+            report = tempfile.TemporaryFile()
+            report_text = io.TextIOWrapper(report, encoding='utf-8', newline='', write_through=True)
+            try:
+                stats = reconcile_settlements(
+                    io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''),
+                    report=report_text,
+                    since=form.cleaned_data['since'],
+                    until=form.cleaned_data['until'],
+                    dry_run=form.cleaned_data['dry_run'],
+                )
+            except (SettlementFileError, UnicodeDecodeError) as e:
+                report_text.close()
+                form.add_error('settlement_file', str(e))
+            else:
+                report_text.detach()
+                report.seek(0)
+                self.message_user(
+                    request,
+                    f"{'Dry run: ' if form.cleaned_data['dry_run'] else ''}"
+                    f"{stats['rows']} rows, {stats['matched']} matched ({stats['fixed']} fixed), "
+                    f"{stats['amount_mismatch']} amount mismatches, {stats['status_mismatch']} status mismatches, "
+                    f"{stats['missing_locally']} missing locally, {stats['missing_at_gateway']} missing at gateway."
+                )
+                return FileResponse(report, as_attachment=True, filename='settlement_reconciliation.csv')
+        
+        return render(request, 'admin/repayments/repayment/reconcile_settlements.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Reconcile settlement file',
+            'form': form,
+        })
+    
+    def import_statement_view(self, request):
+        """Upload a bank statement; a dry run previews it, otherwise its repayments are imported"""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = StatementImportForm(request.POST or None, request.FILES or None)
+        result = None
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['statement_file']
+            try:
+                result = import_statement(
+                    upload.file,
+                    fmt=statement_format(upload.name),
+                    dry_run=form.cleaned_data['dry_run'],
+                    skip_invalid=form.cleaned_data['skip_invalid'],
+                    default_method=form.cleaned_data['payment_method'],
+                    processed_by=request.user,
+                )
+            except StatementFileError as e:
+                form.add_error('statement_file', str(e))
+            else:
+                if result['imported']:
+                    self.message_user(
+                        request,
+                        f"Imported {result['imported']} repayment(s) totalling ₹{result['total_amount']} "
+                        f"across {result['loans']} loan(s); {len(result['errors'])} row(s) skipped."
+                    )
+                    return redirect('admin:repayments_repayment_changelist')
+        
+        return render(request, 'admin/repayments/repayment/import_statement.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import bank statement',
+            'form': form,
+            'result': result,
+            'errors': result['errors'][:200] if result else [],
+        })
+    
     def get_queryset(self, request):
         """Custom queryset with related loan and student data"""
         return super().get_queryset(request).select_related('loan__student')
 
 
 @admin.register(Withdrawal)
-class WithdrawalAdmin(admin.ModelAdmin):
+class WithdrawalAdmin(RankedSearchAdminMixin, admin.ModelAdmin):
     """Admin configuration for Withdrawal model"""
     
     list_display = [
@@ -189,7 +298,7 @@ class WithdrawalAdmin(admin.ModelAdmin):
     
     def approve_withdrawals(self, request, queryset):
         """Action to approve selected withdrawals"""
-        updated = queryset.filter(status='Pending').update(status='Processing')
+        updated = update_tracked(queryset.filter(status='Pending'), status='Processing')
         self.message_user(
             request, 
             f"Successfully approved {updated} withdrawal(s) for processing."
@@ -198,7 +307,7 @@ class WithdrawalAdmin(admin.ModelAdmin):
     
     def complete_withdrawals(self, request, queryset):
         """Action to mark selected withdrawals as completed"""
-        updated = queryset.filter(status='Processing').update(status='Completed')
+        updated = update_tracked(queryset.filter(status='Processing'), status='Completed')
         self.message_user(
             request, 
             f"Successfully marked {updated} withdrawal(s) as completed."
@@ -207,7 +316,7 @@ class WithdrawalAdmin(admin.ModelAdmin):
     
     def reject_withdrawals(self, request, queryset):
         """Action to reject selected withdrawals"""
-        updated = queryset.filter(status='Pending').update(status='Failed')
+        updated = update_tracked(queryset.filter(status='Pending'), status='Failed')
         self.message_user(
             request, 
             f"Successfully rejected {updated} withdrawal(s)."
@@ -217,3 +326,26 @@ class WithdrawalAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         """Custom queryset with related financier data"""
         return super().get_queryset(request).select_related('financier__user', 'processed_by')
+
+
+@admin.register(GatewayEvent)
+class GatewayEventAdmin(admin.ModelAdmin):
+    """Admin interface for received payment gateway webhook events"""
+    
+    list_display = ['event_id', 'gateway', 'event_type', 'order_id', 'status', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['gateway', 'status', 'received_at']
+    search_fields = ['event_id', 'order_id']
+    readonly_fields = [
+        'gateway', 'event_id', 'event_type', 'order_id', 'payload', 'repayment',
+        'attempts', 'last_error', 'received_at', 'processed_at'
+    ]
+    ordering = ['-received_at']
+    actions = ['retry_now']
+    
+    def retry_now(self, request, queryset):
+        """Action to put failed or waiting events back at the front of the queue"""
+        updated = queryset.exclude(status__in=['Processed', 'Ignored']).update(
+            status='Pending', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"Queued {updated} event(s) for immediate processing.")
+    retry_now.short_description = "Retry selected events now"
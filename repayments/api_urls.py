@@ -8,4 +8,5 @@ urlpatterns = [
     path('mark-paid/<int:repayment_id>/', views.mark_repayment_paid, name='mark_paid_api'),
     path('mark-failed/<int:repayment_id>/', views.mark_repayment_failed, name='mark_failed_api'),
     path('summary/', views.repayment_summary, name='summary_api'),
+    path('gateways/health/', views.gateway_health, name='gateway_health_api'),
 ]
@@ -0,0 +1,120 @@
+"""
+REST API viewsets for repayments, withdrawals and investments (api/v1/)
+
+Students see the repayments on their own loans and record manual
+repayments; financiers see their own withdrawals and investments and
+request withdrawals; staff see everything and settle repayments. Lists
+are cursor-paginated on the same indexed keys as the HTML history pages.
+"""
+
+from django.db import transaction
+from rest_framework import mixins, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from loan_app.api import SparseFieldsetsViewMixin
+from users.models import FinancierUser
+from .models import Investment, Repayment, Withdrawal
+from .notifications import send_payment_confirmation_notification, send_withdrawal_request_notification
+from .serializers import InvestmentSerializer, RepaymentSerializer, WithdrawalSerializer
+
+
+class StatusFilterMixin:
+    """?status= filter for list actions"""
+
+    def filter_status(self, queryset):
+        status_filter = self.request.query_params.get('status')
+        if self.action == 'list' and status_filter:
+            queryset = queryset.filter(status=status_filter)
+        return queryset
+
+
+class RepaymentViewSet(StatusFilterMixin, SparseFieldsetsViewMixin, mixins.CreateModelMixin,
+                       viewsets.ReadOnlyModelViewSet):
+    """
+    list:        GET  repayments/                   (?status=, ?fields=, ?cursor=, ?page_size=)
+    retrieve:    GET  repayments/{id}/
+    create:      POST repayments/                   (students; validated like the web form)
+    mark_paid:   POST repayments/{id}/mark-paid/    (staff)
+    mark_failed: POST repayments/{id}/mark-failed/  (staff)
+    """
+    serializer_class = RepaymentSerializer
+    cursor_ordering = ('-payment_date', '-id')
+
+    def get_queryset(self):
+        queryset = Repayment.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(loan__student=self.request.user)
+        return self.filter_status(queryset)
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            repayment = serializer.save()
+            # Queue payment confirmation email with the repayment
+            send_payment_confirmation_notification(repayment)
+
+    def _set_status(self, new_status):
+        repayment = self.get_object()
+        repayment.status = new_status
+        repayment.save()
+        return Response(self.get_serializer(repayment).data)
+
+    @action(detail=True, methods=['post'], url_path='mark-paid', permission_classes=[IsAdminUser])
+    def mark_paid(self, request, pk=None, version=None):
+        return self._set_status('Paid')
+
+    @action(detail=True, methods=['post'], url_path='mark-failed', permission_classes=[IsAdminUser])
+    def mark_failed(self, request, pk=None, version=None):
+        return self._set_status('Failed')
+
+
+class WithdrawalViewSet(StatusFilterMixin, SparseFieldsetsViewMixin, mixins.CreateModelMixin,
+                        viewsets.ReadOnlyModelViewSet):
+    """
+    list:     GET  withdrawals/       (?status=, ?fields=, ?cursor=, ?page_size=)
+    retrieve: GET  withdrawals/{id}/
+    create:   POST withdrawals/       (financiers; validated like the web form)
+    """
+    serializer_class = WithdrawalSerializer
+    cursor_ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        queryset = Withdrawal.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(financier__user=self.request.user)
+        return self.filter_status(queryset)
+
+    def perform_create(self, serializer):
+        try:
+            financier = self.request.user.financier_profile
+        except FinancierUser.DoesNotExist:
+            raise PermissionDenied('You must be a registered financier to request withdrawals.')
+
+        # Same balance check as WithdrawalCreateView
+        available_balance = financier.investment_amount
+        if serializer.validated_data['amount'] > available_balance:
+            raise ValidationError({'amount': [f'Insufficient balance. Available: ₹{available_balance:.2f}']})
+
+        with transaction.atomic():
+            withdrawal = serializer.save(financier=financier)
+            # Queue withdrawal request notification with the withdrawal
+            send_withdrawal_request_notification(withdrawal)
+
+
+class InvestmentViewSet(StatusFilterMixin, SparseFieldsetsViewMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    list:     GET  investments/       (?status=, ?fields=, ?cursor=, ?page_size=)
+    retrieve: GET  investments/{id}/
+    """
+    serializer_class = InvestmentSerializer
+    cursor_ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        queryset = Investment.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(financier__user=self.request.user)
+        if self.wants('expected_return', 'total_return'):
+            queryset = queryset.with_returns()
+        return self.filter_status(queryset)
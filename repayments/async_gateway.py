@@ -0,0 +1,284 @@
+"""
+Async payment gateway client for the ASGI payment views
+
+Mirrors the synchronous layer in payment_gateway: AsyncGatewayTransport
+has the same timeouts, retry policy and gateway_request_finished metrics
+as GatewayTransport but runs on an aiohttp ClientSession, so one process can
+hold hundreds of gateway calls in flight while they wait on the network.
+Circuit breakers and failover order are shared with the synchronous
+payment_gateway manager, so both paths see the same gateway health.
+
+Only Razorpay orders go over HTTP; PayU and Paytm orders are signed
+locally and reuse the synchronous gateway objects.
+"""
+
+import asyncio
+import inspect
+import random
+import time
+import weakref
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .payment_gateway import (
+    RETRY_STATUSES,
+    GatewayUnavailable,
+    PaymentGatewayError,
+    RazorpayGateway,
+    apply_payment_error,
+    apply_payment_order,
+    gateway_request_finished,
+    order_for_repayment,
+    payment_gateway,
+    verify_payment,
+)
+
+
+class AsyncGatewayTransport:
+    """
+    Pooled asyncio HTTP client for one gateway host
+
+    Same policy as GatewayTransport: connect/read timeouts on every call,
+    jittered exponential backoff retries for idempotent calls, and only
+    connect timeouts retried for the rest.
+    """
+
+    def __init__(self, name, base_url, headers=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, backoff=None, max_connections=None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = getattr(settings, 'PAYMENT_GATEWAY_MAX_RETRIES', 2) if max_retries is None else max_retries
+        self.backoff = getattr(settings, 'PAYMENT_GATEWAY_BACKOFF', 0.25) if backoff is None else backoff
+        max_connections = max_connections or getattr(settings, 'PAYMENT_GATEWAY_ASYNC_MAX_CONNECTIONS', 200)
+        # Must be created inside the event loop it will run on
+        self.session = aiohttp.ClientSession(
+            headers=headers or {},
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=connect_timeout or getattr(settings, 'PAYMENT_GATEWAY_CONNECT_TIMEOUT', 3.05),
+                sock_read=read_timeout or getattr(settings, 'PAYMENT_GATEWAY_READ_TIMEOUT', 10),
+            ),
+            connector=aiohttp.TCPConnector(limit=max_connections),
+        )
+
+    async def request(self, method, path, idempotent=False, **kwargs):
+        """
+        Send a request and return the response, body already read (raises for HTTP errors)
+
+        Raises:
+            aiohttp.ClientError or asyncio.TimeoutError once the retries are exhausted
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        attempts = 1 + self.max_retries
+        for attempt in range(1, attempts + 1):
+            started = time.perf_counter()
+            response, error = None, None
+            try:
+                async with self.session.request(method, url, **kwargs) as response:
+                    await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                response, error = None, e
+            gateway_request_finished.send(
+                sender=self.__class__,
+                gateway=self.name,
+                method=method,
+                path=path,
+                status=response.status if response is not None else None,
+                elapsed=time.perf_counter() - started,
+                attempt=attempt,
+                error=error,
+            )
+
+            if error is not None:
+                # Connection never established: the gateway did not see the request
+                retryable = idempotent or isinstance(error, (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError))
+            else:
+                retryable = idempotent and response.status in RETRY_STATUSES
+            if not retryable or attempt == attempts:
+                if error is not None:
+                    raise error
+                response.raise_for_status()
+                return response
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+
+    async def post(self, path, idempotent=False, **kwargs):
+        return await self.request('POST', path, idempotent=idempotent, **kwargs)
+
+    async def aclose(self):
+        await self.session.close()
+
+
+# aiohttp sessions belong to the event loop that opened them, so
+# transports are shared per loop (one per process under uvicorn)
+_transports = weakref.WeakKeyDictionary()
+
+# The server's long-lived loop, between ASGI lifespan startup and shutdown
+# (see loan_app.asgi). Other loops (async_to_sync, management commands,
+# tests) end without closing anything, so the views do not open sessions there.
+_serving_loop = None
+
+
+def serving_loop_started():
+    """Lifespan startup: the running loop serves requests until shutdown"""
+    global _serving_loop
+    _serving_loop = asyncio.get_running_loop()
+
+
+async def aclose_transports():
+    """Lifespan shutdown: close the running loop's transports"""
+    global _serving_loop
+    loop = asyncio.get_running_loop()
+    if _serving_loop is loop:
+        _serving_loop = None
+    for transport in _transports.pop(loop, {}).values():
+        await transport.aclose()
+
+
+def on_serving_loop():
+    return _serving_loop is not None and asyncio.get_running_loop() is _serving_loop
+
+
+def get_async_transport(name, base_url, headers=None):
+    """Event-loop-wide AsyncGatewayTransport for a gateway host and credentials"""
+    per_loop = _transports.setdefault(asyncio.get_running_loop(), {})
+    key = (name, base_url, tuple(sorted((headers or {}).items())))
+    transport = per_loop.get(key)
+    if transport is None:
+        transport = per_loop[key] = AsyncGatewayTransport(name, base_url, headers=headers)
+    return transport
+
+
+class AsyncRazorpayGateway(RazorpayGateway):
+    """Razorpay order and capture calls over the async transport"""
+
+    def __init__(self):
+        super().__init__()
+        self._headers = None
+
+    @property
+    def transport(self):
+        """Loop-wide pooled transport with the Basic auth header built once"""
+        if self._headers is None:
+            self._headers = {
+                'Authorization': f'Basic {self._get_auth_string()}',
+                'Content-Type': 'application/json',
+            }
+        return get_async_transport('razorpay', self.base_url, headers=self._headers)
+
+    async def create_order(self, amount, currency='INR', receipt=None):
+        """Create a Razorpay order"""
+        if not self.key_id or not self.key_secret:
+            raise PaymentGatewayError("Razorpay credentials not configured")
+
+        data = {
+            'amount': int(amount * 100),  # Convert to paise
+            'currency': currency,
+            'receipt': receipt or f"loan_repayment_{int(time.time())}",
+            'notes': {
+                'payment_type': 'loan_repayment'
+            }
+        }
+
+        try:
+            # Not idempotent: a retried POST could create a second order
+            response = await self.transport.post('orders', json=data)
+            return await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise PaymentGatewayError(f"Razorpay order creation failed: {str(e)}")
+
+    async def capture_payment(self, payment_id, amount):
+        """Capture authorized payment"""
+        data = {
+            'amount': int(amount * 100)  # Convert to paise
+        }
+
+        try:
+            response = await self.transport.post(f'payments/{payment_id}/capture', idempotent=True, json=data)
+            return await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise PaymentGatewayError(f"Razorpay payment capture failed: {str(e)}")
+
+
+async def _razorpay_order(gateway, amount, order):
+    return await gateway.create_order(amount, currency=order.get('currency', 'INR'), receipt=order.get('receipt'))
+
+
+class AsyncPaymentGatewayManager:
+    """
+    Async create_order() with the failover behaviour of PaymentGatewayManager
+
+    Gateways without an async implementation fall back to the synchronous
+    manager's entries (they sign orders locally without network I/O).
+    Outside the serving loop the whole call goes to the synchronous manager
+    in a thread, on its pooled transports.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.razorpay = AsyncRazorpayGateway()
+        self.async_gateways = {'razorpay': (self.razorpay, _razorpay_order)}
+
+    async def _call(self, name, build_order, gateway, amount, order):
+        breaker = self.manager.breakers[name]
+        if not breaker.allow():
+            raise GatewayUnavailable(f"{name} is temporarily unavailable")
+        started = time.perf_counter()
+        try:
+            result = build_order(gateway, amount, order)
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception:
+            breaker.record(False, time.perf_counter() - started)
+            raise
+        except BaseException:
+            # Cancelled (client disconnect, outer timeout): no outcome to
+            # record, but a half-open probe slot must not leak
+            breaker.release()
+            raise
+        breaker.record(True, time.perf_counter() - started)
+        return result
+
+    async def create_order(self, amount, order, preferred=None):
+        """Create a payment on the first healthy gateway; returns (gateway name, payment data)"""
+        if not on_serving_loop():
+            return await sync_to_async(self.manager.create_order)(amount, order, preferred=preferred)
+        if preferred:
+            self.manager._get(preferred)
+        errors = []
+        for name in self.manager.failover_order(preferred):
+            entry = self.manager.gateways[name]
+            gateway, build_order = self.async_gateways.get(name, (entry['gateway'], entry['build_order']))
+            try:
+                return name, await self._call(name, build_order, gateway, amount, order)
+            except PaymentGatewayError as e:
+                errors.append(f"{name}: {e}")
+        raise PaymentGatewayError(f"No payment gateway available ({'; '.join(errors)})")
+
+
+async_payment_gateway = AsyncPaymentGatewayManager(payment_gateway)
+
+
+async def aprocess_payment(repayment, gateway_name='razorpay', **gateway_params):
+    """
+    Async process_payment(): the gateway call is awaited, the save runs in a thread
+
+    repayment must have loan__student loaded (select_related) so building
+    the order does not query the database from the event loop.
+    """
+    try:
+        gateway_name, payment_data = await async_payment_gateway.create_order(
+            float(repayment.amount_paid),
+            order_for_repayment(repayment, **gateway_params),
+            preferred=gateway_name,
+        )
+        result = apply_payment_order(repayment, gateway_name, payment_data)
+    except Exception as e:
+        result = apply_payment_error(repayment, gateway_name, e)
+    await sync_to_async(repayment.save)()
+    return result
+
+
+async def averify_payment(repayment, gateway_name='razorpay', **verification_params):
+    """Async verify_payment(); verification is a local signature check, so it all runs in a thread"""
+    return await sync_to_async(verify_payment)(repayment, gateway_name, **verification_params)
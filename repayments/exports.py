@@ -0,0 +1,66 @@
+"""
+Repayment, withdrawal and investment export definitions
+
+Each *_export() returns the (queryset, ordering) for an export with the
+same filters as the matching admin page; computed columns are annotations.
+"""
+
+from .filters import filter_investments, filter_repayments, filter_withdrawals
+from .models import Investment, Repayment, Withdrawal
+
+REPAYMENT_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('loan_id', 'loan_id'),
+    ('student_email', 'loan__student__email'),
+    ('amount_paid', 'amount_paid'),
+    ('status', 'status'),
+    ('payment_method', 'payment_method'),
+    ('payment_date', 'payment_date'),
+    ('transaction_id', 'transaction_id'),
+    ('gateway_transaction_id', 'gateway_transaction_id'),
+    ('processed_at', 'processed_at'),
+    ('reconciled_at', 'reconciled_at'),
+]
+
+WITHDRAWAL_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('financier_id', 'financier__financier_id'),
+    ('financier_email', 'financier__user__email'),
+    ('amount', 'amount'),
+    ('withdrawal_method', 'withdrawal_method'),
+    ('status', 'status'),
+    ('bank_name', 'bank_name'),
+    ('transaction_id', 'transaction_id'),
+    ('created_at', 'created_at'),
+    ('processed_at', 'processed_at'),
+]
+
+INVESTMENT_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('financier_id', 'financier__financier_id'),
+    ('financier_email', 'financier__user__email'),
+    ('loan_id', 'loan_id'),
+    ('investment_amount', 'investment_amount'),
+    ('expected_return_rate', 'expected_return_rate'),
+    ('expected_return_amount', 'expected_return'),
+    ('total_return_amount', 'total_return'),
+    ('investment_method', 'investment_method'),
+    ('status', 'status'),
+    ('investment_date', 'investment_date'),
+    ('maturity_date', 'maturity_date'),
+]
+
+
+def repayment_export(search='', status='', payment_method=''):
+    """(queryset, ordering) for a repayment export with the admin management filters"""
+    return filter_repayments(Repayment.objects.all(), search, status, payment_method)
+
+
+def withdrawal_export(search='', status='', method=''):
+    """(queryset, ordering) for a withdrawal export with the admin management filters"""
+    return filter_withdrawals(Withdrawal.objects.all(), search, status, method)
+
+
+def investment_export(status='', method=''):
+    """(queryset, ordering) for an investment export, with the return properties annotated"""
+    return filter_investments(Investment.objects.with_returns(), status, method)
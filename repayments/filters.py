@@ -0,0 +1,55 @@
+"""
+Filters shared by the admin management pages and the repayment, withdrawal
+and investment exports
+"""
+
+from search.services import ranked_search, SEARCH_ORDERING
+
+# Newest first, keyset-friendly
+REPAYMENT_ORDERING = ('-payment_date', '-id')
+WITHDRAWAL_ORDERING = ('-created_at', '-id')
+# Primary key order: investments have no (created_at, id) index
+INVESTMENT_ORDERING = ('-id',)
+
+
+def filter_repayments(queryset, search='', status='', payment_method=''):
+    """Apply the admin repayment filters; returns (queryset, ordering)"""
+    ordering = REPAYMENT_ORDERING
+    if search:
+        queryset = ranked_search(queryset, search)
+        ordering = SEARCH_ORDERING
+    
+    if status:
+        queryset = queryset.filter(status=status)
+    
+    if payment_method:
+        queryset = queryset.filter(payment_method=payment_method)
+    
+    return queryset, ordering
+
+
+def filter_withdrawals(queryset, search='', status='', method=''):
+    """Apply the admin withdrawal filters; returns (queryset, ordering)"""
+    ordering = WITHDRAWAL_ORDERING
+    if search:
+        queryset = ranked_search(queryset, search)
+        ordering = SEARCH_ORDERING
+    
+    if status:
+        queryset = queryset.filter(status=status)
+    
+    if method:
+        queryset = queryset.filter(withdrawal_method=method)
+    
+    return queryset, ordering
+
+
+def filter_investments(queryset, status='', method=''):
+    """Apply status and investment method filters; returns (queryset, ordering)"""
+    if status:
+        queryset = queryset.filter(status=status)
+    
+    if method:
+        queryset = queryset.filter(investment_method=method)
+    
+    return queryset, INVESTMENT_ORDERING
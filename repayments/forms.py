@@ -1,5 +1,6 @@
 from django import forms
 from django.core.validators import MinValueValidator, RegexValidator
+from django.db.models import Sum
 from django.utils import timezone
 from .models import Repayment, Withdrawal, Investment
 
@@ -129,10 +130,9 @@ class RepaymentForm(forms.ModelForm):
                 )
             
             # Check if payment amount exceeds remaining loan amount
-            total_paid = sum(
-                repayment.amount_paid 
-                for repayment in self.loan.repayments.filter(status='Paid')
-            )
+            total_paid = self.loan.repayments.filter(status='Paid').aggregate(
+                total=Sum('amount_paid')
+            )['total'] or 0
             remaining_amount = self.loan.total_amount_due - total_paid
             
             if cleaned_data.get('amount_paid', 0) > remaining_amount:
@@ -643,3 +643,50 @@ class InvestmentUpdateForm(forms.ModelForm):
         if rate < 1.00 or rate > 50.00:
             raise forms.ValidationError('Expected return rate must be between 1% and 50%.')
         return rate
+
+
+class SettlementUploadForm(forms.Form):
+    """Admin upload of a gateway settlement CSV for reconciliation"""
+    
+    settlement_file = forms.FileField(help_text="CSV with an order or transaction id column and an amount column")
+    since = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        help_text="Settlement period start (enables the missing-at-gateway check)"
+    )
+    until = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        help_text="Settlement period end"
+    )
+    dry_run = forms.BooleanField(required=False, help_text="Only report; do not fix statuses")
+    
+    def clean(self):
+        """Require both ends of the settlement period or neither"""
+        cleaned_data = super().clean()
+        since, until = cleaned_data.get('since'), cleaned_data.get('until')
+        if bool(since) != bool(until):
+            raise forms.ValidationError('Give both the start and the end of the settlement period.')
+        if since and until and since > until:
+            raise forms.ValidationError('The settlement period must start before it ends.')
+        return cleaned_data
+
+
+class StatementImportForm(forms.Form):
+    """Admin upload of a bank statement (CSV or XLSX) for bulk repayment import"""
+    
+    statement_file = forms.FileField(help_text="CSV or XLSX with loan_id, amount and date columns")
+    payment_method = forms.ChoiceField(
+        choices=Repayment.PAYMENT_METHOD_CHOICES,
+        initial='Bank Transfer',
+        help_text="Used for rows without a payment method"
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        initial=True,
+        help_text="Validate and preview only; import nothing"
+    )
+    skip_invalid = forms.BooleanField(
+        required=False,
+        help_text="Import the valid rows even if other rows have errors"
+    )
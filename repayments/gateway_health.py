@@ -0,0 +1,150 @@
+"""
+Circuit breakers for payment gateways
+
+Each gateway gets a CircuitBreaker fed with the outcome and latency of
+every call made through PaymentGatewayManager. Over a rolling window the
+breaker tracks the failure rate and the share of slow calls; when either
+crosses its threshold the circuit opens and the manager routes new orders
+to the next gateway instead of waiting on a degraded one. After a cool-off
+the circuit goes half-open and lets a few probe calls through: success
+closes it again, failure re-opens it.
+
+Breaker state lives in the process (each gunicorn worker learns on its
+own), which keeps the check free of any network round trip.
+"""
+
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def _setting(name, default):
+    return getattr(settings, f'PAYMENT_GATEWAY_BREAKER_{name}', default)
+
+
+class CircuitBreaker:
+    """
+    Failure-rate and latency circuit breaker for one gateway
+
+    Args:
+        name: Gateway name (for reporting)
+        window: Seconds of call history the rates are computed over
+        min_calls: Calls needed in the window before the circuit may open
+        failure_rate: Failed share of calls that opens the circuit
+        slow_call: Seconds after which a call counts as slow
+        slow_rate: Slow share of calls that opens the circuit
+        open_for: Seconds the circuit stays open before probing
+        probes: Concurrent trial calls allowed while half-open
+        clock: Time source (monotonic seconds)
+    """
+
+    def __init__(self, name, window=None, min_calls=None, failure_rate=None, slow_call=None,
+                 slow_rate=None, open_for=None, probes=None, clock=time.monotonic):
+        self.name = name
+        self.window = window or _setting('WINDOW', 60)
+        self.min_calls = min_calls or _setting('MIN_CALLS', 10)
+        self.failure_rate = failure_rate or _setting('FAILURE_RATE', 0.5)
+        self.slow_call = slow_call or _setting('SLOW_CALL', 3.0)
+        self.slow_rate = slow_rate or _setting('SLOW_RATE', 0.5)
+        self.open_for = open_for or _setting('OPEN_FOR', 30)
+        self.probes = probes or _setting('PROBES', 1)
+        self.clock = clock
+
+        self.state = CLOSED
+        self.opened_at = None
+        self._calls = deque()  # (finished_at, ok, elapsed)
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    def allow(self):
+        """Whether a call may be made now (reserves a probe slot when half-open)"""
+        with self._lock:
+            now = self.clock()
+            if self.state == OPEN:
+                if now - self.opened_at < self.open_for:
+                    return False
+                self.state = HALF_OPEN
+                self._probes_in_flight = 0
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.probes:
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def record(self, ok, elapsed):
+        """Record the outcome of a call allowed by allow()"""
+        with self._lock:
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if ok and elapsed < self.slow_call:
+                    self.state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                self._calls.append((now, ok, elapsed))
+                return
+
+            self._calls.append((now, ok, elapsed))
+            self._trim(now)
+            if self.state == CLOSED and len(self._calls) >= self.min_calls:
+                failure_rate, slow_rate = self._rates()
+                if failure_rate >= self.failure_rate or slow_rate >= self.slow_rate:
+                    self._open(now)
+
+    def release(self):
+        """Give back a probe slot reserved by allow() for a call that never finished (e.g. cancelled)"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+
+    def _rates(self):
+        calls = len(self._calls)
+        if not calls:
+            return 0.0, 0.0
+        failures = sum(1 for _, ok, _ in self._calls if not ok)
+        slow = sum(1 for _, _, elapsed in self._calls if elapsed >= self.slow_call)
+        return failures / calls, slow / calls
+
+    def reset(self):
+        """Close the circuit and forget the call history"""
+        with self._lock:
+            self.state = CLOSED
+            self.opened_at = None
+            self._calls.clear()
+            self._probes_in_flight = 0
+
+    def snapshot(self):
+        """Current state and rolling health figures as a JSON-friendly dict"""
+        with self._lock:
+            now = self.clock()
+            self._trim(now)
+            failure_rate, slow_rate = self._rates()
+            latencies = sorted(elapsed for _, _, elapsed in self._calls)
+            state = self.state
+            if state == OPEN and now - self.opened_at >= self.open_for:
+                state = HALF_OPEN
+            return {
+                'gateway': self.name,
+                'state': state,
+                'calls': len(latencies),
+                'failure_rate': round(failure_rate, 3),
+                'slow_rate': round(slow_rate, 3),
+                'latency_p50': round(latencies[len(latencies) // 2], 4) if latencies else None,
+                'latency_p99': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 4) if latencies else None,
+                'retry_in': round(max(0.0, self.opened_at + self.open_for - now), 1) if state == OPEN else None,
+            }
@@ -0,0 +1,396 @@
+"""
+Bulk import of repayments from bank statement files
+
+Cash, cheque and NEFT collections arrive as a daily bank statement
+(CSV or XLSX) rather than one form submission per payment.
+import_statement() reads the whole file and validates every row before
+anything is written. Loans are fetched in chunks of CHUNK_SIZE ids. Their
+remaining balances come from one grouped paid_totals() query per chunk and
+the portfolio engine's total due. References are checked against existing
+repayments through repayment_txn_idx. Each accepted row is charged against
+its loan's remaining balance in file order, so several rows for one loan
+cannot overpay it.
+
+Accepted rows are inserted with bulk_create, CHUNK_SIZE rows per INSERT,
+in one transaction. bulk_create bypasses Repayment.save() and the
+post_save signals. The loan ledgers, repayment schedules, portfolio
+statistics and search documents are therefore brought up to date in
+batches inside the same transaction. A dry run validates and previews the
+file without writing anything.
+"""
+
+import csv
+import io
+import time
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from loans.balances import paid_totals, rebuild_balances_for
+from loans.engine import PortfolioSchedule, paise_to_rupees
+from loans.models import LoanApplication
+from loans.schedules import allocate_payments_for
+from portfolio.stats import apply_deltas, collect_deltas, tracker_for_model
+from search.indexes import index_for_model
+from search.models import SearchDocument
+from .models import Repayment
+
+# Rows per INSERT, and ids per loan / reference lookup query
+CHUNK_SIZE = 2000
+
+# Valid rows returned for the dry-run preview
+PREVIEW_ROWS = 50
+
+STATEMENT_FORMATS = ('csv', 'xlsx')
+
+# Accepted column names (compared lowercased) for each statement field
+COLUMN_ALIASES = {
+    'loan_id': ('loan_id', 'loan', 'loan_no', 'loan_number'),
+    'amount': ('amount', 'amount_paid', 'credit', 'credit_amount', 'deposit'),
+    'date': ('date', 'payment_date', 'value_date', 'txn_date', 'transaction_date'),
+    'reference': ('reference', 'transaction_id', 'utr', 'cheque_no', 'ref_no', 'reference_no'),
+    'method': ('method', 'payment_method', 'mode'),
+    'notes': ('notes', 'narration', 'description', 'remarks'),
+}
+REQUIRED_COLUMNS = ('loan_id', 'amount', 'date')
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d-%b-%Y', '%d %b %Y')
+
+# Statement payment modes that are not Repayment.PAYMENT_METHOD_CHOICES keys
+METHOD_ALIASES = {
+    'neft': 'Bank Transfer',
+    'rtgs': 'Bank Transfer',
+    'imps': 'Bank Transfer',
+    'transfer': 'Bank Transfer',
+    'chq': 'Cheque',
+    'demand draft': 'DD',
+}
+
+MAX_AMOUNT = Decimal('99999999.99')
+CENT = Decimal('0.01')
+
+
+class StatementFileError(Exception):
+    """Statement file that cannot be read or lacks the required columns"""
+    pass
+
+
+def statement_format(filename):
+    """Statement format from a file name: 'xlsx' for Excel workbooks, otherwise 'csv'"""
+    return 'xlsx' if filename.lower().endswith(('.xlsx', '.xlsm')) else 'csv'
+
+
+def _columns(header):
+    """Map statement fields to column positions in the header row"""
+    present = {}
+    for position, name in enumerate(header):
+        present.setdefault(str(name or '').strip().lower().replace(' ', '_'), position)
+    columns = {
+        field: next((present[alias] for alias in aliases if alias in present), None)
+        for field, aliases in COLUMN_ALIASES.items()
+    }
+    missing = [field for field in REQUIRED_COLUMNS if columns[field] is None]
+    if missing:
+        raise StatementFileError(f"Statement file is missing the {', '.join(missing)} column(s)")
+    return columns
+
+
+def _csv_rows(stream):
+    return csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+
+
+def _xlsx_rows(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise StatementFileError("XLSX statements need openpyxl installed")
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise StatementFileError(f"Unreadable XLSX file: {e}")
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_statement_rows(stream, fmt='csv'):
+    """
+    Yield raw statement rows from a binary stream
+
+    Each row is a dict with 'line' and the raw cell value of every
+    statement field ('' where the column is absent). Blank lines are skipped.
+
+    Raises:
+        StatementFileError for an unknown format, an unreadable file or missing columns
+    """
+    if fmt not in STATEMENT_FORMATS:
+        raise StatementFileError(f"Unsupported statement format: {fmt!r}")
+    rows = _xlsx_rows(stream) if fmt == 'xlsx' else _csv_rows(stream)
+    try:
+        header = next(rows, None)
+        if header is None:
+            raise StatementFileError("Statement file is empty")
+        columns = _columns(header)
+        for line, row in enumerate(rows, start=2):
+            if not any(value not in (None, '') for value in row):
+                continue
+            yield {
+                'line': line,
+                **{
+                    field: row[position] if position is not None and position < len(row) else ''
+                    for field, position in columns.items()
+                },
+            }
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise StatementFileError(f"Unreadable CSV file: {e}")
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _parse_loan_id(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    try:
+        return int(_text(value))
+    except ValueError:
+        return None
+
+
+def _parse_amount(value):
+    # Spreadsheet cells arrive as floats; str() gives their shortest decimal form
+    text = str(value) if isinstance(value, float) else _text(value).replace(',', '').replace('₹', '')
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not amount.is_finite():
+        return None
+    return amount
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = _text(value)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_method(value, default):
+    text = _text(value)
+    if not text:
+        return default
+    methods = {key.lower(): key for key, _ in Repayment.PAYMENT_METHOD_CHOICES}
+    return methods.get(text.lower()) or METHOD_ALIASES.get(text.lower())
+
+
+def parse_row(row, default_method='Bank Transfer', today=None):
+    """
+    Parse one raw statement row
+
+    Returns:
+        (values, errors): values holds 'line', 'loan_id', 'amount', 'date',
+        'reference', 'method' and 'notes'; errors lists what is wrong with the row
+    """
+    today = today or timezone.localdate()
+    errors = []
+    values = {
+        'line': row['line'],
+        'loan_id': _parse_loan_id(row['loan_id']),
+        'amount': _parse_amount(row['amount']),
+        'date': _parse_date(row['date']),
+        'reference': _text(row['reference']),
+        'method': _parse_method(row['method'], default_method),
+        'notes': _text(row['notes']),
+    }
+    if values['loan_id'] is None:
+        errors.append(f"Invalid loan id {_text(row['loan_id'])!r}")
+    amount = values['amount']
+    if amount is None:
+        errors.append(f"Invalid amount {_text(row['amount'])!r}")
+    elif amount <= 0:
+        errors.append("Amount must be greater than 0")
+    elif amount != amount.quantize(CENT) or amount > MAX_AMOUNT:
+        errors.append(f"Amount {amount} is not a valid rupee amount")
+    if values['date'] is None:
+        errors.append(f"Invalid date {_text(row['date'])!r}")
+    elif values['date'] > today:
+        errors.append(f"Payment date {values['date']} is in the future")
+    if values['method'] is None:
+        errors.append(f"Unknown payment method {_text(row['method'])!r}")
+    if len(values['reference']) > 100:
+        errors.append("Reference is longer than 100 characters")
+    return values, errors
+
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _load_loans(loan_ids, chunk_size, lock):
+    """Loans and their remaining balances (total due minus paid repayments) by id"""
+    loans, remaining = {}, {}
+    queryset = LoanApplication.objects.select_related('student')
+    if lock:
+        queryset = queryset.select_for_update(of=('self',))
+    for chunk in _chunks(sorted(loan_ids), chunk_size):
+        batch = list(queryset.filter(pk__in=chunk))
+        totals = paid_totals(chunk)
+        schedule = PortfolioSchedule.from_loans(batch)
+        for loan, total_due in zip(batch, schedule.total_due):
+            loans[loan.pk] = loan
+            paid = (totals.get(loan.pk) or {}).get('total') or Decimal('0.00')
+            remaining[loan.pk] = paise_to_rupees(total_due) - paid
+    return loans, remaining
+
+
+def _existing_references(references, chunk_size):
+    """Repayment id already recorded for each of the given references"""
+    existing = {}
+    for chunk in _chunks(references, chunk_size):
+        existing.update(
+            Repayment.objects.filter(transaction_id__in=chunk).values_list('transaction_id', 'pk')
+        )
+    return existing
+
+
+def validate_rows(parsed, chunk_size=CHUNK_SIZE, lock=False):
+    """
+    Check parsed rows against the database and each other
+
+    Args:
+        parsed: (values, errors) pairs from parse_row(), in file order
+        chunk_size: Ids per loan and reference lookup query
+        lock: Lock the loans for update (for an import that will write)
+
+    Returns:
+        (valid, errors, loans): valid rows in file order, (line, message) errors,
+        and the loans referenced by valid rows keyed by id
+    """
+    loan_ids = {values['loan_id'] for values, row_errors in parsed if not row_errors}
+    loans, remaining = _load_loans(loan_ids, chunk_size, lock)
+    existing = _existing_references(
+        {values['reference'] for values, row_errors in parsed if values['reference'] and not row_errors},
+        chunk_size,
+    )
+
+    valid, errors, seen = [], [], {}
+    for values, row_errors in parsed:
+        line = values['line']
+        if not row_errors:
+            loan = loans.get(values['loan_id'])
+            reference = values['reference']
+            if loan is None:
+                row_errors = [f"Loan #{values['loan_id']} does not exist"]
+            elif loan.status != 'Approved':
+                row_errors = [f"Loan #{loan.pk} is {loan.status}, not Approved"]
+            elif reference in existing:
+                row_errors = [f"Reference {reference} is already recorded (repayment #{existing[reference]})"]
+            elif reference in seen:
+                row_errors = [f"Reference {reference} is repeated (first on line {seen[reference]})"]
+            elif values['amount'] > remaining[loan.pk]:
+                row_errors = [
+                    f"Amount ₹{values['amount']} exceeds the remaining balance of loan #{loan.pk} "
+                    f"(₹{max(remaining[loan.pk], Decimal('0.00'))})"
+                ]
+        if row_errors:
+            errors.append((line, '; '.join(row_errors)))
+            continue
+        remaining[values['loan_id']] -= values['amount']
+        if values['reference']:
+            seen[values['reference']] = line
+        valid.append(values)
+    return valid, errors, {values['loan_id']: loans[values['loan_id']] for values in valid}
+
+
+def _insert(valid, loans, processed_by, now, chunk_size):
+    """bulk_create the repayments and update everything Repayment.save() and its signals would"""
+    tracker = tracker_for_model(Repayment)
+    index = index_for_model(Repayment)
+    tz = timezone.get_current_timezone()
+    deltas = None
+    for chunk in _chunks(valid, chunk_size):
+        repayments = [
+            Repayment(
+                loan=loans[values['loan_id']],
+                amount_paid=values['amount'],
+                payment_date=timezone.make_aware(datetime.combine(values['date'], dt_time.min), tz),
+                status='Paid',
+                payment_method=values['method'],
+                transaction_id=values['reference'] or None,
+                notes=values['notes'] or None,
+                processed_by=processed_by,
+                processed_at=now,
+            )
+            for values in chunk
+        ]
+        Repayment.objects.bulk_create(repayments)
+        deltas = collect_deltas(tracker, [(None, tracker.current(repayment)) for repayment in repayments], deltas)
+        SearchDocument.objects.bulk_create([
+            SearchDocument(kind=index.kind, object_id=repayment.pk, document=index.document(repayment))
+            for repayment in repayments
+        ])
+    if deltas:
+        apply_deltas(deltas)
+    rebuild_balances_for(loans)
+    allocate_payments_for(loans)
+
+
+def import_statement(stream, fmt='csv', dry_run=False, skip_invalid=False, default_method='Bank Transfer',
+                     processed_by=None, chunk_size=CHUNK_SIZE, now=None):
+    """
+    Validate a bank statement and import its repayments
+
+    Args:
+        stream: Binary stream of the statement file
+        fmt: 'csv' or 'xlsx' (see statement_format())
+        dry_run: Validate and preview only; write nothing
+        skip_invalid: Import the valid rows even when other rows have errors
+            (by default a file with any error imports nothing)
+        default_method: Payment method for rows without a method column or value
+        processed_by: Admin user recorded as having processed the repayments
+        chunk_size: Rows per INSERT and ids per lookup query
+        now: Processing timestamp (defaults to now)
+
+    Returns:
+        dict with 'rows', 'valid', 'imported', 'loans', 'total_amount', 'errors'
+        (list of (line, message)), 'preview' (the first valid rows) and 'elapsed'
+
+    Raises:
+        StatementFileError if the file cannot be read or lacks required columns
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    started = time.monotonic()
+    parsed = [parse_row(row, default_method, today) for row in read_statement_rows(stream, fmt)]
+
+    with transaction.atomic():
+        valid, errors, loans = validate_rows(parsed, chunk_size, lock=not dry_run)
+        imported = 0
+        if valid and not dry_run and (skip_invalid or not errors):
+            _insert(valid, loans, processed_by, now, chunk_size)
+            imported = len(valid)
+
+    return {
+        'rows': len(parsed),
+        'valid': len(valid),
+        'imported': imported,
+        'loans': len(loans),
+        'total_amount': sum((values['amount'] for values in valid), Decimal('0.00')),
+        'errors': errors,
+        'preview': valid[:PREVIEW_ROWS],
+        'elapsed': time.monotonic() - started,
+    }
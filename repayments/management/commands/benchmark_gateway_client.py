@@ -0,0 +1,122 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from repayments.async_gateway import AsyncRazorpayGateway
+from repayments.payment_gateway import RazorpayGateway
+
+
+class SlowGatewayStub:
+    """Keep-alive HTTP/1.1 server answering every request with an order after `delay` seconds"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.ready = threading.Event()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                length = 0
+                for line in head.decode('latin-1').split('\r\n'):
+                    name, _, value = line.partition(':')
+                    if name.lower() == 'content-length':
+                        length = int(value)
+                await reader.readexactly(length)
+
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                await asyncio.sleep(self.delay)
+                self.in_flight -= 1
+
+                body = json.dumps({'id': 'order_bench', 'status': 'created'}).encode()
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    + f'Content-Length: {len(body)}\r\n\r\n'.encode() + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def serve_in_thread(self):
+        def run():
+            loop = asyncio.new_event_loop()
+            server = loop.run_until_complete(
+                asyncio.start_server(self.handle, '127.0.0.1', 0, backlog=4096)
+            )
+            self.port = server.sockets[0].getsockname()[1]
+            self.ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        self.ready.wait()
+        return self.port
+
+
+class Command(BaseCommand):
+    help = 'Compare the async and thread-pooled sync gateway clients against a local slow stub gateway'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=500, help='Orders to create per client')
+        parser.add_argument('--delay', type=float, default=0.2, help='Stub gateway response time in seconds')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Worker threads for the sync client (e.g. gunicorn threads)')
+
+    def handle(self, *args, **options):
+        calls, delay, threads = options['calls'], options['delay'], options['threads']
+        stub = SlowGatewayStub(delay)
+        port = stub.serve_in_thread()
+
+        with override_settings(
+            RAZORPAY_BASE_URL=f'http://127.0.0.1:{port}/v1',
+            RAZORPAY_KEY_ID='rzp_bench',
+            RAZORPAY_KEY_SECRET='bench',
+            PAYMENT_GATEWAY_ASYNC_MAX_CONNECTIONS=max(calls, 1),
+            PAYMENT_GATEWAY_POOL_SIZE=threads,
+        ):
+            async def run_async():
+                gateway = AsyncRazorpayGateway()
+                results = await asyncio.gather(*(
+                    gateway.create_order(Decimal('100.00'), receipt=f'bench_{i}') for i in range(calls)
+                ))
+                await gateway.transport.aclose()
+                return results
+
+            started = time.perf_counter()
+            results = asyncio.run(run_async())
+            async_elapsed = time.perf_counter() - started
+            async_peak = stub.peak_in_flight
+            if len(results) != calls:
+                raise CommandError('Async client lost orders')
+
+            stub.peak_in_flight = 0
+            gateway = RazorpayGateway()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(
+                    lambda i: gateway.create_order(Decimal('100.00'), receipt=f'bench_{i}'), range(calls)
+                ))
+            sync_elapsed = time.perf_counter() - started
+            sync_peak = stub.peak_in_flight
+            gateway.transport.close()
+
+        self.stdout.write(f'{calls} orders against a {delay * 1000:.0f} ms gateway')
+        self.stdout.write(
+            f'  async client:           {async_elapsed:.2f}s  ({calls / async_elapsed:.0f} orders/s, '
+            f'{async_peak} in flight)'
+        )
+        self.stdout.write(
+            f'  sync client, {threads:>3} threads: {sync_elapsed:.2f}s  ({calls / sync_elapsed:.0f} orders/s, '
+            f'{sync_peak} in flight)'
+        )
+        self.stdout.write(self.style.SUCCESS(f'Async speed-up: {sync_elapsed / async_elapsed:.1f}x'))
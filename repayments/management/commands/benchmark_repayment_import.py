@@ -0,0 +1,100 @@
+import io
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from loans.models import LoanApplication
+from loans.schedules import generate_schedules
+from repayments.imports import CHUNK_SIZE, import_statement
+from repayments.models import Repayment
+from users.models import StudentUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Time a bulk statement import against per-row Repayment.save() on synthetic data; '
+        'everything is rolled back afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help='Statement rows to import')
+        parser.add_argument('--loans', type=int, default=10_000, help='Approved loans the rows are spread over')
+        parser.add_argument('--compare', type=int, default=1_000,
+                            help='Rows recorded one save() at a time for the baseline rate')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rows, loan_count = options['rows'], options['loans']
+        if rows < 1 or loan_count < 1:
+            raise CommandError('--rows and --loans must be at least 1')
+        rng = random.Random(options['seed'])
+        today = timezone.localdate()
+
+        with transaction.atomic():
+            student = StudentUser.objects.create_user(
+                email='import-benchmark@example.com', password=None, first_name='Import',
+                last_name='Benchmark', student_id='BENCH-IMPORT', university='N/A', gpa=Decimal('0.00'),
+            )
+            loans = LoanApplication.objects.bulk_create(
+                LoanApplication(
+                    student=student, amount=100_000, reason='Import benchmark', status='Approved',
+                    repayment_due_date=today + timedelta(days=365),
+                )
+                for _ in range(loan_count)
+            )
+            generate_schedules(loans)
+            loan_ids = [loan.pk for loan in loans]
+
+            statement = io.StringIO()
+            statement.write('loan_id,amount,value_date,utr,mode,narration\n')
+            for i in range(rows):
+                statement.write(
+                    f'{rng.choice(loan_ids)},{rng.randint(100, 2000) / 100:.2f},'
+                    f'{(today - timedelta(days=rng.randint(0, 30))).isoformat()},UTR{i:010d},NEFT,benchmark\n'
+                )
+            data = statement.getvalue().encode()
+            self.stdout.write(f'{rows:,} statement rows over {loan_count:,} loans ({len(data) / 1e6:.1f} MB)')
+
+            started = time.perf_counter()
+            preview = import_statement(io.BytesIO(data), dry_run=True, chunk_size=options['chunk_size'])
+            dry_run_elapsed = time.perf_counter() - started
+            if preview['errors']:
+                raise CommandError(f"Synthetic statement has errors: {preview['errors'][:3]}")
+
+            started = time.perf_counter()
+            result = import_statement(io.BytesIO(data), chunk_size=options['chunk_size'])
+            import_elapsed = time.perf_counter() - started
+
+            imported_total = Repayment.objects.filter(loan_id__in=loan_ids).aggregate(total=Sum('amount_paid'))['total']
+            ledger_total = LoanApplication.objects.filter(pk__in=loan_ids).aggregate(total=Sum('total_paid'))['total']
+            if result['imported'] != rows or imported_total != result['total_amount'] or ledger_total != imported_total:
+                raise CommandError('Imported repayments and loan ledgers disagree')
+
+            compare = min(options['compare'], rows)
+            started = time.perf_counter()
+            for i in range(compare):
+                Repayment(
+                    loan=loans[i % loan_count], amount_paid=Decimal('1.00'), status='Paid',
+                    payment_method='Bank Transfer', transaction_id=f'SAVE{i:010d}',
+                ).save()
+            save_rate = compare / (time.perf_counter() - started) if compare else 0.0
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'  dry run (parse + validate): {dry_run_elapsed:.2f}s ({rows / dry_run_elapsed:,.0f} rows/s)')
+        self.stdout.write(f'  bulk import:                {import_elapsed:.2f}s ({rows / import_elapsed:,.0f} rows/s)')
+        if save_rate:
+            self.stdout.write(
+                f'  per-row save():             {save_rate:,.0f} rows/s over {compare:,} rows '
+                f'(~{rows / save_rate:.1f}s for {rows:,})'
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Bulk import speed-up: {rows / import_elapsed / save_rate:.1f}x (all changes rolled back)'
+            ))
@@ -0,0 +1,73 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from repayments.imports import CHUNK_SIZE, StatementFileError, import_statement, statement_format
+from repayments.models import Repayment
+
+
+class Command(BaseCommand):
+    help = 'Import repayments from a bank statement (CSV or XLSX), validating every row before writing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Statement file (.csv or .xlsx)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate and preview only; import nothing')
+        parser.add_argument('--skip-invalid', action='store_true',
+                            help='Import the valid rows even if other rows have errors')
+        parser.add_argument('--method', default='Bank Transfer',
+                            choices=[key for key, _ in Repayment.PAYMENT_METHOD_CHOICES],
+                            help='Payment method for rows that do not give one')
+        parser.add_argument('--errors', help='Write row-level errors to this CSV file')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Rows per INSERT and ids per lookup query')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = import_statement(
+                    stream,
+                    fmt=statement_format(options['path']),
+                    dry_run=options['dry_run'],
+                    skip_invalid=options['skip_invalid'],
+                    default_method=options['method'],
+                    chunk_size=options['chunk_size'],
+                )
+        except (OSError, StatementFileError) as e:
+            raise CommandError(str(e)) from e
+
+        if options['errors']:
+            with open(options['errors'], 'w', newline='') as report:
+                writer = csv.writer(report)
+                writer.writerow(['line', 'error'])
+                writer.writerows(result['errors'])
+        elif options['verbosity'] >= 1:
+            for line, message in result['errors'][:20]:
+                self.stderr.write(f'  line {line}: {message}')
+            if len(result['errors']) > 20:
+                self.stderr.write(f"  ... and {len(result['errors']) - 20} more (use --errors to write them all)")
+
+        if options['dry_run'] and options['verbosity'] >= 2:
+            for values in result['preview']:
+                self.stdout.write(
+                    f"  line {values['line']}: loan #{values['loan_id']} ₹{values['amount']} "
+                    f"on {values['date']} ({values['method']}) {values['reference']}"
+                )
+
+        self.stdout.write(
+            f"{result['rows']} row(s): {result['valid']} valid, {len(result['errors'])} with errors, "
+            f"₹{result['total_amount']} across {result['loans']} loan(s)"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Dry run: nothing imported ({result['elapsed']:.2f}s)"))
+        elif result['imported']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Imported {result['imported']} repayment(s) in {result['elapsed']:.2f}s"
+            ))
+        elif result['errors']:
+            raise CommandError('Nothing imported: fix the errors or pass --skip-invalid')
+        else:
+            self.stdout.write(self.style.WARNING('No repayments in the statement'))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from repayments.webhooks import BATCH_SIZE, process_batch
+
+
+class Command(BaseCommand):
+    help = 'Apply stored payment gateway webhook events to their repayments, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Events claimed and applied per transaction')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when no event is due')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no event is due instead of polling')
+
+    def handle(self, *args, **options):
+        totals = {'claimed': 0, 'processed': 0, 'ignored': 0, 'retried': 0, 'failed': 0}
+        try:
+            while True:
+                stats = process_batch(batch_size=options['batch_size'])
+                for key, value in stats.items():
+                    totals[key] += value
+
+                if stats['claimed'] and options['verbosity'] >= 2:
+                    self.stdout.write(
+                        f"Processed {stats['processed']}, ignored {stats['ignored']}, "
+                        f"retrying {stats['retried']}, failed {stats['failed']}"
+                    )
+                if stats['claimed'] < options['batch_size']:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {totals['processed']} event(s), ignored {totals['ignored']}; "
+            f"{totals['retried']} scheduled for retry, {totals['failed']} failed permanently"
+        ))
@@ -0,0 +1,61 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from repayments.settlements import BATCH_SIZE, SettlementFileError, reconcile_settlements
+
+
+class Command(BaseCommand):
+    help = 'Reconcile repayments against a gateway settlement CSV, streaming it in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Settlement CSV file')
+        parser.add_argument('--report', help='Write mismatches, missing rows and fixes to this CSV file')
+        parser.add_argument('--since', type=date.fromisoformat,
+                            help='Settlement period start (YYYY-MM-DD), for the missing-at-gateway check')
+        parser.add_argument('--until', type=date.fromisoformat,
+                            help='Settlement period end (YYYY-MM-DD), for the missing-at-gateway check')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Settlement rows matched and written per batch')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Classify and report only; do not fix statuses or stamp repayments')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if bool(options['since']) != bool(options['until']):
+            raise CommandError('--since and --until must be given together')
+
+        def progress(stats):
+            if options['verbosity'] >= 2:
+                rate = stats['rows'] / stats['elapsed'] if stats['elapsed'] else 0.0
+                self.stdout.write(
+                    f"  batch {stats['batches']}: {stats['rows']} rows, {stats['matched']} matched, "
+                    f"{stats['fixed']} fixed ({rate:.0f} rows/s)"
+                )
+
+        report = open(options['report'], 'w', newline='') if options['report'] else None
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+                stats = reconcile_settlements(
+                    stream,
+                    report=report,
+                    since=options['since'],
+                    until=options['until'],
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                    on_batch=progress,
+                )
+        except (OSError, SettlementFileError) as e:
+            raise CommandError(str(e)) from e
+        finally:
+            if report:
+                report.close()
+
+        for key in ('rows', 'matched', 'fixed', 'amount_mismatch', 'status_mismatch',
+                    'missing_locally', 'missing_at_gateway', 'invalid'):
+            self.stdout.write(f'{key}: {stats[key]}')
+        prefix = 'Dry run: ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Reconciled {stats['rows']} settlement row(s) in {stats['elapsed']:.2f}s"
+        ))
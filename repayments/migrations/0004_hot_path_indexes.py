@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-17 01:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0005_hot_path_indexes'),
+        ('repayments', '0003_investment'),
+        ('users', '0003_studentuser_user_type_financieruser'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='investment',
+            index=models.Index(fields=['status', 'maturity_date'], name='investment_status_mat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repayment',
+            index=models.Index(fields=['loan', 'status'], name='repayment_loan_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repayment',
+            index=models.Index(fields=['status', 'payment_date'], name='repayment_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repayment',
+            index=models.Index(fields=['gateway_transaction_id'], name='repayment_gateway_txn_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repayment',
+            index=models.Index(fields=['payment_date', 'id'], name='repayment_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['financier', 'created_at'], name='withdrawal_fin_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['created_at', 'id'], name='withdrawal_created_id_idx'),
+        ),
+    ]
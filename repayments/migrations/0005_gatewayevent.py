@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-17 01:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repayments', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GatewayEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gateway', models.CharField(max_length=20)),
+                ('event_id', models.CharField(help_text="Gateway's id for this notification", max_length=200)),
+                ('event_type', models.CharField(blank=True, max_length=100)),
+                ('order_id', models.CharField(blank=True, help_text='Gateway order id (matches Repayment.gateway_transaction_id)', max_length=200)),
+                ('payload', models.JSONField(help_text='Raw event as received')),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Processed', 'Processed'), ('Ignored', 'Ignored'), ('Failed', 'Failed')], default='Pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Not processed before this time')),
+                ('last_error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('repayment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='gateway_events', to='repayments.repayment')),
+            ],
+            options={
+                'verbose_name': 'Gateway Event',
+                'verbose_name_plural': 'Gateway Events',
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'Pending')), fields=['next_attempt_at', 'id'], name='gateway_event_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='gatewayevent',
+            constraint=models.UniqueConstraint(fields=('gateway', 'event_id'), name='gateway_event_unique'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-17 01:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0007_loanapplication_overdue_marked_at'),
+        ('repayments', '0005_gatewayevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repayment',
+            name='reconciled_at',
+            field=models.DateTimeField(blank=True, help_text='When the payment was last found in a gateway settlement file', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='repayment',
+            index=models.Index(fields=['transaction_id'], name='repayment_txn_idx'),
+        ),
+    ]
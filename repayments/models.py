@@ -1,4 +1,5 @@
-from django.db import models
+from decimal import Decimal
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 
@@ -129,6 +130,12 @@ class Repayment(models.Model):
         help_text="When the payment was processed"
     )
     
+    reconciled_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When the payment was last found in a gateway settlement file"
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -136,6 +143,29 @@ class Repayment(models.Model):
         ordering = ['-payment_date']
         verbose_name = 'Repayment'
         verbose_name_plural = 'Repayments'
+        indexes = [
+            # Loan ledger aggregates: a loan's repayments by status
+            models.Index(fields=['loan', 'status'], name='repayment_loan_status_idx'),
+            # Statistics and listings by status, newest first
+            models.Index(fields=['status', 'payment_date'], name='repayment_status_date_idx'),
+            # Gateway callbacks look repayments up by order id
+            models.Index(fields=['gateway_transaction_id'], name='repayment_gateway_txn_idx'),
+            # Settlement reconciliation falls back to the payment reference
+            models.Index(fields=['transaction_id'], name='repayment_txn_idx'),
+            # Keyset pagination on (payment_date, id)
+            models.Index(fields=['payment_date', 'id'], name='repayment_date_id_idx'),
+        ]
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Ledger-relevant values as last persisted (None until saved/loaded)
+        self._ledger_state = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._ledger_state = instance._get_ledger_state()
+        return instance
     
     def __str__(self):
         return f"Repayment #{self.id} - {self.loan} - {self.amount_paid} INR"
@@ -145,7 +175,51 @@ class Repayment(models.Model):
         if self.status == 'Pending' and self.amount_paid > 0:
             self.status = 'Paid'
         
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._sync_loan_balances()
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._ledger_state = self._get_ledger_state()
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self._sync_loan_balances(deleted=True)
+        return result
+    
+    def _get_ledger_state(self):
+        """Fields that feed the loan's repayment ledger"""
+        # Read from __dict__ so deferred fields are not fetched one by one
+        values = self.__dict__
+        return (
+            values.get('loan_id'),
+            values.get('status'),
+            values.get('amount_paid'),
+            values.get('payment_date'),
+        )
+    
+    def _sync_loan_balances(self, deleted=False):
+        """Refresh the balance of every loan affected by this write"""
+        old_state = self._ledger_state
+        new_state = None if deleted else self._get_ledger_state()
+        self._ledger_state = new_state
+        
+        if old_state == new_state:
+            return
+        was_paid = old_state is not None and old_state[1] == 'Paid'
+        is_paid = new_state is not None and new_state[1] == 'Paid'
+        if not (was_paid or is_paid):
+            return
+        
+        if new_state is not None:
+            self.loan.refresh_balance()
+        if was_paid and old_state[0] and (new_state is None or old_state[0] != new_state[0]):
+            from loans.models import LoanApplication
+            old_loan = LoanApplication.objects.filter(pk=old_state[0]).first()
+            if old_loan:
+                old_loan.refresh_balance()
     
     @property
     def is_successful(self):
@@ -273,6 +347,12 @@ class Withdrawal(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Withdrawal'
         verbose_name_plural = 'Withdrawals'
+        indexes = [
+            # A financier's withdrawals, newest first
+            models.Index(fields=['financier', 'created_at'], name='withdrawal_fin_created_idx'),
+            # Keyset pagination on (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='withdrawal_created_id_idx'),
+        ]
     
     def __str__(self):
         return f"Withdrawal #{self.id} - {self.financier.user.get_full_name()} - ₹{self.amount}"
@@ -302,6 +382,34 @@ class Withdrawal(models.Model):
         return f"₹{self.amount:,.2f}"
 
 
+class InvestmentQuerySet(models.QuerySet):
+    """QuerySet with database-side equivalents of the Investment return properties"""
+    
+    def with_returns(self):
+        """
+        Annotate the return properties as SQL expressions
+        
+        Annotations:
+            expected_return -> expected_return_amount
+            total_return    -> total_return_amount
+        """
+        from loans.models import MONEY_FIELD
+        
+        # Two percentages: multiplied rather than divided, which SQLite would truncate as integers
+        per_ten_thousand = models.Value(Decimal('0.0001'))
+        return self.annotate(
+            expected_return=models.ExpressionWrapper(
+                models.F('investment_amount') * models.F('expected_return_rate')
+                * models.F('loan__interest_rate') * per_ten_thousand,
+                output_field=MONEY_FIELD,
+            ),
+        ).annotate(
+            total_return=models.ExpressionWrapper(
+                models.F('investment_amount') + models.F('expected_return'), output_field=MONEY_FIELD
+            ),
+        )
+
+
 class Investment(models.Model):
     """Model for tracking financier investments in loans"""
     
@@ -442,11 +550,17 @@ class Investment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = InvestmentQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Investment'
         verbose_name_plural = 'Investments'
         unique_together = ['financier', 'loan']  # One investment per financier per loan
+        indexes = [
+            # Maturity tracking: status = X AND maturity date range
+            models.Index(fields=['status', 'maturity_date'], name='investment_status_mat_idx'),
+        ]
     
     def __str__(self):
         return f"Investment #{self.id} - {self.financier.user.get_full_name()} - ₹{self.investment_amount} - Loan #{self.loan.id}"
@@ -511,3 +625,65 @@ class Investment(models.Model):
         if self.maturity_date:
             return (self.maturity_date - self.investment_date).days
         return 0
+
+
+class GatewayEvent(models.Model):
+    """
+    A server-to-server notification received from a payment gateway
+
+    The webhook endpoint verifies the signature and stores the raw event
+    here; the unique (gateway, event_id) constraint makes a redelivered
+    event a single indexed no-op. The process_gateway_events worker then
+    applies each event to its repayment exactly once (see
+    repayments.webhooks).
+    """
+    
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Processed', 'Processed'),
+        ('Ignored', 'Ignored'),
+        ('Failed', 'Failed'),
+    ]
+    
+    gateway = models.CharField(max_length=20)
+    event_id = models.CharField(max_length=200, help_text="Gateway's id for this notification")
+    event_type = models.CharField(max_length=100, blank=True)
+    order_id = models.CharField(
+        max_length=200,
+        blank=True,
+        help_text="Gateway order id (matches Repayment.gateway_transaction_id)"
+    )
+    payload = models.JSONField(help_text="Raw event as received")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text="Not processed before this time")
+    last_error = models.TextField(blank=True)
+    repayment = models.ForeignKey(
+        Repayment,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='gateway_events'
+    )
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-received_at']
+        verbose_name = 'Gateway Event'
+        verbose_name_plural = 'Gateway Events'
+        constraints = [
+            # Dedup lookup for redelivered notifications
+            models.UniqueConstraint(fields=['gateway', 'event_id'], name='gateway_event_unique'),
+        ]
+        indexes = [
+            # Worker claim query: pending events that are due, oldest first
+            models.Index(
+                fields=['next_attempt_at', 'id'],
+                name='gateway_event_due_idx',
+                condition=models.Q(status='Pending'),
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.gateway} {self.event_type or 'event'} {self.event_id} ({self.status})"
@@ -3,238 +3,282 @@ Email notification system for the Student Loan Portal
 
 This module handles sending email notifications for various events
 like loan approvals, payment confirmations, withdrawal requests, etc.
+Messages are rendered here and queued in the outbox within the caller's
+transaction; the deliver_outbox worker sends them.
 """
 
-from django.core.mail import send_mail, EmailMultiAlternatives
+import logging
+from functools import wraps
+
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.db import DatabaseError
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from outbox.delivery import queue_email, queue_emails
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
 
+def _logged(description, failed=False):
+    """
+    Log and swallow failures to build a notification (templates, missing
+    data), returning failed instead. Database errors, including the outbox
+    insert, propagate so the message and the caller's write commit or roll
+    back together.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except DatabaseError:
+                raise
+            except Exception:
+                logger.exception("Could not queue %s", description)
+                return failed
+        return wrapper
+    return decorator
 
+
+@_logged('loan approval notification')
 def send_loan_approval_notification(loan_application):
     """Send email notification when a loan is approved"""
-    try:
-        student = loan_application.student
-        subject = f"Loan Application Approved - Loan #{loan_application.id}"
-        
-        # Create email content
-        context = {
-            'student': student,
-            'loan': loan_application,
-            'total_amount': loan_application.total_amount_due,
-            'monthly_payment': loan_application.monthly_payment,
-            'due_date': loan_application.repayment_due_date,
-        }
-        
-        # Render HTML email
-        html_content = render_to_string('emails/loan_approval.html', context)
-        text_content = render_to_string('emails/loan_approval.txt', context)
-        
-        # Send email
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[student.email]
-        )
-        email.attach_alternative(html_content, "text/html")
-        email.send()
-        
-        return True
-    except Exception as e:
-        print(f"Error sending loan approval notification: {e}")
-        return False
+    student = loan_application.student
+    subject = f"Loan Application Approved - Loan #{loan_application.id}"
+
+    # Create email content
+    context = {
+        'student': student,
+        'loan': loan_application,
+        'total_amount': loan_application.total_amount_due,
+        'monthly_payment': loan_application.monthly_payment,
+        'due_date': loan_application.repayment_due_date,
+    }
+
+    # Render HTML email
+    html_content = render_to_string('emails/loan_approval.html', context)
+    text_content = render_to_string('emails/loan_approval.txt', context)
 
+    # Queue email
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=text_content,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[student.email]
+    )
+    email.attach_alternative(html_content, "text/html")
+    queue_email(email)
 
+    return True
+
+
+@_logged('loan decision notifications', failed=0)
+def send_loan_decision_notifications(loan_ids):
+    """
+    Email every student in a batch of approved/rejected loans
+    
+    Used after bulk status transitions: all messages are built first and
+    queued with a single insert.
+    
+    Returns:
+        Number of emails queued
+    """
+    from loans.models import LoanApplication
+    
+    messages = []
+    for loan in LoanApplication.objects.filter(pk__in=loan_ids).select_related('student'):
+        student = loan.student
+        if loan.status == 'Approved':
+            context = {
+                'student': student,
+                'loan': loan,
+                'total_amount': loan.total_amount_due,
+                'monthly_payment': loan.monthly_payment,
+                'due_date': loan.repayment_due_date,
+            }
+            message = EmailMultiAlternatives(
+                subject=f"Loan Application Approved - Loan #{loan.id}",
+                body=render_to_string('emails/loan_approval.txt', context),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[student.email],
+            )
+            message.attach_alternative(render_to_string('emails/loan_approval.html', context), "text/html")
+        else:
+            message = EmailMultiAlternatives(
+                subject=f"Loan Application Update - Loan #{loan.id}",
+                body=render_to_string('emails/loan_rejection.txt', {'student': student, 'loan': loan}),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[student.email],
+            )
+        messages.append(message)
+
+    return len(queue_emails(messages))
+
+
+@_logged('payment confirmation notification')
 def send_payment_confirmation_notification(repayment):
     """Send email notification when a payment is confirmed"""
-    try:
-        student = repayment.loan.student
-        subject = f"Payment Confirmed - ₹{repayment.amount_paid}"
-        
-        # Create email content
-        context = {
-            'student': student,
-            'repayment': repayment,
-            'loan': repayment.loan,
-            'payment_date': repayment.payment_date,
-            'remaining_amount': repayment.loan.total_amount_due - sum(
-                r.amount_paid for r in repayment.loan.repayments.filter(status='Paid')
-            ),
-        }
-        
-        # Render HTML email
-        html_content = render_to_string('emails/payment_confirmation.html', context)
-        text_content = render_to_string('emails/payment_confirmation.txt', context)
-        
-        # Send email
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[student.email]
-        )
-        email.attach_alternative(html_content, "text/html")
-        email.send()
-        
-        return True
-    except Exception as e:
-        print(f"Error sending payment confirmation notification: {e}")
-        return False
+    student = repayment.loan.student
+    subject = f"Payment Confirmed - ₹{repayment.amount_paid}"
+
+    # Create email content
+    context = {
+        'student': student,
+        'repayment': repayment,
+        'loan': repayment.loan,
+        'payment_date': repayment.payment_date,
+        'remaining_amount': repayment.loan.outstanding_balance,
+    }
 
+    # Render HTML email
+    html_content = render_to_string('emails/payment_confirmation.html', context)
+    text_content = render_to_string('emails/payment_confirmation.txt', context)
 
+    # Queue email
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=text_content,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[student.email]
+    )
+    email.attach_alternative(html_content, "text/html")
+    queue_email(email)
+
+    return True
+
+
+@_logged('withdrawal request notification')
 def send_withdrawal_request_notification(withdrawal):
     """Send email notification when a withdrawal is requested"""
-    try:
-        financier = withdrawal.financier.user
-        subject = f"Withdrawal Request Submitted - ₹{withdrawal.amount}"
-        
-        # Create email content
-        context = {
-            'financier': financier,
-            'withdrawal': withdrawal,
-            'request_date': withdrawal.created_at,
-        }
-        
-        # Render HTML email
-        html_content = render_to_string('emails/withdrawal_request.html', context)
-        text_content = render_to_string('emails/withdrawal_request.txt', context)
-        
-        # Send email
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[financier.email]
-        )
-        email.attach_alternative(html_content, "text/html")
-        email.send()
-        
-        return True
-    except Exception as e:
-        print(f"Error sending withdrawal request notification: {e}")
-        return False
+    financier = withdrawal.financier.user
+    subject = f"Withdrawal Request Submitted - ₹{withdrawal.amount}"
+
+    # Create email content
+    context = {
+        'financier': financier,
+        'withdrawal': withdrawal,
+        'request_date': withdrawal.created_at,
+    }
 
+    # Render HTML email
+    html_content = render_to_string('emails/withdrawal_request.html', context)
+    text_content = render_to_string('emails/withdrawal_request.txt', context)
 
+    # Queue email
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=text_content,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[financier.email]
+    )
+    email.attach_alternative(html_content, "text/html")
+    queue_email(email)
+
+    return True
+
+
+@_logged('withdrawal processed notification')
 def send_withdrawal_processed_notification(withdrawal):
     """Send email notification when a withdrawal is processed"""
-    try:
-        financier = withdrawal.financier.user
-        subject = f"Withdrawal Processed - ₹{withdrawal.amount}"
-        
-        # Create email content
-        context = {
-            'financier': financier,
-            'withdrawal': withdrawal,
-            'processed_date': withdrawal.processed_at,
-            'processed_by': withdrawal.processed_by,
-        }
-        
-        # Render HTML email
-        html_content = render_to_string('emails/withdrawal_processed.html', context)
-        text_content = render_to_string('emails/withdrawal_processed.txt', context)
-        
-        # Send email
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[financier.email]
-        )
-        email.attach_alternative(html_content, "text/html")
-        email.send()
-        
-        return True
-    except Exception as e:
-        print(f"Error sending withdrawal processed notification: {e}")
-        return False
+    financier = withdrawal.financier.user
+    subject = f"Withdrawal Processed - ₹{withdrawal.amount}"
+
+    # Create email content
+    context = {
+        'financier': financier,
+        'withdrawal': withdrawal,
+        'processed_date': withdrawal.processed_at,
+        'processed_by': withdrawal.processed_by,
+    }
+
+    # Render HTML email
+    html_content = render_to_string('emails/withdrawal_processed.html', context)
+    text_content = render_to_string('emails/withdrawal_processed.txt', context)
 
+    # Queue email
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=text_content,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[financier.email]
+    )
+    email.attach_alternative(html_content, "text/html")
+    queue_email(email)
 
+    return True
+
+
+def build_overdue_message(loan_application):
+    """Overdue reminder for a loan as an unsent EmailMultiAlternatives"""
+    student = loan_application.student
+    context = {
+        'student': student,
+        'loan': loan_application,
+        'overdue_days': loan_application.days_overdue,
+        'total_amount': loan_application.total_amount_due,
+        'outstanding': loan_application.outstanding_balance,
+        'due_date': loan_application.repayment_due_date,
+    }
+    message = EmailMultiAlternatives(
+        subject=f"Payment Overdue - Loan #{loan_application.id}",
+        body=render_to_string('emails/loan_overdue.txt', context),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[student.email],
+    )
+    message.attach_alternative(render_to_string('emails/loan_overdue.html', context), "text/html")
+    return message
+
+
+@_logged('overdue notification')
 def send_overdue_notification(loan_application):
     """Send email notification for overdue loans"""
-    try:
-        student = loan_application.student
-        subject = f"Payment Overdue - Loan #{loan_application.id}"
-        
-        # Create email content
-        context = {
-            'student': student,
-            'loan': loan_application,
-            'overdue_days': loan_application.days_overdue,
-            'total_amount': loan_application.total_amount_due,
-            'due_date': loan_application.repayment_due_date,
-        }
-        
-        # Render HTML email
-        html_content = render_to_string('emails/loan_overdue.html', context)
-        text_content = render_to_string('emails/loan_overdue.txt', context)
-        
-        # Send email
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[student.email]
-        )
-        email.attach_alternative(html_content, "text/html")
-        email.send()
-        
-        return True
-    except Exception as e:
-        print(f"Error sending overdue notification: {e}")
-        return False
+    queue_email(build_overdue_message(loan_application))
+    return True
 
 
+@_logged('welcome notification')
 def send_welcome_notification(user):
     """Send welcome email to new users"""
-    try:
-        subject = "Welcome to Student Loan Portal"
-        
-        # Create email content
-        context = {
-            'user': user,
-            'login_url': f"{settings.BASE_URL}/login/",
-        }
-        
-        # Render HTML email
-        html_content = render_to_string('emails/welcome.html', context)
-        text_content = render_to_string('emails/welcome.txt', context)
-        
-        # Send email
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[user.email]
-        )
-        email.attach_alternative(html_content, "text/html")
-        email.send()
-        
-        return True
-    except Exception as e:
-        print(f"Error sending welcome notification: {e}")
-        return False
+    subject = "Welcome to Student Loan Portal"
+
+    # Create email content
+    context = {
+        'user': user,
+        'login_url': f"{settings.BASE_URL}/login/",
+    }
+
+    # Render HTML email
+    html_content = render_to_string('emails/welcome.html', context)
+    text_content = render_to_string('emails/welcome.txt', context)
+
+    # Queue email
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=text_content,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user.email]
+    )
+    email.attach_alternative(html_content, "text/html")
+    queue_email(email)
+
+    return True
 
 
+@_logged('admin notification')
 def send_admin_notification(subject, message, admin_emails=None):
     """Send notification to admin users"""
-    try:
-        if not admin_emails:
-            admin_emails = User.objects.filter(is_staff=True).values_list('email', flat=True)
-        
-        if admin_emails:
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=list(admin_emails),
-                fail_silently=False,
-            )
-        
-        return True
-    except Exception as e:
-        print(f"Error sending admin notification: {e}")
-        return False
+    if not admin_emails:
+        admin_emails = User.objects.filter(is_staff=True).values_list('email', flat=True)
+
+    if admin_emails:
+        queue_email(EmailMessage(
+            subject=subject,
+            body=message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=list(admin_emails),
+        ))
+
+    return True
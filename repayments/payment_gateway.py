@@ -3,16 +3,26 @@ Payment Gateway Integration for Student Loan Portal
 
 This module provides integration with popular Indian payment gateways
 including Razorpay, PayU, and Paytm for processing loan repayments.
+Server-to-server API calls go through a shared GatewayTransport per
+gateway host (pooled keep-alive connections, timeouts and retries).
 """
 
+import base64
 import json
+import random
 import requests
 import hashlib
 import hmac
+import threading
 import time
 from decimal import Decimal
+from urllib.parse import urlsplit
 from django.conf import settings
+from django.dispatch import Signal
 from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .gateway_health import CircuitBreaker
 
 
 class PaymentGatewayError(Exception):
@@ -20,25 +30,144 @@ class PaymentGatewayError(Exception):
     pass
 
 
+# Sent after every HTTP attempt against a gateway with
+# gateway, method, path, status (None on network errors), elapsed (seconds),
+# attempt (1-based) and error (exception or None)
+gateway_request_finished = Signal()
+
+# Responses worth another attempt on idempotent calls
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class GatewayTransport:
+    """
+    Shared HTTP client for one gateway host
+    
+    Keeps a requests.Session with a bounded keep-alive connection pool, so
+    repeated calls reuse the TCP+TLS connection instead of handshaking each
+    time. Every request has connect/read timeouts. Idempotent calls are
+    retried on network errors and 429/5xx responses with jittered
+    exponential backoff; other calls are only retried when the connection
+    could not be established (the request never reached the gateway).
+    """
+    
+    def __init__(self, name, base_url, headers=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, backoff=None, pool_size=None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (
+            connect_timeout or getattr(settings, 'PAYMENT_GATEWAY_CONNECT_TIMEOUT', 3.05),
+            read_timeout or getattr(settings, 'PAYMENT_GATEWAY_READ_TIMEOUT', 10),
+        )
+        self.max_retries = getattr(settings, 'PAYMENT_GATEWAY_MAX_RETRIES', 2) if max_retries is None else max_retries
+        self.backoff = getattr(settings, 'PAYMENT_GATEWAY_BACKOFF', 0.25) if backoff is None else backoff
+        pool_size = pool_size or getattr(settings, 'PAYMENT_GATEWAY_POOL_SIZE', 10)
+        
+        self.session = requests.Session()
+        # Retries are handled in request(), where idempotency is known
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        parts = urlsplit(self.base_url)
+        self.session.mount(f"{parts.scheme}://{parts.netloc}", adapter)
+        self.session.headers.update(headers or {})
+    
+    def _sleep(self, attempt):
+        """Exponential backoff with full jitter before retry number `attempt`"""
+        time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+    
+    def request(self, method, path, idempotent=False, **kwargs):
+        """
+        Send a request and return the response (raises for HTTP errors)
+        
+        Raises:
+            requests.RequestException once the retries are exhausted
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        attempts = 1 + self.max_retries
+        for attempt in range(1, attempts + 1):
+            started = time.perf_counter()
+            response, error = None, None
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.RequestException as e:
+                error = e
+            gateway_request_finished.send(
+                sender=self.__class__,
+                gateway=self.name,
+                method=method,
+                path=path,
+                status=response.status_code if response is not None else None,
+                elapsed=time.perf_counter() - started,
+                attempt=attempt,
+                error=error,
+            )
+            
+            if error is not None:
+                retryable = idempotent or isinstance(error, requests.ConnectTimeout)
+            else:
+                retryable = idempotent and response.status_code in RETRY_STATUSES
+            if not retryable or attempt == attempts:
+                if error is not None:
+                    raise error
+                response.raise_for_status()
+                return response
+            if response is not None:
+                # Hand the connection back to the pool before retrying
+                response.close()
+            self._sleep(attempt)
+    
+    def post(self, path, idempotent=False, **kwargs):
+        return self.request('POST', path, idempotent=idempotent, **kwargs)
+    
+    def get(self, path, **kwargs):
+        return self.request('GET', path, idempotent=True, **kwargs)
+    
+    def close(self):
+        self.session.close()
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(name, base_url, headers=None):
+    """
+    Process-wide GatewayTransport for a gateway host and credentials
+    
+    Gateway objects are cheap and created in several places; sharing the
+    transport is what lets them share the connection pool.
+    """
+    key = (name, base_url, tuple(sorted((headers or {}).items())))
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = _transports[key] = GatewayTransport(name, base_url, headers=headers)
+        return transport
+
+
 class RazorpayGateway:
     """Razorpay payment gateway integration"""
     
     def __init__(self):
         self.key_id = getattr(settings, 'RAZORPAY_KEY_ID', '')
         self.key_secret = getattr(settings, 'RAZORPAY_KEY_SECRET', '')
-        self.base_url = 'https://api.razorpay.com/v1'
+        self.base_url = getattr(settings, 'RAZORPAY_BASE_URL', 'https://api.razorpay.com/v1')
+        self._transport = None
+    
+    @property
+    def transport(self):
+        """Shared pooled transport with the Basic auth header built once"""
+        if self._transport is None:
+            self._transport = get_transport('razorpay', self.base_url, headers={
+                'Authorization': f'Basic {self._get_auth_string()}',
+                'Content-Type': 'application/json',
+            })
+        return self._transport
     
     def create_order(self, amount, currency='INR', receipt=None):
         """Create a Razorpay order"""
         if not self.key_id or not self.key_secret:
             raise PaymentGatewayError("Razorpay credentials not configured")
         
-        url = f"{self.base_url}/orders"
-        headers = {
-            'Authorization': f'Basic {self._get_auth_string()}',
-            'Content-Type': 'application/json'
-        }
-        
         data = {
             'amount': int(amount * 100),  # Convert to paise
             'currency': currency,
@@ -49,8 +178,8 @@ class RazorpayGateway:
         }
         
         try:
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
+            # Not idempotent: a retried POST could create a second order
+            response = self.transport.post('orders', json=data)
             return response.json()
         except requests.RequestException as e:
             raise PaymentGatewayError(f"Razorpay order creation failed: {str(e)}")
@@ -68,26 +197,19 @@ class RazorpayGateway:
     
     def capture_payment(self, payment_id, amount):
         """Capture authorized payment"""
-        url = f"{self.base_url}/payments/{payment_id}/capture"
-        headers = {
-            'Authorization': f'Basic {self._get_auth_string()}',
-            'Content-Type': 'application/json'
-        }
-        
         data = {
             'amount': int(amount * 100)  # Convert to paise
         }
         
         try:
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
+            # Capturing the same payment twice is rejected, so retrying is safe
+            response = self.transport.post(f'payments/{payment_id}/capture', idempotent=True, json=data)
             return response.json()
         except requests.RequestException as e:
             raise PaymentGatewayError(f"Razorpay payment capture failed: {str(e)}")
     
     def _get_auth_string(self):
         """Get base64 encoded auth string"""
-        import base64
         credentials = f"{self.key_id}:{self.key_secret}"
         return base64.b64encode(credentials.encode()).decode()
 
@@ -215,93 +337,227 @@ class PaytmGateway:
         return base64.b64encode(checksum).decode()
 
 
+class GatewayUnavailable(PaymentGatewayError):
+    """Raised when a gateway's circuit breaker is open"""
+    pass
+
+
+def _razorpay_order(gateway, amount, order):
+    return gateway.create_order(amount, currency=order.get('currency', 'INR'), receipt=order.get('receipt'))
+
+
+def _payu_order(gateway, amount, order):
+    return gateway.create_payment_request(
+        amount,
+        firstname=order['name'],
+        email=order['email'],
+        phone=order.get('phone', ''),
+        product_info=order['description'],
+        success_url=order['success_url'],
+        failure_url=order['failure_url'],
+    )
+
+
+def _paytm_order(gateway, amount, order):
+    return gateway.create_transaction(
+        amount,
+        order_id=order['receipt'],
+        customer_id=order['customer_id'],
+        callback_url=order['callback_url'],
+    )
+
+
 class PaymentGatewayManager:
-    """Manager class for handling multiple payment gateways"""
+    """
+    Registry of payment gateways with a circuit breaker per gateway
+    
+    create_payment()/verify_payment() dispatch to one named gateway.
+    create_order() takes a gateway-neutral order and tries the preferred
+    gateway first, then the others in PAYMENT_GATEWAY_FAILOVER order,
+    skipping any whose circuit is open.
+    """
     
     def __init__(self):
         self.razorpay = RazorpayGateway()
         self.payu = PayUGateway()
         self.paytm = PaytmGateway()
+        self.gateways = {}
+        self.breakers = {}
+        self.register('razorpay', self.razorpay, self.razorpay.create_order,
+                      self.razorpay.verify_payment, _razorpay_order)
+        self.register('payu', self.payu, self.payu.create_payment_request,
+                      self.payu.verify_payment_response, _payu_order)
+        self.register('paytm', self.paytm, self.paytm.create_transaction,
+                      self.paytm.verify_transaction, _paytm_order)
+    
+    def register(self, name, gateway, create, verify, build_order):
+        """
+        Add a gateway to the registry
+        
+        Args:
+            name: Gateway name used by callers and in PAYMENT_GATEWAY_FAILOVER
+            gateway: Gateway instance
+            create: Callable creating a payment from gateway-specific kwargs
+            verify: Callable verifying a payment from gateway-specific kwargs
+            build_order: Callable (gateway, amount, order) creating a payment
+                from a gateway-neutral order dict (see order_for_repayment)
+        """
+        self.gateways[name] = {
+            'gateway': gateway,
+            'create': create,
+            'verify': verify,
+            'build_order': build_order,
+        }
+        self.breakers[name] = CircuitBreaker(name)
+    
+    def _get(self, gateway_name):
+        name = gateway_name.lower()
+        if name not in self.gateways:
+            raise PaymentGatewayError(f"Unsupported payment gateway: {gateway_name}")
+        return name, self.gateways[name]
+    
+    def _call(self, name, func, *args, **kwargs):
+        """Run func behind the gateway's circuit breaker, recording outcome and latency"""
+        breaker = self.breakers[name]
+        if not breaker.allow():
+            raise GatewayUnavailable(f"{name} is temporarily unavailable")
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            breaker.record(False, time.perf_counter() - started)
+            raise
+        except BaseException:
+            # Interrupted (worker timeout SystemExit, KeyboardInterrupt): no
+            # outcome to record, but a half-open probe slot must not leak
+            breaker.release()
+            raise
+        breaker.record(True, time.perf_counter() - started)
+        return result
     
     def create_payment(self, gateway_name, amount, **kwargs):
         """Create payment using specified gateway"""
-        if gateway_name.lower() == 'razorpay':
-            return self.razorpay.create_order(amount, **kwargs)
-        elif gateway_name.lower() == 'payu':
-            return self.payu.create_payment_request(amount, **kwargs)
-        elif gateway_name.lower() == 'paytm':
-            return self.paytm.create_transaction(amount, **kwargs)
-        else:
-            raise PaymentGatewayError(f"Unsupported payment gateway: {gateway_name}")
+        name, entry = self._get(gateway_name)
+        return self._call(name, entry['create'], amount, **kwargs)
     
     def verify_payment(self, gateway_name, **kwargs):
         """Verify payment using specified gateway"""
-        if gateway_name.lower() == 'razorpay':
-            return self.razorpay.verify_payment(**kwargs)
-        elif gateway_name.lower() == 'payu':
-            return self.payu.verify_payment_response(**kwargs)
-        elif gateway_name.lower() == 'paytm':
-            return self.paytm.verify_transaction(**kwargs)
-        else:
-            raise PaymentGatewayError(f"Unsupported payment gateway: {gateway_name}")
+        name, entry = self._get(gateway_name)
+        return entry['verify'](**kwargs)
+    
+    def failover_order(self, preferred=None):
+        """Gateway names in the order new orders should try them"""
+        names = list(getattr(settings, 'PAYMENT_GATEWAY_FAILOVER', self.gateways))
+        if preferred:
+            preferred = preferred.lower()
+            names = [preferred] + [name for name in names if name != preferred]
+        return [name for name in names if name in self.gateways]
+    
+    def create_order(self, amount, order, preferred=None):
+        """
+        Create a payment on the first healthy gateway
+        
+        Args:
+            amount: Amount in rupees
+            order: Gateway-neutral order dict (see order_for_repayment)
+            preferred: Gateway to try first
+        
+        Returns:
+            (gateway name, payment data)
+        """
+        if preferred:
+            self._get(preferred)
+        errors = []
+        for name in self.failover_order(preferred):
+            entry = self.gateways[name]
+            try:
+                return name, self._call(name, entry['build_order'], entry['gateway'], amount, order)
+            except PaymentGatewayError as e:
+                errors.append(f"{name}: {e}")
+        raise PaymentGatewayError(f"No payment gateway available ({'; '.join(errors)})")
+    
+    def health(self):
+        """Breaker state and rolling health figures for every gateway"""
+        return [self.breakers[name].snapshot() for name in self.gateways]
+
+
+def order_for_repayment(repayment, **overrides):
+    """Gateway-neutral order details for a repayment"""
+    student = repayment.loan.student
+    order = {
+        'receipt': f"loan_repayment_{repayment.id}",
+        'currency': 'INR',
+        'customer_id': f"STUDENT{student.pk}",
+        'name': student.first_name,
+        'email': student.email,
+        'phone': student.phone_number or '',
+        'description': f"Loan #{repayment.loan_id} repayment",
+        'success_url': f"{settings.BASE_URL}{settings.PAYMENT_SUCCESS_URL}",
+        'failure_url': f"{settings.BASE_URL}{settings.PAYMENT_FAILURE_URL}",
+        'callback_url': f"{settings.BASE_URL}{settings.PAYMENT_CALLBACK_URL}",
+    }
+    order.update(overrides)
+    return order
 
 
 # Global payment gateway manager instance
 payment_gateway = PaymentGatewayManager()
 
 
+def apply_payment_order(repayment, gateway_name, payment_data):
+    """Update repayment with a created gateway order (caller saves) and return the result"""
+    repayment.gateway_transaction_id = (
+        payment_data.get('id') or payment_data.get('txnid') or payment_data.get('ORDER_ID')
+    )
+    repayment.status = 'Processing'
+    repayment.gateway_response = payment_data
+    
+    return {
+        'success': True,
+        'payment_data': payment_data,
+        'gateway': gateway_name
+    }
+
+
+def apply_payment_error(repayment, gateway_name, error):
+    """Mark repayment failed after an order error (caller saves) and return the result"""
+    prefix = "Payment gateway error" if isinstance(error, PaymentGatewayError) else "Payment processing error"
+    repayment.status = 'Failed'
+    repayment.notes = f"{prefix}: {str(error)}"
+    
+    return {
+        'success': False,
+        'error': str(error),
+        'gateway': gateway_name
+    }
+
+
 def process_payment(repayment, gateway_name='razorpay', **gateway_params):
     """
     Process payment for a repayment record
     
     Args:
         repayment: Repayment model instance
-        gateway_name: Name of the payment gateway to use
-        **gateway_params: Additional parameters for the gateway
+        gateway_name: Name of the payment gateway to try first
+        **gateway_params: Overrides for the order details (e.g. receipt)
     
     Returns:
         dict: Payment processing result
     """
     try:
-        # Create payment using the specified gateway
-        payment_data = payment_gateway.create_payment(
-            gateway_name,
+        # Create payment on the requested gateway, failing over if it is unhealthy
+        gateway_name, payment_data = payment_gateway.create_order(
             float(repayment.amount_paid),
-            **gateway_params
+            order_for_repayment(repayment, **gateway_params),
+            preferred=gateway_name,
         )
-        
-        # Update repayment with gateway information
-        repayment.gateway_transaction_id = payment_data.get('id') or payment_data.get('txnid')
-        repayment.status = 'Processing'
-        repayment.gateway_response = payment_data
-        repayment.save()
-        
-        return {
-            'success': True,
-            'payment_data': payment_data,
-            'gateway': gateway_name
-        }
-        
-    except PaymentGatewayError as e:
-        repayment.status = 'Failed'
-        repayment.notes = f"Payment gateway error: {str(e)}"
+        result = apply_payment_order(repayment, gateway_name, payment_data)
         repayment.save()
-        
-        return {
-            'success': False,
-            'error': str(e),
-            'gateway': gateway_name
-        }
+        return result
     except Exception as e:
-        repayment.status = 'Failed'
-        repayment.notes = f"Payment processing error: {str(e)}"
+        result = apply_payment_error(repayment, gateway_name, e)
         repayment.save()
-        
-        return {
-            'success': False,
-            'error': str(e),
-            'gateway': gateway_name
-        }
+        return result
 
 
 def verify_payment(repayment, gateway_name='razorpay', **verification_params):
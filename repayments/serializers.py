@@ -0,0 +1,80 @@
+"""
+REST API serializers for repayments, withdrawals and investments
+
+Writes are validated by the matching web forms (RepaymentForm,
+WithdrawalForm); investment returns are read from the annotations of
+Investment.objects.with_returns().
+"""
+
+from rest_framework import serializers
+
+from loan_app.api import FormValidationMixin, SparseFieldsetsMixin
+from loans.models import LoanApplication
+from .forms import RepaymentForm, WithdrawalForm
+from .models import Investment, Repayment, Withdrawal
+
+
+class RepaymentSerializer(SparseFieldsetsMixin, FormValidationMixin, serializers.ModelSerializer):
+    """Repayment; students record manual repayments against their own approved loans"""
+    form_class = RepaymentForm
+    # Declared so the model's float MinValueValidator is not copied; RepaymentForm checks the amount
+    amount_paid = serializers.DecimalField(max_digits=10, decimal_places=2)
+    masked_account_number = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Repayment
+        fields = [
+            'id', 'loan', 'amount_paid', 'status', 'payment_method', 'payment_date', 'transaction_id',
+            'gateway_transaction_id', 'upi_id', 'bank_name', 'account_number', 'masked_account_number',
+            'ifsc_code', 'notes', 'processed_at', 'reconciled_at', 'created_at',
+        ]
+        read_only_fields = [
+            'status', 'payment_date', 'gateway_transaction_id', 'processed_at', 'reconciled_at', 'created_at',
+        ]
+        extra_kwargs = {'account_number': {'write_only': True}}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if 'loan' in self.fields and request is not None:
+            # Unknown and other students' loans are rejected as "does not exist"
+            self.fields['loan'].queryset = LoanApplication.objects.filter(student=request.user)
+
+    def validate(self, attrs):
+        self.loan = attrs['loan']
+        return super().validate(attrs)
+
+    def get_form_kwargs(self):
+        return {'loan': self.loan}
+
+
+class WithdrawalSerializer(SparseFieldsetsMixin, FormValidationMixin, serializers.ModelSerializer):
+    """Financier withdrawal request"""
+    form_class = WithdrawalForm
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    masked_account_number = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Withdrawal
+        fields = [
+            'id', 'financier', 'amount', 'withdrawal_method', 'status', 'bank_name', 'account_holder_name',
+            'account_number', 'masked_account_number', 'ifsc_code', 'upi_id', 'transaction_id', 'notes',
+            'processed_at', 'created_at',
+        ]
+        read_only_fields = ['financier', 'status', 'transaction_id', 'processed_at', 'created_at']
+        extra_kwargs = {'account_number': {'write_only': True}}
+
+
+class InvestmentSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """Investment with its expected returns (annotated)"""
+    investment_amount = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    expected_return = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    total_return = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Investment
+        fields = [
+            'id', 'financier', 'loan', 'investment_amount', 'expected_return_rate', 'expected_return',
+            'total_return', 'investment_method', 'status', 'investment_date', 'maturity_date', 'created_at',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,260 @@
+"""
+Reconciliation of repayments against gateway settlement files
+
+reconcile_settlements() reads a settlement CSV one row at a time and works
+in batches of BATCH_SIZE rows. Each batch is matched to repayments with
+two IN-queries: gateway_transaction_id first, then transaction_id for the
+rows still unmatched, both served by an index. Matched repayments whose
+status disagrees with the gateway are fixed with one bulk_update, and
+loan balances and portfolio statistics are kept in step. Only the
+current batch is held in memory, and exceptions are streamed to a CSV
+report, so memory use does not depend on the size of the file.
+
+Every repayment found in a file is stamped with reconciled_at. Gateway
+repayments in the settlement period that no file has contained are
+reported as missing at the gateway.
+"""
+
+import csv
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from loans.balances import rebuild_balances_for
+from portfolio.stats import apply_deltas, collect_deltas, tracker_for_model
+from .models import Repayment
+
+# Settlement rows matched and written per batch (and keys per IN-query)
+BATCH_SIZE = 2000
+
+# Accepted column names (compared lowercased) for each settlement field
+COLUMN_ALIASES = {
+    'order_id': ('order_id', 'gateway_transaction_id', 'txnid', 'orderid'),
+    'transaction_id': ('payment_id', 'transaction_id', 'mihpayid', 'txn_id'),
+    'amount': ('amount', 'txnamount', 'txn_amount'),
+    'status': ('status', 'txnstatus', 'payment_status'),
+}
+
+# Gateway row statuses (lowercased); rows without a status column count as settled
+SETTLED_STATUSES = {'captured', 'settled', 'success', 'txn_success', 'paid', 'processed'}
+FAILED_STATUSES = {'failed', 'failure', 'txn_failure'}
+
+# Local statuses a settlement may move to Paid or Failed
+FIXABLE_TO_PAID = {'Pending', 'Processing', 'Failed'}
+FIXABLE_TO_FAILED = {'Pending', 'Processing'}
+
+UPDATE_FIELDS = ['status', 'reconciled_at', 'updated_at']
+
+REPORT_COLUMNS = [
+    'result', 'order_id', 'transaction_id', 'settlement_amount', 'settlement_status',
+    'repayment_id', 'local_amount', 'local_status', 'note',
+]
+
+
+class SettlementFileError(Exception):
+    """Settlement file without the columns needed to match repayments"""
+    pass
+
+
+def _columns(fieldnames):
+    """Map settlement fields to the file's column names"""
+    present = {name.strip().lower(): name for name in fieldnames or []}
+    columns = {
+        field: next((present[alias] for alias in aliases if alias in present), None)
+        for field, aliases in COLUMN_ALIASES.items()
+    }
+    if not (columns['order_id'] or columns['transaction_id']) or not columns['amount']:
+        raise SettlementFileError(
+            "Settlement file needs an order or transaction id column and an amount column"
+        )
+    return columns
+
+
+def read_settlement_rows(stream):
+    """
+    Yield normalised settlement rows from a CSV text stream
+
+    Each row is a dict with 'line', 'order_id', 'transaction_id', 'amount'
+    (Decimal, or None if unparseable) and 'status' (lowercased, '' if absent).
+    """
+    reader = csv.DictReader(stream)
+    columns = _columns(reader.fieldnames)
+    for row in reader:
+        values = {
+            field: (row.get(column) or '').strip() if column else ''
+            for field, column in columns.items()
+        }
+        try:
+            amount = Decimal(values['amount'].replace(',', ''))
+        except InvalidOperation:
+            amount = None
+        yield {
+            'line': reader.line_num,
+            'order_id': values['order_id'],
+            'transaction_id': values['transaction_id'],
+            'amount': amount,
+            'status': values['status'].lower(),
+        }
+
+
+def _report(writer, result, row=None, repayment=None, note=''):
+    if writer is None:
+        return
+    row = row or {}
+    writer.writerow({
+        'result': result,
+        'order_id': row.get('order_id', repayment.gateway_transaction_id if repayment else ''),
+        'transaction_id': row.get('transaction_id', repayment.transaction_id if repayment else ''),
+        'settlement_amount': row.get('amount', ''),
+        'settlement_status': row.get('status', ''),
+        'repayment_id': repayment.pk if repayment else '',
+        'local_amount': repayment.amount_paid if repayment else '',
+        'local_status': repayment.status if repayment else '',
+        'note': note,
+    })
+
+
+def _lookup(rows):
+    """Repayments for a batch of rows: by gateway order id, then by transaction id"""
+    queryset = Repayment.objects.select_for_update(of=('self',)).select_related('loan')
+    order_keys = {row['order_id'] for row in rows if row['order_id']}
+    by_order = {
+        repayment.gateway_transaction_id: repayment
+        for repayment in queryset.filter(gateway_transaction_id__in=order_keys)
+    } if order_keys else {}
+
+    txn_keys = {
+        row['transaction_id'] for row in rows
+        if row['transaction_id'] and row['order_id'] not in by_order
+    }
+    by_txn = {
+        repayment.transaction_id: repayment
+        for repayment in queryset.filter(transaction_id__in=txn_keys)
+    } if txn_keys else {}
+    return by_order, by_txn
+
+
+def _reconcile_batch(rows, stats, now, writer, dry_run):
+    tracker = tracker_for_model(Repayment)
+    with transaction.atomic():
+        by_order, by_txn = _lookup(rows)
+        seen, changes, fixed_loans = {}, [], set()
+
+        for row in rows:
+            if (not row['order_id'] and not row['transaction_id']) or row['amount'] is None:
+                stats['invalid'] += 1
+                _report(writer, 'invalid', row, note=f"Line {row['line']}: missing id or amount")
+                continue
+
+            repayment = by_order.get(row['order_id']) or by_txn.get(row['transaction_id'])
+            if repayment is None:
+                stats['missing_locally'] += 1
+                _report(writer, 'missing_locally', row)
+                continue
+
+            seen[repayment.pk] = repayment
+            repayment.reconciled_at = now
+            if row['amount'] != repayment.amount_paid:
+                stats['amount_mismatch'] += 1
+                _report(writer, 'amount_mismatch', row, repayment)
+                continue
+
+            settled = not row['status'] or row['status'] in SETTLED_STATUSES
+            failed = row['status'] in FAILED_STATUSES
+            if failed and repayment.status == 'Paid':
+                stats['status_mismatch'] += 1
+                _report(writer, 'status_mismatch', row, repayment, note="Paid locally, failed at gateway")
+                continue
+
+            stats['matched'] += 1
+            target = None
+            if settled and repayment.status in FIXABLE_TO_PAID:
+                target = 'Paid'
+            elif failed and repayment.status in FIXABLE_TO_FAILED:
+                target = 'Failed'
+            if target:
+                before = tracker.current(repayment)
+                note = f"{repayment.status} -> {target}"
+                repayment.status = target
+                repayment.updated_at = now
+                changes.append((before, tracker.current(repayment)))
+                fixed_loans.add(repayment.loan_id)
+                stats['fixed'] += 1
+                _report(writer, 'fixed', row, repayment, note=note)
+
+        if not dry_run and seen:
+            Repayment.objects.bulk_update(list(seen.values()), UPDATE_FIELDS)
+            if changes:
+                apply_deltas(collect_deltas(tracker, changes))
+                # bulk_update bypasses Repayment.save(), so rebuild the affected loan
+                # balances (which also re-allocates their installments)
+                rebuild_balances_for(fixed_loans)
+
+
+def missing_at_gateway(since, until):
+    """Gateway repayments paid or in progress in [since, until] that no settlement file contained"""
+    return Repayment.objects.filter(
+        gateway_transaction_id__isnull=False,
+        status__in=['Paid', 'Processing'],
+        payment_date__date__gte=since,
+        payment_date__date__lte=until,
+        reconciled_at__isnull=True,
+    ).exclude(gateway_transaction_id='').order_by('payment_date', 'id')
+
+
+def reconcile_settlements(stream, report=None, since=None, until=None, batch_size=BATCH_SIZE,
+                          dry_run=False, now=None, on_batch=None):
+    """
+    Reconcile a settlement CSV against the repayments table
+
+    Args:
+        stream: Text stream of the settlement CSV
+        report: Optional text stream the exceptions and fixes are written to as CSV
+        since, until: Settlement period (dates); when both are given, gateway
+            repayments in it that were never settled are reported as missing at gateway
+        batch_size: Settlement rows per lookup/update batch
+        dry_run: Classify and report the file's rows only; write nothing (and skip the
+            missing-at-gateway check, which relies on the reconciled_at stamps)
+        now: Reconciliation timestamp (defaults to now)
+        on_batch: Called with the running stats dict after every batch
+
+    Returns:
+        dict with 'rows', 'matched', 'fixed', 'amount_mismatch', 'status_mismatch',
+        'missing_locally', 'missing_at_gateway', 'invalid', 'batches' and 'elapsed'
+
+    Raises:
+        SettlementFileError if the file lacks the columns needed for matching
+    """
+    now = now or timezone.now()
+    stats = {
+        'rows': 0, 'matched': 0, 'fixed': 0, 'amount_mismatch': 0, 'status_mismatch': 0,
+        'missing_locally': 0, 'missing_at_gateway': 0, 'invalid': 0, 'batches': 0, 'elapsed': 0.0,
+    }
+    started = time.monotonic()
+    writer = None
+    if report is not None:
+        writer = csv.DictWriter(report, fieldnames=REPORT_COLUMNS)
+        writer.writeheader()
+
+    rows = read_settlement_rows(stream)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        stats['rows'] += len(batch)
+        _reconcile_batch(batch, stats, now, writer, dry_run)
+        stats['batches'] += 1
+        stats['elapsed'] = time.monotonic() - started
+        if on_batch:
+            on_batch(stats)
+
+    if since and until and not dry_run:
+        for repayment in missing_at_gateway(since, until).iterator(chunk_size=batch_size):
+            stats['missing_at_gateway'] += 1
+            _report(writer, 'missing_at_gateway', repayment=repayment)
+
+    stats['elapsed'] = time.monotonic() - started
+    return stats
@@ -1,3 +1,1127 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import csv
+import hashlib
+import hmac
+import io
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+from django.template import TemplateDoesNotExist
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from loan_app.asgi import application as asgi_application
+from loan_app.pagination import KeysetPaginator
+from loan_app.testing import QueryPlanAssertionsMixin
+from loans.models import LoanApplication
+from portfolio.stats import rebuild_stats, update_tracked
+from search.models import SearchDocument
+from users.models import StudentUser, FinancierUser
+from .models import GatewayEvent, Repayment, Withdrawal, Investment
+from .async_gateway import (
+    AsyncPaymentGatewayManager, AsyncRazorpayGateway, _transports as async_transports, async_payment_gateway,
+)
+from .gateway_health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from .imports import StatementFileError, import_statement, statement_format
+from .payment_gateway import (
+    PaymentGatewayError, PaymentGatewayManager, PaytmGateway, RazorpayGateway, gateway_request_finished,
+    payment_gateway,
+)
+from .settlements import SettlementFileError, reconcile_settlements
+from .webhooks import process_batch
+
+
+class RepaymentQueryPlanTests(QueryPlanAssertionsMixin, TestCase):
+    """Hot Repayment, Withdrawal and Investment queries must stay on an index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = StudentUser.objects.create_user(
+            email='student@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='Student',
+            student_id='STU001',
+            university='Test University',
+            gpa=Decimal('5.00'),
+        )
+        cls.loan = LoanApplication.objects.create(
+            student=cls.student,
+            amount=5000,
+            reason='Tuition',
+            status='Approved',
+            repayment_due_date=timezone.now().date() + timedelta(days=90),
+        )
+        for i in range(10):
+            Repayment.objects.create(
+                loan=cls.loan,
+                amount_paid=Decimal('100.00'),
+                status=['Paid', 'Failed'][i % 2],
+                gateway_transaction_id=f'order_{i}',
+            )
+
+        financier_user = StudentUser.objects.create_user(
+            email='financier@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='Financier',
+            student_id='FIN001',
+            university='N/A',
+            gpa=Decimal('0.00'),
+            user_type='financier',
+        )
+        cls.financier = FinancierUser.objects.create(user=financier_user, financier_id='F001')
+
+    def test_loan_paid_repayments(self):
+        self.assertIndexedQuery(
+            Repayment.objects.filter(loan=self.loan, status='Paid')
+        )
+
+    def test_repayments_by_status_newest_first(self):
+        self.assertIndexedQuery(
+            Repayment.objects.filter(status='Paid').order_by('-payment_date'),
+            'repayment_status_date_idx',
+        )
+
+    def test_gateway_callback_lookup(self):
+        self.assertIndexedQuery(
+            Repayment.objects.filter(gateway_transaction_id='order_3', loan__student=self.student),
+            'repayment_gateway_txn_idx',
+        )
+
+    def test_gateway_event_dedup_lookup(self):
+        self.assertIndexedQuery(
+            GatewayEvent.objects.filter(gateway='razorpay', event_id='evt_1')
+        )
+
+    def test_settlement_transaction_id_lookup(self):
+        self.assertIndexedQuery(
+            Repayment.objects.filter(transaction_id__in=['pay_1', 'pay_2']),
+            'repayment_txn_idx',
+        )
+
+    def test_repayment_keyset_page(self):
+        anchor = Repayment.objects.order_by('-payment_date', '-id')[3]
+        paginator = KeysetPaginator(Repayment.objects.all(), ('-payment_date', '-id'), per_page=3)
+        queryset = Repayment.objects.filter(
+            paginator._seek([anchor.payment_date, anchor.id], forward=True)
+        ).order_by('-payment_date', '-id')[:4]
+        self.assertIndexedQuery(queryset, 'repayment_date_id_idx')
+
+    def test_financier_withdrawals(self):
+        self.assertIndexedQuery(
+            Withdrawal.objects.filter(financier=self.financier).order_by('-created_at'),
+            'withdrawal_fin_created_idx',
+        )
+
+    def test_maturing_investments(self):
+        self.assertIndexedQuery(
+            Investment.objects.filter(status='Active', maturity_date__lte=timezone.now()),
+            'investment_status_mat_idx',
+        )
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    """Keep-alive HTTP/1.1 stand-in for the Razorpay API, scripted per test"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.requests.append((self.path, self.headers.get('Authorization'), json.loads(body)))
+        status, delay = self.server.script.pop(0) if self.server.script else (200, 0)
+        time.sleep(delay)
+        payload = json.dumps({'id': 'order_1', 'status': 'created'}).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (timeout tests)
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubGatewayMixin:
+    """Start a StubGatewayHandler server and point the Razorpay settings at it"""
+
+    def start_stub_gateway(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubGatewayHandler)
+        self.server.connections = 0
+        self.server.requests = []
+        self.server.script = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.gateway_settings = {
+            'RAZORPAY_BASE_URL': f'http://127.0.0.1:{self.server.server_port}/v1',
+            'RAZORPAY_KEY_ID': 'rzp_test',
+            'RAZORPAY_KEY_SECRET': 'secret',
+        }
+        settings = override_settings(
+            PAYMENT_GATEWAY_READ_TIMEOUT=0.5, PAYMENT_GATEWAY_BACKOFF=0, **self.gateway_settings
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.calls = []
+        receiver = lambda sender, **kwargs: self.calls.append(kwargs)
+        gateway_request_finished.connect(receiver)
+        self.addCleanup(gateway_request_finished.disconnect, receiver)
+
+
+class GatewayTransportTests(StubGatewayMixin, SimpleTestCase):
+    """Gateway calls reuse pooled connections, time out and retry only when safe"""
+
+    def setUp(self):
+        self.start_stub_gateway()
+        self.gateway = RazorpayGateway()
+
+    def tearDown(self):
+        self.gateway.transport.close()
+
+    def test_calls_share_one_connection_and_auth_header(self):
+        for _ in range(3):
+            self.assertEqual(self.gateway.create_order(Decimal('100.00'))['id'], 'order_1')
+        # A second gateway object shares the same pool
+        RazorpayGateway().capture_payment('pay_1', Decimal('100.00'))
+
+        self.assertEqual(self.server.connections, 1)
+        path, auth, body = self.server.requests[-1]
+        self.assertEqual(path, '/v1/payments/pay_1/capture')
+        self.assertEqual(auth, 'Basic cnpwX3Rlc3Q6c2VjcmV0')
+        self.assertEqual(body, {'amount': 10000})
+        self.assertEqual([call['status'] for call in self.calls], [200] * 4)
+        self.assertTrue(all(call['elapsed'] > 0 for call in self.calls))
+
+    def test_idempotent_call_retried_on_server_error(self):
+        self.server.script = [(503, 0), (502, 0)]
+        self.gateway.capture_payment('pay_1', Decimal('50.00'))
+        self.assertEqual([call['status'] for call in self.calls], [503, 502, 200])
+        self.assertEqual([call['attempt'] for call in self.calls], [1, 2, 3])
+
+    def test_order_creation_not_retried(self):
+        self.server.script = [(503, 0)]
+        with self.assertRaises(PaymentGatewayError):
+            self.gateway.create_order(Decimal('50.00'))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_slow_gateway_times_out(self):
+        self.server.script = [(200, 2)]
+        started = time.monotonic()
+        with self.assertRaisesMessage(PaymentGatewayError, 'Razorpay order creation failed'):
+            self.gateway.create_order(Decimal('50.00'))
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertIsNone(self.calls[0]['status'])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """Breakers open on failures or slow calls and probe before closing again"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            'razorpay', window=60, min_calls=4, failure_rate=0.5, slow_call=1.0,
+            slow_rate=0.5, open_for=30, probes=1, clock=self.clock,
+        )
+
+    def test_opens_on_failure_rate_then_half_open_probe_closes(self):
+        for ok in (True, False, True, False):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record(ok, 0.1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+        self.clock.now += 30
+        self.assertEqual(self.breaker.snapshot()['state'], HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        # Only one probe at a time
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record(True, 0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_slow_calls_open_and_failed_probe_reopens(self):
+        for _ in range(4):
+            self.breaker.allow()
+            self.breaker.record(True, 2.0)
+        self.assertEqual(self.breaker.state, OPEN)
+
+        self.clock.now += 31
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.snapshot()['retry_in'], 30)
+
+    def test_old_calls_leave_the_window(self):
+        for _ in range(3):
+            self.breaker.record(False, 0.1)
+        self.clock.now += 61
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.snapshot()['calls'], 1)
+
+
+class DownGateway:
+    def __init__(self):
+        self.calls = 0
+
+    def create_order(self, amount, **kwargs):
+        self.calls += 1
+        raise PaymentGatewayError('503 Service Unavailable')
+
+
+@override_settings(PAYMENT_GATEWAY_FAILOVER=['razorpay', 'payu', 'paytm'], PAYMENT_GATEWAY_BREAKER_MIN_CALLS=2)
+class GatewayFailoverTests(TestCase):
+    """New orders fail over to the next gateway and skip open circuits"""
+
+    order = {
+        'receipt': 'loan_repayment_1', 'currency': 'INR', 'customer_id': 'STUDENT1',
+        'name': 'Test', 'email': 'student@example.com', 'phone': '', 'description': 'Loan #1 repayment',
+        'success_url': '/ok/', 'failure_url': '/fail/', 'callback_url': '/cb/',
+    }
+
+    def setUp(self):
+        self.manager = PaymentGatewayManager()
+        self.down = DownGateway()
+        self.manager.register(
+            'razorpay', self.down, self.down.create_order, None,
+            lambda gateway, amount, order: gateway.create_order(amount),
+        )
+
+    def test_fails_over_and_skips_open_circuit(self):
+        for _ in range(2):
+            name, data = self.manager.create_order(100, self.order, preferred='razorpay')
+            self.assertEqual(name, 'payu')
+            self.assertEqual(data['txnid'][:3], 'TXN')
+        self.assertEqual(self.down.calls, 2)
+
+        # Circuit is open now: Razorpay is not even attempted
+        name, _ = self.manager.create_order(100, self.order, preferred='razorpay')
+        self.assertEqual(name, 'payu')
+        self.assertEqual(self.down.calls, 2)
+        health = {entry['gateway']: entry for entry in self.manager.health()}
+        self.assertEqual(health['razorpay']['state'], OPEN)
+        self.assertEqual(health['payu']['state'], CLOSED)
+
+    def test_interrupted_probe_is_released(self):
+        breaker = self.manager.breakers['razorpay']
+        for _ in range(2):
+            breaker.allow()
+            breaker.record(False, 0.1)
+        breaker.opened_at -= breaker.open_for
+
+        def interrupted(*args, **kwargs):
+            self.assertEqual(breaker.state, HALF_OPEN)
+            raise SystemExit(1)
+
+        with self.assertRaises(SystemExit):
+            self.manager._call('razorpay', interrupted)
+        self.assertTrue(breaker.allow())
+
+    async def test_cancelled_probe_is_released(self):
+        breaker = self.manager.breakers['razorpay']
+        for _ in range(2):
+            breaker.allow()
+            breaker.record(False, 0.1)
+        breaker.opened_at -= breaker.open_for
+        started = asyncio.Event()
+
+        async def hang(gateway, amount, order):
+            started.set()
+            await asyncio.sleep(60)
+
+        manager = AsyncPaymentGatewayManager(self.manager)
+        call = asyncio.create_task(manager._call('razorpay', hang, self.down, 100, self.order))
+        await started.wait()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        call.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await call
+
+        # The probe slot is free again for the next call
+        self.assertTrue(breaker.allow())
+
+    def test_unknown_gateway_rejected(self):
+        with self.assertRaisesMessage(PaymentGatewayError, 'Unsupported payment gateway'):
+            self.manager.create_order(100, self.order, preferred='stripe')
+
+    def test_health_endpoint_is_staff_only(self):
+        url = reverse('repayments_api:gateway_health_api')
+        user = StudentUser.objects.create_user(
+            email='admin@example.com', password='testpass123', first_name='Admin', last_name='User',
+            student_id='ADM001', university='N/A', gpa=Decimal('0.00'), is_staff=True,
+        )
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(user)
+        response = self.client.get(url).json()
+        self.assertEqual(response['failover_order'], ['razorpay', 'payu', 'paytm'])
+        self.assertEqual({entry['gateway'] for entry in response['gateways']}, {'razorpay', 'payu', 'paytm'})
+
+
+class AsyncGatewayTests(StubGatewayMixin, TestCase):
+    """The async client keeps the sync client's policy and backs the async payment views"""
+
+    def setUp(self):
+        self.start_stub_gateway()
+
+    async def test_async_orders_share_pool_and_retry_capture(self):
+        gateway = AsyncRazorpayGateway()
+        orders = await asyncio.gather(*(gateway.create_order(Decimal('10.00')) for _ in range(5)))
+        self.assertEqual({order['id'] for order in orders}, {'order_1'})
+
+        self.server.script = [(503, 0)]
+        await gateway.capture_payment('pay_1', Decimal('10.00'))
+        self.assertEqual([call['status'] for call in self.calls][-2:], [503, 200])
+        self.assertLessEqual(self.server.connections, 5)
+        self.assertEqual(self.server.requests[-1][1], 'Basic cnpwX3Rlc3Q6c2VjcmV0')
+        await gateway.transport.aclose()
+
+    async def test_async_order_times_out(self):
+        self.server.script = [(200, 2)]
+        gateway = AsyncRazorpayGateway()
+        with self.assertRaisesMessage(PaymentGatewayError, 'Razorpay order creation failed'):
+            await gateway.create_order(Decimal('10.00'))
+        await gateway.transport.aclose()
+
+    def create_repayment(self):
+        self.student = StudentUser.objects.create_user(
+            email='student@example.com', password='testpass123', first_name='Test', last_name='Student',
+            student_id='STU001', university='Test University', gpa=Decimal('5.00'),
+        )
+        loan = LoanApplication.objects.create(
+            student=self.student, amount=5000, reason='Tuition', status='Approved',
+            repayment_due_date=timezone.now().date() + timedelta(days=90),
+        )
+        # A failed earlier attempt being retried (new Pending repayments are auto-marked Paid)
+        return Repayment.objects.create(loan=loan, amount_paid=Decimal('500.00'), status='Failed')
+
+    @contextlib.asynccontextmanager
+    async def serving(self):
+        """Run loan_app.asgi.application's lifespan around the block, as uvicorn does"""
+        received, sent = asyncio.Queue(), asyncio.Queue()
+        lifespan = asyncio.ensure_future(asgi_application({'type': 'lifespan'}, received.get, sent.put))
+        await received.put({'type': 'lifespan.startup'})
+        self.assertEqual((await sent.get())['type'], 'lifespan.startup.complete')
+        try:
+            yield
+        finally:
+            await received.put({'type': 'lifespan.shutdown'})
+            self.assertEqual((await sent.get())['type'], 'lifespan.shutdown.complete')
+            await lifespan
+
+    async def test_initiate_payment_view(self):
+        repayment = await sync_to_async(self.create_repayment)()
+        url = reverse('repayments:initiate_payment', args=[repayment.pk])
+
+        self.assertEqual((await self.async_client.post(url)).status_code, 302)
+        await self.async_client.aforce_login(self.student)
+        with mock.patch.multiple(async_payment_gateway.razorpay, **{
+            'base_url': self.gateway_settings['RAZORPAY_BASE_URL'],
+            'key_id': 'rzp_test',
+            'key_secret': 'secret',
+            '_headers': None,
+        }):
+            async with self.serving():
+                response = (await self.async_client.post(url, {'gateway': 'razorpay'})).json()
+                session = async_payment_gateway.razorpay.transport.session
+        # Shutdown closed the loop's sessions
+        self.assertTrue(session.closed)
+
+        self.assertEqual(response['gateway'], 'razorpay')
+        await repayment.arefresh_from_db()
+        self.assertEqual(repayment.status, 'Processing')
+        self.assertEqual(repayment.gateway_transaction_id, 'order_1')
+        self.assertEqual(self.server.requests[0][2]['receipt'], f'loan_repayment_{repayment.pk}')
+
+    async def test_initiate_payment_outside_serving_loop_uses_sync_client(self):
+        repayment = await sync_to_async(self.create_repayment)()
+        url = reverse('repayments:initiate_payment', args=[repayment.pk])
+        await self.async_client.aforce_login(self.student)
+        with mock.patch.multiple(payment_gateway.razorpay, **{
+            'base_url': self.gateway_settings['RAZORPAY_BASE_URL'],
+            'key_id': 'rzp_test',
+            'key_secret': 'secret',
+            '_transport': None,
+        }):
+            response = (await self.async_client.post(url, {'gateway': 'razorpay'})).json()
+            payment_gateway.razorpay.transport.close()
+
+        self.assertEqual(response['gateway'], 'razorpay')
+        self.assertEqual(len(self.server.requests), 1)
+        # No aiohttp session left behind on this one-off loop
+        self.assertNotIn(asyncio.get_running_loop(), async_transports)
+
+
+@override_settings(RAZORPAY_WEBHOOK_SECRET='whsec', PAYTM_MERCHANT_KEY='paytm_key')
+class GatewayWebhookTests(TestCase):
+    """Webhook events are verified, stored once and applied once by the worker"""
+
+    def setUp(self):
+        student = StudentUser.objects.create_user(
+            email='student@example.com', password='testpass123', first_name='Test', last_name='Student',
+            student_id='STU001', university='Test University', gpa=Decimal('5.00'),
+        )
+        self.loan = LoanApplication.objects.create(
+            student=student, amount=5000, reason='Tuition', status='Approved',
+            repayment_due_date=timezone.now().date() + timedelta(days=90),
+        )
+        self.repayment = Repayment.objects.create(
+            loan=self.loan, amount_paid=Decimal('500.00'), status='Processing', gateway_transaction_id='order_1',
+        )
+
+    def post_razorpay(self, event='payment.captured', event_id='evt_1', amount=50000, secret='whsec'):
+        body = json.dumps({
+            'event': event,
+            'payload': {'payment': {'entity': {'id': 'pay_1', 'order_id': 'order_1', 'amount': amount}}},
+        }).encode()
+        return self.client.post(
+            reverse('repayments:gateway_webhook', args=['razorpay']),
+            body,
+            content_type='application/json',
+            headers={
+                'X-Razorpay-Event-Id': event_id,
+                'X-Razorpay-Signature': hmac.new(secret.encode(), body, hashlib.sha256).hexdigest(),
+            },
+        )
+
+    def test_event_is_stored_and_acknowledged(self):
+        response = self.post_razorpay()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'success': True, 'duplicate': False})
+        event = GatewayEvent.objects.get()
+        self.assertEqual((event.status, event.order_id), ('Pending', 'order_1'))
+        self.repayment.refresh_from_db()
+        self.assertEqual(self.repayment.status, 'Processing')
+
+    def test_duplicate_delivery_is_a_no_op(self):
+        self.post_razorpay()
+        with self.assertNumQueries(4):  # savepoint, conflicting INSERT, rollback and release
+            response = self.post_razorpay()
+
+        self.assertEqual(response.json(), {'success': True, 'duplicate': True})
+        self.assertEqual(GatewayEvent.objects.count(), 1)
+
+    def test_bad_signature_is_rejected(self):
+        response = self.post_razorpay(secret='wrong')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(GatewayEvent.objects.exists())
+
+    def test_unknown_gateway(self):
+        response = self.client.post(reverse('repayments:gateway_webhook', args=['stripe']), {})
+        self.assertEqual(response.status_code, 404)
+
+    def test_worker_applies_event_exactly_once(self):
+        self.post_razorpay()
+
+        self.assertEqual(process_batch()['processed'], 1)
+        self.assertEqual(process_batch()['claimed'], 0)
+        self.repayment.refresh_from_db()
+        self.loan.refresh_from_db()
+        self.assertEqual(self.repayment.status, 'Paid')
+        self.assertEqual(self.repayment.gateway_response['webhook']['event_id'], 'evt_1')
+        self.assertEqual(self.loan.outstanding_balance, self.loan.total_amount_due - Decimal('500.00'))
+        self.assertEqual(GatewayEvent.objects.get().repayment, self.repayment)
+
+    def test_late_failure_does_not_undo_payment(self):
+        self.post_razorpay()
+        self.post_razorpay(event='payment.failed', event_id='evt_2')
+
+        self.assertEqual(process_batch()['processed'], 2)
+        self.repayment.refresh_from_db()
+        self.assertEqual(self.repayment.status, 'Paid')
+
+    def test_amount_mismatch_is_not_applied(self):
+        self.post_razorpay(amount=100)
+
+        self.assertEqual(process_batch()['failed'], 1)
+        self.repayment.refresh_from_db()
+        self.assertEqual(self.repayment.status, 'Processing')
+
+    def test_unmatched_order_is_retried(self):
+        self.repayment.gateway_transaction_id = 'order_other'
+        self.repayment.save()
+        self.post_razorpay()
+
+        self.assertEqual(process_batch()['retried'], 1)
+        event = GatewayEvent.objects.get()
+        self.assertEqual(event.status, 'Pending')
+        self.assertGreater(event.next_attempt_at, timezone.now())
+
+    def test_paytm_notification(self):
+        data = {'ORDERID': 'order_1', 'TXNID': 'txn_1', 'TXNAMOUNT': '500.00', 'STATUS': 'TXN_FAILURE'}
+        data['CHECKSUMHASH'] = PaytmGateway()._generate_checksum(data)
+        url = reverse('repayments:gateway_webhook', args=['paytm'])
+
+        self.assertEqual(self.client.post(url, data).json()['duplicate'], False)
+        self.assertEqual(self.client.post(url, data).json()['duplicate'], True)
+        self.assertEqual(self.client.post(url, {**data, 'STATUS': 'TXN_SUCCESS'}).status_code, 400)
+        process_batch()
+        self.repayment.refresh_from_db()
+        self.assertEqual(self.repayment.status, 'Failed')
+
+
+class SettlementReconciliationTests(TestCase):
+    """Settlement files are matched in batches, classified, and fix statuses in bulk"""
+
+    def setUp(self):
+        student = StudentUser.objects.create_user(
+            email='student@example.com', password='testpass123', first_name='Test', last_name='Student',
+            student_id='STU001', university='Test University', gpa=Decimal('5.00'),
+        )
+        self.loan = LoanApplication.objects.create(
+            student=student, amount=5000, reason='Tuition', status='Approved',
+            repayment_due_date=timezone.now().date() + timedelta(days=90),
+        )
+
+        def repayment(status, **fields):
+            return Repayment.objects.create(loan=self.loan, amount_paid=Decimal('500.00'), status=status, **fields)
+
+        self.processing = repayment('Processing', gateway_transaction_id='order_1')
+        self.paid = repayment('Paid', gateway_transaction_id='order_2')
+        self.mismatch = repayment('Processing', gateway_transaction_id='order_3')
+        self.by_reference = repayment('Failed', transaction_id='pay_4')
+        self.unsettled = repayment('Paid', gateway_transaction_id='order_5')
+        self.today = timezone.now().date()
+
+    def settlement(self, *rows):
+        lines = ['order_id,payment_id,amount,status'] + [','.join(row) for row in rows]
+        return io.StringIO('\n'.join(lines) + '\n')
+
+    def reconcile(self, **kwargs):
+        report = io.StringIO()
+        stats = reconcile_settlements(self.settlement(
+            ('order_1', 'pay_1', '500.00', 'captured'),
+            ('order_2', 'pay_2', '500.00', 'failed'),
+            ('order_3', 'pay_3', '400.00', 'captured'),
+            ('', 'pay_4', '500', 'settled'),
+            ('order_9', 'pay_9', '100.00', 'captured'),
+            ('', '', 'x', ''),
+        ), report=report, since=self.today, until=self.today, batch_size=2, **kwargs)
+        return stats, list(csv.DictReader(io.StringIO(report.getvalue())))
+
+    def test_rows_are_classified_and_fixed(self):
+        stats, report = self.reconcile()
+
+        self.assertEqual(stats['rows'], 6)
+        self.assertEqual(stats['batches'], 3)
+        self.assertEqual(
+            {key: stats[key] for key in ('matched', 'fixed', 'amount_mismatch', 'status_mismatch',
+                                         'missing_locally', 'missing_at_gateway', 'invalid')},
+            {'matched': 2, 'fixed': 2, 'amount_mismatch': 1, 'status_mismatch': 1,
+             'missing_locally': 1, 'missing_at_gateway': 1, 'invalid': 1},
+        )
+        statuses = dict(Repayment.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[self.processing.pk], 'Paid')
+        self.assertEqual(statuses[self.by_reference.pk], 'Paid')
+        self.assertEqual(statuses[self.mismatch.pk], 'Processing')
+        self.assertEqual(statuses[self.paid.pk], 'Paid')
+        self.assertFalse(Repayment.objects.filter(pk=self.unsettled.pk, reconciled_at__isnull=False).exists())
+        self.assertEqual(
+            [row['repayment_id'] for row in report if row['result'] == 'missing_at_gateway'],
+            [str(self.unsettled.pk)],
+        )
+
+    def test_fixes_refresh_loan_balance(self):
+        self.reconcile()
+
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.total_paid, Decimal('2000.00'))
+        self.assertEqual(self.loan.paid_installments, 4)
+
+    def test_fixes_settle_installments(self):
+        installments = list(self.loan.installments.order_by('number'))
+        self.assertEqual(sum(i.amount_paid for i in installments), Decimal('1000.00'))
+        self.reconcile()
+
+        # The two fixed repayments of 500 are allocated to the first installment
+        first, second, third = self.loan.installments.order_by('number')
+        self.assertEqual(first.amount_paid, Decimal('2000.00'))
+        self.assertFalse(first.settled)
+        self.assertEqual(second.amount_paid, Decimal('0.00'))
+
+        # One more fixed repayment settles it
+        Repayment.objects.create(loan=self.loan, amount_paid=Decimal('500.00'), status='Processing',
+                                 gateway_transaction_id='order_6')
+        reconcile_settlements(self.settlement(('order_6', 'pay_6', '500.00', 'captured')))
+        first, second, third = self.loan.installments.order_by('number')
+        self.assertTrue(first.settled)
+        self.assertEqual(second.amount_paid, Decimal('500.00') - (first.amount_due - Decimal('2000.00')))
+
+    def test_dry_run_writes_nothing(self):
+        stats, _ = self.reconcile(dry_run=True)
+
+        self.assertEqual(stats['fixed'], 2)
+        self.assertEqual(stats['missing_at_gateway'], 0)
+        self.assertEqual(Repayment.objects.filter(status='Paid').count(), 2)
+        self.assertFalse(Repayment.objects.filter(reconciled_at__isnull=False).exists())
+
+    def test_queries_per_batch_are_bounded(self):
+        rows = [(f'order_x{i}', f'pay_x{i}', '10.00', 'captured') for i in range(50)]
+        # Per batch: savepoint, order id IN-query, transaction id IN-query, release
+        with self.assertNumQueries(4 * 5):
+            reconcile_settlements(self.settlement(*rows), batch_size=10)
+
+    def test_file_without_amount_column(self):
+        with self.assertRaises(SettlementFileError):
+            reconcile_settlements(io.StringIO('order_id,status\norder_1,captured\n'))
+
+    def test_admin_upload(self):
+        admin_user = StudentUser.objects.create_superuser(
+            email='admin@example.com', password='testpass123', first_name='Admin', last_name='User',
+            student_id='ADM001', university='N/A', gpa=Decimal('0.00'),
+        )
+        self.client.force_login(admin_user)
+        upload = SimpleUploadedFile(
+            'settlement.csv', self.settlement(('order_1', 'pay_1', '500.00', 'captured')).getvalue().encode()
+        )
+
+        response = self.client.post(
+            reverse('admin:repayments_repayment_reconcile_settlements'), {'settlement_file': upload}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        report = b''.join(response.streaming_content).decode()
+        self.assertIn('fixed', report)
+        self.processing.refresh_from_db()
+        self.assertEqual(self.processing.status, 'Paid')
+
+
+class RepaymentExportTests(TestCase):
+    """Repayment, withdrawal and investment exports reuse the admin filters and annotations"""
+
+    @classmethod
+    def setUpTestData(cls):
+        student = StudentUser.objects.create_user(
+            email='student@example.com', password='testpass123', first_name='Test', last_name='Student',
+            student_id='STU001', university='Test University', gpa=Decimal('5.00'),
+        )
+        loan = LoanApplication.objects.create(
+            student=student, amount=5000, reason='Tuition', status='Approved',
+            repayment_due_date=timezone.now().date() + timedelta(days=90),
+        )
+        Repayment.objects.create(loan=loan, amount_paid=Decimal('100.00'), payment_method='UPI')
+        Repayment.objects.create(loan=loan, amount_paid=Decimal('200.00'), payment_method='Cash')
+        financier_user = StudentUser.objects.create_user(
+            email='financier@example.com', password='testpass123', first_name='Test', last_name='Financier',
+            student_id='FIN001', university='N/A', gpa=Decimal('0.00'), user_type='financier',
+        )
+        financier = FinancierUser.objects.create(user=financier_user, financier_id='F001')
+        cls.investment = Investment.objects.create(
+            financier=financier, loan=loan, investment_amount=Decimal('2500.00'),
+            maturity_date=timezone.now() + timedelta(days=90),
+        )
+        cls.admin = StudentUser.objects.create_superuser(
+            email='admin@example.com', password='testpass123', first_name='Admin', last_name='User',
+            student_id='ADM001', university='N/A', gpa=Decimal('0.00'),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(f'repayments:{name}'), params)
+        return list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+
+    def test_repayment_export_filters(self):
+        rows = self.export('admin_export', payment_method='UPI')
+
+        self.assertEqual([row['amount_paid'] for row in rows], ['100.00'])
+        self.assertEqual(rows[0]['student_email'], 'student@example.com')
+
+    def test_investment_export_annotations(self):
+        rows = self.export('investment_export')
+        investment = Investment.objects.get(pk=self.investment.pk)
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(
+            Decimal(rows[0]['expected_return_amount']),
+            investment.expected_return_amount.quantize(Decimal('0.01')),
+        )
+        self.assertEqual(
+            Decimal(rows[0]['total_return_amount']),
+            investment.total_return_amount.quantize(Decimal('0.01')),
+        )
+
+    def test_withdrawal_export_is_staff_only(self):
+        self.assertEqual(self.export('withdrawal_export'), [])
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('repayments:withdrawal_export')).status_code, 302)
+
+
+class StatementImportTests(TestCase):
+    """Bank statements are validated up front and imported with bulk inserts"""
+
+    def setUp(self):
+        self.student = StudentUser.objects.create_user(
+            email='student@example.com', password='testpass123', first_name='Test', last_name='Student',
+            student_id='STU001', university='Test University', gpa=Decimal('5.00'),
+        )
+        self.loan = LoanApplication.objects.create(
+            student=self.student, amount=5000, reason='Tuition', status='Approved',
+            repayment_due_date=timezone.now().date() + timedelta(days=90),
+        )
+        self.pending = LoanApplication.objects.create(
+            student=self.student, amount=3000, reason='Books', status='Pending',
+            repayment_due_date=timezone.now().date() + timedelta(days=90),
+        )
+        Repayment.objects.create(loan=self.loan, amount_paid=Decimal('1000.00'), status='Paid', transaction_id='UTR0')
+        self.today = timezone.localdate().isoformat()
+
+    def statement(self, *rows):
+        lines = ['Loan ID,Amount,Value Date,UTR,Mode'] + [','.join(row) for row in rows]
+        return io.BytesIO(('\n'.join(lines) + '\n').encode())
+
+    def test_row_level_errors(self):
+        remaining = self.loan.total_amount_due - Decimal('1000.00')
+        result = import_statement(self.statement(
+            (str(self.loan.pk), '500.00', self.today, 'UTR1', 'NEFT'),
+            ('999999', '100.00', self.today, 'UTR2', 'NEFT'),
+            (str(self.pending.pk), '100.00', self.today, 'UTR3', 'NEFT'),
+            (str(self.loan.pk), 'abc', 'yesterday', 'UTR4', 'Telepathy'),
+            (str(self.loan.pk), '100.00', self.today, 'UTR0', 'NEFT'),
+            (str(self.loan.pk), '100.00', self.today, 'UTR1', 'NEFT'),
+            (str(self.loan.pk), str(remaining), self.today, 'UTR5', 'NEFT'),
+        ), dry_run=True)
+
+        self.assertEqual(result['rows'], 7)
+        self.assertEqual(result['valid'], 1)
+        self.assertEqual(result['imported'], 0)
+        errors = dict(result['errors'])
+        self.assertEqual(sorted(errors), [3, 4, 5, 6, 7, 8])
+        self.assertIn('does not exist', errors[3])
+        self.assertIn('Pending', errors[4])
+        self.assertIn('Invalid amount', errors[5])
+        self.assertIn('Invalid date', errors[5])
+        self.assertIn('Unknown payment method', errors[5])
+        self.assertIn('already recorded', errors[6])
+        self.assertIn('repeated (first on line 2)', errors[7])
+        # The earlier row for the same loan has used up part of the remaining balance
+        self.assertIn('exceeds the remaining balance', errors[8])
+        self.assertEqual(Repayment.objects.count(), 1)
+
+    def test_import_updates_ledger_schedule_stats_and_search(self):
+        result = import_statement(self.statement(
+            (str(self.loan.pk), '500.00', self.today, 'UTR1', 'NEFT'),
+            (str(self.loan.pk), '250.50', self.today, 'UTR2', 'Cheque'),
+        ))
+
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual(result['total_amount'], Decimal('750.50'))
+        imported = Repayment.objects.filter(transaction_id__in=['UTR1', 'UTR2']).order_by('transaction_id')
+        self.assertEqual([r.status for r in imported], ['Paid', 'Paid'])
+        self.assertEqual([r.payment_method for r in imported], ['Bank Transfer', 'Cheque'])
+
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.total_paid, Decimal('1750.50'))
+        self.assertEqual(self.loan.paid_installments, 3)
+        self.assertEqual(self.loan.installments.aggregate(paid=Sum('amount_paid'))['paid'], Decimal('1750.50'))
+        self.assertEqual(rebuild_stats(commit=False)['drifted'], [])
+        self.assertEqual(
+            SearchDocument.objects.filter(kind='repayment', object_id__in=[r.pk for r in imported]).count(), 2
+        )
+
+    def test_errors_block_import_unless_skipped(self):
+        rows = (
+            (str(self.loan.pk), '500.00', self.today, 'UTR1', 'NEFT'),
+            (str(self.pending.pk), '100.00', self.today, 'UTR2', 'NEFT'),
+        )
+
+        result = import_statement(self.statement(*rows))
+        self.assertEqual(result['imported'], 0)
+        self.assertFalse(Repayment.objects.filter(transaction_id='UTR1').exists())
+
+        result = import_statement(self.statement(*rows), skip_invalid=True)
+        self.assertEqual(result['imported'], 1)
+        self.assertTrue(Repayment.objects.filter(transaction_id='UTR1').exists())
+
+    def test_queries_are_chunked(self):
+        rows = [(str(self.loan.pk), '1.00', self.today, f'UTR{i}', 'NEFT') for i in range(1, 21)]
+        with CaptureQueriesContext(connection) as queries:
+            import_statement(self.statement(*rows), chunk_size=5)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "repayments_repayment"')]
+        self.assertEqual(len(inserts), 4)
+
+    def test_xlsx_statement(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['loan_id', 'credit', 'payment_date', 'cheque_no', 'narration'])
+        sheet.append([self.loan.pk, 1200.5, timezone.now().replace(tzinfo=None), 'CHQ100', 'Cheque deposit'])
+        stream = io.BytesIO()
+        workbook.save(stream)
+        stream.seek(0)
+
+        result = import_statement(stream, fmt=statement_format('statement.xlsx'), default_method='Cheque')
+
+        self.assertEqual(result['imported'], 1)
+        repayment = Repayment.objects.get(transaction_id='CHQ100')
+        self.assertEqual(repayment.amount_paid, Decimal('1200.50'))
+        self.assertEqual(repayment.payment_method, 'Cheque')
+        self.assertEqual(repayment.notes, 'Cheque deposit')
+
+    def test_missing_columns(self):
+        with self.assertRaises(StatementFileError):
+            import_statement(io.BytesIO(b'loan_id,reference\n1,UTR1\n'))
+
+    def test_admin_preview_and_import(self):
+        admin_user = StudentUser.objects.create_superuser(
+            email='admin@example.com', password='testpass123', first_name='Admin', last_name='User',
+            student_id='ADM001', university='N/A', gpa=Decimal('0.00'),
+        )
+        self.client.force_login(admin_user)
+        url = reverse('admin:repayments_repayment_import_statement')
+
+        def upload():
+            return SimpleUploadedFile(
+                'statement.csv', self.statement((str(self.loan.pk), '500.00', self.today, 'UTR1', 'NEFT')).getvalue()
+            )
+
+        response = self.client.post(url, {'statement_file': upload(), 'payment_method': 'Bank Transfer', 'dry_run': 'on'})
+        self.assertContains(response, 'Preview')
+        self.assertFalse(Repayment.objects.filter(transaction_id='UTR1').exists())
+
+        response = self.client.post(url, {'statement_file': upload(), 'payment_method': 'Bank Transfer'})
+        self.assertRedirects(response, reverse('admin:repayments_repayment_changelist'))
+        self.assertEqual(Repayment.objects.get(transaction_id='UTR1').processed_by, admin_user)
+
+
+class RepaymentApiTests(TestCase):
+    """api/v1/ repayments, withdrawals and investments: scoped, validated and constant in queries"""
+
+    def setUp(self):
+        self.student = StudentUser.objects.create_user(
+            email='student@example.com', password='testpass123', first_name='Test', last_name='Student',
+            student_id='STU001', university='Test University', gpa=Decimal('5.00'),
+        )
+        self.staff = StudentUser.objects.create_superuser(
+            email='admin@example.com', password='testpass123', first_name='Admin', last_name='User',
+            student_id='ADM001', university='N/A', gpa=Decimal('0.00'),
+        )
+        financier_user = StudentUser.objects.create_user(
+            email='financier@example.com', password='testpass123', first_name='Test', last_name='Financier',
+            student_id='FIN001', university='N/A', gpa=Decimal('0.00'), user_type='financier',
+        )
+        self.financier = FinancierUser.objects.create(
+            user=financier_user, financier_id='F001', investment_amount=Decimal('5000.00'),
+        )
+        due = timezone.now().date() + timedelta(days=90)
+        self.loan = LoanApplication.objects.create(
+            student=self.student, amount=5000, reason='Tuition', status='Approved', repayment_due_date=due,
+        )
+        self.pending = LoanApplication.objects.create(
+            student=self.student, amount=1000, reason='Books', status='Pending', repayment_due_date=due,
+        )
+        self.client = APIClient()
+
+    def add_rows(self, count):
+        for i in range(count):
+            Repayment.objects.create(loan=self.loan, amount_paid=Decimal('10.00'), status='Paid')
+            Withdrawal.objects.create(
+                financier=self.financier, amount=Decimal('100.00'), bank_name='Bank',
+                account_holder_name='Test Financier', account_number='1234567890', ifsc_code='BANK0000001',
+            )
+            loan = LoanApplication.objects.create(
+                student=self.student, amount=1000, reason=f'Loan {i}', status='Rejected',
+                repayment_due_date=timezone.now().date() + timedelta(days=30),
+            )
+            Investment.objects.create(
+                financier=self.financier, loan=loan, investment_amount=Decimal('1000.00'),
+                expected_return_rate=Decimal('12.00'), maturity_date=timezone.now() + timedelta(days=30),
+            )
+
+    def test_list_query_counts_do_not_grow_with_rows(self):
+        self.client.force_authenticate(self.staff)
+        for count in (1, 6):
+            self.add_rows(count)
+            for endpoint in ('repayments', 'withdrawals', 'investments'):
+                with self.subTest(endpoint=endpoint, rows=count), self.assertNumQueries(1):
+                    response = self.client.get(f'/api/v1/{endpoint}/')
+                    self.assertEqual(response.status_code, 200)
+
+    def test_retrieve_query_counts(self):
+        self.add_rows(1)
+        self.client.force_authenticate(self.staff)
+        for endpoint, obj in (
+            ('repayments', Repayment.objects.first()),
+            ('withdrawals', Withdrawal.objects.first()),
+            ('investments', Investment.objects.first()),
+        ):
+            with self.subTest(endpoint=endpoint), self.assertNumQueries(1):
+                self.assertEqual(self.client.get(f'/api/v1/{endpoint}/{obj.pk}/').status_code, 200)
+
+    def test_lists_are_scoped(self):
+        self.add_rows(2)
+        self.client.force_authenticate(self.student)
+        self.assertEqual(len(self.client.get('/api/v1/repayments/').json()['results']), 2)
+        self.assertEqual(self.client.get('/api/v1/withdrawals/').json()['results'], [])
+        self.assertEqual(self.client.get('/api/v1/investments/').json()['results'], [])
+
+        self.client.force_authenticate(self.financier.user)
+        self.assertEqual(self.client.get('/api/v1/repayments/').json()['results'], [])
+        withdrawals = self.client.get('/api/v1/withdrawals/').json()['results']
+        self.assertEqual(len(withdrawals), 2)
+        self.assertEqual(withdrawals[0]['masked_account_number'], '****7890')
+        self.assertNotIn('account_number', withdrawals[0])
+
+    def test_investment_returns_are_annotated(self):
+        self.add_rows(1)
+        investment = Investment.objects.get()
+        self.client.force_authenticate(self.financier.user)
+
+        row = self.client.get('/api/v1/investments/?fields=expected_return,total_return').json()['results'][0]
+
+        self.assertEqual(set(row), {'id', 'expected_return', 'total_return'})
+        self.assertEqual(Decimal(row['expected_return']), investment.expected_return_amount.quantize(Decimal('0.01')))
+        self.assertEqual(Decimal(row['total_return']), investment.total_return_amount.quantize(Decimal('0.01')))
+
+    def test_create_repayment_validates_like_the_form(self):
+        self.client.force_authenticate(self.student)
+        payload = {'loan': self.pending.pk, 'amount_paid': '100.00', 'payment_method': 'UPI'}
+        response = self.client.post('/api/v1/repayments/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('approved loans', str(response.json()))
+
+        payload['loan'] = self.loan.pk
+        payload['amount_paid'] = str(self.loan.total_amount_due + 1)
+        self.assertEqual(self.client.post('/api/v1/repayments/', payload, format='json').status_code, 400)
+
+        payload['amount_paid'] = '100.00'
+        response = self.client.post('/api/v1/repayments/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.json())
+        self.assertEqual(response.json()['status'], 'Paid')
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.total_paid, Decimal('100.00'))
+
+        self.client.force_authenticate(self.financier.user)
+        response = self.client.post('/api/v1/repayments/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('loan', response.json())
+
+    def test_notification_failures(self):
+        self.client.force_authenticate(self.student)
+        payload = {'loan': self.loan.pk, 'amount_paid': '100.00', 'payment_method': 'UPI'}
+
+        # A message that cannot be built is logged; the repayment still goes through
+        with mock.patch('repayments.notifications.render_to_string', side_effect=TemplateDoesNotExist('x')):
+            with self.assertLogs('repayments.notifications', 'ERROR') as logs:
+                response = self.client.post('/api/v1/repayments/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('Could not queue payment confirmation notification', logs.output[0])
+
+        # A failed outbox insert rolls the repayment back with it
+        with mock.patch('repayments.notifications.render_to_string', return_value=''), \
+                mock.patch('repayments.notifications.queue_email', side_effect=DatabaseError('outbox')):
+            with self.assertRaises(DatabaseError):
+                self.client.post('/api/v1/repayments/', payload, format='json')
+        self.assertEqual(Repayment.objects.filter(loan=self.loan).count(), 1)
+
+    def test_create_withdrawal(self):
+        payload = {
+            'amount': '200.00', 'withdrawal_method': 'Bank Transfer', 'bank_name': 'Bank',
+            'account_holder_name': 'Test Financier', 'account_number': '1234567890', 'ifsc_code': 'BANK0000001',
+        }
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.post('/api/v1/withdrawals/', payload, format='json').status_code, 403)
+
+        self.client.force_authenticate(self.financier.user)
+        response = self.client.post('/api/v1/withdrawals/', {**payload, 'amount': '9000.00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Insufficient balance', str(response.json()))
+
+        response = self.client.post('/api/v1/withdrawals/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.json())
+        self.assertEqual(response.json()['financier'], self.financier.pk)
+        self.assertEqual(response.json()['status'], 'Pending')
+
+    def test_staff_settles_repayments(self):
+        repayment = Repayment.objects.create(loan=self.loan, amount_paid=Decimal('50.00'), status='Processing')
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.post(f'/api/v1/repayments/{repayment.pk}/mark-paid/').status_code, 403)
+
+        self.client.force_authenticate(self.staff)
+        response = self.client.post(f'/api/v1/repayments/{repayment.pk}/mark-paid/')
+        self.assertEqual(response.json()['status'], 'Paid')
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.total_paid, Decimal('50.00'))
+
+
+class ConditionalGetTests(TestCase):
+    """Repayment and withdrawal detail pages revalidate on updated_at"""
+
+    def setUp(self):
+        self.student = StudentUser.objects.create_user(
+            email='student@example.com', password='testpass123', first_name='Test', last_name='Student',
+            student_id='STU001', university='Test University', gpa=Decimal('5.00'),
+        )
+        financier_user = StudentUser.objects.create_user(
+            email='financier@example.com', password='testpass123', first_name='Test', last_name='Financier',
+            student_id='FIN001', university='N/A', gpa=Decimal('0.00'), user_type='financier',
+        )
+        self.financier = FinancierUser.objects.create(user=financier_user, financier_id='F001')
+        loan = LoanApplication.objects.create(
+            student=self.student, amount=5000, reason='Tuition', status='Approved',
+            repayment_due_date=timezone.now().date() + timedelta(days=90),
+        )
+        self.repayment = Repayment.objects.create(loan=loan, amount_paid=Decimal('100.00'), status='Pending')
+        self.withdrawal = Withdrawal.objects.create(
+            financier=self.financier, amount=Decimal('1000.00'), withdrawal_method='UPI', upi_id='fin@upi',
+        )
+
+    def assertRevalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertFalse(again.templates)
+        return response['ETag']
+
+    def test_repayment_detail(self):
+        self.client.force_login(self.student)
+        url = reverse('repayments:detail', args=[self.repayment.pk])
+        etag = self.assertRevalidates(url)
+
+        # Admin bulk actions go through update_tracked(), which now stamps updated_at
+        update_tracked(Repayment.objects.filter(pk=self.repayment.pk), status='Failed')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_withdrawal_detail(self):
+        self.client.force_login(self.financier.user)
+        url = reverse('repayments:withdrawal_detail', args=[self.withdrawal.pk])
+        etag = self.assertRevalidates(url)
+
+        self.withdrawal.status = 'Processing'
+        self.withdrawal.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -12,6 +12,8 @@ urlpatterns = [
     
     # Admin management URLs
     path('admin/', views.admin_repayment_management, name='admin_management'),
+    path('admin/export/', views.export_repayments, name='admin_export'),
+    path('investments/export/', views.export_investments, name='investment_export'),
     path('statistics/', views.repayment_statistics, name='statistics'),
     
     # API endpoints for repayment management
@@ -26,6 +28,7 @@ urlpatterns = [
     
     # Admin withdrawal management URLs
     path('withdrawals/admin/', views.admin_withdrawal_management, name='admin_withdrawal_management'),
+    path('withdrawals/admin/export/', views.export_withdrawals, name='withdrawal_export'),
     
     # API endpoints for withdrawal management
     path('api/withdrawals/approve/<int:withdrawal_id>/', views.approve_withdrawal, name='approve_withdrawal_api'),
@@ -37,4 +40,6 @@ urlpatterns = [
     path('payment/success/', views.payment_success, name='payment_success'),
     path('payment/failure/', views.payment_failure, name='payment_failure'),
     path('payment/callback/', views.payment_callback, name='payment_callback'),
+    path('payment/webhooks/<str:gateway>/', views.gateway_webhook, name='gateway_webhook'),
+    path('api/gateways/health/', views.gateway_health, name='gateway_health_api'),
 ]
@@ -1,19 +1,30 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import CreateView, UpdateView, DetailView, ListView
 from django.urls import reverse_lazy
 from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Q, Sum, Count
-from django.core.paginator import Paginator
 
+from .exports import (
+    INVESTMENT_EXPORT_COLUMNS, REPAYMENT_EXPORT_COLUMNS, WITHDRAWAL_EXPORT_COLUMNS,
+    investment_export, repayment_export, withdrawal_export,
+)
+from .filters import filter_repayments, filter_withdrawals
 from .forms import RepaymentForm, RepaymentUpdateForm, WithdrawalForm, WithdrawalUpdateForm
 from .models import Repayment, Withdrawal
-from .payment_gateway import process_payment, verify_payment
+from .async_gateway import aprocess_payment, averify_payment
+from .payment_gateway import payment_gateway
+from .webhooks import InvalidWebhook, WEBHOOK_PARSERS, ingest_event
 from .notifications import (
     send_payment_confirmation_notification,
     send_withdrawal_request_notification,
@@ -21,6 +32,13 @@ from .notifications import (
 )
 from loans.models import LoanApplication
 from users.models import StudentUser, FinancierUser
+from users.services import BorrowerSummary, dashboard_summary_data
+from loan_app.computed import SingleObjectOnceMixin
+from loan_app.conditional import ConditionalGetMixin, validator
+from loan_app.exports import EXPORT_FORMATS, export_response
+from loan_app.pagination import KeysetPaginationMixin, keyset_paginate
+from search.services import ranked_search, SEARCH_ORDERING
+from portfolio.stats import PortfolioSnapshot
 
 
 class RepaymentCreateView(LoginRequiredMixin, CreateView):
@@ -54,11 +72,7 @@ class RepaymentCreateView(LoginRequiredMixin, CreateView):
         form.instance.loan = loan
         
         # Check if payment amount exceeds remaining loan amount
-        total_paid = loan.repayments.filter(status='Paid').aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
-        
-        remaining_amount = loan.total_amount_due - total_paid
+        remaining_amount = loan.outstanding_balance
         
         if form.instance.amount_paid > remaining_amount:
             messages.error(
@@ -67,13 +81,11 @@ class RepaymentCreateView(LoginRequiredMixin, CreateView):
             )
             return self.form_invalid(form)
         
-        response = super().form_valid(form)
-        
-        # Send payment confirmation email
-        try:
+        with transaction.atomic():
+            response = super().form_valid(form)
+            
+            # Queue payment confirmation email with the repayment
             send_payment_confirmation_notification(form.instance)
-        except Exception as e:
-            print(f"Error sending payment confirmation email: {e}")
         
         messages.success(
             self.request, 
@@ -90,21 +102,25 @@ class RepaymentCreateView(LoginRequiredMixin, CreateView):
             loan = get_object_or_404(LoanApplication, id=loan_id, student=self.request.user)
             context['loan'] = loan
             
-            # Calculate remaining amount
-            total_paid = loan.repayments.filter(status='Paid').aggregate(
-                total=Sum('amount_paid')
-            )['total'] or 0
-            context['remaining_amount'] = loan.total_amount_due - total_paid
+            context['remaining_amount'] = loan.outstanding_balance
         
         return context
 
 
-class RepaymentDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
+class RepaymentDetailView(LoginRequiredMixin, ConditionalGetMixin, UserPassesTestMixin, SingleObjectOnceMixin,
+                          DetailView):
     """View for displaying repayment details"""
     model = Repayment
     template_name = 'repayments/detail.html'
     context_object_name = 'repayment'
     
+    def get_validator(self):
+        repayments = Repayment.objects.filter(pk=self.kwargs['pk'])
+        if not self.request.user.is_staff:
+            repayments = repayments.filter(loan__student=self.request.user)
+        updated_at = repayments.values_list('updated_at', flat=True).first()
+        return updated_at and validator(self.request, updated_at)
+    
     def test_func(self):
         """Check if user can view this repayment"""
         repayment = self.get_object()
@@ -118,43 +134,31 @@ class RepaymentDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
         return context
 
 
-class RepaymentListView(LoginRequiredMixin, ListView):
+class RepaymentListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """View for listing repayments"""
     model = Repayment
     template_name = 'repayments/list.html'
     context_object_name = 'repayments'
     paginate_by = 10
+    keyset_ordering = ('-payment_date', '-id')
     
     def get_queryset(self):
-        """Filter repayments based on user role"""
+        """Filter repayments based on user role, search, status and method"""
         if self.request.user.is_staff:
             # Admin sees all repayments
-            return Repayment.objects.all().select_related('loan__student').order_by('-payment_date')
+            queryset = Repayment.objects.all().select_related('loan__student')
         else:
             # Students see only their own repayments
-            return Repayment.objects.filter(
+            queryset = Repayment.objects.filter(
                 loan__student=self.request.user
-            ).select_related('loan').order_by('-payment_date')
-    
-    def get_context_data(self, **kwargs):
-        """Add search and filter context"""
-        context = super().get_context_data(**kwargs)
+            ).select_related('loan')
         
-        # Search functionality
         search_query = self.request.GET.get('search', '')
         status_filter = self.request.GET.get('status', '')
         payment_method_filter = self.request.GET.get('payment_method', '')
         
-        queryset = self.get_queryset()
-        
         if search_query:
-            queryset = queryset.filter(
-                Q(loan__student__first_name__icontains=search_query) |
-                Q(loan__student__last_name__icontains=search_query) |
-                Q(loan__student__student_id__icontains=search_query) |
-                Q(transaction_id__icontains=search_query) |
-                Q(notes__icontains=search_query)
-            )
+            queryset = ranked_search(queryset, search_query)
         
         if status_filter:
             queryset = queryset.filter(status=status_filter)
@@ -162,10 +166,17 @@ class RepaymentListView(LoginRequiredMixin, ListView):
         if payment_method_filter:
             queryset = queryset.filter(payment_method=payment_method_filter)
         
-        # Pagination
-        paginator = Paginator(queryset, self.paginate_by)
-        page_number = self.request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        return queryset
+    
+    def get_keyset_ordering(self):
+        """Best matches first while searching"""
+        if self.request.GET.get('search', ''):
+            return SEARCH_ORDERING
+        return self.keyset_ordering
+    
+    def get_context_data(self, **kwargs):
+        """Add search, filter and reminder context"""
+        context = super().get_context_data(**kwargs)
         
         # Add reminder information for students
         overdue_loans = []
@@ -173,46 +184,14 @@ class RepaymentListView(LoginRequiredMixin, ListView):
         total_remaining = 0
         
         if not self.request.user.is_staff:
-            # Get all approved loans for the student
-            student_loans = LoanApplication.objects.filter(
-                student=self.request.user,
-                status='Approved'
-            ).select_related('student')
-            
-            for loan in student_loans:
-                # Calculate remaining amount
-                total_paid = loan.repayments.filter(status='Paid').aggregate(
-                    total=Sum('amount_paid')
-                )['total'] or 0
-                remaining_amount = loan.total_amount_due - total_paid
-                
-                # Skip if fully paid
-                if remaining_amount <= 0:
-                    continue
-                
-                total_remaining += remaining_amount
-                
-                # Check if overdue
-                if loan.is_overdue:
-                    overdue_loans.append({
-                        'loan': loan,
-                        'remaining_amount': remaining_amount,
-                        'days_overdue': loan.days_overdue,
-                        'due_date': loan.repayment_due_date,
-                    })
-                # Check if due soon (within 7 days)
-                elif loan.days_until_due is not None and loan.days_until_due <= 7:
-                    upcoming_due_loans.append({
-                        'loan': loan,
-                        'remaining_amount': remaining_amount,
-                        'days_until_due': loan.days_until_due,
-                        'due_date': loan.repayment_due_date,
-                    })
-        
-        context['page_obj'] = page_obj
-        context['search_query'] = search_query
-        context['status_filter'] = status_filter
-        context['payment_method_filter'] = payment_method_filter
+            summary = BorrowerSummary(self.request.user, recent_limit=0)
+            overdue_loans = summary.overdue_loans
+            upcoming_due_loans = summary.upcoming_due_loans
+            total_remaining = summary.total_remaining
+        
+        context['search_query'] = self.request.GET.get('search', '')
+        context['status_filter'] = self.request.GET.get('status', '')
+        context['payment_method_filter'] = self.request.GET.get('payment_method', '')
         context['status_choices'] = Repayment.STATUS_CHOICES
         context['payment_method_choices'] = [
             ('Manual Entry', 'Manual Entry'),
@@ -248,11 +227,7 @@ def record_repayment(request, loan_id):
             repayment.loan = loan
             
             # Check if payment amount exceeds remaining loan amount
-            total_paid = loan.repayments.filter(status='Paid').aggregate(
-                total=Sum('amount_paid')
-            )['total'] or 0
-            
-            remaining_amount = loan.total_amount_due - total_paid
+            remaining_amount = loan.outstanding_balance
             
             if repayment.amount_paid > remaining_amount:
                 messages.error(
@@ -272,16 +247,10 @@ def record_repayment(request, loan_id):
     else:
         form = RepaymentForm(loan=loan)
     
-    # Calculate remaining amount
-    total_paid = loan.repayments.filter(status='Paid').aggregate(
-        total=Sum('amount_paid')
-    )['total'] or 0
-    remaining_amount = loan.total_amount_due - total_paid
-    
     context = {
         'form': form,
         'loan': loan,
-        'remaining_amount': remaining_amount,
+        'remaining_amount': loan.outstanding_balance,
     }
     
     return render(request, 'repayments/create.html', context)
@@ -290,50 +259,23 @@ def record_repayment(request, loan_id):
 @staff_member_required
 def admin_repayment_management(request):
     """Admin view for managing repayments"""
-    repayments = Repayment.objects.all().select_related('loan__student').order_by('-payment_date')
-    
-    # Statistics
-    total_repayments = repayments.count()
-    paid_repayments = repayments.filter(status='Paid').count()
-    pending_repayments = repayments.filter(status='Pending').count()
-    failed_repayments = repayments.filter(status='Failed').count()
+    repayments = Repayment.objects.all().select_related('loan__student')
     
-    total_amount_paid = repayments.filter(status='Paid').aggregate(
-        total=Sum('amount_paid')
-    )['total'] or 0
+    # Statistics from the incrementally maintained snapshot
+    stats = PortfolioSnapshot().repayment_summary()
     
     # Search and filtering
     search_query = request.GET.get('search', '')
     status_filter = request.GET.get('status', '')
     payment_method_filter = request.GET.get('payment_method', '')
+    repayments, ordering = filter_repayments(repayments, search_query, status_filter, payment_method_filter)
     
-    if search_query:
-        repayments = repayments.filter(
-            Q(loan__student__first_name__icontains=search_query) |
-            Q(loan__student__last_name__icontains=search_query) |
-            Q(loan__student__student_id__icontains=search_query) |
-            Q(transaction_id__icontains=search_query) |
-            Q(notes__icontains=search_query)
-        )
-    
-    if status_filter:
-        repayments = repayments.filter(status=status_filter)
-    
-    if payment_method_filter:
-        repayments = repayments.filter(payment_method=payment_method_filter)
-    
-    # Pagination
-    paginator = Paginator(repayments, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on (payment_date, id), or on search rank while searching
+    page_obj = keyset_paginate(request, repayments, ordering, per_page=20, with_total=True)
     
     context = {
         'repayments': page_obj,
-        'total_repayments': total_repayments,
-        'paid_repayments': paid_repayments,
-        'pending_repayments': pending_repayments,
-        'failed_repayments': failed_repayments,
-        'total_amount_paid': total_amount_paid,
+        **stats,
         'search_query': search_query,
         'status_filter': status_filter,
         'payment_method_filter': payment_method_filter,
@@ -352,6 +294,33 @@ def admin_repayment_management(request):
     return render(request, 'repayments/admin_management.html', context)
 
 
+def _export_format(request):
+    fmt = request.GET.get('format', 'csv')
+    return fmt if fmt in EXPORT_FORMATS else None
+
+
+def _unsupported_format(request):
+    return JsonResponse(
+        {'success': False, 'error': f"Unsupported format: {request.GET.get('format')}"}, status=400
+    )
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def export_repayments(request):
+    """Stream the repayments matching the admin management filters as CSV or JSONL (?format=jsonl)"""
+    fmt = _export_format(request)
+    if fmt is None:
+        return _unsupported_format(request)
+    
+    repayments, ordering = repayment_export(
+        request.GET.get('search', ''),
+        request.GET.get('status', ''),
+        request.GET.get('payment_method', ''),
+    )
+    return export_response(request, repayments, REPAYMENT_EXPORT_COLUMNS, 'repayments', fmt, ordering)
+
+
 @staff_member_required
 @require_http_methods(["POST"])
 def mark_repayment_paid(request, repayment_id):
@@ -399,45 +368,19 @@ def repayment_statistics(request):
     
     if user.is_staff:
         # Admin sees all statistics
-        total_repayments = Repayment.objects.count()
-        paid_repayments = Repayment.objects.filter(status='Paid').count()
-        pending_repayments = Repayment.objects.filter(status='Pending').count()
-        failed_repayments = Repayment.objects.filter(status='Failed').count()
-        
-        total_amount_paid = Repayment.objects.filter(status='Paid').aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
-        
-        # Payment method statistics
-        payment_method_stats = Repayment.objects.values('payment_method').annotate(
-            count=Count('id'),
-            total_amount=Sum('amount_paid')
-        ).order_by('-count')
-        
+        snapshot = PortfolioSnapshot()
     else:
         # Students see their own statistics
-        user_repayments = Repayment.objects.filter(loan__student=user)
-        total_repayments = user_repayments.count()
-        paid_repayments = user_repayments.filter(status='Paid').count()
-        pending_repayments = user_repayments.filter(status='Pending').count()
-        failed_repayments = user_repayments.filter(status='Failed').count()
-        
-        total_amount_paid = user_repayments.filter(status='Paid').aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
-        
-        # Payment method statistics
-        payment_method_stats = user_repayments.values('payment_method').annotate(
-            count=Count('id'),
-            total_amount=Sum('amount_paid')
-        ).order_by('-count')
+        snapshot = PortfolioSnapshot(user)
+    
+    # Payment method statistics
+    payment_method_stats = [
+        {'payment_method': item['key'], 'count': item['count'], 'total_amount': item['total_amount']}
+        for item in snapshot.breakdown('repayment_method')
+    ]
     
     context = {
-        'total_repayments': total_repayments,
-        'paid_repayments': paid_repayments,
-        'pending_repayments': pending_repayments,
-        'failed_repayments': failed_repayments,
-        'total_amount_paid': total_amount_paid,
+        **snapshot.repayment_summary(),
         'payment_method_stats': payment_method_stats,
         'user': user,
     }
@@ -449,34 +392,7 @@ def repayment_statistics(request):
 def repayment_summary(request):
     """API endpoint to get repayment summary for dashboard"""
     try:
-        user = request.user
-        active_loan = LoanApplication.objects.filter(
-            student=user, status='Approved'
-        ).first()
-        
-        if not active_loan:
-            return JsonResponse({
-                'success': True, 
-                'data': {'has_active_loan': False}
-            })
-        
-        total_paid = active_loan.repayments.filter(status='Paid').aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
-        
-        remaining_amount = active_loan.total_amount_due - total_paid
-        
-        data = {
-            'has_active_loan': True,
-            'loan_id': active_loan.id,
-            'total_amount_due': float(active_loan.total_amount_due),
-            'total_paid': float(total_paid),
-            'remaining_amount': float(remaining_amount),
-            'is_overdue': active_loan.is_overdue,
-            'days_until_due': active_loan.days_until_due,
-            'repayment_progress': (total_paid / active_loan.total_amount_due) * 100 if active_loan.total_amount_due > 0 else 0,
-        }
-        
+        data = dashboard_summary_data(request.user)
         return JsonResponse({'success': True, 'data': data})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
@@ -514,13 +430,11 @@ class WithdrawalCreateView(LoginRequiredMixin, CreateView):
             return self.form_invalid(form)
         
         form.instance.financier = financier
-        response = super().form_valid(form)
-        
-        # Send withdrawal request notification
-        try:
+        with transaction.atomic():
+            response = super().form_valid(form)
+            
+            # Queue withdrawal request notification with the withdrawal
             send_withdrawal_request_notification(form.instance)
-        except Exception as e:
-            print(f"Error sending withdrawal request notification: {e}")
         
         messages.success(
             self.request, 
@@ -540,35 +454,44 @@ class WithdrawalCreateView(LoginRequiredMixin, CreateView):
         return context
 
 
-class WithdrawalListView(LoginRequiredMixin, ListView):
+class WithdrawalListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """View for listing withdrawals"""
     model = Withdrawal
     template_name = 'repayments/withdrawal_list.html'
     context_object_name = 'withdrawals'
     paginate_by = 10
+    keyset_ordering = ('-created_at', '-id')
     
     def get_queryset(self):
         """Filter withdrawals based on user role"""
         if self.request.user.is_staff:
             # Admin sees all withdrawals
-            return Withdrawal.objects.all().select_related('financier__user').order_by('-created_at')
+            return Withdrawal.objects.all().select_related('financier__user')
         else:
             # Financiers see only their own withdrawals
             try:
                 financier = self.request.user.financier_profile
                 return Withdrawal.objects.filter(
                     financier=financier
-                ).select_related('financier__user').order_by('-created_at')
+                ).select_related('financier__user')
             except FinancierUser.DoesNotExist:
                 return Withdrawal.objects.none()
 
 
-class WithdrawalDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
+class WithdrawalDetailView(LoginRequiredMixin, ConditionalGetMixin, UserPassesTestMixin, SingleObjectOnceMixin,
+                           DetailView):
     """View for displaying withdrawal details"""
     model = Withdrawal
     template_name = 'repayments/withdrawal_detail.html'
     context_object_name = 'withdrawal'
     
+    def get_validator(self):
+        withdrawals = Withdrawal.objects.filter(pk=self.kwargs['pk'])
+        if not self.request.user.is_staff:
+            withdrawals = withdrawals.filter(financier__user=self.request.user)
+        updated_at = withdrawals.values_list('updated_at', flat=True).first()
+        return updated_at and validator(self.request, updated_at)
+    
     def test_func(self):
         """Check if user can view this withdrawal"""
         withdrawal = self.get_object()
@@ -579,52 +502,23 @@ class WithdrawalDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
 @staff_member_required
 def admin_withdrawal_management(request):
     """Admin view for managing withdrawals"""
-    withdrawals = Withdrawal.objects.all().select_related('financier__user').order_by('-created_at')
+    withdrawals = Withdrawal.objects.all().select_related('financier__user')
     
-    # Statistics
-    total_withdrawals = withdrawals.count()
-    pending_withdrawals = withdrawals.filter(status='Pending').count()
-    processing_withdrawals = withdrawals.filter(status='Processing').count()
-    completed_withdrawals = withdrawals.filter(status='Completed').count()
-    failed_withdrawals = withdrawals.filter(status='Failed').count()
-    
-    total_amount_requested = withdrawals.aggregate(
-        total=Sum('amount')
-    )['total'] or 0
+    # Statistics from the incrementally maintained snapshot
+    stats = PortfolioSnapshot().withdrawal_summary()
     
     # Search and filtering
     search_query = request.GET.get('search', '')
     status_filter = request.GET.get('status', '')
     method_filter = request.GET.get('method', '')
+    withdrawals, ordering = filter_withdrawals(withdrawals, search_query, status_filter, method_filter)
     
-    if search_query:
-        withdrawals = withdrawals.filter(
-            Q(financier__user__first_name__icontains=search_query) |
-            Q(financier__user__last_name__icontains=search_query) |
-            Q(financier__financier_id__icontains=search_query) |
-            Q(transaction_id__icontains=search_query) |
-            Q(notes__icontains=search_query)
-        )
-    
-    if status_filter:
-        withdrawals = withdrawals.filter(status=status_filter)
-    
-    if method_filter:
-        withdrawals = withdrawals.filter(withdrawal_method=method_filter)
-    
-    # Pagination
-    paginator = Paginator(withdrawals, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on (created_at, id), or on search rank while searching
+    page_obj = keyset_paginate(request, withdrawals, ordering, per_page=20, with_total=True)
     
     context = {
         'withdrawals': page_obj,
-        'total_withdrawals': total_withdrawals,
-        'pending_withdrawals': pending_withdrawals,
-        'processing_withdrawals': processing_withdrawals,
-        'completed_withdrawals': completed_withdrawals,
-        'failed_withdrawals': failed_withdrawals,
-        'total_amount_requested': total_amount_requested,
+        **stats,
         'search_query': search_query,
         'status_filter': status_filter,
         'method_filter': method_filter,
@@ -635,6 +529,34 @@ def admin_withdrawal_management(request):
     return render(request, 'repayments/admin_withdrawal_management.html', context)
 
 
+@staff_member_required
+@require_http_methods(["GET"])
+def export_withdrawals(request):
+    """Stream the withdrawals matching the admin management filters as CSV or JSONL (?format=jsonl)"""
+    fmt = _export_format(request)
+    if fmt is None:
+        return _unsupported_format(request)
+    
+    withdrawals, ordering = withdrawal_export(
+        request.GET.get('search', ''),
+        request.GET.get('status', ''),
+        request.GET.get('method', ''),
+    )
+    return export_response(request, withdrawals, WITHDRAWAL_EXPORT_COLUMNS, 'withdrawals', fmt, ordering)
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def export_investments(request):
+    """Stream investments (optionally filtered by status and method) as CSV or JSONL (?format=jsonl)"""
+    fmt = _export_format(request)
+    if fmt is None:
+        return _unsupported_format(request)
+    
+    investments, ordering = investment_export(request.GET.get('status', ''), request.GET.get('method', ''))
+    return export_response(request, investments, INVESTMENT_EXPORT_COLUMNS, 'investments', fmt, ordering)
+
+
 @staff_member_required
 @require_http_methods(["POST"])
 def approve_withdrawal(request, withdrawal_id):
@@ -644,13 +566,11 @@ def approve_withdrawal(request, withdrawal_id):
         withdrawal.status = 'Processing'
         withdrawal.processed_by = request.user
         withdrawal.processed_at = timezone.now()
-        withdrawal.save()
-        
-        # Send withdrawal processed notification
-        try:
+        with transaction.atomic():
+            withdrawal.save()
+            
+            # Queue withdrawal processed notification with the status change
             send_withdrawal_processed_notification(withdrawal)
-        except Exception as e:
-            print(f"Error sending withdrawal processed notification: {e}")
         
         return JsonResponse({
             'success': True, 
@@ -709,11 +629,25 @@ def reject_withdrawal(request, withdrawal_id):
 
 # Payment Gateway Views
 
-@login_required
-def initiate_payment(request, repayment_id):
+def async_login_required(view):
+    """login_required for async views (resolves the user without blocking the event loop)"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@async_login_required
+async def initiate_payment(request, repayment_id):
     """Initiate payment through gateway"""
     try:
-        repayment = get_object_or_404(Repayment, id=repayment_id, loan__student=request.user)
+        user = await request.auser()
+        repayment = await sync_to_async(get_object_or_404)(
+            Repayment.objects.select_related('loan__student'), id=repayment_id, loan__student=user
+        )
         
         if repayment.status not in ['Pending', 'Failed']:
             return JsonResponse({
@@ -723,8 +657,8 @@ def initiate_payment(request, repayment_id):
         
         gateway = request.POST.get('gateway', 'razorpay')
         
-        # Process payment through gateway
-        result = process_payment(
+        # Process payment through gateway without holding a worker thread
+        result = await aprocess_payment(
             repayment,
             gateway_name=gateway,
             currency='INR',
@@ -750,8 +684,19 @@ def initiate_payment(request, repayment_id):
         })
 
 
-@login_required
-def payment_success(request):
+@staff_member_required
+@require_http_methods(["GET"])
+def gateway_health(request):
+    """API endpoint reporting circuit breaker state and health per payment gateway"""
+    return JsonResponse({
+        'success': True,
+        'failover_order': payment_gateway.failover_order(),
+        'gateways': payment_gateway.health(),
+    })
+
+
+@async_login_required
+async def payment_success(request):
     """Handle successful payment callback"""
     try:
         # Get payment parameters from callback
@@ -764,17 +709,17 @@ def payment_success(request):
             return redirect('repayments:list')
         
         # Find repayment by gateway transaction ID
-        repayment = Repayment.objects.filter(
+        repayment = await Repayment.objects.filter(
             gateway_transaction_id=order_id,
-            loan__student=request.user
-        ).first()
+            loan__student=await request.auser()
+        ).afirst()
         
         if not repayment:
             messages.error(request, 'Payment record not found')
             return redirect('repayments:list')
         
         # Verify payment
-        result = verify_payment(
+        result = await averify_payment(
             repayment,
             gateway_name='razorpay',
             razorpay_order_id=order_id,
@@ -817,8 +762,8 @@ def payment_failure(request):
         return redirect('repayments:list')
 
 
-@login_required
-def payment_callback(request):
+@async_login_required
+async def payment_callback(request):
     """Handle payment gateway callback"""
     try:
         # This is a generic callback handler
@@ -831,14 +776,11 @@ def payment_callback(request):
             # Handle GET callback (Razorpay)
             callback_data = request.GET.dict()
         
-        # Log callback data for debugging
-        print(f"Payment callback received: {callback_data}")
-        
         # Process based on gateway
         gateway = callback_data.get('gateway', 'unknown')
         
         if gateway == 'razorpay':
-            return payment_success(request)
+            return await payment_success(request)
         else:
             # Handle other gateways
             messages.info(request, 'Payment callback received and processed')
@@ -847,3 +789,24 @@ def payment_callback(request):
     except Exception as e:
         messages.error(request, f'Callback processing error: {str(e)}')
         return redirect('repayments:list')
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def gateway_webhook(request, gateway):
+    """
+    Server-to-server payment notifications from a gateway
+
+    Verifies the signature, stores the raw event and acknowledges; the
+    process_gateway_events worker applies it to the repayment. Duplicate
+    deliveries are acknowledged without being stored again.
+    """
+    if gateway not in WEBHOOK_PARSERS:
+        return JsonResponse({'success': False, 'error': 'Unknown gateway'}, status=404)
+    
+    try:
+        event, created = ingest_event(gateway, request)
+    except InvalidWebhook as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({'success': True, 'duplicate': not created})
@@ -0,0 +1,282 @@
+"""
+Payment gateway webhooks: verified ingestion and exactly-once processing
+
+ingest_event() is the request side. It checks the gateway's signature on
+the notification and stores the raw event as a GatewayEvent row, then
+the endpoint acknowledges. Nothing else happens in the request. The
+unique (gateway, event_id) constraint turns a redelivered notification
+into a single indexed insert conflict, so retries and duplicate
+notifications are no-ops.
+
+process_batch() is the worker side. It claims pending events with
+SELECT ... FOR UPDATE SKIP LOCKED and applies each one to its repayment
+in the transaction that marks the event Processed, so every event changes
+state exactly once however many workers run. Events that cannot be
+applied yet (e.g. the repayment is not found) are retried with backoff
+until MAX_ATTEMPTS.
+"""
+
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import GatewayEvent, Repayment
+from .payment_gateway import PayUGateway, PaytmGateway
+
+# Events claimed and applied per transaction
+BATCH_SIZE = 100
+
+# Processing attempts before an event is given up on
+MAX_ATTEMPTS = 8
+
+# First retry delay, doubled on every further failure up to RETRY_MAX
+RETRY_BASE = timedelta(seconds=30)
+RETRY_MAX = timedelta(hours=1)
+
+UPDATE_FIELDS = ['status', 'attempts', 'next_attempt_at', 'last_error', 'repayment', 'processed_at']
+
+# Repayment status each gateway event type leads to; other types are stored and ignored
+EVENT_OUTCOMES = {
+    'razorpay': {'payment.captured': 'Paid', 'order.paid': 'Paid', 'payment.failed': 'Failed'},
+    'payu': {'success': 'Paid', 'failure': 'Failed'},
+    'paytm': {'TXN_SUCCESS': 'Paid', 'TXN_FAILURE': 'Failed'},
+}
+
+
+class InvalidWebhook(Exception):
+    """Notification that is malformed or fails signature verification"""
+    pass
+
+
+def _amount(value, paise=False):
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return amount / 100 if paise else amount
+
+
+def parse_razorpay(request):
+    """Razorpay webhook: JSON body signed with HMAC-SHA256 of the raw body"""
+    secret = getattr(settings, 'RAZORPAY_WEBHOOK_SECRET', '')
+    signature = request.headers.get('X-Razorpay-Signature', '')
+    if not secret:
+        raise InvalidWebhook("Razorpay webhook secret not configured")
+    expected = hmac.new(secret.encode(), request.body, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, signature):
+        raise InvalidWebhook("Invalid signature")
+
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        raise InvalidWebhook("Malformed JSON body")
+    event_type = payload.get('event', '')
+    entities = payload.get('payload', {})
+    payment = entities.get('payment', {}).get('entity', {})
+    order = entities.get('order', {}).get('entity', {})
+    event_id = request.headers.get('X-Razorpay-Event-Id') or (
+        f"{payment.get('id') or order.get('id')}:{event_type}" if payment or order else ''
+    )
+    return {
+        'event_id': event_id,
+        'event_type': event_type,
+        'order_id': payment.get('order_id') or order.get('id') or '',
+        'amount': _amount(payment.get('amount', order.get('amount_paid')), paise=True),
+        'payload': payload,
+    }
+
+
+def parse_payu(request):
+    """PayU server-to-server notification: form POST with the reverse SHA-512 hash"""
+    data = request.POST.dict()
+    if not data.get('hash'):
+        raise InvalidWebhook("Missing hash")
+    verification = PayUGateway().verify_payment_response(data)
+    if not verification['verified']:
+        raise InvalidWebhook("Invalid signature")
+    return {
+        'event_id': f"{data.get('mihpayid') or data.get('txnid')}:{data.get('status')}",
+        'event_type': data.get('status', ''),
+        'order_id': data.get('txnid', ''),
+        'amount': _amount(data.get('amount')),
+        'payload': data,
+    }
+
+
+def parse_paytm(request):
+    """Paytm server-to-server notification: form POST with CHECKSUMHASH"""
+    data = request.POST.dict()
+    if not data.get('CHECKSUMHASH'):
+        raise InvalidWebhook("Missing checksum")
+    verification = PaytmGateway().verify_transaction(dict(data))
+    if not verification['verified']:
+        raise InvalidWebhook("Invalid signature")
+    return {
+        'event_id': f"{data.get('TXNID') or data.get('ORDERID')}:{data.get('STATUS')}",
+        'event_type': data.get('STATUS', ''),
+        'order_id': data.get('ORDERID', ''),
+        'amount': _amount(data.get('TXNAMOUNT')),
+        'payload': data,
+    }
+
+
+WEBHOOK_PARSERS = {
+    'razorpay': parse_razorpay,
+    'payu': parse_payu,
+    'paytm': parse_paytm,
+}
+
+
+def ingest_event(gateway, request):
+    """
+    Verify and store one webhook notification
+
+    Returns:
+        (event, created): created is False for a duplicate delivery
+
+    Raises:
+        KeyError for an unknown gateway, InvalidWebhook for a bad notification
+    """
+    event = WEBHOOK_PARSERS[gateway](request)
+    if not event['event_id'] or not event['event_type']:
+        raise InvalidWebhook("Missing event id or type")
+
+    payload = event['payload']
+    if event['amount'] is not None:
+        # Kept alongside the raw event so processing can check it against the repayment
+        payload = {**payload, '_amount': str(event['amount'])}
+    try:
+        # Savepoint: a duplicate must not break an outer transaction
+        with transaction.atomic():
+            return GatewayEvent.objects.create(
+                gateway=gateway,
+                event_id=event['event_id'][:200],
+                event_type=event['event_type'][:100],
+                order_id=(event['order_id'] or '')[:200],
+                payload=payload,
+            ), True
+    except IntegrityError:
+        return None, False
+
+
+def retry_delay(attempts):
+    """Backoff after the given number of failed attempts"""
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+def claim_events(batch_size=BATCH_SIZE, now=None):
+    """
+    Lock and return up to batch_size due events, oldest first
+
+    Must run inside a transaction; rows locked by another worker are
+    skipped rather than waited on.
+    """
+    now = now or timezone.now()
+    return list(
+        GatewayEvent.objects.select_for_update(skip_locked=True)
+        .filter(status='Pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id')[:batch_size]
+    )
+
+
+def apply_event(event, now=None):
+    """
+    Apply one event to its repayment (caller saves the event)
+
+    A Paid repayment is never moved back by a late failure notification,
+    and a repayment already in the target state is left untouched.
+    """
+    now = now or timezone.now()
+    outcome = EVENT_OUTCOMES.get(event.gateway, {}).get(event.event_type)
+    if outcome is None:
+        event.status = 'Ignored'
+        event.processed_at = now
+        return
+
+    repayment = (
+        Repayment.objects.select_for_update()
+        .select_related('loan')
+        .filter(gateway_transaction_id=event.order_id)
+        .first()
+    ) if event.order_id else None
+    if repayment is None:
+        raise LookupError(f"No repayment for order {event.order_id or '(none)'}")
+    event.repayment = repayment
+
+    amount = event.payload.get('_amount')
+    if outcome == 'Paid' and amount is not None and Decimal(amount) != repayment.amount_paid:
+        event.status = 'Failed'
+        event.last_error = f"Amount {amount} does not match repayment amount {repayment.amount_paid}"
+        event.processed_at = now
+        return
+
+    if repayment.status != outcome and repayment.status != 'Paid':
+        repayment.status = outcome
+        gateway_response = repayment.gateway_response or {}
+        gateway_response['webhook'] = {
+            'gateway': event.gateway,
+            'event_id': event.event_id,
+            'event_type': event.event_type,
+        }
+        repayment.gateway_response = gateway_response
+        repayment.save()
+
+    event.status = 'Processed'
+    event.last_error = ''
+    event.processed_at = now
+
+
+def _record_failure(event, error, now):
+    event.last_error = f"{type(error).__name__}: {error}"
+    if event.attempts >= MAX_ATTEMPTS:
+        event.status = 'Failed'
+    else:
+        event.next_attempt_at = now + retry_delay(event.attempts)
+
+
+def process_batch(batch_size=BATCH_SIZE, now=None):
+    """
+    Claim one batch of due events and apply them
+
+    Each event is applied in a savepoint, so one failing event is retried
+    later without rolling back the rest of the batch.
+
+    Returns:
+        dict with 'claimed', 'processed', 'ignored', 'retried' and 'failed' counts
+    """
+    now = now or timezone.now()
+    stats = {'claimed': 0, 'processed': 0, 'ignored': 0, 'retried': 0, 'failed': 0}
+
+    with transaction.atomic():
+        events = claim_events(batch_size, now)
+        if not events:
+            return stats
+        stats['claimed'] = len(events)
+
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    apply_event(event, now)
+            except Exception as e:
+                event.repayment = None
+                _record_failure(event, e, now)
+
+        GatewayEvent.objects.bulk_update(events, UPDATE_FIELDS)
+
+    for event in events:
+        if event.status == 'Processed':
+            stats['processed'] += 1
+        elif event.status == 'Ignored':
+            stats['ignored'] += 1
+        elif event.status == 'Failed':
+            stats['failed'] += 1
+        else:
+            stats['retried'] += 1
+    return stats
@@ -0,0 +1,11 @@
+from .services import ranked_search
+
+
+class RankedSearchAdminMixin:
+    """ModelAdmin mixin routing the changelist search box through ranked_search"""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        # The changelist applies its own (column) ordering on top of the matches
+        return ranked_search(queryset, search_term), False
@@ -0,0 +1,178 @@
+"""
+Database-specific search backends
+
+Each backend answers two questions as SQL expressions: which objects of
+a given kind match a query, and how well a given object matches. Both
+run inside the caller's queryset, so scoping filters apply before
+ranking and nothing is truncated. PostgresSearchBackend uses the tsvector
+column and trigram index from migration 0002, SQLiteFTSBackend the FTS5
+shadow table; DocumentScanBackend is the fallback for other databases
+(or an SQLite build without FTS5) and still only reads the single
+denormalized document table.
+"""
+
+from django.db import connections
+from django.db.models import F, FloatField, Func
+from django.db.models.expressions import RawSQL
+
+
+def _split_terms(query):
+    return [term for term in query.split() if term]
+
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+class DocumentRank(Func):
+    """
+    Rank of the outer row's search document (lower is better)
+
+    sql is a scalar subquery with a trailing `{pk}` placeholder for the
+    outer row's primary key column, so it follows whatever alias the
+    queryset gives its table.
+    """
+    output_field = FloatField()
+
+    def __init__(self, sql, params):
+        super().__init__(F('pk'))
+        self.sql = sql
+        self.params = params
+
+    def as_sql(self, compiler, connection, **extra_context):
+        pk_sql, pk_params = compiler.compile(self.source_expressions[0])
+        return self.sql.format(pk=pk_sql), [*self.params, *pk_params]
+
+
+class BaseSearchBackend:
+    """
+    Common interface for one kind of object and one query
+
+    matches(kind, query): expression for `pk__in`, every matching object
+        id (None when nothing can match)
+    rank(kind, query): expression ranking a matching row, lower is better
+
+    Both are evaluated inside the caller's queryset, so its own filters
+    (the student's rows, status, ...) scope the search before anything
+    is ranked or cut off.
+    """
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def connection(self):
+        return connections[self.alias]
+
+    def matches(self, kind, query):
+        raise NotImplementedError
+
+    def rank(self, kind, query):
+        raise NotImplementedError
+
+
+class DocumentScanBackend(BaseSearchBackend):
+    """Substring match over the document table, newest first (no ranking)"""
+
+    def matches(self, kind, query):
+        from .models import SearchDocument
+
+        documents = SearchDocument.objects.using(self.alias).filter(kind=kind)
+        for term in _split_terms(query):
+            documents = documents.filter(document__icontains=term)
+        return documents.values('object_id')
+
+    def rank(self, kind, query):
+        return DocumentRank('(-{pk})', [])
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    FTS5 with the trigram tokenizer, ranked by bm25
+
+    Trigram tokens give substring matches (like the icontains filters this
+    replaces) but need at least three characters; shorter terms are
+    applied as a LIKE filter on the matched rows.
+    """
+    table = 'search_searchdocument_fts'
+    MIN_TERM_LENGTH = 3
+
+    def _terms(self, query):
+        terms = _split_terms(query)
+        long_terms = [term for term in terms if len(term) >= self.MIN_TERM_LENGTH]
+        short_terms = [term for term in terms if len(term) < self.MIN_TERM_LENGTH]
+        match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in long_terms)
+        return match, short_terms
+
+    def matches(self, kind, query):
+        match, short_terms = self._terms(query)
+        if not match:
+            return DocumentScanBackend(self.alias).matches(kind, query)
+
+        sql = [
+            f'SELECT d.object_id FROM {self.table} f',
+            'JOIN search_searchdocument d ON d.id = f.rowid',
+            f'WHERE {self.table} MATCH %s AND d.kind = %s',
+        ]
+        params = [match, kind]
+        for term in short_terms:
+            sql.append("AND d.document LIKE %s ESCAPE '\\'")
+            params.append(_like_pattern(term))
+        return RawSQL(' '.join(sql), params)
+
+    def rank(self, kind, query):
+        match, _ = self._terms(query)
+        if not match:
+            return DocumentScanBackend(self.alias).rank(kind, query)
+        # Seek the document by (kind, object_id), then score that one FTS row
+        return DocumentRank(
+            f'(SELECT bm25({self.table}) FROM {self.table} WHERE {self.table} MATCH %s '
+            f'AND {self.table}.rowid = (SELECT d.id FROM search_searchdocument d '
+            'WHERE d.kind = %s AND d.object_id = {pk}))',
+            [match, kind],
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    tsvector match for whole words plus trigram ILIKE for fragments
+
+    Ranked by ts_rank plus trigram similarity, so exact word hits come
+    before partial ones.
+    """
+
+    def matches(self, kind, query):
+        terms = _split_terms(query)
+        if not terms:
+            return None
+        return RawSQL(
+            "SELECT object_id FROM search_searchdocument WHERE kind = %s "
+            "AND (search_vector @@ websearch_to_tsquery('simple', %s) OR document ILIKE ALL(%s))",
+            [kind, query, [_like_pattern(term) for term in terms]],
+        )
+
+    def rank(self, kind, query):
+        return DocumentRank(
+            "(SELECT -(ts_rank(d.search_vector, websearch_to_tsquery('simple', %s)) + similarity(d.document, %s)) "
+            'FROM search_searchdocument d WHERE d.kind = %s AND d.object_id = {pk})',
+            [query, query, kind],
+        )
+
+
+_backends = {}
+
+
+def get_backend(alias='default'):
+    """Search backend for a database alias, chosen by vendor and available indexes"""
+    if alias not in _backends:
+        connection = connections[alias]
+        if connection.vendor == 'postgresql':
+            backend = PostgresSearchBackend(alias)
+        elif (connection.vendor == 'sqlite'
+              and SQLiteFTSBackend.table in connection.introspection.table_names()):
+            backend = SQLiteFTSBackend(alias)
+        else:
+            backend = DocumentScanBackend(alias)
+        _backends[alias] = backend
+    return _backends[alias]
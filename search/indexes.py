@@ -0,0 +1,141 @@
+"""
+Search document definitions for the Student Loan Portal
+
+Each SearchIndex says which model a document kind is built from and
+which fields end up in the document text. The helpers below keep the
+SearchDocument table in step with those models: signals call
+update_document()/remove_document() on every change, and
+rebuild_index() regenerates everything (used by the data migration and
+the rebuild_search_index management command).
+"""
+
+from django.apps import apps as django_apps
+from django.db import transaction
+
+
+class SearchIndex:
+    """Base class: maps one model to one kind of search document"""
+    kind = None
+    model = None
+    related = ()
+    # Fields on the model itself that feed the document; saves limited to
+    # other fields (update_fields) do not touch the index
+    document_fields = ()
+
+    def get_model(self, apps=django_apps):
+        return apps.get_model(self.model)
+
+    def get_queryset(self, apps=django_apps):
+        return self.get_model(apps)._default_manager.select_related(*self.related).order_by('pk')
+
+    def values(self, obj):
+        raise NotImplementedError
+
+    def document(self, obj):
+        return ' '.join(str(value) for value in self.values(obj) if value)
+
+
+class LoanSearchIndex(SearchIndex):
+    kind = 'loan'
+    model = 'loans.LoanApplication'
+    related = ('student',)
+    document_fields = ('student', 'reason')
+
+    def values(self, loan):
+        student = loan.student
+        return (
+            student.first_name, student.last_name, student.student_id, student.email,
+            loan.reason,
+        )
+
+
+class RepaymentSearchIndex(SearchIndex):
+    kind = 'repayment'
+    model = 'repayments.Repayment'
+    related = ('loan__student',)
+    document_fields = ('loan', 'transaction_id', 'notes')
+
+    def values(self, repayment):
+        student = repayment.loan.student
+        return (
+            student.first_name, student.last_name, student.student_id, student.email,
+            repayment.transaction_id, repayment.notes,
+        )
+
+
+class WithdrawalSearchIndex(SearchIndex):
+    kind = 'withdrawal'
+    model = 'repayments.Withdrawal'
+    related = ('financier__user',)
+    document_fields = ('financier', 'transaction_id', 'notes')
+
+    def values(self, withdrawal):
+        financier = withdrawal.financier
+        return (
+            financier.user.first_name, financier.user.last_name, financier.financier_id,
+            withdrawal.transaction_id, withdrawal.notes,
+        )
+
+
+INDEXES = {
+    index.kind: index
+    for index in (LoanSearchIndex(), RepaymentSearchIndex(), WithdrawalSearchIndex())
+}
+
+
+def index_for_model(model):
+    """SearchIndex for a model class (or None when the model is not searchable)"""
+    label = model._meta.label
+    for index in INDEXES.values():
+        if index.model == label:
+            return index
+    return None
+
+
+def update_document(obj):
+    """Write the search document for a single object"""
+    from .models import SearchDocument
+
+    index = index_for_model(type(obj))
+    SearchDocument.objects.update_or_create(
+        kind=index.kind, object_id=obj.pk, defaults={'document': index.document(obj)}
+    )
+
+
+def remove_document(obj):
+    """Drop the search document for an object that is being deleted"""
+    from .models import SearchDocument
+
+    index = index_for_model(type(obj))
+    SearchDocument.objects.filter(kind=index.kind, object_id=obj.pk).delete()
+
+
+def rebuild_index(kinds=None, apps=django_apps, batch_size=1000):
+    """
+    Regenerate search documents from scratch
+
+    Args:
+        kinds: Document kinds to rebuild (default: all)
+        apps: App registry; migrations pass their historical registry
+        batch_size: Objects per bulk insert
+
+    Returns:
+        dict mapping kind to the number of documents written
+    """
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+    counts = {}
+    for kind in kinds or INDEXES:
+        index = INDEXES[kind]
+        with transaction.atomic():
+            SearchDocument.objects.filter(kind=kind).delete()
+            batch = []
+            counts[kind] = 0
+            for obj in index.get_queryset(apps).iterator(chunk_size=batch_size):
+                batch.append(SearchDocument(kind=kind, object_id=obj.pk, document=index.document(obj)))
+                if len(batch) >= batch_size:
+                    SearchDocument.objects.bulk_create(batch)
+                    counts[kind] += len(batch)
+                    batch = []
+            SearchDocument.objects.bulk_create(batch)
+            counts[kind] += len(batch)
+    return counts
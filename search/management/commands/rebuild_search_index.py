@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from search.indexes import INDEXES, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the search documents behind the list and admin search boxes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', dest='kinds', choices=sorted(INDEXES),
+                            help='Limit to the given document kind (can be repeated)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        counts = rebuild_index(options['kinds'], batch_size=options['batch_size'])
+        for kind, count in counts.items():
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {kind} document(s)'))
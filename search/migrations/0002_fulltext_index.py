@@ -0,0 +1,82 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "ALTER TABLE search_searchdocument ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', document)) STORED",
+    'CREATE INDEX search_doc_vector_idx ON search_searchdocument USING GIN (search_vector)',
+    'CREATE INDEX search_doc_trgm_idx ON search_searchdocument USING GIN (document gin_trgm_ops)',
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS search_doc_trgm_idx',
+    'DROP INDEX IF EXISTS search_doc_vector_idx',
+    'ALTER TABLE search_searchdocument DROP COLUMN IF EXISTS search_vector',
+]
+
+# External-content FTS5 table kept in step with search_searchdocument by triggers
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE search_searchdocument_fts USING fts5("
+    "document, content='search_searchdocument', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER search_searchdocument_fts_ai AFTER INSERT ON search_searchdocument BEGIN "
+    "INSERT INTO search_searchdocument_fts(rowid, document) VALUES (new.id, new.document); END",
+    "CREATE TRIGGER search_searchdocument_fts_ad AFTER DELETE ON search_searchdocument BEGIN "
+    "INSERT INTO search_searchdocument_fts(search_searchdocument_fts, rowid, document) "
+    "VALUES ('delete', old.id, old.document); END",
+    "CREATE TRIGGER search_searchdocument_fts_au AFTER UPDATE ON search_searchdocument BEGIN "
+    "INSERT INTO search_searchdocument_fts(search_searchdocument_fts, rowid, document) "
+    "VALUES ('delete', old.id, old.document); "
+    "INSERT INTO search_searchdocument_fts(rowid, document) VALUES (new.id, new.document); END",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS search_searchdocument_fts_au',
+    'DROP TRIGGER IF EXISTS search_searchdocument_fts_ad',
+    'DROP TRIGGER IF EXISTS search_searchdocument_fts_ai',
+    'DROP TABLE IF EXISTS search_searchdocument_fts',
+]
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in POSTGRES_FORWARD:
+            schema_editor.execute(statement)
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(SQLITE_FORWARD[0])
+        except OperationalError:
+            # SQLite built without FTS5 (or older than 3.34, no trigram
+            # tokenizer): search falls back to scanning the document table
+            return
+        for statement in SQLITE_FORWARD[1:]:
+            schema_editor.execute(statement)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def populate_documents(apps, schema_editor):
+    from search.indexes import rebuild_index
+    rebuild_index(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+        ('loans', '0005_hot_path_indexes'),
+        ('repayments', '0004_hot_path_indexes'),
+        ('users', '0003_studentuser_user_type_financieruser'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(populate_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized, searchable text for one loan, repayment or withdrawal
+
+    Flattens the fields the admin search boxes look at (student or
+    financier names and IDs, reason, transaction ID, notes) into a single
+    column so a search hits one indexed table instead of a chain of
+    icontains filters across joins. The full-text index on top of it is
+    database specific and created in migration 0002: a tsvector column
+    plus trigram GIN indexes on PostgreSQL, an FTS5 shadow table on SQLite.
+    """
+
+    KIND_CHOICES = [
+        ('loan', 'Loan Application'),
+        ('repayment', 'Repayment'),
+        ('withdrawal', 'Withdrawal'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    document = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Search Document'
+        verbose_name_plural = 'Search Documents'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='search_doc_kind_object_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}"
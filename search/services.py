@@ -0,0 +1,32 @@
+"""
+Ranked search API used by every list and admin search box
+"""
+
+from django.db.models import Value
+
+from .backends import get_backend
+from .indexes import index_for_model
+
+# Keyset ordering for ranked results (best match first)
+SEARCH_ORDERING = ('search_rank', 'id')
+
+
+def ranked_search(queryset, query):
+    """
+    Restrict a queryset to objects matching query, ranked by relevance
+
+    The queryset keeps its own filters (role, status, ...) and the search
+    runs inside them: every match in scope is returned, annotated with
+    `search_rank` (lower = better) for ordering by SEARCH_ORDERING, so
+    keyset pages and exports walk the full result.
+    """
+    index = index_for_model(queryset.model)
+    if index is None:
+        raise ValueError(f"{queryset.model._meta.label} has no search index")
+
+    backend = get_backend(queryset.db)
+    query = query.strip()
+    matches = backend.matches(index.kind, query)
+    if matches is None:
+        return queryset.none().annotate(search_rank=Value(0.0))
+    return queryset.filter(pk__in=matches).annotate(search_rank=backend.rank(index.kind, query))
@@ -0,0 +1,58 @@
+"""
+Keep search documents current as loans, repayments, withdrawals and the
+people they belong to change
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from loans.models import LoanApplication
+from repayments.models import Repayment, Withdrawal
+from users.models import StudentUser, FinancierUser
+from .indexes import index_for_model, update_document, remove_document
+
+# Person fields that appear in loan/repayment/withdrawal documents
+PERSON_FIELDS = {'first_name', 'last_name', 'student_id', 'email', 'financier_id'}
+
+
+def _touches(update_fields, fields):
+    """False when a save was limited to fields that are not indexed"""
+    return update_fields is None or bool(set(update_fields) & set(fields))
+
+
+@receiver(post_save, sender=LoanApplication)
+@receiver(post_save, sender=Repayment)
+@receiver(post_save, sender=Withdrawal)
+def index_saved_object(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or not _touches(update_fields, index_for_model(sender).document_fields):
+        return
+    update_document(instance)
+
+
+@receiver(post_delete, sender=LoanApplication)
+@receiver(post_delete, sender=Repayment)
+@receiver(post_delete, sender=Withdrawal)
+def unindex_deleted_object(sender, instance, **kwargs):
+    remove_document(instance)
+
+
+@receiver(post_save, sender=StudentUser)
+def reindex_student(sender, instance, created=False, update_fields=None, raw=False, **kwargs):
+    """Names and IDs are copied into documents, so renames must be re-indexed"""
+    # Logins save last_login only; new users have nothing indexed yet
+    if raw or created or not _touches(update_fields, PERSON_FIELDS):
+        return
+    for loan in LoanApplication.objects.filter(student=instance).select_related('student'):
+        update_document(loan)
+    for repayment in Repayment.objects.filter(loan__student=instance).select_related('loan__student'):
+        update_document(repayment)
+    for withdrawal in Withdrawal.objects.filter(financier__user=instance).select_related('financier__user'):
+        update_document(withdrawal)
+
+
+@receiver(post_save, sender=FinancierUser)
+def reindex_financier(sender, instance, created=False, update_fields=None, raw=False, **kwargs):
+    if raw or created or not _touches(update_fields, PERSON_FIELDS):
+        return
+    for withdrawal in Withdrawal.objects.filter(financier=instance).select_related('financier__user'):
+        update_document(withdrawal)
@@ -0,0 +1,184 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from loans.models import LoanApplication
+from repayments.models import Repayment, Withdrawal
+from users.models import StudentUser, FinancierUser
+from .backends import get_backend, SQLiteFTSBackend
+from .indexes import rebuild_index
+from loan_app.pagination import KeysetPaginator
+from loans.filters import filter_loans
+from .models import SearchDocument
+from .services import ranked_search, SEARCH_ORDERING
+
+
+class SearchTests(TestCase):
+    """Search documents follow their sources and every search box uses them"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = StudentUser.objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+            first_name='Admin',
+            last_name='User',
+            student_id='ADM001',
+            university='N/A',
+            gpa=Decimal('0.00'),
+        )
+
+    def create_student(self, student_id, first_name, last_name):
+        return StudentUser.objects.create_user(
+            email=f'{student_id.lower()}@example.com',
+            password='testpass123',
+            first_name=first_name,
+            last_name=last_name,
+            student_id=student_id,
+            university='Test University',
+            gpa=Decimal('5.00'),
+        )
+
+    def create_loan(self, student, reason='Tuition fees'):
+        return LoanApplication.objects.create(
+            student=student,
+            amount=1000,
+            reason=reason,
+            status='Approved',
+            repayment_due_date=timezone.now().date() + timedelta(days=30),
+        )
+
+    def search_ids(self, queryset, query):
+        return list(ranked_search(queryset, query).order_by('search_rank', 'id').values_list('id', flat=True))
+
+    def test_sqlite_uses_fts(self):
+        self.assertIsInstance(get_backend(), SQLiteFTSBackend)
+
+    def test_loan_search_matches_names_ids_and_reason(self):
+        priya = self.create_loan(self.create_student('STU101', 'Priya', 'Sharma'), 'Hostel rent')
+        rahul = self.create_loan(self.create_student('STU102', 'Rahul', 'Verma'), 'Laptop purchase')
+        loans = LoanApplication.objects.all()
+
+        self.assertEqual(self.search_ids(loans, 'priya'), [priya.id])
+        self.assertEqual(self.search_ids(loans, 'STU102'), [rahul.id])
+        # Substrings match like the icontains filters did
+        self.assertEqual(self.search_ids(loans, 'apto'), [rahul.id])
+        # Every term must match, short terms included
+        self.assertEqual(self.search_ids(loans, 'Rahul Ve'), [rahul.id])
+        self.assertEqual(self.search_ids(loans, 'Priya Laptop'), [])
+        # The queryset's own filters still apply
+        self.assertEqual(self.search_ids(loans.filter(status='Pending'), 'priya'), [])
+
+    def test_documents_follow_changes(self):
+        student = self.create_student('STU201', 'Anita', 'Rao')
+        loan = self.create_loan(student)
+        repayment = Repayment.objects.create(
+            loan=loan, amount_paid=Decimal('100.00'), status='Paid', transaction_id='TXN-ALPHA-1'
+        )
+        self.assertEqual(self.search_ids(Repayment.objects.all(), 'alpha'), [repayment.id])
+
+        student.last_name = 'Kulkarni'
+        student.save()
+        self.assertEqual(self.search_ids(LoanApplication.objects.all(), 'kulkarni'), [loan.id])
+        self.assertEqual(self.search_ids(Repayment.objects.all(), 'kulkarni'), [repayment.id])
+        self.assertEqual(self.search_ids(LoanApplication.objects.all(), 'Rao'), [])
+
+        repayment.delete()
+        self.assertFalse(SearchDocument.objects.filter(kind='repayment', object_id=repayment.id).exists())
+
+    def test_rebuild_index(self):
+        loan = self.create_loan(self.create_student('STU301', 'Meera', 'Iyer'))
+        SearchDocument.objects.all().delete()
+        self.assertEqual(self.search_ids(LoanApplication.objects.all(), 'meera'), [])
+
+        counts = rebuild_index()
+        self.assertEqual(counts['loan'], 1)
+        self.assertEqual(self.search_ids(LoanApplication.objects.all(), 'meera'), [loan.id])
+
+    def test_admin_views_search(self):
+        loan = self.create_loan(self.create_student('STU401', 'Kavya', 'Nair'), 'Semester fees')
+        self.create_loan(self.create_student('STU402', 'Arjun', 'Mehta'))
+        financier_user = self.create_student('FIN401', 'Vikram', 'Singh')
+        financier = FinancierUser.objects.create(user=financier_user, financier_id='F401')
+        withdrawal = Withdrawal.objects.create(
+            financier=financier, amount=Decimal('500.00'), withdrawal_method='UPI', upi_id='vikram@upi'
+        )
+        self.client.force_login(self.admin)
+
+        response = self.client.get(reverse('loans:admin_management'), {'search': 'semester'})
+        self.assertEqual([item.id for item in response.context['loans']], [loan.id])
+
+        response = self.client.get(reverse('loans:list'), {'search': 'kavya'})
+        self.assertEqual([item.id for item in response.context['loans']], [loan.id])
+
+        response = self.client.get(reverse('repayments:admin_withdrawal_management'), {'search': 'F401'})
+        self.assertEqual([item.id for item in response.context['withdrawals']], [withdrawal.id])
+
+        response = self.client.get(reverse('admin:loans_loanapplication_changelist'), {'q': 'arjun'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class ScopedSearchTests(TestCase):
+    """Searches rank inside the caller's scope and are never cut off"""
+
+    BETTER_MATCHES = 510
+
+    @classmethod
+    def setUpTestData(cls):
+        def student(student_id, **extra):
+            return StudentUser.objects.create_user(
+                email=f'{student_id.lower()}@example.com', password='testpass123', first_name='Test',
+                last_name=student_id, student_id=student_id, university='Test University',
+                gpa=Decimal('5.00'), **extra,
+            )
+
+        cls.admin = student('ADM001', is_staff=True)
+        cls.student = student('STU001')
+        other = student('STU002')
+        due = timezone.now().date() + timedelta(days=30)
+        # Another student's loans all match "scholarship" better than this student's
+        LoanApplication.objects.bulk_create([
+            LoanApplication(student=other, amount=1000, reason='Scholarship scholarship scholarship',
+                            status='Approved', repayment_due_date=due)
+            for _ in range(cls.BETTER_MATCHES)
+        ])
+        cls.own = [
+            LoanApplication.objects.create(
+                student=cls.student, amount=1000, status='Pending', repayment_due_date=due,
+                reason='Bridge funding until the scholarship for the semester abroad is paid out',
+            )
+            for _ in range(2)
+        ]
+        rebuild_index(['loan'])
+
+    def test_student_search_finds_own_matches(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('loans:list'), {'search': 'scholarship'})
+        self.assertEqual(sorted(loan.id for loan in response.context['loans']), sorted(loan.id for loan in self.own))
+
+    def test_filters_scope_the_search(self):
+        loans, ordering = filter_loans(LoanApplication.objects.all(), 'scholarship', status='Pending')
+        self.assertEqual(sorted(loans.values_list('id', flat=True)), sorted(loan.id for loan in self.own))
+
+    def test_keyset_pages_walk_every_match(self):
+        loans = ranked_search(LoanApplication.objects.all(), 'scholarship')
+        paginator = KeysetPaginator(loans, SEARCH_ORDERING, per_page=200)
+        page = paginator.get_page()
+        # Best matches first
+        self.assertNotIn(self.own[0].id, [loan.id for loan in page])
+        seen = [loan.id for loan in page]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            seen += [loan.id for loan in page]
+        self.assertEqual(len(seen), self.BETTER_MATCHES + 2)
+        self.assertEqual(len(set(seen)), len(seen))
+        self.assertEqual(set(seen[-2:]), {loan.id for loan in self.own})
+
+    def test_export_is_not_truncated(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('loans:admin_export'), {'search': 'scholarship'})
+        lines = b''.join(response.streaming_content).decode().strip().splitlines()
+        self.assertEqual(len(lines), self.BETTER_MATCHES + 2 + 1)  # plus the header
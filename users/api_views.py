@@ -0,0 +1,38 @@
+"""
+REST API viewsets for users (api/v1/users/)
+
+Staff can list every user; everyone else only sees their own profile,
+which is also served at users/me/.
+"""
+
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from loan_app.api import SparseFieldsetsViewMixin
+from .models import StudentUser
+from .serializers import UserSerializer
+
+
+class UserViewSet(SparseFieldsetsViewMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    list:     GET users/        (?user_type=, ?fields=, ?cursor=, ?page_size=)
+    retrieve: GET users/{id}/
+    me:       GET users/me/
+    """
+    serializer_class = UserSerializer
+    cursor_ordering = ('-date_joined', '-id')
+
+    def get_queryset(self):
+        queryset = StudentUser.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(pk=self.request.user.pk)
+        if self.action == 'list' and self.request.query_params.get('user_type'):
+            queryset = queryset.filter(user_type=self.request.query_params['user_type'])
+        if self.wants('financier_id'):
+            queryset = queryset.select_related('financier_profile')
+        return queryset
+
+    @action(detail=False)
+    def me(self, request, version=None):
+        return Response(self.get_serializer(self.get_queryset().get(pk=request.user.pk)).data)
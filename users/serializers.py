@@ -0,0 +1,22 @@
+"""
+REST API serializers for users
+"""
+
+from rest_framework import serializers
+
+from loan_app.api import SparseFieldsetsMixin
+from .models import StudentUser
+
+
+class UserSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """Profile of a student or financier (read-only)"""
+    financier_id = serializers.CharField(source='financier_profile.financier_id', read_only=True, default=None)
+    is_eligible_for_loan = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = StudentUser
+        fields = [
+            'id', 'email', 'first_name', 'last_name', 'user_type', 'student_id', 'university', 'gpa',
+            'phone_number', 'is_eligible_for_loan', 'financier_id', 'date_joined',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,189 @@
+"""
+Borrower summary service for the Student Loan Portal
+
+Collects everything the dashboard, profile page and summary API show
+about a single student (status counts, amounts paid and remaining,
+overdue reminders, installments due soon, recent loans and repayments)
+in a fixed number of queries, regardless of how many loans the student
+has.
+
+The JSON summaries polled by the front-end widgets are cached per student
+and per loan (see caching/versioned.py).
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Count, Q, Sum
+from django.shortcuts import get_object_or_404
+
+from caching.versioned import cached, loan_scope, student_scope
+from loan_app.computed import as_of_date
+from loans.models import LoanApplication, RepaymentSchedule
+from repayments.models import Repayment
+
+
+class BorrowerSummary:
+    """Loan and repayment overview for one student"""
+
+    DUE_SOON_DAYS = 7
+
+    def __init__(self, student, recent_limit=5):
+        """
+        Args:
+            student: StudentUser instance
+            recent_limit: Number of recent loans/repayments to load
+                (None for all, 0 to skip those queries)
+        """
+        self.student = student
+        self.recent_limit = recent_limit
+        self._load()
+
+    def _load(self):
+        loans = LoanApplication.objects.filter(student=self.student)
+
+        # 1. Status counts and ledger totals via conditional aggregation
+        totals = loans.aggregate(
+            total_loans=Count('id'),
+            approved_loans=Count('id', filter=Q(status='Approved')),
+            pending_loans=Count('id', filter=Q(status='Pending')),
+            rejected_loans=Count('id', filter=Q(status='Rejected')),
+            total_paid=Sum('total_paid'),
+            total_remaining=Sum(
+                'outstanding_balance',
+                filter=Q(status='Approved', outstanding_balance__gt=0)
+            ),
+        )
+        self.total_loans = totals['total_loans']
+        self.approved_loans = totals['approved_loans']
+        self.pending_loans = totals['pending_loans']
+        self.rejected_loans = totals['rejected_loans']
+        self.total_paid = totals['total_paid'] or Decimal('0.00')
+        self.total_remaining = totals['total_remaining'] or Decimal('0.00')
+        self.has_active_loan = (self.approved_loans + self.pending_loans) > 0
+
+        # 2. Approved loans feed the active loan and the reminder lists
+        self.approved = list(loans.filter(status='Approved').order_by('-created_at'))
+        self.active_loan = self.approved[0] if self.approved else None
+
+        self.overdue_loans = []
+        for loan in self.approved:
+            if loan.outstanding_balance > 0 and loan.is_overdue:
+                self.overdue_loans.append({
+                    'loan': loan,
+                    'remaining_amount': loan.outstanding_balance,
+                    'due_date': loan.repayment_due_date,
+                    'days_overdue': loan.days_overdue,
+                })
+
+        # 3. Next open installment per loan falling due within the week
+        #    (range scan on the open-installment due date index)
+        today = as_of_date()
+        loans_by_id = {loan.pk: loan for loan in self.approved}
+        due_soon = RepaymentSchedule.objects.due_between(
+            today, today + timedelta(days=self.DUE_SOON_DAYS)
+        ).filter(loan__student=self.student).order_by('due_date', 'number')
+        self.upcoming_due_loans = []
+        seen = set()
+        for installment in due_soon:
+            if installment.loan_id in seen or installment.loan_id not in loans_by_id:
+                continue
+            seen.add(installment.loan_id)
+            self.upcoming_due_loans.append({
+                'loan': loans_by_id[installment.loan_id],
+                'installment': installment,
+                'remaining_amount': installment.amount_remaining,
+                'due_date': installment.due_date,
+                'days_until_due': (installment.due_date - today).days,
+            })
+
+        # 4. Recent loans and 5. recent repayments (with their loan joined in)
+        if self.recent_limit == 0:
+            self.recent_loans = []
+            self.recent_repayments = []
+            return
+        recent_loans = loans.order_by('-created_at')
+        recent_repayments = Repayment.objects.filter(
+            loan__student=self.student
+        ).select_related('loan').order_by('-payment_date')
+        if self.recent_limit is not None:
+            recent_loans = recent_loans[:self.recent_limit]
+            recent_repayments = recent_repayments[:self.recent_limit]
+        self.recent_loans = list(recent_loans)
+        self.recent_repayments = list(recent_repayments)
+
+    @property
+    def has_reminders(self):
+        return bool(self.overdue_loans or self.upcoming_due_loans)
+
+    def as_context(self):
+        """Template context shared by the dashboard and profile pages"""
+        return {
+            'loan_applications': self.recent_loans,
+            'repayments': self.recent_repayments,
+            'active_loan': self.active_loan,
+            'has_active_loan': self.has_active_loan,
+            'total_loans': self.total_loans,
+            'approved_loans': self.approved_loans,
+            'pending_loans': self.pending_loans,
+            'rejected_loans': self.rejected_loans,
+            'total_paid': self.total_paid,
+            'total_remaining': self.total_remaining,
+            'overdue_loans': self.overdue_loans,
+            'upcoming_due_loans': self.upcoming_due_loans,
+            'has_reminders': self.has_reminders,
+        }
+
+    def active_loan_data(self):
+        """JSON-serializable repayment summary for the active loan"""
+        loan = self.active_loan
+        if not loan:
+            return {'has_active_loan': False}
+        return {
+            'has_active_loan': True,
+            'loan_id': loan.id,
+            'total_amount_due': float(loan.total_amount_due),
+            'total_paid': float(loan.total_paid),
+            'remaining_amount': float(loan.outstanding_balance),
+            'is_overdue': loan.is_overdue,
+            'days_until_due': loan.days_until_due,
+        }
+
+
+@cached('repayment_summary', lambda student: [student_scope(student.pk)])
+def repayment_summary_data(student):
+    """Active loan summary served by the repayment summary and profile APIs"""
+    return BorrowerSummary(student, recent_limit=0).active_loan_data()
+
+
+@cached('loan_status', lambda student, loan_id: [student_scope(student.pk), loan_scope(loan_id)])
+def loan_status_data(student, loan_id):
+    """Status of one of the student's loans (404 for anyone else's)"""
+    loan = get_object_or_404(LoanApplication, id=loan_id, student=student)
+    return {
+        'id': loan.id,
+        'amount': loan.amount,
+        'status': loan.status,
+        'created_at': loan.created_at.strftime('%B %d, %Y'),
+        'repayment_due_date': loan.repayment_due_date.strftime('%B %d, %Y') if loan.repayment_due_date else None,
+        'is_overdue': loan.is_overdue,
+        'total_amount_due': float(loan.total_amount_due),
+        'days_until_due': loan.days_until_due,
+    }
+
+
+@cached('dashboard_summary', lambda student: [student_scope(student.pk)])
+def dashboard_summary_data(student):
+    """Repayment progress of the student's active loan for the dashboard widget"""
+    active_loan = LoanApplication.objects.filter(student=student, status='Approved').first()
+    if not active_loan:
+        return {'has_active_loan': False}
+    return {
+        'has_active_loan': True,
+        'loan_id': active_loan.id,
+        'total_amount_due': float(active_loan.total_amount_due),
+        'total_paid': float(active_loan.total_paid),
+        'remaining_amount': float(active_loan.outstanding_balance),
+        'is_overdue': active_loan.is_overdue,
+        'days_until_due': active_loan.days_until_due,
+        'repayment_progress': float(active_loan.repayment_progress),
+    }
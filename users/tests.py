@@ -1,3 +1,141 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from loan_app.computed import as_of
+from loans.models import LoanApplication
+from repayments.models import Repayment
+from .models import FinancierUser, StudentUser
+from .services import BorrowerSummary
+
+
+class BorrowerSummaryTests(TestCase):
+    """BorrowerSummary must run a fixed number of queries however many loans a student has"""
+
+    SUMMARY_QUERY_BUDGET = 5
+
+    def setUp(self):
+        self.student = StudentUser.objects.create_user(
+            email='student@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='Student',
+            student_id='STU001',
+            university='Test University',
+            gpa=Decimal('5.00'),  # below the auto-approval threshold
+        )
+
+    def create_loans(self, count):
+        today = timezone.now().date()
+        for i in range(count):
+            loan = LoanApplication.objects.create(
+                student=self.student,
+                amount=1000,
+                reason='Tuition',
+                status='Approved',
+                # Alternate between overdue and due within the week
+                repayment_due_date=today - timedelta(days=3) if i % 2 else today + timedelta(days=3),
+            )
+            Repayment.objects.create(loan=loan, amount_paid=Decimal('100.00'), status='Paid')
+
+    def dashboard_query_count(self):
+        self.client.force_login(self.student)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('users:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_summary_query_budget(self):
+        self.create_loans(6)
+        with self.assertNumQueries(self.SUMMARY_QUERY_BUDGET):
+            summary = BorrowerSummary(self.student)
+
+        self.assertEqual(summary.total_loans, 6)
+        self.assertEqual(summary.approved_loans, 6)
+        self.assertEqual(summary.total_paid, Decimal('600.00'))
+        self.assertEqual(len(summary.overdue_loans), 3)
+        self.assertEqual(len(summary.upcoming_due_loans), 3)
+        self.assertEqual(len(summary.recent_loans), 5)
+        self.assertEqual(len(summary.recent_repayments), 5)
+
+    def test_summary_uses_the_as_of_date(self):
+        self.create_loans(2)
+        with as_of(timezone.now().date() + timedelta(days=10)):
+            summary = BorrowerSummary(self.student)
+        # Both loans are past due on that date, none merely due soon
+        self.assertEqual(len(summary.overdue_loans), 2)
+        self.assertEqual(summary.upcoming_due_loans, [])
+
+    def test_dashboard_queries_do_not_grow_with_loans(self):
+        self.create_loans(1)
+        baseline = self.dashboard_query_count()
+        self.create_loans(10)
+        self.assertEqual(self.dashboard_query_count(), baseline)
+
+    def test_profile_and_summary_api(self):
+        self.create_loans(2)
+        self.client.force_login(self.student)
+
+        response = self.client.get(reverse('users:profile'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['default_count'], 1)
+
+        response = self.client.get(reverse('users:repayment_summary_api'))
+        data = response.json()['data']
+        self.assertTrue(data['has_active_loan'])
+        self.assertEqual(data['total_paid'], 100.0)
+
+
+class UserApiTests(TestCase):
+    """api/v1/users/ and the JWT token endpoints"""
+
+    def setUp(self):
+        self.student = StudentUser.objects.create_user(
+            email='student@example.com', password='testpass123', first_name='Test', last_name='Student',
+            student_id='STU001', university='Test University', gpa=Decimal('7.00'),
+        )
+        financier_user = StudentUser.objects.create_user(
+            email='financier@example.com', password='testpass123', first_name='Test', last_name='Financier',
+            student_id='FIN001', university='N/A', gpa=Decimal('0.00'), user_type='financier',
+        )
+        FinancierUser.objects.create(user=financier_user, financier_id='F001')
+        self.staff = StudentUser.objects.create_superuser(
+            email='admin@example.com', password='testpass123', first_name='Admin', last_name='User',
+            student_id='ADM001', university='N/A', gpa=Decimal('0.00'),
+        )
+        self.client = APIClient()
+
+    def test_me_and_scoping(self):
+        self.client.force_authenticate(self.student)
+        me = self.client.get('/api/v1/users/me/').json()
+        self.assertEqual(me['email'], 'student@example.com')
+        self.assertTrue(me['is_eligible_for_loan'])
+        self.assertIsNone(me['financier_id'])
+        self.assertEqual([row['id'] for row in self.client.get('/api/v1/users/').json()['results']], [self.student.pk])
+
+    def test_staff_list_query_count(self):
+        self.client.force_authenticate(self.staff)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/users/')
+        financier_ids = {row['email']: row['financier_id'] for row in response.json()['results']}
+        self.assertEqual(financier_ids['financier@example.com'], 'F001')
+
+    def test_token_authentication(self):
+        response = self.client.post(
+            '/api/v1/token/', {'email': 'student@example.com', 'password': 'testpass123'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/v1/users/me/').status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+        self.assertEqual(self.client.get('/api/v1/users/me/').json()['id'], self.student.pk)
 
-# Create your tests here.
+    def test_unknown_version(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get('/api/v2/users/me/').status_code, 404)
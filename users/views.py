@@ -15,8 +15,12 @@ import json
 
 from .forms import StudentUserCreationForm, StudentProfileForm
 from .models import StudentUser
+from .services import BorrowerSummary, loan_status_data, repayment_summary_data
 from loans.models import LoanApplication
 from repayments.models import Repayment
+from loan_app.computed import as_of_date
+from loan_app.conditional import conditional, validator
+from loan_app.pagination import keyset_paginate
 
 
 class StudentRegistrationView(CreateView):
@@ -74,49 +78,11 @@ class StudentProfileView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         """Add loan and repayment data to context"""
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-        
-        # Get user's loan applications
-        context['loan_applications'] = LoanApplication.objects.filter(
-            student=user
-        ).order_by('-created_at')
-        
-        # Get user's repayments
-        context['repayments'] = Repayment.objects.filter(
-            loan__student=user
-        ).order_by('-payment_date')
-        
-        # Calculate loan statistics
-        context['total_loans'] = context['loan_applications'].count()
-        context['approved_loans'] = context['loan_applications'].filter(status='Approved').count()
-        context['pending_loans'] = context['loan_applications'].filter(status='Pending').count()
-        context['rejected_loans'] = context['loan_applications'].filter(status='Rejected').count()
-        
-        # Calculate repayment statistics
-        total_paid = sum(
-            repayment.amount_paid 
-            for repayment in context['repayments'].filter(status='Paid')
-        )
-        context['total_paid'] = total_paid
-        
-        # Check for payment defaults (overdue loans with unpaid amounts)
-        payment_defaults = []
-        for loan in context['loan_applications'].filter(status='Approved'):
-            # Calculate remaining amount for this loan
-            loan_total_paid = sum(
-                r.amount_paid for r in loan.repayments.filter(status='Paid')
-            )
-            remaining_amount = loan.total_amount_due - loan_total_paid
-            
-            # Check if loan is overdue and has unpaid amount
-            if loan.is_overdue and remaining_amount > 0:
-                payment_defaults.append({
-                    'loan': loan,
-                    'remaining_amount': remaining_amount,
-                    'days_overdue': loan.days_overdue,
-                    'due_date': loan.repayment_due_date,
-                })
+        summary = BorrowerSummary(self.request.user, recent_limit=None)
+        context.update(summary.as_context())
         
+        # Payment defaults are overdue loans with an unpaid amount
+        payment_defaults = summary.overdue_loans
         context['payment_defaults'] = payment_defaults
         context['has_payment_default'] = len(payment_defaults) > 0
         context['default_count'] = len(payment_defaults)
@@ -145,78 +111,11 @@ class StudentProfileUpdateView(LoginRequiredMixin, UpdateView):
 def dashboard(request):
     """Student dashboard view"""
     user = request.user
-    
-    # Get user's loan applications
-    loan_applications = LoanApplication.objects.filter(
-        student=user
-    ).order_by('-created_at')
-    
-    # Get user's repayments
-    repayments = Repayment.objects.filter(
-        loan__student=user
-    ).order_by('-payment_date')
-    
-    # Get active loan (if any)
-    active_loan = loan_applications.filter(status='Approved').first()
-    
-    # Calculate statistics
-    total_loans = loan_applications.count()
-    approved_loans = loan_applications.filter(status='Approved').count()
-    pending_loans = loan_applications.filter(status='Pending').count()
-    rejected_loans = loan_applications.filter(status='Rejected').count()
-    
-    total_paid = sum(
-        repayment.amount_paid 
-        for repayment in repayments.filter(status='Paid')
-    )
-    
-    # Calculate reminder information
-    overdue_loans = []
-    upcoming_due_loans = []
-    total_remaining = 0
-    
-    for loan in loan_applications.filter(status='Approved'):
-        # Calculate remaining amount
-        loan_total_paid = sum(
-            r.amount_paid for r in loan.repayments.filter(status='Paid')
-        )
-        remaining_amount = loan.total_amount_due - loan_total_paid
-        
-        # Skip if fully paid
-        if remaining_amount <= 0:
-            continue
-        
-        total_remaining += remaining_amount
-        
-        # Check if overdue
-        if loan.is_overdue:
-            overdue_loans.append({
-                'loan': loan,
-                'remaining_amount': remaining_amount,
-                'days_overdue': loan.days_overdue,
-            })
-        # Check if due soon (within 7 days)
-        elif loan.days_until_due is not None and loan.days_until_due <= 7:
-            upcoming_due_loans.append({
-                'loan': loan,
-                'remaining_amount': remaining_amount,
-                'days_until_due': loan.days_until_due,
-            })
+    summary = BorrowerSummary(user)
     
     context = {
         'user': user,
-        'loan_applications': loan_applications[:5],  # Show only recent 5
-        'repayments': repayments[:5],  # Show only recent 5
-        'active_loan': active_loan,
-        'total_loans': total_loans,
-        'approved_loans': approved_loans,
-        'pending_loans': pending_loans,
-        'rejected_loans': rejected_loans,
-        'total_paid': total_paid,
-        'overdue_loans': overdue_loans,
-        'upcoming_due_loans': upcoming_due_loans,
-        'total_remaining': total_remaining,
-        'has_reminders': len(overdue_loans) > 0 or len(upcoming_due_loans) > 0,
+        **summary.as_context(),
     }
     
     return render(request, 'users/dashboard.html', context)
@@ -226,9 +125,11 @@ def dashboard(request):
 def loan_history(request):
     """View for displaying complete loan history"""
     user = request.user
-    loan_applications = LoanApplication.objects.filter(
-        student=user
-    ).order_by('-created_at')
+    loan_applications = keyset_paginate(
+        request,
+        LoanApplication.objects.filter(student=user),
+        ('-created_at', '-id'),
+    )
     
     context = {
         'loan_applications': loan_applications,
@@ -242,9 +143,11 @@ def loan_history(request):
 def repayment_history(request):
     """View for displaying complete repayment history"""
     user = request.user
-    repayments = Repayment.objects.filter(
-        loan__student=user
-    ).order_by('-payment_date')
+    repayments = keyset_paginate(
+        request,
+        Repayment.objects.filter(loan__student=user).select_related('loan'),
+        ('-payment_date', '-id'),
+    )
     
     context = {
         'repayments': repayments,
@@ -255,22 +158,19 @@ def repayment_history(request):
 
 
 # API Views for AJAX requests
+def loan_status_validator(request, loan_id):
+    version = LoanApplication.objects.filter(student=request.user).version(loan_id)
+    # is_overdue and days_until_due move with the date
+    return version and validator(request, *version, as_of_date())
+
+
 @login_required
 @require_http_methods(["GET"])
+@conditional(loan_status_validator)
 def get_loan_status(request, loan_id):
     """API endpoint to get loan status"""
     try:
-        loan = get_object_or_404(LoanApplication, id=loan_id, student=request.user)
-        data = {
-            'id': loan.id,
-            'amount': loan.amount,
-            'status': loan.status,
-            'created_at': loan.created_at.strftime('%B %d, %Y'),
-            'repayment_due_date': loan.repayment_due_date.strftime('%B %d, %Y') if loan.repayment_due_date else None,
-            'is_overdue': loan.is_overdue,
-            'total_amount_due': float(loan.total_amount_due),
-            'days_until_due': loan.days_until_due,
-        }
+        data = loan_status_data(request.user, loan_id)
         return JsonResponse({'success': True, 'data': data})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
@@ -281,33 +181,7 @@ def get_loan_status(request, loan_id):
 def get_repayment_summary(request):
     """API endpoint to get repayment summary"""
     try:
-        user = request.user
-        active_loan = LoanApplication.objects.filter(
-            student=user, status='Approved'
-        ).first()
-        
-        if not active_loan:
-            return JsonResponse({
-                'success': True, 
-                'data': {'has_active_loan': False}
-            })
-        
-        total_paid = sum(
-            repayment.amount_paid 
-            for repayment in active_loan.repayments.filter(status='Paid')
-        )
-        
-        remaining_amount = active_loan.total_amount_due - total_paid
-        
-        data = {
-            'has_active_loan': True,
-            'loan_id': active_loan.id,
-            'total_amount_due': float(active_loan.total_amount_due),
-            'total_paid': float(total_paid),
-            'remaining_amount': float(remaining_amount),
-            'is_overdue': active_loan.is_overdue,
-            'days_until_due': active_loan.days_until_due,
-        }
+        data = repayment_summary_data(request.user)
         
         return JsonResponse({'success': True, 'data': data})
     except Exception as e: